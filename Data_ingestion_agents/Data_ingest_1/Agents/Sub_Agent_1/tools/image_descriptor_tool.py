@@ -31,37 +31,58 @@ incidents, environmental hazards, utility problems, public safety concerns, weat
 specific about what makes each an anomaly. if there is no anomaly in the image return Normal.
 """
 
-async def get_image_description(base64_image_string: str) -> str:
-    logger.info("Attempting to describe image from base64 string.")
+def decode_base64_image(base64_image_string: str) -> tuple[str, bytes]:
+    """
+    Splits an optional data URI prefix off a base64 image string and decodes it.
 
-    try:
-        # --- FIX ---
-        # Check if the data URI prefix exists
-        match = re.match(r'data:(image/\w+);base64,(.*)', base64_image_string)
-        if match:
-            # If it exists, extract mime type and data
-            mime_type, base64_data = match.groups()
-        else:
-            # If it doesn't exist, assume a default mime type and use the whole string
-            logger.warning("Base64 string does not have a data URI prefix. Assuming image/jpeg.")
-            mime_type = "image/jpeg" # Or another sensible default
-            base64_data = base64_image_string
-        # --- END FIX ---
+    Returns:
+        A (mime_type, image_bytes) tuple.
 
-        image_bytes = base64.b64decode(base64_data)
-        logger.debug(f"Successfully decoded base64 string with MIME type: {mime_type}")
+    Raises:
+        ValueError: If the payload is not valid base64.
+    """
+    # Check if the data URI prefix exists
+    match = re.match(r'data:(image/\w+);base64,(.*)', base64_image_string)
+    if match:
+        # If it exists, extract mime type and data
+        mime_type, base64_data = match.groups()
+    else:
+        # If it doesn't exist, assume a default mime type and use the whole string
+        logger.warning("Base64 string does not have a data URI prefix. Assuming image/jpeg.")
+        mime_type = "image/jpeg" # Or another sensible default
+        base64_data = base64_image_string
 
+    try:
+        image_bytes = base64.b64decode(base64_data)
     except (base64.binascii.Error, TypeError) as e:
+        raise ValueError(f"Could not decode base64 string. {e}") from e
+
+    logger.debug(f"Successfully decoded base64 string with MIME type: {mime_type}")
+    return mime_type, image_bytes
+
+
+async def get_image_description(base64_image_string: str) -> str:
+    logger.info("Attempting to describe image from base64 string.")
+
+    try:
+        mime_type, image_bytes = decode_base64_image(base64_image_string)
+    except ValueError as e:
         logger.error(f"Failed to decode base64 string. Error: {e}")
-        return f"Error: Could not decode base64 string. {e}"
+        return f"Error: {e}"
     except Exception as e:
         logger.error(f"An unexpected error occurred during base64 processing. Error: {e}")
         return f"Error: An unexpected error occurred. {e}"
 
+    return await describe_image_bytes(image_bytes, mime_type)
+
 
+async def describe_image_bytes(image_bytes, mime_type: str) -> str:
+    """
+    Describes already-decoded image bytes (e.g. a blob read from the BlobStore).
+    """
     try:
         image = types.Part.from_bytes(
-            data=image_bytes, mime_type=mime_type
+            data=bytes(image_bytes), mime_type=mime_type
         )
         logger.debug("Successfully created image Part object.")
     except Exception as e:
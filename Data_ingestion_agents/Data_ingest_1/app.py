@@ -1,18 +1,29 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 import logging
 import json
+import os
+import uuid
+from typing import List
 import asyncio # Import asyncio
+from contextlib import asynccontextmanager
 
 
 from models.anomaly_detection_request import AnomalyDetectionRequest
 from models.anomaly_detection_response import CityAnomalyReport
 from Agents.Sub_Agent_1.agent import root_agent
 from Agents.Sub_Agent_2.agent import address_resolution_agent
-from Agents.Sub_Agent_1.tools.image_descriptor_tool import get_image_description
+from Agents.Sub_Agent_2.model import AddressDetailsOutput
+from Agents.Sub_Agent_1.tools.image_descriptor_tool import decode_base64_image, describe_image_bytes
 from Agents.agent_runner import get_adk_runner, get_message, get_session_service
+from tools.blob_store import get_blob_store
+from tools.report_store import get_report_store
+from tools.tracing import TracingMiddleware, get_tracer, setup_tracing
 
 APP_NAME = "city_anomaly_detector_data_ingest_1"
+# How long a report may wait on reverse geocoding before it is returned with coordinates only.
+GEOCODE_DEADLINE_SECONDS = float(os.getenv("GEOCODE_DEADLINE_SECONDS", "20"))
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -21,12 +32,76 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 session_service = get_session_service()
+blob_store = get_blob_store()
+report_store = get_report_store()
+# Spans of each request, continuing the caller's trace; the ADK adds its agent and model spans.
+tracer_provider = setup_tracing("data_ingest_1")
+tracer = get_tracer()
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight.
+background_tasks = set()
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+def coordinates_only_address(latitude: float, longitude: float) -> dict:
+    """
+    Address fields for a report whose reverse geocoding is still pending.
+    """
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "formatted_address": f"{latitude}, {longitude}",
+    }
+
+
+async def backfill_address(incident_id: str, geocode_task: asyncio.Task):
+    """
+    Waits for a reverse geocode that missed the request deadline and patches the
+    stored incident with the resolved address. If geocoding fails, the incident is
+    finalised with its coordinates-only address and `address_failed`, rather than
+    being left pending forever.
+    """
+    try:
+        raw_address = await geocode_task
+        if not raw_address:
+            raise ValueError("the address agent produced no response")
+        address = AddressDetailsOutput(**json.loads(raw_address))
+        fields = {**address.model_dump(), "pending_address": False}
+    except Exception as e:
+        logger.error(f"Failed to backfill address for incident '{incident_id}': {e}", exc_info=True)
+        fields = {"pending_address": False, "address_failed": True}
+
+    try:
+        await asyncio.to_thread(report_store.patch, incident_id, fields)
+    except Exception as e:
+        logger.error(f"Failed to patch the address of incident '{incident_id}': {e}", exc_info=True)
+        return
+    if fields.get("address_failed"):
+        logger.warning(f"Incident '{incident_id}' finalised with coordinates only.")
+    else:
+        logger.info(f"Backfilled address for incident '{incident_id}'.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Flush the spans still batched for export.
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+
 
 # --- FastAPI Application Initialization ---
 app = FastAPI(
     title="ADK Agent API",
     description="API for interacting with a Google ADK agent.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- CORS Middleware ---
@@ -37,6 +112,7 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+app.add_middleware(TracingMiddleware)
 
 # --- API Endpoint ---
 @app.post("/query", response_model=CityAnomalyReport, status_code=200)
@@ -88,65 +164,154 @@ async def query_agent(
 
         agent1_raw_response_text = "" 
         agent2_raw_response_text = ""
-
-        description = await get_image_description(image)
+        request_started = asyncio.get_running_loop().time()
+        incident_id = uuid.uuid4().hex
 
         # Define async functions to get responses from each runner
-        async def get_agent1_response():
+        async def get_agent1_response(description):
             nonlocal agent1_raw_response_text
-            async for event in runner1.run_async(
-                user_id=user_id,
-                session_id=session_id,
-                new_message=get_message(description)
-            ):
-                if event.is_final_response():
-                    agent1_raw_response_text = event.content.parts[0].text
+            with tracer.start_as_current_span("anomaly_agent"):
+                async for event in runner1.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=get_message(description)
+                ):
+                    if event.is_final_response():
+                        agent1_raw_response_text = event.content.parts[0].text
             return agent1_raw_response_text
 
         async def get_agent2_response():
             nonlocal agent2_raw_response_text
-            async for event in runner2.run_async(
-                user_id=user_id,
-                session_id=session_id,
-                new_message=get_message(f"Latitude: {latitude}, Longitude: {longitude}")
-            ):
-                if event.is_final_response():
-                    agent2_raw_response_text = event.content.parts[0].text
+            with tracer.start_as_current_span("address_resolution_agent"):
+                async for event in runner2.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=get_message(f"Latitude: {latitude}, Longitude: {longitude}")
+                ):
+                    if event.is_final_response():
+                        agent2_raw_response_text = event.content.parts[0].text
             return agent2_raw_response_text
-        
-        # Run both agents concurrently
-        # The order of results in the list will correspond to the order of awaitables passed to gather
-        results = await asyncio.gather(
-            get_agent1_response(),
-            get_agent2_response()
-        )
-
-        agent1_raw_response_text = results[0]
-        agent2_raw_response_text = results[1]
-                
-        if not agent1_raw_response_text:
-            logger.warning(f"Agent 1 did not produce a final response for session '{session_id}'.")
-            raise HTTPException(status_code=500, detail="Agent 1 did not produce a response.")
-        if not agent2_raw_response_text:
-            logger.warning(f"Agent 2 did not produce a final response for session '{session_id}'.")
-            raise HTTPException(status_code=500, detail="Agent 2 did not produce a response.")
 
+        # Reverse geocoding only needs the coordinates, so start it right away and let it
+        # run concurrently with the whole vision stage.
+        geocode_task = asyncio.create_task(get_agent2_response())
+        # Set once the task is handed to the background backfill; otherwise it must not
+        # outlive the request, whichever way the request ends.
+        handed_off = False
         try:
-            parsed_json_1 = json.loads(agent1_raw_response_text)
-            parsed_json_2 = json.loads(agent2_raw_response_text)
+            # Decode once, persist the image so re-analysis never needs the client to resend it,
+            # and describe the stored bytes.
+            try:
+                mime_type, image_bytes = decode_base64_image(image)
+            except ValueError as e:
+                logger.error(f"Failed to decode image for session '{session_id}': {e}")
+                raise HTTPException(status_code=400, detail=f"Invalid image data: {e}")
+
+            with tracer.start_as_current_span("store_image"):
+                source_media_uri = await asyncio.to_thread(blob_store.put, image_bytes)
+            with tracer.start_as_current_span("describe_image"):
+                description = await describe_image_bytes(image_bytes, mime_type)
+            agent1_raw_response_text = await get_agent1_response(description)
+
+            if not agent1_raw_response_text:
+                logger.warning(f"Agent 1 did not produce a final response for session '{session_id}'.")
+                raise HTTPException(status_code=500, detail="Agent 1 did not produce a response.")
+
+            # Give the geocoder whatever is left of its deadline. If it misses it, answer with
+            # coordinates only and let the task finish in the background.
+            remaining = GEOCODE_DEADLINE_SECONDS - (asyncio.get_running_loop().time() - request_started)
+            done, _ = await asyncio.wait({geocode_task}, timeout=max(remaining, 0))
+            pending_address = geocode_task not in done
+
+            if not pending_address:
+                agent2_raw_response_text = geocode_task.result()
+                if not agent2_raw_response_text:
+                    logger.warning(f"Agent 2 did not produce a final response for session '{session_id}'.")
+                    raise HTTPException(status_code=500, detail="Agent 2 did not produce a response.")
+
+            try:
+                parsed_json_1 = json.loads(agent1_raw_response_text)
+                if pending_address:
+                    logger.warning(f"Reverse geocoding missed its {GEOCODE_DEADLINE_SECONDS}s deadline for incident '{incident_id}', returning coordinates only.")
+                    parsed_json_2 = coordinates_only_address(latitude, longitude)
+                else:
+                    parsed_json_2 = json.loads(agent2_raw_response_text)
             
-            final_response = CityAnomalyReport(unix_timestamp=time, **parsed_json_1, **parsed_json_2)
-            logger.info(f"Successfully parsed agent response into CityAnomalyReport model.")
+                final_response = CityAnomalyReport(
+                    unix_timestamp=time,
+                    **parsed_json_1,
+                    **parsed_json_2,
+                    source_media_uri=source_media_uri,
+                    incident_id=incident_id,
+                    pending_address=pending_address,
+                )
+                logger.info(f"Successfully parsed agent response into CityAnomalyReport model.")
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to parse agent response as JSON: {e}. Raw response: {agent1_raw_response_text}, {agent2_raw_response_text}", exc_info=True)
+                raise HTTPException(status_code=500, detail="Agent returned invalid JSON.")
+            except Exception as e:
+                logger.error(f"Failed to validate agent response against CityAnomalyReport model: {e}", exc_info=True)
+                raise HTTPException(status_code=500, detail="Agent response did not match expected structure.")
+
+            with tracer.start_as_current_span("save_report"):
+                await asyncio.to_thread(report_store.save, incident_id, final_response.model_dump())
+            if pending_address:
+                run_in_background(backfill_address(incident_id, geocode_task))
+                handed_off = True
             return final_response
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse agent response as JSON: {e}. Raw response: {agent1_raw_response_text}, {agent2_raw_response_text}", exc_info=True)
-            raise HTTPException(status_code=500, detail="Agent returned invalid JSON.")
-        except Exception as e:
-            logger.error(f"Failed to validate agent response against CityAnomalyReport model: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail="Agent response did not match expected structure.")
+        finally:
+            if not handed_off:
+                geocode_task.cancel()
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Unexpected error processing query for session '{session_id}': {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+# Upper bound on the ids one /reports lookup may ask for.
+MAX_REPORTS_PER_LOOKUP = 500
+
+
+@app.get("/reports", response_model=List[CityAnomalyReport])
+async def get_reports(incident_id: List[str] = Query(default=[])):
+    """
+    Returns the stored reports for the given ids (repeat `incident_id`), so a client can
+    re-check all its pending reports in one call. Unknown ids are left out.
+    """
+    if len(incident_id) > MAX_REPORTS_PER_LOOKUP:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_REPORTS_PER_LOOKUP} incident ids per lookup.")
+    reports = await asyncio.to_thread(report_store.get_many, incident_id)
+    return [CityAnomalyReport(**report) for report in reports.values()]
+
+
+@app.get("/reports/{incident_id}", response_model=CityAnomalyReport)
+async def get_report(incident_id: str):
+    """
+    Returns the stored report, including any address patched in after the original response.
+    """
+    report = await asyncio.to_thread(report_store.get, incident_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found.")
+    return CityAnomalyReport(**report)
+
+
+@app.get("/media/{digest}")
+async def get_media(digest: str):
+    """
+    Serves a stored report image by its sha256 digest (the tail of `source_media_uri`).
+    The file is sent as is (sendfile where the server supports it) rather than read into memory;
+    blobs are immutable, so this is safe without holding a mapping open.
+    """
+    try:
+        if not blob_store.exists(digest):
+            raise HTTPException(status_code=404, detail="Media not found.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return FileResponse(
+        blob_store.path_for(digest),
+        media_type=blob_store.media_type(digest),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
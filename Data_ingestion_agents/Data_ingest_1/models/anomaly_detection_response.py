@@ -119,4 +119,20 @@ class CityAnomalyReport(BaseModel):
     )
     postal_code: Optional[str] = Field(
         default=None, description="The postal code or ZIP code of the anomaly location."
-    )
\ No newline at end of file
+    )
+
+    # Media Fields (from the BlobStore)
+    source_media_uri: Optional[str] = Field(
+        default=None, description="Stable content-addressed URI (blob://sha256/<digest>) of the stored report image, servable from /media/{digest}."
+    )
+
+    # Tracking Fields
+    incident_id: Optional[str] = Field(
+        default=None, description="Identifier of the stored report; use it with /reports/{incident_id} to fetch later patches."
+    )
+    pending_address: bool = Field(
+        default=False, description="True when reverse geocoding missed its deadline and the address fields are still being backfilled."
+    )
+    address_failed: bool = Field(
+        default=False, description="True when the backfill of a pending address failed; the address fields then hold the coordinates only."
+    )
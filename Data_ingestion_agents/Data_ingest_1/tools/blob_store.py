@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(os.path.dirname(__file__), "..", "blob_store"))
+URI_PREFIX = "blob://sha256/"
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Magic bytes of the image formats the UI and the vision model deal with.
+_MEDIA_TYPE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"RIFF", "image/webp"),
+]
+
+
+class BlobStore:
+    """
+    Content-addressed store for report images.
+
+    Blobs are named by the sha256 of their bytes and sharded two levels deep
+    (`ab/cd/abcd...`) so no single directory grows unbounded. Writes go to a
+    temporary file in the target shard and are renamed into place, so readers
+    never observe a partially written blob and storing the same image twice is
+    a no-op.
+    """
+
+    def __init__(self, root_dir: str = BLOB_STORE_DIR):
+        self.root_dir = os.path.abspath(root_dir)
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    # --- Addressing ---
+    @staticmethod
+    def uri_for(digest: str) -> str:
+        return f"{URI_PREFIX}{digest}"
+
+    @staticmethod
+    def digest_from_uri(uri: str) -> str:
+        """
+        Extracts the sha256 digest from a `source_media_uri` (or accepts a bare digest).
+
+        Raises:
+            ValueError: If the value is not a valid blob reference.
+        """
+        digest = uri[len(URI_PREFIX):] if uri.startswith(URI_PREFIX) else uri
+        if not _DIGEST_RE.match(digest):
+            raise ValueError(f"Not a valid blob reference: {uri!r}")
+        return digest
+
+    def path_for(self, digest: str) -> str:
+        digest = self.digest_from_uri(digest)
+        return os.path.join(self.root_dir, digest[:2], digest[2:4], digest)
+
+    def exists(self, uri: str) -> bool:
+        return os.path.exists(self.path_for(uri))
+
+    # --- Writes ---
+    def put(self, data: bytes) -> str:
+        """
+        Stores the given bytes and returns their stable `source_media_uri`.
+
+        Args:
+            data: Raw (decoded) image bytes.
+
+        Returns:
+            A `blob://sha256/<digest>` URI that always resolves to these bytes.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            logger.debug(f"Blob {digest} already stored, skipping write.")
+            return self.uri_for(digest)
+
+        shard_dir = os.path.dirname(path)
+        os.makedirs(shard_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=shard_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        logger.info(f"Stored blob {digest} ({len(data)} bytes).")
+        return self.uri_for(digest)
+
+    # --- Reads ---
+    def media_type(self, uri: str) -> str:
+        with open(self.path_for(uri), "rb") as blob_file:
+            head = blob_file.read(16)
+        return sniff_media_type(head) or "application/octet-stream"
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    for signature, media_type in _MEDIA_TYPE_SIGNATURES:
+        if head.startswith(signature):
+            if media_type == "image/webp" and head[8:12] != b"WEBP":
+                continue
+            return media_type
+    return None
+
+
+def get_blob_store() -> BlobStore:
+    """
+    Returns the BlobStore rooted at BLOB_STORE_DIR.
+    """
+    logger.info(f"BlobStore initialized at '{os.path.abspath(BLOB_STORE_DIR)}'.")
+    return BlobStore(BLOB_STORE_DIR)
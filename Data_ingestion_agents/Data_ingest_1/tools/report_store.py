@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# The prediction service reads the `incident_events` table of this file directly (its
+# INCIDENT_EVENT_LOG must name the same path), so moving it means updating both services.
+REPORT_STORE_PATH = os.getenv("REPORT_STORE_PATH", os.path.join(os.path.dirname(__file__), "..", "reports.db"))
+
+
+class ReportStore:
+    """
+    Durable store of the CityAnomalyReports produced by this service, keyed by incident_id.
+
+    Reports are kept as JSON documents so enrichment that finishes after the
+    response was sent (e.g. a late reverse-geocode) can patch individual fields
+    in place.
+
+    Each report is also published, once final (with its address resolved), to the
+    `incident_events` table: an append-only log whose ids are the offsets subscribers
+    (the prediction service) resume from. The event is written in the same transaction
+    as the report, so a report is never saved without its event or the reverse.
+    """
+
+    def __init__(self, db_path: str = REPORT_STORE_PATH):
+        self.db_path = os.path.abspath(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reports (
+                    incident_id TEXT PRIMARY KEY,
+                    report TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS incident_events (
+                    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    incident_id TEXT NOT NULL,
+                    report TEXT NOT NULL,
+                    published_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def _publish(conn: sqlite3.Connection, incident_id: str, document: str) -> None:
+        conn.execute(
+            "INSERT INTO incident_events (incident_id, report, published_at) VALUES (?, ?, ?)",
+            (incident_id, document, time.time()),
+        )
+
+    def save(self, incident_id: str, report: Dict[str, Any]) -> None:
+        """
+        Stores a report, and publishes it unless its address is still pending.
+        """
+        document = json.dumps(report)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (incident_id, report, updated_at) VALUES (?, ?, ?)",
+                (incident_id, document, time.time()),
+            )
+            if not report.get("pending_address"):
+                self._publish(conn, incident_id, document)
+
+    def get(self, incident_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT report FROM reports WHERE incident_id = ?", (incident_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, incident_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the stored reports among `incident_ids`, keyed by incident_id; unknown ids are left out.
+        """
+        if not incident_ids:
+            return {}
+        placeholders = ", ".join("?" * len(incident_ids))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT incident_id, report FROM reports WHERE incident_id IN ({placeholders})",
+                list(incident_ids),
+            ).fetchall()
+        return {incident_id: json.loads(report) for incident_id, report in rows}
+
+    def patch(self, incident_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Merges `fields` into a stored report and returns the updated document.
+
+        Returns:
+            The patched report, or None if the incident is unknown.
+        """
+        with closing(self._connect()) as conn, conn:
+            # BEGIN IMMEDIATE takes the write lock up front so concurrent patches
+            # to the same report cannot interleave their read-modify-write.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT report FROM reports WHERE incident_id = ?", (incident_id,)).fetchone()
+            if row is None:
+                logger.warning(f"Cannot patch unknown incident '{incident_id}'.")
+                return None
+            report = json.loads(row[0])
+            was_pending = report.get("pending_address", False)
+            report.update(fields)
+            document = json.dumps(report)
+            conn.execute(
+                "UPDATE reports SET report = ?, updated_at = ? WHERE incident_id = ?",
+                (document, time.time(), incident_id),
+            )
+            # The report becomes final when its address is backfilled.
+            if was_pending and not report.get("pending_address"):
+                self._publish(conn, incident_id, document)
+        return report
+
+
+def get_report_store() -> ReportStore:
+    """
+    Returns the ReportStore backed by REPORT_STORE_PATH.
+    """
+    logger.info(f"ReportStore initialized at '{os.path.abspath(REPORT_STORE_PATH)}'.")
+    return ReportStore(REPORT_STORE_PATH)
@@ -0,0 +1,95 @@
+"""
+OpenTelemetry tracing of the ingestion service.
+
+`setup_tracing` installs the global tracer provider, so the ADK's own spans (agent
+runs, model calls, tool and MCP calls) are exported alongside ours; shut it down
+when the service stops so batched spans are flushed. `TracingMiddleware` continues
+the trace of the caller (W3C `traceparent` header) for each HTTP request.
+
+Spans go to TRACE_EXPORTER: "file" (one JSON span per line in TRACE_FILE, for offline
+use; see prediction_agent/tools/critical_path.py), "console", "gcp" (Cloud Trace) or "none".
+"""
+import logging
+import os
+from typing import Optional
+
+from opentelemetry import trace
+from opentelemetry.propagate import extract
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(__file__), "..", "traces.jsonl"))
+
+TRACER_NAME = "commuteguardian"
+
+
+def setup_tracing(service_name: str) -> Optional[TracerProvider]:
+    """
+    Installs a tracer provider exporting to TRACE_EXPORTER, unless it is "none".
+
+    Returns:
+        The provider, to shut down (flushing pending spans) when the service stops.
+    """
+    if TRACE_EXPORTER == "none":
+        return None
+    if TRACE_EXPORTER == "file":
+        path = os.path.abspath(TRACE_FILE)
+        exporter = ConsoleSpanExporter(out=open(path, "a", encoding="utf-8"),
+                                       formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif TRACE_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif TRACE_EXPORTER == "gcp":
+        from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+        exporter = CloudTraceSpanExporter()
+    else:
+        logger.warning(f"Unknown TRACE_EXPORTER '{TRACE_EXPORTER}', tracing disabled.")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing '{service_name}' to {TRACE_EXPORTER}"
+                + (f" ({os.path.abspath(TRACE_FILE)})." if TRACE_EXPORTER == "file" else "."))
+    return provider
+
+
+def get_tracer(tracer_provider: Optional[TracerProvider] = None) -> trace.Tracer:
+    return trace.get_tracer(TRACER_NAME, tracer_provider=tracer_provider)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request, as a child of the caller's
+    span if the request carries one. The span lasts until the response body is sent,
+    so it covers streamed responses too.
+    """
+
+    def __init__(self, app, tracer_provider: Optional[TracerProvider] = None):
+        self.app = app
+        self.tracer = get_tracer(tracer_provider)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        name = f"{scope['method']} {scope['path']}"
+        with self.tracer.start_as_current_span(
+            name, context=extract(carrier), kind=SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            await self.app(scope, receive, send_traced)
+
@@ -1,14 +1,17 @@
 import os
 from google.adk.agents import LlmAgent, SequentialAgent
+from google.adk.agents.callback_context import CallbackContext
 from google.adk.tools import google_search
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
 from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
-from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
+from typing import Optional
 
 from .models import Outputformat
-from .agent_runner import get_message
+from .agent_runner import (
+    CONVERSATION_SUMMARY_STATE_KEY, get_message, run_agent_in_scratch_session, scratch_session, stream_agent_text,
+)
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -26,6 +29,22 @@ if not google_maps_api_key:
         print("WARNING: GOOGLE_MAPS_API_KEY is not set. Please set it as an environment variable or in the script.")
         # You might want to raise an error or exit if the key is crucial and not found.
 
+# Set by the route resolver when both endpoints resolved from the local gazetteer.
+KNOWN_GEOCODE_STATE_KEY = "known_geocode"
+
+
+def use_known_geocode(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    Skips the geocoding agent (and its `maps_geocode` calls) when the route resolver
+    already knows both endpoints, handing them to the directions agent as {geocode}.
+    """
+    known = callback_context.state.get(KNOWN_GEOCODE_STATE_KEY)
+    if not known:
+        return None
+    callback_context.state['geocode'] = known
+    return types.Content(role="model", parts=[types.Part(text=known)])
+
+
 location_finder = LlmAgent(
     name="tool_agent",
     model="gemini-2.5-flash",
@@ -62,7 +81,8 @@ location_finder = LlmAgent(
             tool_filter=['maps_geocode']
         )
     ],
-    output_key='geocode'
+    output_key='geocode',
+    before_agent_callback=use_known_geocode
 )
 
 first_agent = LlmAgent(
@@ -118,7 +138,11 @@ root_agent = SequentialAgent(
     sub_agents=[location_finder, first_agent, formatter_agent]
 )
 
-async def get_past_incident_data(search_query: str, user_id, session_id, session_service, app_name):
+async def get_past_incident_data(search_query: str, user_id, session_service, app_name):
+    """
+    Searches past news for one incident query. Runs in its own scratch session so that
+    several lookups can run concurrently; the caller stores the result in the user's session.
+    """
     get_past_data = LlmAgent(
         model='gemini-2.0-flash-lite',
         name='get_past_data',
@@ -133,23 +157,14 @@ async def get_past_incident_data(search_query: str, user_id, session_id, session
         output_key='news'
     )
 
-
     message = get_message(f'Search Queries : {search_query}')
+    return await run_agent_in_scratch_session(get_past_data, message, app_name, user_id, session_service)
 
-    runner = Runner(agent=get_past_data, session_service=session_service, app_name=app_name)
-
-    agent_raw_response_text = ""
-    async for event in runner.run_async(
-            user_id=user_id,
-            session_id=session_id,
-            new_message=message
-        ):
-            if event.is_final_response():
-                agent_raw_response_text = event.content.parts[0].text
-    
-    return agent_raw_response_text
-
-async def get_feature_weather_data(locations: list, user_id, session_id, session_service, app_name):
+async def get_feature_weather_data(locations: list, user_id, session_service, app_name, forecast_hour: str = None):
+    """
+    Searches the weather forecast for the route locations (optionally for a given
+    hour), in its own scratch session.
+    """
     get_past_data = LlmAgent(
         model='gemini-2.0-flash-lite',
         name='get_feature_weather_data',
@@ -164,24 +179,15 @@ async def get_feature_weather_data(locations: list, user_id, session_id, session
         output_key='feature_weather'
     )
 
-    message = get_message(f'Locations : {locations}')
-
-    runner = Runner(agent=get_past_data, session_service=session_service, app_name=app_name)
-
-    agent_raw_response_text = ""
-    async for event in runner.run_async(
-            user_id=user_id,
-            session_id=session_id,
-            new_message=message
-        ):
-            if event.is_final_response():
-                agent_raw_response_text = event.content.parts[0].text
-    
-    return agent_raw_response_text
+    query = f'Locations : {locations}'
+    if forecast_hour:
+        query += f' Forecast hour : {forecast_hour}'
+    message = get_message(query)
+    return await run_agent_in_scratch_session(get_past_data, message, app_name, user_id, session_service)
 
 
-async def feature_event_prediction_agent(our_data, user_id, session_id, session_service, app_name):
-    get_past_data = LlmAgent(
+def prediction_agent() -> LlmAgent:
+    return LlmAgent(
         model='gemini-2.5-flash',
         name='prediction',
         instruction='''
@@ -189,6 +195,8 @@ async def feature_event_prediction_agent(our_data, user_id, session_id, session_
         Input 1: {news} It is the past anomaly happened in that location for that particular event
         Input 2: {feature_weather} It is the possible weather condition in those locations for that particular events
         Input 3: the user will be providing the current condition of the Place
+        Earlier exchanges with the user, if any (use them to understand follow-up questions):
+        {conversation_summary?}
 
         Using all these data decide what might happen in that area after 1 or 2 hrs. Will anomaly will still be there or
         the anomaly will be gone or because of the wether the anomaly will increase you have to tell that.
@@ -197,17 +205,24 @@ async def feature_event_prediction_agent(our_data, user_id, session_id, session_
         output_key='final_output'
     )
 
+
+async def stream_feature_event_prediction(our_data, enrichment: dict, user_id, session_service, app_name,
+                                          conversation_summary: str = ""):
+    """
+    Yields the prediction agent's advisory text as the model generates it. The agent
+    runs in a scratch session holding the `enrichment` state (`news`, `feature_weather`;
+    see `enrich_incidents`) and the clipped `conversation_summary` (see
+    `get_conversation_summary`), so its prompt is bounded on every request.
+    """
     message = get_message(f'Current Data : {our_data}')
+    state = {**enrichment, CONVERSATION_SUMMARY_STATE_KEY: conversation_summary}
+    async with scratch_session(session_service, app_name, user_id, state) as session_id:
+        async for chunk in stream_agent_text(prediction_agent(), message, app_name, user_id, session_id,
+                                             session_service):
+            yield chunk
+
 
-    runner = Runner(agent=get_past_data, session_service=session_service, app_name=app_name)
-
-    agent_raw_response_text = ""
-    async for event in runner.run_async(
-            user_id=user_id,
-            session_id=session_id,
-            new_message=message
-        ):
-            if event.is_final_response():
-                agent_raw_response_text = event.content.parts[0].text
-    
-    return agent_raw_response_text
+async def feature_event_prediction_agent(our_data, enrichment: dict, user_id, session_service, app_name,
+                                         conversation_summary: str = ""):
+    return "".join([chunk async for chunk in stream_feature_event_prediction(
+        our_data, enrichment, user_id, session_service, app_name, conversation_summary)])
@@ -1,5 +1,11 @@
+import asyncio
 import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
@@ -10,6 +16,16 @@ from google.genai import types
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# --- Configuration ---
+# The user's long-lived session keeps only the last few exchanges, each clipped, so its
+# size stays constant however long the conversation runs.
+CONVERSATION_SUMMARY_TURNS = int(os.getenv("CONVERSATION_SUMMARY_TURNS", "5"))
+CONVERSATION_SUMMARY_CHARS = int(os.getenv("CONVERSATION_SUMMARY_CHARS", "200"))
+CONVERSATION_SUMMARY_STATE_KEY = "conversation_summary"
+
+# Serialises the read-replace of long-lived sessions, so concurrent turns are not lost.
+_summary_lock = asyncio.Lock()
+
 def get_session_service():
     """
     Returns an instance of InMemorySessionService for managing user sessions.
@@ -28,4 +44,96 @@ def get_adk_runner(agent, app_name, session_service) -> Runner:
     return Runner(agent=agent, session_service=session_service, app_name=app_name)
 
 def get_message(user_message: str) -> types.Content:
-    return types.Content(role="user", parts=[types.Part(text=user_message)])
\ No newline at end of file
+    return types.Content(role="user", parts=[types.Part(text=user_message)])
+
+async def run_agent(agent, message: types.Content, app_name, user_id, session_id, session_service) -> str:
+    """
+    Runs an agent to completion in the given session and returns its final response text.
+    """
+    runner = get_adk_runner(agent, app_name, session_service)
+    final_text = ""
+    async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=message):
+        if event.is_final_response() and event.content and event.content.parts:
+            final_text = event.content.parts[0].text or ""
+    return final_text
+
+async def stream_agent_text(agent, message: types.Content, app_name, user_id, session_id, session_service) -> AsyncIterator[str]:
+    """
+    Runs an agent in the given session and yields its response text as the model
+    generates it. Joined, the chunks are the final response text.
+    """
+    runner = get_adk_runner(agent, app_name, session_service)
+    streamed = False
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+    async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=message,
+                                        run_config=run_config):
+        parts = event.content.parts if event.content and event.content.parts else []
+        text = "".join(part.text for part in parts if part.text and not part.thought)
+        if event.partial:
+            if text:
+                streamed = True
+                yield text
+        elif event.is_final_response() and text and not streamed:
+            # The model answered without streaming; the whole text arrives at once.
+            yield text
+
+@asynccontextmanager
+async def scratch_session(session_service, app_name, user_id, state: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    A throwaway session holding `state` (e.g. what an agent's instruction reads), deleted
+    on exit. Agents run in one per request, so concurrent requests cannot overwrite each
+    other's state and no request inherits the event history of earlier ones.
+
+    Yields:
+        The session id.
+    """
+    session = await session_service.create_session(
+        app_name=app_name, user_id=user_id, state=state, session_id=f"scratch-{uuid.uuid4().hex}"
+    )
+    try:
+        yield session.id
+    finally:
+        await session_service.delete_session(app_name=app_name, user_id=user_id, session_id=session.id)
+
+async def run_agent_in_scratch_session(agent, message: types.Content, app_name, user_id, session_service,
+                                       state: Optional[dict] = None) -> str:
+    """
+    Runs an agent in a throwaway session (see `scratch_session`), so that several agents
+    can run concurrently without interleaving their turns in a shared conversation history.
+    """
+    async with scratch_session(session_service, app_name, user_id, state) as session_id:
+        return await run_agent(agent, message, app_name, user_id, session_id, session_service)
+
+async def get_conversation_summary(session_service, app_name, user_id, session_id) -> str:
+    """
+    The conversation summary of the user's long-lived session (see `record_conversation_turn`)
+    as prompt text, one exchange per line pair; empty before the first turn.
+    """
+    session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    turns = (session.state.get(CONVERSATION_SUMMARY_STATE_KEY) if session else None) or []
+    return "\n".join(f"User: {turn['user']}\nAssistant: {turn['assistant']}" for turn in turns)
+
+async def record_conversation_turn(session_service, app_name, user_id, session_id, user_input: str,
+                                   reply: str) -> None:
+    """
+    Appends an exchange to the conversation summary in the user's long-lived session
+    (`conversation_summary` in its state), keeping the last CONVERSATION_SUMMARY_TURNS.
+
+    The session is replaced with one holding the new state rather than appended to, so
+    it carries no event history; it is created on the user's first turn.
+    """
+    def clip(text: str) -> str:
+        text = " ".join(str(text).split())
+        return text if len(text) <= CONVERSATION_SUMMARY_CHARS else text[:CONVERSATION_SUMMARY_CHARS - 3] + "..."
+
+    async with _summary_lock:
+        session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        # App- and user-scoped keys are merged into the state on read but stored apart.
+        state = {key: value for key, value in (session.state if session else {}).items()
+                 if not key.startswith(("app:", "user:", "temp:"))}
+        turns = list(state.get(CONVERSATION_SUMMARY_STATE_KEY) or [])
+        turns.append({"user": clip(user_input), "assistant": clip(reply)})
+        state[CONVERSATION_SUMMARY_STATE_KEY] = turns[-CONVERSATION_SUMMARY_TURNS:]
+        if session is not None:
+            await session_service.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        await session_service.create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
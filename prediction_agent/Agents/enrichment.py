@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from tools.cache import TTLCache, get_disk_tier
+
+from .agent import get_feature_weather_data, get_past_incident_data
+from .weather import get_weather_forecaster
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Upper bound on enrichment lookups (news groups + weather) in flight at once.
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "8"))
+# Only the most relevant (event type, area) groups get a news lookup.
+MAX_NEWS_GROUPS = int(os.getenv("MAX_NEWS_GROUPS", "6"))
+# Past news changes slowly: serve it from cache for NEWS_CACHE_TTL_SECONDS, then for up
+# to NEWS_CACHE_STALE_SECONDS more while it is refreshed in the background.
+NEWS_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CACHE_TTL_SECONDS", "3600"))
+NEWS_CACHE_STALE_SECONDS = float(os.getenv("NEWS_CACHE_STALE_SECONDS", "21600"))
+NEWS_CACHE_MAX_ENTRIES = int(os.getenv("NEWS_CACHE_MAX_ENTRIES", "2048"))
+
+_news_cache: Optional[TTLCache] = None
+
+
+def get_news_cache() -> TTLCache:
+    """
+    Returns the process-wide cache of past-incident news lookups (memory + disk tier).
+    """
+    global _news_cache
+    if _news_cache is None:
+        _news_cache = TTLCache(
+            "news",
+            ttl_seconds=NEWS_CACHE_TTL_SECONDS,
+            stale_seconds=NEWS_CACHE_STALE_SECONDS,
+            max_entries=NEWS_CACHE_MAX_ENTRIES,
+            disk=get_disk_tier(),
+        )
+    return _news_cache
+
+
+def group_incidents(incidents: List[dict]) -> Dict[Tuple[str, str], List[dict]]:
+    """
+    Groups matched incidents by (event_type, area_name), compared case- and
+    whitespace-insensitively. Groups keep the order in which they first appear,
+    so the most relevant incidents' groups come first.
+    """
+    groups: Dict[Tuple[str, str], List[dict]] = {}
+    for incident in incidents:
+        key = tuple(str(incident.get(field) or "").strip().lower() for field in ("event_type", "area_name"))
+        groups.setdefault(key, []).append(incident)
+    return groups
+
+
+def news_query(incidents: List[dict]) -> str:
+    """
+    One news search query for a group of incidents of the same type in the same area,
+    e.g. "Weather-Related Damage (flooding, waterlogging) in Silk Board, Bengaluru".
+    """
+    first = incidents[0]
+    sub_event_types = list(dict.fromkeys(i.get("sub_event_type") for i in incidents if i.get("sub_event_type")))
+    query = first.get("event_type") or "Incident"
+    if sub_event_types:
+        query += f" ({', '.join(sub_event_types)})"
+    place = ", ".join(part for part in (first.get("area_name"), first.get("city")) if part)
+    return f"{query} in {place}" if place else query
+
+
+def _normalize(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def news_cache_key(incidents: List[dict]) -> str:
+    """
+    Cache key for a group's news lookup: its normalised event type, sorted sub-event
+    types and area name, so the same group hits the cache whatever order or
+    spelling case its incidents arrive in.
+    """
+    first = incidents[0]
+    sub_event_types = sorted({_normalize(i.get("sub_event_type")) for i in incidents} - {""})
+    return "|".join([_normalize(first.get("event_type")), ",".join(sub_event_types), _normalize(first.get("area_name"))])
+
+
+async def _bounded(semaphore: asyncio.Semaphore, name: str, coro):
+    # Runs one lookup under the concurrency limit; a failure gives "" instead of raising.
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            return await coro
+        except Exception as e:
+            logger.error(f"Enrichment lookup '{name}' failed: {e}", exc_info=True)
+            return ""
+        finally:
+            logger.info(f"Enrichment lookup '{name}' took {time.perf_counter() - started:.2f}s.")
+
+
+def _news_lookups(groups: List[List[dict]], user_id, session_service, app_name, semaphore: asyncio.Semaphore) -> list:
+    # One cached news lookup per group, as awaitables in group order.
+    news_cache = get_news_cache()
+
+    def load_news(query: str):
+        return lambda: get_past_incident_data(query, user_id, session_service, app_name)
+
+    return [
+        _bounded(semaphore, f"news: {news_query(group)}",
+                 news_cache.get_or_load(news_cache_key(group), load_news(news_query(group))))
+        for group in groups
+    ]
+
+
+async def enrich_incidents(incidents: List[dict], locations: list, user_id, session_service, app_name,
+                           route_points=None) -> dict:
+    """
+    Runs the enrichment lookups concurrently and returns their results as the session
+    state the prediction agent reads (`news`, `feature_weather`).
+
+    One news lookup is issued per (event_type, area_name) group, alongside a single
+    weather lookup for the route, at most ENRICHMENT_CONCURRENCY at a time, so the
+    stage takes about as long as its slowest lookup. News results are served from the
+    news cache (see `get_news_cache`) when possible. Given `route_points` ((n, 2)
+    latitude/longitude), weather comes from the per-cell forecast cache (see
+    `Agents/weather.py`); otherwise it is searched for the location names. A failed
+    lookup is logged and contributes an empty result instead of failing the request.
+
+    Returns:
+        The prediction agent's session state.
+    """
+    semaphore = asyncio.Semaphore(ENRICHMENT_CONCURRENCY)
+    groups = list(group_incidents(incidents).values())[:MAX_NEWS_GROUPS]
+    queries = [news_query(group) for group in groups]
+    news_tasks = _news_lookups(groups, user_id, session_service, app_name, semaphore)
+    if route_points is not None and len(route_points):
+        weather_lookup = get_weather_forecaster(session_service, app_name).route_forecast(route_points)
+    else:
+        weather_lookup = get_feature_weather_data(locations, user_id, session_service, app_name)
+    weather_task = _bounded(semaphore, "weather", weather_lookup)
+
+    *news_results, weather = await asyncio.gather(*news_tasks, weather_task)
+
+    news = "\n\n".join(f"### {query}\n{result}" for query, result in zip(queries, news_results) if result)
+    return {"news": news or "No related past news found.", "feature_weather": weather or "No forecast available."}
+
+
+async def enrich_routes(route_incidents: List[List[dict]], route_points: List, user_id, session_service,
+                        app_name) -> List[dict]:
+    """
+    Enrichment for several routes at once (e.g. alternatives being compared). Lookups
+    are shared where routes overlap: news is looked up once per (event_type,
+    area_name) group across all routes (at most MAX_NEWS_GROUPS, most relevant
+    first), and weather once per forecast cell (see `WeatherForecaster.routes_forecast`).
+
+    Args:
+        route_incidents: The matched incidents of each route.
+        route_points: (n, 2) latitude/longitude arrays, one per route.
+
+    Returns:
+        One dict per route with its `news` (group query -> result) and `weather`.
+    """
+    semaphore = asyncio.Semaphore(ENRICHMENT_CONCURRENCY)
+    groups = group_incidents([incident for incidents in route_incidents for incident in incidents])
+    keys = list(groups)[:MAX_NEWS_GROUPS]
+    news_tasks = _news_lookups([groups[key] for key in keys], user_id, session_service, app_name, semaphore)
+    weather_task = _bounded(semaphore, "weather", get_weather_forecaster(session_service, app_name).routes_forecast(route_points))
+    *news_results, weather = await asyncio.gather(*news_tasks, weather_task)
+    weather = weather or [""] * len(route_points)
+    news = {key: (news_query(groups[key]), result) for key, result in zip(keys, news_results) if result}
+
+    enriched = []
+    for incidents, forecast in zip(route_incidents, weather):
+        route_news = dict(news[key] for key in group_incidents(incidents) if key in news)
+        enriched.append({"news": route_news, "weather": forecast})
+    return enriched
@@ -0,0 +1,153 @@
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from tools.gazetteer import get_gazetteer
+from tools.incident_index import IncidentIndex, get_incident_index
+from tools.recency import RecencyPolicy, get_recency_policy
+
+from .routes import clean_place_phrase, parse_route_query
+
+logger = logging.getLogger(__name__)
+
+# --- Intents ---
+ROUTE = "route"
+AREA_STATUS = "area_status"
+OTHER = "other"
+
+# Incidents listed in a local area-status answer.
+MAX_AREA_INCIDENTS = 5
+
+NO_ANOMALY = "No anomaly found"
+HELP_REPLY = (
+    "I can warn you about incidents on your commute. Ask about a route, e.g. "
+    "\"I have to go from Hoodi to Silk Board\", or about an area, e.g. \"What's happening in Koramangala?\""
+)
+
+# "what's happening in X", "how is the traffic near X", "any flooding in X", "status of X"
+_AREA_PATTERNS = [
+    re.compile(r"\bwhat(?:'s|s| is)\s+(?:happening|going on|up|the situation)\s+(?:in|at|near|around|on)\s+(?P<area>.+)",
+               re.IGNORECASE),
+    re.compile(r"\bhow(?:'s|s| is| are)\s+(?:the\s+)?(?:traffic|roads?|situation|conditions?)\s+(?:like\s+)?"
+               r"(?:in|at|near|around|on)\s+(?P<area>.+)", re.IGNORECASE),
+    re.compile(r"\b(?:any|are there)\s+(?:\w+\s+){0,2}?(?:incidents?|issues?|problems?|accidents?|flooding|floods?|"
+               r"jams?|potholes?|delays?|alerts?|traffic)\s+(?:in|at|near|around|on)\s+(?P<area>.+)", re.IGNORECASE),
+    re.compile(r"\b(?:status|situation|conditions?)\s+(?:of|in|at|near|around|on)\s+(?P<area>.+)", re.IGNORECASE),
+]
+_ROUTE_WORDS = re.compile(
+    r"\b(?:route|commute|travel|travelling|traveling|drive|driving|ride|reach|directions?|go|going|get|head|heading)\b",
+    re.IGNORECASE,
+)
+# Asking for an explanation rather than a quick status sends a route query to the prediction agent.
+_NARRATIVE_WORDS = re.compile(
+    r"\b(?:explain|elaborate|details?|detailed|why|describe|in depth|tell me more|more about)\b", re.IGNORECASE
+)
+_SMALL_TALK = [
+    (re.compile(r"^\s*(?:hi|hello|hey|hola|namaste|good\s+(?:morning|afternoon|evening))\b", re.IGNORECASE),
+     "Hello! " + HELP_REPLY),
+    (re.compile(r"\b(?:thanks|thank\s+you|thx|cheers|ty)\b", re.IGNORECASE),
+     "You're welcome! Have a safe commute."),
+    (re.compile(r"\b(?:bye|goodbye|see\s+you)\b", re.IGNORECASE),
+     "Goodbye! Have a safe commute."),
+]
+
+
+@dataclass
+class QueryPlan:
+    """
+    What a chat message asks for, decided locally before any agent runs.
+    """
+    intent: str
+    endpoints: Optional[Tuple[str, str]] = None
+    area: Optional[str] = None
+    reply: Optional[str] = None
+    narrative: bool = False
+
+
+def plan_query(user_input: str) -> QueryPlan:
+    """
+    Classifies a chat message as a route query, an area status query or anything
+    else, with regular expressions and the gazetteer.
+
+    A route query needs "from X to Y" / "between X and Y" phrasing, or a bare
+    "X to Y" where a place is known to the gazetteer, or routing words ("route",
+    "commute", "get to"). Other messages get a canned `reply`. `narrative` is set
+    when the message asks for an explanation or details.
+    """
+    text = " ".join(user_input.split())
+    narrative = bool(_NARRATIVE_WORDS.search(text))
+    endpoints = parse_route_query(text)
+    if endpoints is not None:
+        gazetteer = get_gazetteer()
+        if _ROUTE_WORDS.search(text) or any(gazetteer.lookup(name) for name in endpoints):
+            return QueryPlan(ROUTE, endpoints=endpoints, narrative=narrative)
+
+    for pattern in _AREA_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            area = clean_place_phrase(match.group("area"))
+            if area:
+                return QueryPlan(AREA_STATUS, area=area)
+
+    if _ROUTE_WORDS.search(text):
+        return QueryPlan(ROUTE, narrative=narrative)
+    for pattern, reply in _SMALL_TALK:
+        if pattern.search(text):
+            return QueryPlan(OTHER, reply=reply)
+    return QueryPlan(OTHER, reply=HELP_REPLY)
+
+
+def has_active_incidents(index: IncidentIndex = None, policy: RecencyPolicy = None, now: float = None) -> bool:
+    """
+    Whether any incident in the city is still inside its recency window. When none
+    is, no route can match anything and the route pipeline can be skipped.
+    """
+    index = index if index is not None else get_incident_index()
+    policy = policy if policy is not None else get_recency_policy()
+    now = time.time() if now is None else now
+    if len(index) == 0:
+        return False
+    rows = index.rows_since(now - policy.max_window_seconds)
+    return bool(len(rows)) and bool(index.within_windows(rows, now, policy).any())
+
+
+def area_incidents(area: str, index: IncidentIndex = None, policy: RecencyPolicy = None,
+                   now: float = None) -> List[Tuple]:
+    """
+    Recent incidents on streets or in areas matching `area` (or the gazetteer's name
+    for it), most relevant first.
+    """
+    index = index if index is not None else get_incident_index()
+    policy = policy if policy is not None else get_recency_policy()
+    if len(index) == 0:
+        return []
+    names = [area]
+    place = get_gazetteer().lookup(area)
+    if place is not None and place.name.lower() != area.lower():
+        names.append(place.name)
+    return index.match_streets(names, policy=policy, now=now)
+
+
+def answer_area_status(area: str, index: IncidentIndex = None, policy: RecencyPolicy = None,
+                       now: float = None) -> str:
+    """
+    A short status report of the recent incidents in an area, built without agents.
+    """
+    incidents = area_incidents(area, index, policy, now)
+    if not incidents:
+        return f"No recent incidents reported in {area}."
+    lines = [f"{len(incidents)} recent incident{'s' if len(incidents) != 1 else ''} reported in {area}:"]
+    for event_type, sub_event_type, area_name, street_name, _, description, severity in incidents[:MAX_AREA_INCIDENTS]:
+        kind = f"{event_type} ({sub_event_type})" if sub_event_type else f"{event_type}"
+        where = ", ".join(part for part in (street_name, area_name) if part)
+        line = f"- {kind}{f' on {where}' if where else ''}"
+        if severity is not None:
+            line += f", severity {severity}"
+        if description:
+            line += f": {description}"
+        lines.append(line)
+    if len(incidents) > MAX_AREA_INCIDENTS:
+        lines.append(f"...and {len(incidents) - MAX_AREA_INCIDENTS} more.")
+    return "\n".join(lines)
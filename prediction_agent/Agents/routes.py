@@ -0,0 +1,376 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from tools.cache import TTLCache, get_disk_tier
+from tools.directions import (
+    fetch_directions, fetch_route_alternatives, fetch_route_polyline, geocode_results_from_events, geocodes_from_events,
+    route_length, route_locations, route_polyline,
+)
+from tools.gazetteer import get_gazetteer
+from tools.street_index import normalize_place_name
+
+from .agent import KNOWN_GEOCODE_STATE_KEY, location_finder, root_agent
+from .agent_runner import get_adk_runner, get_message, scratch_session
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+ROUTE_CACHE_TTL_SECONDS = float(os.getenv("ROUTE_CACHE_TTL_SECONDS", "86400"))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "4096"))
+# Width of the time-of-day buckets routes are cached under (0: one entry per route
+# whatever the time), for when the best route depends on the time of day.
+ROUTE_CACHE_TIME_BUCKET_HOURS = int(os.getenv("ROUTE_CACHE_TIME_BUCKET_HOURS", "0"))
+
+# "... from Hoodi to Silk Board", "... between Hoodi and Silk Board", "Hoodi to Silk Board"
+_ROUTE_PATTERNS = [
+    re.compile(r"\bfrom\s+(?P<source>.+?)\s+to\s+(?P<destination>.+)", re.IGNORECASE),
+    re.compile(r"\bbetween\s+(?P<source>.+?)\s+and\s+(?P<destination>.+)", re.IGNORECASE),
+    re.compile(r"^(?P<source>[^,.?!]+?)\s+to\s+(?P<destination>.+)$", re.IGNORECASE),
+]
+# Trailing time qualifiers do not change the route ("... to Silk Board at 9am tomorrow").
+_TRAILING_QUALIFIERS = re.compile(
+    r"\s+(?:at|around|by|before|after|tomorrow|today|tonight|now|this|next|in the|on)\b.*$", re.IGNORECASE
+)
+# Words that mean the "source" the bare "X to Y" pattern found is part of a sentence.
+_SENTENCE_WORDS = {"i", "we", "go", "have", "want", "need", "going", "how", "way", "my", "me", "what", "is",
+                   "route", "directions", "commute", "drive", "driving", "travel", "get", "head", "heading", "reach"}
+# A clause after the destination is not part of it ("... to Silk Board, explain why").
+_CLAUSE_BREAK = re.compile(r"[,;?!]")
+
+
+class RouteResolutionError(Exception):
+    """Raised when the route pipeline does not produce usable locations."""
+
+
+@dataclass
+class ResolvedRoute:
+    """
+    A route resolved by the pipeline: the locations along it (`Outputformat.locations`),
+    the geocoded endpoints and the route polyline ((n, 2) latitude/longitude).
+    """
+    locations: List[str]
+    geocodes: List[Tuple[float, float]] = field(default_factory=list)
+    polyline: np.ndarray = field(default_factory=lambda: np.empty((0, 2)))
+    cached: bool = False
+
+    @property
+    def points(self) -> np.ndarray:
+        """The polyline, or the geocoded endpoints if there is none."""
+        if len(self.polyline):
+            return self.polyline
+        return np.array(self.geocodes, dtype=np.float64).reshape(-1, 2)
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.locations) and len(self.geocodes) >= 2 and len(self.polyline) > 0
+
+    def to_dict(self) -> dict:
+        return {
+            "locations": list(self.locations),
+            "geocodes": [list(g) for g in self.geocodes],
+            "polyline": np.round(self.polyline, 6).tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, cached: bool = False) -> "ResolvedRoute":
+        return cls(
+            locations=list(data["locations"]),
+            geocodes=[tuple(g) for g in data.get("geocodes", [])],
+            polyline=np.array(data.get("polyline", []), dtype=np.float64).reshape(-1, 2),
+            cached=cached,
+        )
+
+
+@dataclass
+class RouteAlternative:
+    """
+    One of the driving routes the Directions API suggests between two places.
+    """
+    summary: str
+    distance_m: float
+    duration_s: float
+    locations: List[str]
+    polyline: np.ndarray
+
+
+def clean_place_phrase(phrase: str) -> str:
+    """Strips trailing time qualifiers and punctuation from a place phrase."""
+    return _TRAILING_QUALIFIERS.sub("", phrase).strip(" ,.?!")
+
+
+def parse_route_query(user_input: str) -> Optional[Tuple[str, str]]:
+    """
+    Extracts (source, destination) from a routing request, or None if it does not
+    read as one. Only used to key the route cache; anything ambiguous (a "via"
+    stop, a sentence without "from") returns None and is resolved uncached.
+    """
+    text = " ".join(user_input.split())
+    if re.search(r"\bvia\b", text, re.IGNORECASE):
+        return None
+    for pattern in _ROUTE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        source = match.group("source").strip(" ,.?!")
+        destination = clean_place_phrase(_CLAUSE_BREAK.split(match.group("destination"), 1)[0])
+        if pattern is _ROUTE_PATTERNS[-1] and _SENTENCE_WORDS & set(source.lower().split()):
+            return None
+        if source and destination:
+            return source, destination
+    return None
+
+
+def route_cache_key(source: str, destination: str, now: Optional[float] = None) -> str:
+    """
+    Cache key of a route: its normalised endpoints (see `normalize_place_name`, so
+    "Silk Board Jn." and "silk board junction" share an entry), plus the time-of-day
+    bucket when ROUTE_CACHE_TIME_BUCKET_HOURS is set.
+    """
+    endpoints = [normalize_place_name(name) or name.strip().lower() for name in (source, destination)]
+    key = "->".join(endpoints)
+    if ROUTE_CACHE_TIME_BUCKET_HOURS > 0:
+        hour = time.localtime(time.time() if now is None else now).tm_hour
+        key += f"@{hour // ROUTE_CACHE_TIME_BUCKET_HOURS}"
+    return key
+
+
+_route_cache: Optional[TTLCache] = None
+
+
+def get_route_cache() -> TTLCache:
+    """
+    Returns the process-wide cache of resolved routes (memory + disk tier).
+    """
+    global _route_cache
+    if _route_cache is None:
+        _route_cache = TTLCache(
+            "routes", ttl_seconds=ROUTE_CACHE_TTL_SECONDS, max_entries=ROUTE_CACHE_MAX_ENTRIES, disk=get_disk_tier()
+        )
+    return _route_cache
+
+
+async def get_route_polyline(geocodes: List[Tuple[float, float]]) -> np.ndarray:
+    """
+    Resolves the route geometry between the first and last geocoded endpoint.
+    Returns an empty array when the route cannot be determined.
+    """
+    if len(geocodes) < 2:
+        logger.warning("Route endpoints were not both geocoded; skipping corridor matching.")
+        return np.empty((0, 2))
+    try:
+        return await fetch_route_polyline(geocodes[0], geocodes[-1])
+    except Exception as e:
+        logger.warning(f"Failed to fetch the route polyline, falling back to street-name matching only: {e}")
+        return np.empty((0, 2))
+
+
+def known_geocodes(endpoints: Optional[Tuple[str, str]]) -> Optional[List[Tuple[float, float]]]:
+    """
+    The endpoints' coordinates from the local gazetteer, or None unless both resolve.
+    """
+    if endpoints is None:
+        return None
+    gazetteer = get_gazetteer()
+    places = [gazetteer.lookup(name) for name in endpoints]
+    if not all(places):
+        return None
+    return [(place.latitude, place.longitude) for place in places]
+
+
+def learn_geocodes(endpoints: Optional[Tuple[str, str]], route_events) -> None:
+    """
+    Feeds the pipeline's `maps_geocode` results into the gazetteer, under the address
+    the agent asked for and under the endpoint names parsed from the message.
+    """
+    gazetteer = get_gazetteer()
+    results = geocode_results_from_events(route_events)
+    for result in results:
+        gazetteer.learn(result['query'], result['latitude'], result['longitude'], result['formatted_address'])
+    if endpoints is not None and len(results) >= 2:
+        for name, result in zip(endpoints, (results[0], results[-1])):
+            gazetteer.learn(name, result['latitude'], result['longitude'], result['formatted_address'])
+
+
+def known_geocode_state(geocodes: List[Tuple[float, float]], endpoints: Optional[Tuple[str, str]]) -> str:
+    """The {geocode} the directions agent reads, for geocodes resolved outside the pipeline."""
+    names = endpoints or ("Source", "Destination")
+    return json.dumps({
+        label: {"Name": name, "Latitude": lat, "Longitude": lon}
+        for label, name, (lat, lon) in zip(("Source", "Destination"), names, (geocodes[0], geocodes[-1]))
+    })
+
+
+async def run_pipeline_agent(agent, user_input: str, user_id, session_service, app_name,
+                             known_geocode: Optional[str] = None) -> list:
+    """
+    Runs `agent` on the user's message in a scratch session and returns its events.
+    `known_geocode`, if any, is stored there for `use_known_geocode`.
+    """
+    state = {KNOWN_GEOCODE_STATE_KEY: known_geocode} if known_geocode else None
+    runner = get_adk_runner(agent, app_name, session_service)
+    events = []
+    async with scratch_session(session_service, app_name, user_id, state) as session_id:
+        async for event in runner.run_async(user_id=user_id, session_id=session_id,
+                                            new_message=get_message(user_input)):
+            events.append(event)
+    return events
+
+
+async def geocode_endpoints(user_input: str, user_id, session_service, app_name,
+                            endpoints: Optional[Tuple[str, str]] = None) -> List[Tuple[float, float]]:
+    """
+    Geocodes the route endpoints with the geocoding agent alone and learns the results.
+    """
+    events = await run_pipeline_agent(location_finder, user_input, user_id, session_service, app_name)
+    try:
+        await asyncio.to_thread(learn_geocodes, endpoints, events)
+    except Exception as e:
+        logger.warning(f"Failed to learn geocodes from the geocoding agent: {e}")
+    return geocodes_from_events(events)
+
+
+async def run_llm_route_pipeline(user_input: str, user_id, session_service, app_name,
+                                 geocodes: Optional[List[Tuple[float, float]]] = None,
+                                 endpoints: Optional[Tuple[str, str]] = None) -> ResolvedRoute:
+    """
+    Resolves a route with the full `root_agent` pipeline (geocoding, directions and
+    formatter agents). Known `geocodes` skip the geocoding agent (see `use_known_geocode`).
+
+    Raises:
+        RouteResolutionError: if the pipeline gives no response or no valid locations.
+    """
+    known = known_geocode_state(geocodes, endpoints) if geocodes and len(geocodes) >= 2 else None
+    route_events = await run_pipeline_agent(root_agent, user_input, user_id, session_service, app_name, known)
+    agent_raw_response_text = ""
+    for event in route_events:
+        if event.is_final_response():
+            agent_raw_response_text = event.content.parts[0].text
+
+    if not agent_raw_response_text:
+        logger.warning(f"Agent 1 did not produce a final response for user '{user_id}'.")
+        raise RouteResolutionError("Agent did not produce a response.")
+    try:
+        locations = json.loads(agent_raw_response_text)["locations"]
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse agent response as JSON: {e}. Raw response: {agent_raw_response_text}", exc_info=True)
+        raise RouteResolutionError("Agent returned invalid JSON.")
+    except (KeyError, TypeError) as e:
+        logger.error(f"Agent response has no locations: {e}. Raw response: {agent_raw_response_text}", exc_info=True)
+        raise RouteResolutionError("Agent response did not match expected structure.")
+
+    if known is None:
+        geocodes = geocodes_from_events(route_events)
+        try:
+            await asyncio.to_thread(learn_geocodes, endpoints, route_events)
+        except Exception as e:
+            logger.warning(f"Failed to learn geocodes from the route pipeline: {e}")
+
+    return ResolvedRoute(locations=locations, geocodes=geocodes, polyline=await get_route_polyline(geocodes))
+
+
+async def run_route_pipeline(user_input: str, user_id, session_service, app_name,
+                             endpoints: Optional[Tuple[str, str]] = None) -> ResolvedRoute:
+    """
+    Resolves a route: geocodes the endpoints (from the gazetteer when both are known,
+    otherwise with the geocoding agent), then fetches directions and parses the
+    locations and polyline out of them directly.
+
+    The directions and formatter agents only run as a fallback, when the endpoints
+    could not be geocoded or the directions could not be fetched or parsed.
+
+    Raises:
+        RouteResolutionError: if the fallback pipeline gives no valid locations.
+    """
+    geocodes = known_geocodes(endpoints)
+    if geocodes is not None:
+        logger.info(f"Route endpoints {endpoints} resolved from the gazetteer.")
+    else:
+        geocodes = await geocode_endpoints(user_input, user_id, session_service, app_name, endpoints)
+
+    if len(geocodes) >= 2:
+        try:
+            route = await fetch_directions(geocodes[0], geocodes[-1])
+        except Exception as e:
+            logger.warning(f"Failed to fetch directions: {e}")
+            route = None
+        locations = route_locations(route) if route else []
+        if locations:
+            return ResolvedRoute(locations=locations, geocodes=geocodes, polyline=route_polyline(route))
+
+    logger.info("Directions could not be resolved directly; falling back to the directions agents.")
+    return await run_llm_route_pipeline(user_input, user_id, session_service, app_name,
+                                        geocodes if len(geocodes) >= 2 else None, endpoints)
+
+
+async def resolve_route(user_input: str, user_id, session_service, app_name) -> ResolvedRoute:
+    """
+    Resolves the route a user asks about, from the route cache when the same
+    (source, destination) was resolved recently.
+
+    Only complete resolutions (locations, both geocodes and a polyline) are cached,
+    so a transient geocoding or directions failure is retried on the next request.
+    """
+    endpoints = parse_route_query(user_input)
+    if endpoints is None:
+        return await run_route_pipeline(user_input, user_id, session_service, app_name)
+
+    key = route_cache_key(*endpoints)
+    resolved = []
+
+    async def load() -> dict:
+        route = await run_route_pipeline(user_input, user_id, session_service, app_name, endpoints)
+        resolved.append(route)
+        return route.to_dict()
+
+    data = await get_route_cache().get_or_load(
+        key, load, cacheable=lambda d: ResolvedRoute.from_dict(d).complete
+    )
+    if resolved:
+        return resolved[0]
+    logger.info(f"Route '{key}' served from the route cache.")
+    return ResolvedRoute.from_dict(data, cached=True)
+
+
+async def resolve_route_alternatives(user_input: str, user_id, session_service, app_name) -> List[RouteAlternative]:
+    """
+    Resolves the alternative routes between the places a user asks about: the
+    endpoints are geocoded as for `resolve_route` (gazetteer first), then the
+    Directions API is asked for alternatives.
+
+    Raises:
+        RouteResolutionError: if the message names no route, the endpoints cannot be
+            geocoded or no route is found.
+    """
+    endpoints = parse_route_query(user_input)
+    if endpoints is None:
+        raise RouteResolutionError("Could not find a source and destination in the message.")
+    geocodes = known_geocodes(endpoints)
+    if geocodes is None:
+        geocodes = await geocode_endpoints(user_input, user_id, session_service, app_name, endpoints)
+    if len(geocodes) < 2:
+        raise RouteResolutionError("Could not geocode the source and destination.")
+
+    try:
+        routes = await fetch_route_alternatives(geocodes[0], geocodes[-1])
+    except Exception as e:
+        logger.warning(f"Failed to fetch alternative routes: {e}")
+        routes = []
+    alternatives = []
+    for route in routes:
+        polyline = route_polyline(route)
+        if len(polyline):
+            distance_m, duration_s = route_length(route)
+            alternatives.append(RouteAlternative(route.get("summary") or "", distance_m, duration_s,
+                                                 route_locations(route), polyline))
+    if not alternatives:
+        raise RouteResolutionError("No route found between the source and destination.")
+    logger.info(f"Resolved {len(alternatives)} alternative routes for {endpoints}.")
+    return alternatives
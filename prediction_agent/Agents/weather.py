@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import os
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+
+from tools.cache import TTLCache, get_disk_tier
+from tools.geohash import decode, encode_many
+
+from .agent import get_feature_weather_data
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Forecasts are shared by every route through the same geohash cell (precision 5 is ~5 km).
+WEATHER_GEOHASH_PRECISION = int(os.getenv("WEATHER_GEOHASH_PRECISION", "5"))
+WEATHER_MAX_CELLS_PER_ROUTE = int(os.getenv("WEATHER_MAX_CELLS_PER_ROUTE", "4"))
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "3600"))
+WEATHER_CACHE_STALE_SECONDS = float(os.getenv("WEATHER_CACHE_STALE_SECONDS", "1800"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "4096"))
+# The prefetcher keeps the WEATHER_PREFETCH_TOP_N most-queried cells warm for the
+# current hour and the next WEATHER_PREFETCH_HOURS_AHEAD hours.
+WEATHER_PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", "20"))
+WEATHER_PREFETCH_HOURS_AHEAD = int(os.getenv("WEATHER_PREFETCH_HOURS_AHEAD", "1"))
+WEATHER_PREFETCH_INTERVAL_SECONDS = float(os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", "300"))
+WEATHER_PREFETCH_CONCURRENCY = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", "4"))
+# Query counts are multiplied by this every prefetch round, so popularity follows recent demand.
+WEATHER_POPULARITY_DECAY = float(os.getenv("WEATHER_POPULARITY_DECAY", "0.9"))
+# "llm" searches the web through the weather agent; "fake" serves canned forecasts offline.
+WEATHER_FORECAST_SOURCE = os.getenv("WEATHER_FORECAST_SOURCE", "llm")
+
+
+def forecast_hour(timestamp: Optional[float] = None) -> datetime:
+    """
+    The UTC hour a timestamp (default: now) falls in.
+    """
+    moment = datetime.fromtimestamp(time.time() if timestamp is None else timestamp, tz=timezone.utc)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def route_cells(points, precision: int = WEATHER_GEOHASH_PRECISION,
+                max_cells: int = WEATHER_MAX_CELLS_PER_ROUTE) -> List[str]:
+    """
+    Geohash cells a route passes through, in route order. Long routes are thinned to
+    `max_cells` cells spread evenly along the route.
+
+    Args:
+        points: (n, 2) array of (latitude, longitude), e.g. the route polyline.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if not len(points):
+        return []
+    cells = list(dict.fromkeys(encode_many(points[:, 0], points[:, 1], precision).tolist()))
+    if len(cells) > max_cells:
+        cells = [cells[i] for i in np.linspace(0, len(cells) - 1, max_cells).round().astype(int)]
+    return cells
+
+
+class LlmForecastSource:
+    """
+    Looks a cell's forecast up with the weather search agent, addressed by the cell centre.
+    """
+
+    def __init__(self, session_service, app_name: str, user_id: str = "weather-cache"):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.user_id = user_id
+
+    async def forecast(self, cell: str, hour: datetime) -> str:
+        lat, lon = decode(cell)
+        return await get_feature_weather_data(
+            [f"{lat:.4f}, {lon:.4f}"], self.user_id, self.session_service, self.app_name,
+            forecast_hour=hour.strftime("%Y-%m-%d %H:00 UTC"),
+        )
+
+
+class FakeForecastSource:
+    """
+    Deterministic canned forecasts for local runs and tests; `delay_seconds` stands in
+    for the latency of a real lookup. Every call is recorded in `calls`.
+    """
+    CONDITIONS = [
+        "Clear skies, 27°C, no rain expected.",
+        "Partly cloudy, 25°C, 10% chance of rain.",
+        "Light showers likely, 23°C, 60% chance of rain.",
+        "Heavy rain and thunderstorms expected, 21°C, 90% chance of rain; waterlogging likely.",
+    ]
+
+    def __init__(self, delay_seconds: float = 0.0):
+        self.delay_seconds = delay_seconds
+        self.calls = []
+
+    async def forecast(self, cell: str, hour: datetime) -> str:
+        self.calls.append((cell, hour))
+        if self.delay_seconds:
+            await asyncio.sleep(self.delay_seconds)
+        return self.CONDITIONS[zlib.crc32(f"{cell}|{hour:%Y%m%d%H}".encode()) % len(self.CONDITIONS)]
+
+
+class WeatherForecaster:
+    """
+    Serves route weather from forecasts cached per (geohash cell, forecast hour).
+
+    Forecasts for a neighbourhood are the same for every user in a given hour, so a
+    route only waits on the source for cells nobody has asked about recently. Cells
+    are ranked by (decayed) query count and a background task keeps the top ones
+    warm ahead of the hour turning over.
+    """
+
+    def __init__(self, source, cache: Optional[TTLCache] = None, precision: int = WEATHER_GEOHASH_PRECISION,
+                 max_cells: int = WEATHER_MAX_CELLS_PER_ROUTE):
+        self.source = source
+        self.cache = cache or TTLCache(
+            "weather",
+            ttl_seconds=WEATHER_CACHE_TTL_SECONDS,
+            stale_seconds=WEATHER_CACHE_STALE_SECONDS,
+            max_entries=WEATHER_CACHE_MAX_ENTRIES,
+            disk=get_disk_tier(),
+        )
+        self.precision = precision
+        self.max_cells = max_cells
+        self.popularity: Counter = Counter()
+        self._prefetch_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def cache_key(cell: str, hour: datetime) -> str:
+        return f"{cell}|{hour:%Y-%m-%dT%H}"
+
+    def _loader(self, cell: str, hour: datetime):
+        return lambda: self.source.forecast(cell, hour)
+
+    async def forecast_cell(self, cell: str, hour: datetime) -> str:
+        return await self.cache.get_or_load(self.cache_key(cell, hour), self._loader(cell, hour))
+
+    async def route_forecast(self, points, now: Optional[float] = None) -> str:
+        """
+        Forecast for the current hour in each cell along the route.
+
+        Args:
+            points: (n, 2) array of (latitude, longitude) along the route.
+
+        Returns:
+            One "### <cell>" block per cell with a forecast, or "" if there is none.
+        """
+        return (await self.routes_forecast([points], now))[0]
+
+    async def routes_forecast(self, routes: List, now: Optional[float] = None) -> List[str]:
+        """
+        Forecasts for several routes (e.g. alternatives between the same places), as
+        `route_forecast` gives them; a cell shared by several routes is looked up once.
+
+        Args:
+            routes: (n, 2) arrays of (latitude, longitude) along each route.
+        """
+        route_cell_lists = [route_cells(points, self.precision, self.max_cells) for points in routes]
+        cells = list(dict.fromkeys(cell for route in route_cell_lists for cell in route))
+        self.popularity.update(cells)
+        hour = forecast_hour(now)
+        results = await asyncio.gather(*(self.forecast_cell(cell, hour) for cell in cells), return_exceptions=True)
+
+        blocks = {}
+        for cell, result in zip(cells, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Weather forecast for cell '{cell}' failed: {result}")
+                continue
+            lat, lon = decode(cell)
+            blocks[cell] = f"### Around {lat:.3f}, {lon:.3f} ({cell}), {hour:%H}:00 UTC\n{result}"
+        return ["\n\n".join(blocks[cell] for cell in route if cell in blocks) for route in route_cell_lists]
+
+    async def prefetch_once(self, now: Optional[float] = None) -> int:
+        """
+        One prefetch round: decays query counts, then loads the current and upcoming
+        hours of the most-queried cells unless they stay fresh until the next round.
+
+        Returns:
+            Number of forecasts fetched.
+        """
+        for cell in list(self.popularity):
+            self.popularity[cell] *= WEATHER_POPULARITY_DECAY
+            if self.popularity[cell] < 0.01:
+                del self.popularity[cell]
+
+        current = forecast_hour(now).timestamp()
+        hours = [forecast_hour(current + 3600 * ahead) for ahead in range(WEATHER_PREFETCH_HOURS_AHEAD + 1)]
+        semaphore = asyncio.Semaphore(WEATHER_PREFETCH_CONCURRENCY)
+
+        async def warm(cell: str, hour: datetime) -> bool:
+            async with semaphore:
+                try:
+                    return await self.cache.warm(
+                        self.cache_key(cell, hour), self._loader(cell, hour),
+                        min_ttl_left=WEATHER_PREFETCH_INTERVAL_SECONDS,
+                    )
+                except Exception as e:
+                    logger.warning(f"Weather prefetch for cell '{cell}' at {hour:%H}:00 failed: {e}")
+                    return False
+
+        top_cells = [cell for cell, _ in self.popularity.most_common(WEATHER_PREFETCH_TOP_N)]
+        fetched = await asyncio.gather(*(warm(cell, hour) for cell in top_cells for hour in hours))
+        return sum(fetched)
+
+    async def _prefetch_loop(self):
+        while True:
+            try:
+                fetched = await self.prefetch_once()
+                if fetched:
+                    logger.info(f"Weather prefetch refreshed {fetched} forecasts.")
+            except Exception as e:
+                logger.error(f"Weather prefetch round failed: {e}", exc_info=True)
+            await asyncio.sleep(WEATHER_PREFETCH_INTERVAL_SECONDS)
+
+    def start_prefetch(self):
+        if self._prefetch_task is None:
+            self._prefetch_task = asyncio.create_task(self._prefetch_loop())
+
+    async def stop_prefetch(self):
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+            try:
+                await self._prefetch_task
+            except asyncio.CancelledError:
+                pass
+            self._prefetch_task = None
+
+
+_weather_forecaster: Optional[WeatherForecaster] = None
+
+
+def get_weather_forecaster(session_service, app_name: str) -> WeatherForecaster:
+    """
+    Returns the process-wide forecaster, backed by the source named in WEATHER_FORECAST_SOURCE.
+    """
+    global _weather_forecaster
+    if _weather_forecaster is None:
+        if WEATHER_FORECAST_SOURCE == "fake":
+            source = FakeForecastSource()
+        else:
+            source = LlmForecastSource(session_service, app_name)
+        _weather_forecaster = WeatherForecaster(source)
+    return _weather_forecaster
@@ -1,16 +1,41 @@
 from fastapi import FastAPI, HTTPException, Depends
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
+from sse_starlette.sse import EventSourceResponse
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import time
 import json # Import the json module
+from opentelemetry import trace
 
 from models.request import Request
 # from models.anomaly_detection_response import CityAnomalyReport
-from Agents.agent import root_agent, get_past_incident_data, get_feature_weather_data, feature_event_prediction_agent
-from Agents.agent_runner import get_adk_runner, get_message, get_session_service
+from Agents.agent import stream_feature_event_prediction
+from Agents.agent_runner import get_conversation_summary, get_session_service, record_conversation_turn
+from Agents.enrichment import enrich_incidents, enrich_routes
+from Agents.weather import get_weather_forecaster
+from Agents.routes import RouteResolutionError, resolve_route, resolve_route_alternatives, route_cache_key
+from Agents.planner import AREA_STATUS, NO_ANOMALY, OTHER, answer_area_status, has_active_incidents, plan_query
 
-from tools.get_data_from_big_query import find_location_anomaly_match
+from tools.get_data_from_big_query import find_location_anomaly_match, find_route_corridor_matches
+from tools.incident_index import get_incident_index
+from tools.incident_events import get_incident_event_subscriber
+from tools.risk_view import get_risk_view
+from tools.heat_grid import get_heat_grid
+from tools.advisory_cache import advisory_cache_key, get_advisory_cache
+from tools.route_comparison import describe_comparison, rank_routes, route_matches, score_routes
+from tools.disruption_model import WEATHER_CATEGORIES, describe_predictions, get_disruption_predictor, weather_category
+from tools.cache import cache_metrics
+from tools.single_flight import get_single_flight, single_flight_metrics
+from tools.tracing import TracingMiddleware, get_tracer, setup_tracing
+from tools.latency import get_latency_recorder, latency_metrics
 
 APP_NAME = "city_predictor_agent"
+# Incidents listed per route in a route comparison.
+MAX_COMPARISON_INCIDENTS = 5
+# Cells returned by one heatmap request, most affected first.
+MAX_HEATMAP_CELLS = 5000
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -19,12 +44,42 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 session_service = get_session_service()  # Get the session service instance
+# Spans of each request, continuing the caller's trace; the ADK adds its agent and model spans.
+tracer_provider = setup_tracing("prediction_agent")
+tracer = get_tracer()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the incident history into memory once and keep it in sync with appends.
+    incident_index = get_incident_index()
+    await asyncio.to_thread(incident_index.start)
+    # Apply the reports the ingestion service publishes as they are committed.
+    incident_events = get_incident_event_subscriber()
+    if incident_events is not None:
+        await asyncio.to_thread(incident_events.start)
+    # Per-cell incident risk, kept current as the index ingests rows.
+    await asyncio.to_thread(get_risk_view().sync)
+    # Incident history per geohash cell and event type, for heatmaps and route history.
+    await asyncio.to_thread(get_heat_grid().sync)
+    # Keep the forecasts of the busiest geohash cells warm.
+    weather_forecaster = get_weather_forecaster(session_service, APP_NAME)
+    weather_forecaster.start_prefetch()
+    yield
+    await weather_forecaster.stop_prefetch()
+    if incident_events is not None:
+        incident_events.stop()
+    incident_index.stop()
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+
 
 # --- FastAPI Application Initialization ---
 app = FastAPI(
     title="ADK Agent API",
     description="API for interacting with a Google ADK agent.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- CORS Middleware ---
@@ -35,8 +90,233 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+app.add_middleware(TracingMiddleware)
 
 # --- API Endpoint ---
+@app.get("/metrics", status_code=200)
+async def metrics():
+    """
+    Hit ratio, stale serves and background refresh lag of each lookup cache, recent
+    query latencies (time to first token, total), and the share of queries that
+    joined an identical query already in flight.
+    """
+    return {"caches": cache_metrics(), "latency": latency_metrics(), "coalescing": single_flight_metrics()}
+
+
+def incident_records(matches: list) -> list:
+    """
+    Incident tuples (as the matchers return them) as the dicts the agents and responses use.
+    """
+    return [
+        {
+            "event_type": match[0],
+            "sub_event_type": match[1],
+            "area_name": match[2],
+            "street_name": match[3],
+            "city": match[4],
+            "description": match[5],
+            "severity_score": match[6]
+        }
+        for match in matches
+    ]
+
+
+async def run_pipeline(user_input: str, user_id: str, session_id: str):
+    """
+    Runs a chat query through the pipeline, yielding (event, payload) pairs as it
+    progresses: "stage" after each step, "token" for each chunk of the reply as the
+    prediction agent generates it, and "final" with the complete response.
+
+    Every agent runs in a scratch session of its own (see `scratch_session`), so the
+    agents' prompts do not grow with the length of the conversation or the uptime of
+    the service. Of the user's session only the clipped conversation summary is read,
+    for narrative answers; it is written by `run_query`.
+
+    Raises:
+        HTTPException: If the route cannot be resolved or the pipeline fails.
+    """
+    started = time.perf_counter()
+    first_token = True
+
+    def token(text: str):
+        nonlocal first_token
+        if first_token:
+            first_token = False
+            ttft = time.perf_counter() - started
+            get_latency_recorder("time_to_first_token").record(ttft)
+            logger.info(f"First token for session '{session_id}' after {ttft * 1000:.0f} ms.")
+        return "token", {"text": text}
+
+    def final(response: dict):
+        get_latency_recorder("query_total").record(time.perf_counter() - started)
+        return "final", response
+
+    try:
+        # Greetings, thanks and area status questions are answered locally; only route
+        # queries go through the agents, and not even those when nothing recent is reported.
+        plan = plan_query(user_input)
+        logger.info(f"Planned query as '{plan.intent}' (endpoints={plan.endpoints}, area={plan.area}).")
+        yield "stage", {"stage": "planned", "intent": plan.intent}
+        if plan.intent == OTHER:
+            yield token(plan.reply)
+            yield final({"final_output": plan.reply})
+            return
+        if plan.intent == AREA_STATUS:
+            reply = await asyncio.to_thread(answer_area_status, plan.area)
+            yield token(reply)
+            yield final({"final_output": reply})
+            return
+        if not has_active_incidents():
+            yield token(NO_ANOMALY)
+            yield final({"final_output": NO_ANOMALY})
+            return
+
+        # Repeated (source, destination) pairs are served from the route cache instead
+        # of re-running the geocode/directions pipeline.
+        try:
+            with tracer.start_as_current_span("resolve_route"):
+                route = await resolve_route(user_input, user_id, session_service, APP_NAME)
+        except RouteResolutionError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        yield "stage", {"stage": "route_resolved", "locations": len(route.locations), "cached": route.cached}
+
+        # Aggregate risk of the cells around the route, looked up in the risk view.
+        # Syncing the view also invalidates the cached advisories of routes through
+        # cells where incidents appeared or expired.
+        route_risk = get_risk_view().route_risk(route.points)
+
+        # Narrative answers (explanations, follow-ups) see the earlier turns of the
+        # conversation, which makes them this user's own: they are neither cached nor shared.
+        conversation = (await get_conversation_summary(session_service, APP_NAME, user_id, session_id)
+                        if plan.narrative else "")
+
+        # Advisories are cached per route and time bucket, and served until an incident
+        # in one of the route's cells changes. A change while this one is computed keeps
+        # it out of the cache.
+        advisory_cache = get_advisory_cache()
+        advisory_key = (advisory_cache_key(route_cache_key(*plan.endpoints), plan.narrative)
+                        if plan.endpoints and not conversation else None)
+        cached = advisory_cache.get(advisory_key) if advisory_key else None
+        if cached is not None:
+            logger.info(f"Advisory '{advisory_key}' served from the advisory cache.")
+            yield "stage", {"stage": "advisory_cached"}
+            yield token(cached["final_output"])
+            yield final({**cached, "route_risk": route_risk.to_dict()})
+            return
+
+        async def compute_advisory():
+            # Yields stages, reply chunks and finally the advisory, which it also caches.
+            reserved = advisory_cache.reserve()
+
+            def advise(advisory: dict):
+                if advisory_key:
+                    advisory_cache.put(advisory_key, advisory, route_risk.cell_ids, reserved)
+                return "final", advisory
+
+            with tracer.start_as_current_span("match_incidents") as span:
+                matches = await asyncio.to_thread(find_location_anomaly_match, route.locations)
+
+                # Incidents near the route geometry catch what street-name equality misses
+                # (spelling variants, unnamed stretches); they come first, ordered along the route.
+                if len(route.polyline):
+                    corridor_matches = await asyncio.to_thread(find_route_corridor_matches, route.polyline)
+                    seen = set(corridor_matches)
+                    matches = corridor_matches + [match for match in matches if match not in seen]
+                span.set_attribute("incidents", len(matches))
+            yield "stage", {"stage": "incidents_found", "incidents": len(matches)}
+
+            if len(matches) == 0:
+                yield "token", {"text": NO_ANOMALY}
+                yield advise({"final_output": NO_ANOMALY})
+                return
+
+            our_data = incident_records(matches)
+
+            # News (one lookup per event type and area) and weather run concurrently and
+            # become the state of the prediction agent's scratch session.
+            # Weather is looked up per geohash cell along the route (the geocoded endpoints if
+            # there is no polyline) so forecasts are shared between users.
+            async def enrich():
+                with tracer.start_as_current_span("enrich_incidents"):
+                    return await enrich_incidents(our_data, route.locations, user_id, session_service, APP_NAME,
+                                                  route_points=route.points)
+
+            # Well-supported incident types are answered from the statistics of past
+            # episodes; the prediction agent runs only for uncertain ones, or when the
+            # user asks for an explanation. Unless the statistics settle the advisory
+            # whatever the weather, the agent's enrichment starts now, so its news lookups
+            # run alongside the forecast (which they share through the weather cache).
+            enrichment_task = None
+            try:
+                with tracer.start_as_current_span("predict_disruption") as span:
+                    predictor = await asyncio.to_thread(get_disruption_predictor)
+                    if plan.narrative or not all(prediction.confident for category in WEATHER_CATEGORIES
+                                                 for prediction in predictor.predict_incidents(our_data, category)):
+                        enrichment_task = asyncio.create_task(enrich())
+                    forecast = await get_weather_forecaster(session_service, APP_NAME).route_forecast(route.points)
+                    predictions = predictor.predict_incidents(our_data, weather_category(forecast))
+                    confident = all(prediction.confident for prediction in predictions)
+                    span.set_attribute("confident", confident)
+                    span.set_attribute("enrichment_started", enrichment_task is not None)
+                yield "stage", {"stage": "predicted", "confident": confident}
+
+                if confident and not plan.narrative:
+                    reply = describe_predictions(our_data, predictions)
+                    yield "token", {"text": reply}
+                    yield advise({"final_output": reply,
+                                  "predictions": [prediction.to_dict() for prediction in predictions]})
+                    return
+
+                enrichment = await (enrichment_task or enrich())
+            finally:
+                if enrichment_task is not None and not enrichment_task.done():
+                    enrichment_task.cancel()
+            yield "stage", {"stage": "enriched"}
+
+            chunks = []
+            with tracer.start_as_current_span("prediction_agent"):
+                async for chunk in stream_feature_event_prediction(our_data, enrichment, user_id,
+                                                                   session_service, APP_NAME, conversation):
+                    chunks.append(chunk)
+                    yield "token", {"text": chunk}
+
+            yield advise({"final_output": "".join(chunks)})
+
+        # Concurrent queries for the same route and time bucket share one computation
+        # (started by the first of them) and each get its events.
+        # A coalesced query's trace shows the wait; the computation is in the first query's trace.
+        if advisory_key:
+            trace.get_current_span().set_attribute("advisory.key", advisory_key)
+            events = get_single_flight("advisories").run(advisory_key, compute_advisory)
+        else:
+            events = compute_advisory()
+        async for event, payload in events:
+            if event == "token":
+                yield token(payload["text"])
+            elif event == "final":
+                yield final({**payload, "route_risk": route_risk.to_dict()})
+            else:
+                yield event, payload
+
+    except HTTPException: # Re-raise HTTPExceptions directly
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error processing query for session '{session_id}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+async def run_query(user_input: str, user_id: str, session_id: str):
+    """
+    Runs a chat query (see `run_pipeline`) and records the exchange in the conversation
+    summary of the user's long-lived session once the reply is complete.
+    """
+    async for event, payload in run_pipeline(user_input, user_id, session_id):
+        if event == "final":
+            await record_conversation_turn(session_service, APP_NAME, user_id, session_id, user_input,
+                                           payload.get("final_output", ""))
+        yield event, payload
+
+
 @app.post("/query", status_code=200)
 async def query_agent(
     request: Request,
@@ -48,93 +328,138 @@ async def query_agent(
     - **user_id**: An identifier for the user (defaults to "default_user").
     - **session_id**: An identifier for the conversation session (defaults to "default_session").
     """
-    user_input = request.user_input 
-    user_id = request.user_id
-    session_id = request.session_id
+    logger.info(f"Received request from user '{request.user_id}', session '{request.session_id}'")
+    response = {}
+    async for event, payload in run_query(request.user_input, request.user_id, request.session_id):
+        if event == "final":
+            response = payload
+    return response
+
 
-    runner = get_adk_runner(root_agent, APP_NAME, session_service)
-    
-    logger.info(f"Received request from user '{user_id}', session '{session_id}'")
+@app.post("/query/stream", status_code=200)
+async def query_agent_stream(
+    request: Request,
+):
+    """
+    Processes a user query like `/query`, streaming the progress as server-sent events:
 
+    - **stage**: a pipeline step finished, e.g. `{"stage": "incidents_found", "incidents": 3}`.
+    - **token**: the next chunk of the reply, `{"text": ...}`, as the prediction agent generates it.
+    - **final**: the complete response, as `/query` returns it.
+    - **error**: the query failed, `{"status_code": ..., "detail": ...}`.
+    """
+    logger.info(f"Received streaming request from user '{request.user_id}', session '{request.session_id}'")
 
-    try:
-        # Check if session exists.
-        existing_session = await session_service.get_session(
-            app_name=APP_NAME,
-            user_id=user_id,
-            session_id=session_id
-        )
-
-        if not existing_session:
-            # Create a new session if it doesn't exist.
-            await session_service.create_session(
-                app_name=APP_NAME,
-                user_id=user_id,
-                session_id=session_id
-            )
-            logger.info(f"Created new session for user '{user_id}' with ID '{session_id}'.")
-        else:
-            logger.info(f"Using existing session for user '{user_id}' with ID '{session_id}'.")
-
-        agent_raw_response_text = "" 
-        # The runner.run_async method is an async generator
-        async for event in runner.run_async(
-            user_id=user_id,
-            session_id=session_id,
-            new_message=get_message(user_input)
-        ):
-            if event.is_final_response():
-                agent_raw_response_text = event.content.parts[0].text
-                # logger.info(f"Agent 1 raw response for session '{session_id}': '{agent1_raw_response_text}'")
-                
-        if not agent_raw_response_text:
-            logger.warning(f"Agent 1 did not produce a final response for session '{session_id}'.")
-            raise HTTPException(status_code=500, detail="Agent did not produce a response.")
-        # --- NEW LOGIC: Parse JSON string and create AgentResponse instance ---
+    async def events():
         try:
-            # Assuming agent_raw_response_text is a valid JSON string
-            parsed_json = json.loads(agent_raw_response_text)
-            
-            matches = await find_location_anomaly_match(parsed_json['locations'])
+            async for event, payload in run_query(request.user_input, request.user_id, request.session_id):
+                yield {"event": event, "data": json.dumps(payload)}
+        except HTTPException as e:
+            yield {"event": "error", "data": json.dumps({"status_code": e.status_code, "detail": e.detail})}
+
+    return EventSourceResponse(events())
 
-            if len(matches) == 0:
-                return {"final_output": "No anomaly found"}
-
-            search_query = ""
-            our_data = []
-            for i, match in enumerate(matches):
-                search_query = f"Event_{i} : {",".join(match[:-2])}"
-                our_data.append(
-                    {
-                        "event_type": match[0],
-                        "sub_event_type": match[1],
-                        "area_name": match[2],
-                        "street_name": match[3],
-                        "city": match[4],
-                        "description": match[5],
-                        "severity_score": match[6]
-                    }
-                )
 
+@app.post("/routes/compare", status_code=200)
+async def compare_routes(
+    request: Request,
+):
+    """
+    Compares the alternative driving routes between the places in the message, safest first.
 
-            past_news_data = await get_past_incident_data(search_query, user_id, session_id, session_service, APP_NAME)
+    All alternatives are matched against the incident index in one pass and scored
+    together; news and weather are looked up once for whatever the routes share.
+    No prediction agent runs.
 
-            feature_weather_data = await get_feature_weather_data(parsed_json['locations'], user_id, session_id, session_service,APP_NAME)
+    - **user_input**: A route question, e.g. "from Hoodi to Silk Board".
+    - **user_id** / **session_id**: As for `/query`; the comparison is added to the conversation summary.
+    """
+    logger.info(f"Received route comparison from user '{request.user_id}', session '{request.session_id}'")
+    try:
+        try:
+            with tracer.start_as_current_span("resolve_route_alternatives"):
+                alternatives = await resolve_route_alternatives(
+                    request.user_input, request.user_id, session_service, APP_NAME
+                )
+        except RouteResolutionError as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
-            final_output = await feature_event_prediction_agent(our_data, user_id, session_id, session_service, APP_NAME)
+        polylines = [alternative.polyline for alternative in alternatives]
+        with tracer.start_as_current_span("match_incidents"):
+            route_rows = await asyncio.to_thread(route_matches, polylines)
+            incident_index = get_incident_index()
+            route_incidents = [incident_records(incident_index.rows_as_tuples(rows)) for rows in route_rows]
+        with tracer.start_as_current_span("enrich_routes"):
+            enrichment = await enrich_routes(route_incidents, polylines, request.user_id, session_service, APP_NAME)
+        weather = [weather_category(e["weather"]) for e in enrichment]
+        with tracer.start_as_current_span("score_routes"):
+            scores = await asyncio.to_thread(score_routes, route_rows, weather)
+            heat_grid = get_heat_grid()
+            history = [heat_grid.route_score(polyline).to_dict() for polyline in polylines]
 
-            return {"final_output": final_output}
-           
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse agent response as JSON: {e}. Raw response: {agent_raw_response_text}", exc_info=True)
-            raise HTTPException(status_code=500, detail="Agent returned invalid JSON.")
-        except Exception as e:
-            logger.error(f"Failed to validate agent response against CityAnomalyReport model: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail="Agent response did not match expected structure.")
+        routes = []
+        for rank, score in enumerate(rank_routes(scores, [a.duration_s for a in alternatives]), start=1):
+            alternative = alternatives[score.route]
+            routes.append({
+                "rank": rank,
+                "route": score.route,
+                "summary": alternative.summary,
+                "distance_km": round(alternative.distance_m / 1000, 2),
+                "duration_min": round(alternative.duration_s / 60, 1),
+                "weather": weather[score.route],
+                **score.to_dict(),
+                "history": history[score.route],
+                "incidents": route_incidents[score.route][:MAX_COMPARISON_INCIDENTS],
+                "news": enrichment[score.route]["news"],
+            })
+        final_output = describe_comparison(routes)
+        await record_conversation_turn(session_service, APP_NAME, request.user_id, request.session_id,
+                                       request.user_input, final_output)
+        return {"final_output": final_output, "routes": routes}
 
-    except HTTPException: # Re-raise HTTPExceptions directly
+    except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error processing query for session '{session_id}': {e}", exc_info=True)
+        logger.error(f"Unexpected error comparing routes for session '{request.session_id}': {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
+
+@app.get("/heatmap", status_code=200)
+async def heatmap(
+    precision: int = 6,
+    event_type: Optional[str] = None,
+    bbox: Optional[str] = None,
+    limit: int = MAX_HEATMAP_CELLS,
+):
+    """
+    Incident history per geohash cell, from the heat grid, for rendering a heatmap
+    without the raw incident rows.
+
+    - **precision**: Geohash precision of the cells, one of `HEAT_GRID_PRECISIONS` (5: ~5 km, 6: ~1 km, 7: ~150 m).
+    - **event_type**: Only count incidents of this event type.
+    - **bbox**: Only cells whose centre lies in "min_lat,min_lon,max_lat,max_lon".
+    - **limit**: At most this many cells, highest decayed severity first.
+
+    The response also scores the whole selection (`area`), with a breakdown per event type.
+    """
+    heat_grid = get_heat_grid()
+    if precision not in heat_grid.precisions:
+        raise HTTPException(status_code=400, detail=f"precision must be one of {list(heat_grid.precisions)}.")
+    box = None
+    if bbox:
+        try:
+            box = tuple(float(value) for value in bbox.split(","))
+        except ValueError:
+            box = ()
+        if len(box) != 4:
+            raise HTTPException(status_code=400, detail="bbox must be 'min_lat,min_lon,max_lat,max_lon'.")
+
+    cells = await asyncio.to_thread(heat_grid.cells, precision, event_type, box)
+    area = await asyncio.to_thread(heat_grid.area_score, box or (-90.0, -180.0, 90.0, 180.0), precision)
+    top = cells.nlargest(max(limit, 0), "decayed_severity").round({"decayed_severity": 3})
+    return {
+        "precision": precision,
+        "total_cells": len(cells),
+        "cells": top.to_dict(orient="records"),
+        "area": area.to_dict(),
+    }
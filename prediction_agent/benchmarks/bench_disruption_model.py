@@ -0,0 +1,53 @@
+"""
+Latency of the statistical disruption predictor: fitting it on histories of growing
+size, and answering one route's incidents (predictions plus the advisory text),
+which is what replaces a prediction-agent call on the fast path.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_disruption_model [episode counts] [incidents per route]
+e.g. python -m benchmarks.bench_disruption_model 2000,20000,100000 8
+"""
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_incident_episodes
+from tools.disruption_model import RAIN, DisruptionPredictor, describe_predictions
+from tools.incident_index import IncidentIndex
+
+QUERIES = 500
+
+
+def run(sizes, per_route: int):
+    print(f"{'episodes':>9} {'reports':>8} {'strata':>7} {'fit ms':>8} {'route p50 ms':>12} {'route p99 ms':>12} "
+          f"{'confident':>9}")
+    for n in sizes:
+        df = make_incident_episodes(n)
+        index = IncidentIndex.from_frame(df)
+        started = time.perf_counter()
+        model = DisruptionPredictor().fit(index)
+        fit_ms = (time.perf_counter() - started) * 1000
+
+        rng = np.random.default_rng(0)
+        columns = ['event_type', 'sub_event_type', 'area_name', 'street_name', 'city', 'description', 'severity_score']
+        records = df[columns].to_dict('records')
+        routes = [[records[i] for i in rng.integers(0, len(records), per_route)] for _ in range(QUERIES)]
+
+        samples, confident = [], 0
+        for i, incidents in enumerate(routes):
+            started = time.perf_counter()
+            predictions = model.predict_incidents(incidents, RAIN if i % 3 == 0 else "clear")
+            describe_predictions(incidents, predictions)
+            samples.append(time.perf_counter() - started)
+            confident += all(p.confident for p in predictions)
+
+        print(f"{n:>9} {len(df):>8} {len(model.counts):>7} {fit_ms:>8.1f} "
+              f"{np.percentile(samples, 50) * 1000:>12.3f} {np.percentile(samples, 99) * 1000:>12.3f} "
+              f"{confident / QUERIES:>9.1%}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    sizes = [int(s) for s in args[0].split(",")] if args else [2_000, 20_000, 100_000]
+    run(sizes, int(args[1]) if len(args) > 1 else 8)
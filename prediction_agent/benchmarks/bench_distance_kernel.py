@@ -0,0 +1,64 @@
+"""
+Cost of the point-to-segment distance kernels (`tools/geo.py`) at scale; their
+agreement with the plain Python references is checked in tests/test_geo.py.
+
+The benchmark runs N incidents against an M-segment route: every pair for the
+nearest segment (dense), and the pairs within a corridor (bounding-box prefilter),
+with the number of pairs evaluated per second and the peak memory of each call.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_distance_kernel [incidents] [segments] [corridor m]
+e.g. python -m benchmarks.bench_distance_kernel 1000000 1000 150
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import make_incidents, make_route
+from tools.geo import nearest_segments, segment_candidates, segments_within
+
+
+def route_segments(n_segments: int) -> np.ndarray:
+    route = make_route(n_segments + 1)
+    return np.hstack([route[:-1], route[1:]])
+
+
+def measure(call):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def run(n_points: int, n_segments: int, corridor_m: float):
+    df = make_incidents(n_points)
+    lat, lon = df['latitude'].to_numpy(), df['longitude'].to_numpy()
+    segments = route_segments(n_segments)
+    pairs = n_points * n_segments
+    print(f"{n_points} incidents x {n_segments} segments ({pairs / 1e9:.1f}G pairs)\n")
+    print(f"{'kernel':<30} {'result':>9} {'pairs tested':>13} {'s':>7} {'Mpairs/s':>9} {'peak MB':>8}")
+
+    nearest, elapsed, peak = measure(lambda: nearest_segments(lat, lon, segments))
+    print(f"{'nearest, every pair':<30} {len(nearest):>9} {pairs:>13} {elapsed:>7.2f} "
+          f"{pairs / elapsed / 1e6:>9.0f} {peak:>8.0f}")
+
+    (candidates, _), _, _ = measure(lambda: segment_candidates(lat, lon, segments, corridor_m))
+    within, elapsed, peak = measure(lambda: segments_within(lat, lon, segments, corridor_m))
+    print(f"{f'within {corridor_m:.0f} m, prefiltered':<30} {len(within):>9} {len(candidates):>13} {elapsed:>7.2f} "
+          f"{pairs / elapsed / 1e6:>9.0f} {peak:>8.0f}")
+
+    bounded, elapsed, peak = measure(lambda: nearest_segments(lat, lon, segments, corridor_m))
+    print(f"{f'nearest within {corridor_m:.0f} m':<30} {len(bounded):>9} {len(candidates):>13} {elapsed:>7.2f} "
+          f"{pairs / elapsed / 1e6:>9.0f} {peak:>8.0f}")
+    print("\n(Mpairs/s counts all N x M pairs, so the prefiltered rows show the effective rate.)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 1_000_000, int(args[1]) if len(args) > 1 else 1000,
+        float(args[2]) if len(args) > 2 else 150.0)
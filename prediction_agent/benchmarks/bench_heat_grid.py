@@ -0,0 +1,142 @@
+"""
+Cost of the incident heat grid against aggregating the raw incident rows.
+
+First a check: after incremental ingestion, every precision's cells (per event
+type) match a pandas groupby of the same rows, and a route score matches summing
+the rows in the route's corridor cells.
+
+Then, per history size: building the grid; "ingest", appending a batch to the
+index and syncing the grid, next to rebuilding it; "route", scoring a route's
+corridor cells, next to encoding every row and summing those in the cells; "area",
+scoring a 5 km box; and "heatmap", the precision-6 cells of the city, with the
+size of that payload next to the raw rows it summarises.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_heat_grid [history sizes] [batch size]
+e.g. python -m benchmarks.bench_heat_grid 10000,100000,1000000 10
+"""
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_incidents, make_route
+from tools.geohash import encode_many
+from tools.heat_grid import HeatGrid
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+from tools.risk_view import corridor_cells
+
+BATCHES = 20
+ROUTES = 20
+# Around Koramangala and Silk Board.
+AREA = (12.90, 77.60, 12.95, 77.65)
+
+
+def median_ms(samples) -> float:
+    return float(np.median(samples) * 1000)
+
+
+def check(now: float) -> None:
+    policy = RecencyPolicy()
+    df = make_incidents(5000, now=now, days=60)
+    index = IncidentIndex.from_frame(df.iloc[:1000])
+    grid = HeatGrid(index, policy)
+    grid.sync(now)
+    for start in range(1000, len(df), 400):
+        index.append_frame(df.iloc[start:start + 400])
+        grid.sync(now)
+
+    weights = df['severity_score'] * policy.decay(now - df['unix_timestamp'].to_numpy())
+    for precision in grid.precisions:
+        frame = df.assign(cell=encode_many(df['latitude'], df['longitude'], precision), weight=weights)
+        expected = frame.groupby('cell').agg(incident_count=('cell', 'size'), max_severity=('severity_score', 'max'),
+                                             decayed_severity=('weight', 'sum'))
+        got = grid.cells(precision, now=now).set_index('geohash')
+        assert got.index.tolist() == expected.index.tolist(), precision
+        assert (got['incident_count'] == expected['incident_count']).all(), precision
+        assert np.allclose(got['max_severity'], expected['max_severity']), precision
+        assert np.allclose(got['decayed_severity'], expected['decayed_severity']), precision
+
+        event_type = df['event_type'].iloc[0]
+        of_type = frame[frame['event_type'] == event_type].groupby('cell').size()
+        got = grid.cells(precision, event_type=event_type, now=now).set_index('geohash')['incident_count']
+        assert got.to_dict() == of_type.to_dict(), precision
+
+    route = make_route()
+    cells = set(corridor_cells(route, precision=grid.precisions[-1]))
+    in_route = np.isin(encode_many(df['latitude'], df['longitude'], grid.precisions[-1]), list(cells))
+    score = grid.route_score(route, now=now)
+    assert score.incident_count == int(in_route.sum())
+    assert np.isclose(score.decayed_severity, float(weights[in_route].sum()))
+    assert sum(count for count, _, _ in score.by_event_type.values()) == score.incident_count
+    print(f"check: {len(df)} incidents, precisions {list(grid.precisions)} match pandas; "
+          f"route of {score.cells} cells has {score.incident_count} incidents\n")
+
+
+def raw_route_score(index: IncidentIndex, policy: RecencyPolicy, cells: set, now: float) -> float:
+    lat, lon = index.latitude.view, index.longitude.view
+    in_route = np.isin(encode_many(lat, lon, 7), list(cells))
+    return float(index.severity_weights(np.flatnonzero(in_route), now, policy).sum())
+
+
+def run(sizes, batch_size: int):
+    now = time.time()
+    check(now)
+    policy = RecencyPolicy()
+    routes = [make_route(seed=seed) for seed in range(ROUTES)]
+    print(f"{'incidents':>10} {'build ms':>9} {'ingest grid ms':>14} {'rebuild ms':>10} {'route grid ms':>13} "
+          f"{'route raw ms':>12} {'area ms':>8} {'heatmap ms':>10} {'heatmap KB':>10} {'raw rows KB':>11}")
+    for n in sizes:
+        df = make_incidents(n + BATCHES * batch_size, now=now, days=180)
+        index = IncidentIndex.from_frame(df.iloc[:n])
+        grid = HeatGrid(index, policy)
+        started = time.perf_counter()
+        grid.sync(now)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        grid_ingest, rebuild = [], []
+        for i in range(BATCHES):
+            index.append_frame(df.iloc[n + i * batch_size:n + (i + 1) * batch_size])
+            started = time.perf_counter()
+            grid.sync(now)
+            grid_ingest.append(time.perf_counter() - started)
+        for _ in range(3):
+            started = time.perf_counter()
+            HeatGrid(index, policy).sync(now)
+            rebuild.append(time.perf_counter() - started)
+
+        grid_route, raw_route = [], []
+        for route in routes:
+            started = time.perf_counter()
+            grid.route_score(route, now=now)
+            grid_route.append(time.perf_counter() - started)
+        for route in routes[:3]:
+            started = time.perf_counter()
+            raw_route_score(index, policy, set(corridor_cells(route)), now)
+            raw_route.append(time.perf_counter() - started)
+
+        area = []
+        for _ in range(ROUTES):
+            started = time.perf_counter()
+            grid.area_score(AREA, now=now)
+            area.append(time.perf_counter() - started)
+
+        heatmap = []
+        for _ in range(5):
+            started = time.perf_counter()
+            payload = json.dumps(grid.cells(6, now=now).to_dict(orient="records"))
+            heatmap.append(time.perf_counter() - started)
+        raw_kb = len(df.iloc[:n].to_json(orient="records")) / 1024
+
+        print(f"{n:>10} {build_ms:>9.1f} {median_ms(grid_ingest):>14.3f} {median_ms(rebuild):>10.1f} "
+              f"{median_ms(grid_route):>13.3f} {median_ms(raw_route):>12.1f} {median_ms(area):>8.3f} "
+              f"{median_ms(heatmap):>10.2f} {len(payload) / 1024:>10.1f} {raw_kb:>11.0f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    sizes = [int(s) for s in args[0].split(",")] if args else [10_000, 100_000, 1_000_000]
+    run(sizes, int(args[1]) if len(args) > 1 else 10)
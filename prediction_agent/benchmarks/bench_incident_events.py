@@ -0,0 +1,182 @@
+"""
+How quickly a report published by the ingestion service becomes visible to route
+queries, through the incident event log (`tools/incident_events.py`) and through
+the incident history CSV.
+
+First a check: reports saved to the ingestion service's report store reach the
+index once each, whether they arrive through the event log, the CSV, or both (the
+UI also appends every report to the CSV); a report whose address is pending is only
+published once its address is backfilled; and a CSV rewrite, which reloads the
+index, loses none of the published reports.
+
+Then, over a history of N incidents, the latency from saving a report to it being
+in the index and its listeners having run: "event log", a ReportStore save picked
+up by the subscriber; "csv append", one row appended to the watched CSV; and "csv
+rewrite", the whole file rewritten (as the UI does when the report schema gains a
+column), which reloads the index.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_incident_events [history size] [reports]
+e.g. python -m benchmarks.bench_incident_events 100000 50
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_incidents
+from tools.incident_events import IncidentEventSubscriber
+from tools.incident_index import WatchedIncidentIndex
+
+# The services are deployed separately and both have a top-level `tools` package.
+REPORT_STORE_MODULE = os.path.join(os.path.dirname(__file__), "..", "..", "Data_ingestion_agents", "Data_ingest_1",
+                                   "tools", "report_store.py")
+TIMEOUT_SECONDS = 10.0
+
+
+def load_report_store():
+    spec = importlib.util.spec_from_file_location("ingestion_report_store", REPORT_STORE_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ReportStore
+
+
+def make_reports(n: int, seed: int, first_id: int = 0) -> list:
+    reports = make_incidents(n, seed=seed, days=1).assign(
+        incident_id=[f"incident-{first_id + i}" for i in range(n)], pending_address=False)
+    return reports.to_dict(orient="records")
+
+
+def stamped(report: dict) -> dict:
+    # Reports carry their upload time, so they land at the end of the index's time order.
+    return dict(report, unix_timestamp=time.time())
+
+
+class Visibility:
+    """
+    Index listener recording when each awaited incident became visible.
+    """
+
+    def __init__(self, index: WatchedIncidentIndex):
+        self.index = index
+        self._changed = threading.Condition()
+        index.add_listener(self._on_change)
+
+    def _on_change(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for(self, incident_id: str) -> bool:
+        deadline = time.perf_counter() + TIMEOUT_SECONDS
+        with self._changed:
+            while incident_id not in self.index.incident_rows:
+                if not self._changed.wait(deadline - time.perf_counter()):
+                    return False
+        return True
+
+
+def start(directory: str, history) -> tuple:
+    ReportStore = load_report_store()
+    store = ReportStore(os.path.join(directory, "reports.db"))
+    csv_path = os.path.join(directory, "submission_history.csv")
+    history.to_csv(csv_path, index=False)
+    index = WatchedIncidentIndex(csv_path)
+    index.start()
+    subscriber = IncidentEventSubscriber(index, store.db_path)
+    subscriber.start()
+    return store, csv_path, index, subscriber, Visibility(index)
+
+
+def append_csv(csv_path: str, reports: list) -> None:
+    columns = list(make_incidents(1).columns) + ['incident_id', 'pending_address']
+    pd.DataFrame(reports).reindex(columns=columns).to_csv(csv_path, mode='a', header=False, index=False)
+
+
+def history_frame(n: int):
+    return make_incidents(n, seed=7).assign(incident_id=[f"history-{i}" for i in range(n)], pending_address=False)
+
+
+def check() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        store, csv_path, index, subscriber, visibility = start(directory, history_frame(500))
+        try:
+            reports = make_reports(30, seed=8)
+            for report in reports[:10]:
+                store.save(report['incident_id'], report)
+            # The same reports, and ten more, through the CSV.
+            append_csv(csv_path, reports[:20])
+            pending = dict(reports[20], pending_address=True, formatted_address=None)
+            store.save(pending['incident_id'], pending)
+            for report in reports[21:]:
+                store.save(report['incident_id'], report)
+            assert visibility.wait_for(reports[-1]['incident_id'])
+            assert visibility.wait_for(reports[19]['incident_id'])
+            assert reports[20]['incident_id'] not in index.incident_rows
+            store.patch(pending['incident_id'], {'pending_address': False, 'formatted_address': 'Backfilled'})
+            assert visibility.wait_for(pending['incident_id'])
+            assert len(index) == 500 + len(reports), len(index)
+
+            # Rewriting the CSV without the new reports reloads the index; the published ones are replayed.
+            generation = index.generation
+            history_frame(500).to_csv(csv_path, index=False)
+            deadline = time.perf_counter() + TIMEOUT_SECONDS
+            published = {report['incident_id'] for report in reports[:10] + reports[20:]}
+            while (index.generation == generation or len(index) < 500 + len(published)) \
+                    and time.perf_counter() < deadline:
+                time.sleep(0.01)
+            assert len(index) == 500 + len(published), len(index)
+            assert published <= set(index.incident_rows)
+        finally:
+            subscriber.stop()
+            index.stop()
+    print(f"check: {len(reports)} reports through the event log and the CSV reach the index once each, "
+          f"across a CSV reload\n")
+
+
+def latency(publish, visibility: Visibility, reports: list) -> list:
+    samples = []
+    for report in reports:
+        report = stamped(report)
+        started = time.perf_counter()
+        publish(report)
+        if not visibility.wait_for(report['incident_id']):
+            raise TimeoutError(f"{report['incident_id']} not visible after {TIMEOUT_SECONDS}s")
+        samples.append(time.perf_counter() - started)
+        time.sleep(0.01)
+    return samples
+
+
+def run(n_history: int, n_reports: int):
+    check()
+    history = history_frame(n_history)
+    with tempfile.TemporaryDirectory() as directory:
+        store, csv_path, index, subscriber, visibility = start(directory, history)
+        try:
+            event_log = latency(lambda report: store.save(report['incident_id'], report), visibility,
+                                make_reports(n_reports, seed=9))
+            csv_append = latency(lambda report: append_csv(csv_path, [report]), visibility,
+                                 make_reports(n_reports, seed=10, first_id=n_reports))
+
+            def rewrite(report):
+                pd.concat([history, pd.DataFrame([report])], ignore_index=True).to_csv(csv_path, index=False)
+
+            csv_rewrite = latency(rewrite, visibility, make_reports(min(n_reports, 5), seed=11, first_id=2 * n_reports))
+        finally:
+            subscriber.stop()
+            index.stop()
+
+    print(f"{n_history} incidents in the index, {n_reports} reports\n")
+    print(f"{'path':<12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, samples in (("event log", event_log), ("csv append", csv_append), ("csv rewrite", csv_rewrite)):
+        ms = np.array(samples) * 1000
+        print(f"{name:<12} {np.percentile(ms, 50):>8.2f} {np.percentile(ms, 99):>8.2f} {ms.max():>8.2f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 100_000, int(args[1]) if len(args) > 1 else 50)
@@ -0,0 +1,75 @@
+"""
+Per-query latency of the resident IncidentIndex versus the previous approach of
+filtering a DataFrame on every request. Each query asks for 3 of the ~50 synthetic
+streets, so latency at large sizes is dominated by decoding the matched rows.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_incident_index [sizes]
+e.g. python -m benchmarks.bench_incident_index 10000,100000,1000000
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_incidents, route_locations
+from tools.incident_index import IncidentIndex
+
+QUERIES = 200
+
+
+def dataframe_match(df: pd.DataFrame, locations: list) -> list:
+    """The per-request pandas filter the index replaced (minus the CSV read)."""
+    far_in_the_past_ts = (datetime.now(timezone.utc) - timedelta(hours=1000000)).timestamp()
+    df = df.copy()
+    df['unix_timestamp'] = pd.to_numeric(df['unix_timestamp'], errors='coerce')
+    time_filtered_df = df[df['unix_timestamp'] >= far_in_the_past_ts].copy()
+    clean_locations = [loc.strip().lower() for loc in locations]
+    time_filtered_df['processed_street_name'] = time_filtered_df['street_name'].astype(str).str.strip().str.lower()
+    matched_df = time_filtered_df[time_filtered_df['processed_street_name'].isin(clean_locations)]
+    output_columns = ['event_type', 'sub_event_type', 'area_name', 'street_name',
+                      'city', 'description', 'severity_score']
+    return list(matched_df[output_columns].drop_duplicates().itertuples(index=False, name=None))
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def time_queries(fn, queries):
+    samples = []
+    for locations in queries:
+        started = time.perf_counter()
+        fn(locations)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run(sizes):
+    queries = [route_locations(k=3, seed=seed) for seed in range(QUERIES)]
+    print(f"{'incidents':>10} {'build s':>8} {'append 1 ms':>11} {'matches':>8} {'index p50 ms':>12} {'index p99 ms':>12} {'pandas p50 ms':>13}")
+    for n in sizes:
+        df = make_incidents(n)
+
+        started = time.perf_counter()
+        index = IncidentIndex.from_frame(df)
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index.append_frame(make_incidents(1, seed=n))
+        append_ms = (time.perf_counter() - started) * 1000
+
+        index_samples = time_queries(index.match_streets, queries)
+        matches = len(index.match_streets(queries[0]))
+        # The pandas path is much slower; a handful of queries is enough at large sizes.
+        pandas_samples = time_queries(lambda locations: dataframe_match(df, locations), queries[:max(3, 20000 // n)])
+
+        print(f"{n:>10} {build_s:>8.2f} {append_ms:>11.3f} {matches:>8} {percentile_ms(index_samples, 50):>12.3f} "
+              f"{percentile_ms(index_samples, 99):>12.3f} {percentile_ms(pandas_samples, 50):>13.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 100_000, 1_000_000]
+    run(sizes)
@@ -0,0 +1,68 @@
+"""
+Cost of pushing incident predicates down to the store (`tools/incident_store.py`).
+
+Per store, the SQLite engine and the BigQuery adapter (with a stub client that runs
+the adapter's SQL on an in-memory SQLite table), the time to answer a time + area +
+severity query with the predicates pushed down, next to loading every row and
+filtering in pandas, and how many rows each leaves storage. Conformance of both
+stores is covered by tests/test_incident_store.py.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_incident_store [incidents]
+e.g. python -m benchmarks.bench_incident_store 200000
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bigquery_stub import StubBigQueryClient
+from benchmarks.synthetic import make_incidents
+from tools.incident_store import BigQueryIncidentStore, IncidentQuery, SqliteIncidentStore
+
+TABLE = "city-project.city.incidents"
+# Around Koramangala and Silk Board.
+BBOX = (12.90, 77.60, 12.95, 77.65)
+
+
+def pandas_filter(df: pd.DataFrame, query: IncidentQuery) -> pd.DataFrame:
+    min_lat, min_lon, max_lat, max_lon = query.bbox
+    keep = ((df['unix_timestamp'] >= query.since) & df['latitude'].between(min_lat, max_lat)
+            & df['longitude'].between(min_lon, max_lon) & (df['severity_score'] >= query.min_severity))
+    return df[keep.to_numpy(dtype=bool)]
+
+
+def timing(name: str, store, now: float) -> None:
+    query = IncidentQuery(since=now - 3 * 86400, bbox=BBOX, min_severity=7)
+    started = time.perf_counter()
+    pushed = store.query(query)
+    pushed_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    everything = store.query(IncidentQuery())
+    filtered = pandas_filter(everything, query)
+    pulled_ms = (time.perf_counter() - started) * 1000
+    assert len(filtered) == len(pushed)
+    print(f"{name:<28} {len(pushed):>10} {pushed_ms:>10.1f} {len(everything):>12} {pulled_ms:>12.1f}")
+
+
+def run(n: int):
+    now = time.time()
+    workdir = tempfile.mkdtemp(prefix="incident_store_")
+    stores = [
+        ("sqlite", lambda: SqliteIncidentStore(os.path.join(workdir, "timing.db"))),
+        ("bigquery (stub client)", lambda: BigQueryIncidentStore(TABLE, client=StubBigQueryClient(TABLE))),
+    ]
+
+    print(f"{n} incidents; time + area + severity query\n")
+    print(f"{'store':<28} {'rows out':>10} {'pushed ms':>10} {'rows pulled':>12} {'pull+filter ms':>12}")
+    for name, make_store in stores:
+        store = make_store()
+        store.append(make_incidents(n, now=now, days=30))
+        timing(name, store, now)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 200_000)
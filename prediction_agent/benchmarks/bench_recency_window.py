@@ -0,0 +1,64 @@
+"""
+Cost of a recency-windowed incident lookup as the window and the history grow.
+The index slices its timestamp-ordered permutation with a binary search and scans
+only the rows inside the window (or the matched streets' postings, if shorter); the
+full-scan column is the previous approach of comparing every row's timestamp.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_recency_window [history sizes]
+e.g. python -m benchmarks.bench_recency_window 100000,1000000,2000000
+"""
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_incidents, route_locations
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+from tools.street_index import normalize_place_name
+
+QUERIES = 50
+WINDOWS_HOURS = [1, 6, 24, 24 * 7, 24 * 30, 24 * 180]
+
+
+def full_scan(index: IncidentIndex, street_codes: list, since: float) -> np.ndarray:
+    """Every row's timestamp and street compared on every call."""
+    mask = index.unix_timestamp.view >= since
+    mask &= np.isin(index.street_key_codes.view, street_codes)
+    return np.flatnonzero(mask)
+
+
+def median_ms(fn, queries) -> float:
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples) * 1000)
+
+
+def run(sizes):
+    now = time.time()
+    queries = [route_locations(k=3, seed=seed) for seed in range(QUERIES)]
+    print(f"{'incidents':>10} {'window h':>9} {'rows in window':>14} {'matches':>8} "
+          f"{'index ms':>9} {'full scan ms':>12}")
+    for n in sizes:
+        index = IncidentIndex.from_frame(make_incidents(n, now=now))
+        codes = {tuple(q): [index.street_keys.lookup(normalize_place_name(name)) for name in q] for q in queries}
+        for hours in WINDOWS_HOURS:
+            since = now - hours * 3600
+            index_ms = median_ms(lambda q: index.match_streets(q, since=since), queries)
+            scan_ms = median_ms(lambda q: index.rows_as_tuples(full_scan(index, codes[tuple(q)], since)), queries)
+            print(f"{n:>10} {hours:>9} {len(index.rows_since(since)):>14} "
+                  f"{len(index.match_streets(queries[0], since=since)):>8} {index_ms:>9.3f} {scan_ms:>12.3f}")
+
+        policy = RecencyPolicy()
+        policy_ms = median_ms(lambda q: index.match_streets(q, policy=policy, now=now), queries)
+        print(f"{n:>10} {'per-type':>9} {len(index.rows_since(now - policy.max_window_seconds)):>14} "
+              f"{len(index.match_streets(queries[0], policy=policy, now=now)):>8} {policy_ms:>9.3f} {'-':>12}")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1].split(",")] if len(sys.argv) > 1 else [100_000, 1_000_000]
+    run(sizes)
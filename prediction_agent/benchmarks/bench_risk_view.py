@@ -0,0 +1,74 @@
+"""
+Cost of keeping per-cell incident risk current: the incrementally maintained
+RiskView against recomputing every cell from the index, both when a batch of
+new incidents arrives and when a route is scored.
+
+"ingest" is appending a batch to the index and bringing the risk up to date
+(a view sync, or a full recomputation); "route" is scoring one route's corridor
+cells (a view lookup, or a full recomputation followed by the same lookup).
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_risk_view [history sizes] [batch size]
+e.g. python -m benchmarks.bench_risk_view 10000,100000,1000000 10
+"""
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_incidents, make_route
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+from tools.risk_view import RiskView, compute_cell_risk, corridor_cells
+
+BATCHES = 20
+ROUTES = 20
+
+
+def median_ms(samples) -> float:
+    return float(np.median(samples) * 1000)
+
+
+def run(sizes, batch_size: int):
+    now = time.time()
+    policy = RecencyPolicy()
+    routes = [make_route(seed=seed) for seed in range(ROUTES)]
+    print(f"{'incidents':>10} {'active':>8} {'build ms':>9} {'ingest view ms':>14} {'ingest full ms':>14} "
+          f"{'route view ms':>13} {'route full ms':>13}")
+    for n in sizes:
+        df = make_incidents(n + BATCHES * batch_size, now=now, days=30)
+        index = IncidentIndex.from_frame(df.iloc[:n])
+        view = RiskView(index, policy)
+        started = time.perf_counter()
+        view.sync(now)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        view_ingest, full_ingest = [], []
+        for i in range(BATCHES):
+            batch = df.iloc[n + i * batch_size:n + (i + 1) * batch_size]
+            index.append_frame(batch)
+            started = time.perf_counter()
+            view.sync(now)
+            view_ingest.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            compute_cell_risk(index, policy, now)
+            full_ingest.append(time.perf_counter() - started)
+
+        view_route, full_route = [], []
+        for route in routes:
+            started = time.perf_counter()
+            view.route_risk(route, now=now)
+            view_route.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            risk = compute_cell_risk(index, policy, now)
+            sum(risk[cell][2] for cell in corridor_cells(route) if cell in risk)
+            full_route.append(time.perf_counter() - started)
+
+        print(f"{n:>10} {len(view):>8} {build_ms:>9.1f} {median_ms(view_ingest):>14.3f} {median_ms(full_ingest):>14.1f} "
+              f"{median_ms(view_route):>13.3f} {median_ms(full_route):>13.1f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    sizes = [int(s) for s in args[0].split(",")] if args else [10_000, 100_000, 1_000_000]
+    run(sizes, int(args[1]) if len(args) > 1 else 10)
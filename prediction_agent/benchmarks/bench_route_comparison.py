@@ -0,0 +1,68 @@
+"""
+Cost of comparing alternative routes against the incident index as routes are
+added: matching every route's corridor (one `match_many` pass) and scoring all
+routes (one vectorised pass), next to matching and scoring the routes one at a
+time. Alternatives share their first and last quarters, whose segments are
+matched once for all routes, so the batched match costs about half of matching
+the routes separately; scoring adds under a millisecond per route. The disruption
+predictor is fitted before timing, as it is in the service.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_route_comparison [incidents] [max routes]
+e.g. python -m benchmarks.bench_route_comparison 1000000 8
+"""
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_incidents, make_route_alternatives
+from tools.corridor_matcher import CorridorMatcher
+from tools.directions import route_polyline
+from tools.disruption_model import DisruptionPredictor
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+from tools.route_comparison import rank_routes, route_matches, score_routes
+
+REPEATS = 5
+
+
+def run(n: int, max_routes: int):
+    now = time.time()
+    policy = RecencyPolicy()
+    index = IncidentIndex.from_frame(make_incidents(n, now=now, days=30))
+    matcher = CorridorMatcher(index)
+    predictor = DisruptionPredictor().fit(index)
+    polylines = [route_polyline(route) for route in make_route_alternatives(max_routes)]
+    route_matches(polylines[:1], matcher, policy, now=now)  # builds the R-tree
+
+    def one_by_one(k):
+        scores = []
+        for polyline in polylines[:k]:
+            rows = route_matches([polyline], matcher, policy, now=now)
+            scores.extend(score_routes(rows, matcher=matcher, policy=policy, predictor=predictor, now=now))
+        return scores
+
+    def median_ms(fn) -> float:
+        timings = []
+        for _ in range(REPEATS):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return float(np.median(timings) * 1000)
+
+    print(f"{n} incidents, {len(predictor.counts)} predictor strata\n")
+    print(f"{'routes':>6} {'incidents':>10} {'match ms':>9} {'score ms':>9} {'score ms/route':>14} {'one by one ms':>14}")
+    for k in range(1, max_routes + 1):
+        rows = route_matches(polylines[:k], matcher, policy, now=now)
+        match_ms = median_ms(lambda: route_matches(polylines[:k], matcher, policy, now=now))
+        score_ms = median_ms(lambda: rank_routes(score_routes(rows, matcher=matcher, policy=policy,
+                                                              predictor=predictor, now=now)))
+        separate_ms = median_ms(lambda: one_by_one(k))
+        print(f"{k:>6} {sum(len(r) for r in rows):>10} {match_ms:>9.1f} {score_ms:>9.2f} {score_ms / k:>14.2f} "
+              f"{separate_ms:>14.1f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 1_000_000, int(args[1]) if len(args) > 1 else 8)
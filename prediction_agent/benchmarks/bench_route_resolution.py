@@ -0,0 +1,154 @@
+"""
+End-to-end route resolution latency: the LLM pipeline (geocoding agent, directions
+agent, formatter agent, then a Directions API call for the polyline) against the
+direct path (endpoints geocoded by the agent or the gazetteer, one Directions API
+call parsed in code), plus a route cache hit.
+
+Model, MCP tool and HTTP round trips are simulated with sleeps of the given
+latencies; everything else (session state, event handling, parsing) runs for real.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_route_resolution [llm_s] [tool_s] [http_s] [repeats]
+e.g. python -m benchmarks.bench_route_resolution 0.8 0.3 0.25 5
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Keep the gazetteer and route cache the benchmark writes out of the real cache.db.
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_routes_"), "cache.db"))
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+import Agents.routes as routes
+from Agents.agent import KNOWN_GEOCODE_STATE_KEY, first_agent, formatter_agent, location_finder
+from benchmarks.synthetic import make_directions_route
+from tools.directions import route_locations, route_polyline
+
+APP_NAME = "bench"
+USER_ID = "commuter"
+USER_INPUT = "I have to go from Hoodi to Silk Board"
+ENDPOINTS = ("Hoodi", "Silk Board")
+GEOCODES = {"Hoodi": (12.9916, 77.7158), "Silk Board": (12.9177, 77.6238)}
+HTTP_SECONDS = 0.25
+ROUTE = make_directions_route()
+
+
+def text_event(author: str, text: str) -> Event:
+    return Event(author=author, content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+class SimulatedRunner:
+    """
+    Stands in for an ADK Runner: replays what each pipeline agent does, sleeping
+    for its model and tool round trips, and counts the model calls.
+    """
+    latencies = {"llm": 0.8, "tool": 0.3}
+    model_calls = 0
+
+    def __init__(self, agent, app_name, session_service):
+        self.agent = agent
+        self.app_name = app_name
+        self.session_service = session_service
+
+    async def llm(self):
+        SimulatedRunner.model_calls += 1
+        await asyncio.sleep(self.latencies["llm"])
+
+    async def run_async(self, user_id, session_id, new_message):
+        session = await self.session_service.get_session(app_name=self.app_name, user_id=user_id, session_id=session_id)
+        for agent in getattr(self.agent, "sub_agents", None) or [self.agent]:
+            if agent is location_finder:
+                if session.state.get(KNOWN_GEOCODE_STATE_KEY):
+                    continue    # use_known_geocode skips the agent
+                await self.llm()
+                calls = [types.Part(function_call=types.FunctionCall(id=name, name="maps_geocode", args={"address": name}))
+                         for name in ENDPOINTS]
+                yield Event(author=agent.name, content=types.Content(role="model", parts=calls))
+                await asyncio.sleep(self.latencies["tool"])
+                responses = [types.Part(function_response=types.FunctionResponse(
+                    id=name, name="maps_geocode",
+                    response={"result": {"content": [{"text": json.dumps(
+                        {"location": {"lat": GEOCODES[name][0], "lng": GEOCODES[name][1]}})}]}},
+                )) for name in ENDPOINTS]
+                yield Event(author=agent.name, content=types.Content(role="user", parts=responses))
+                await self.llm()
+                yield text_event(agent.name, json.dumps(GEOCODES))
+            elif agent is first_agent:
+                await self.llm()
+                await asyncio.sleep(self.latencies["tool"])
+                await self.llm()
+                yield text_event(agent.name, "Directions: Hoodi Main Rd, Outer Ring Rd, Hosur Rd ...")
+            elif agent is formatter_agent:
+                await self.llm()
+                yield text_event(agent.name, json.dumps({"locations": route_locations(ROUTE)}))
+
+
+async def simulated_fetch_directions(origin, destination, api_key=None):
+    await asyncio.sleep(HTTP_SECONDS)
+    return json.loads(json.dumps(ROUTE))
+
+
+async def simulated_fetch_route_polyline(origin, destination, api_key=None):
+    return route_polyline(await simulated_fetch_directions(origin, destination))
+
+
+async def timed(label, scenario, repeats):
+    samples, calls = [], []
+    for _ in range(repeats):
+        SimulatedRunner.model_calls = 0
+        started = time.perf_counter()
+        route = await scenario()
+        samples.append(time.perf_counter() - started)
+        calls.append(SimulatedRunner.model_calls)
+    print(f"{label:<44} {int(np.median(calls)):>11} {len(route.locations):>9} {np.median(samples) * 1000:>10.1f}")
+
+
+async def run(repeats: int):
+    session_service = InMemorySessionService()
+    routes.get_adk_runner = SimulatedRunner
+    routes.fetch_directions = simulated_fetch_directions
+    routes.fetch_route_polyline = simulated_fetch_route_polyline
+
+    parse_samples = []
+    for _ in range(200):
+        started = time.perf_counter()
+        route_locations(ROUTE), route_polyline(ROUTE)
+        parse_samples.append(time.perf_counter() - started)
+    steps = len(ROUTE["legs"][0]["steps"])
+    print(f"Parsing a {steps}-step route (locations + polyline): {np.median(parse_samples) * 1000:.2f} ms\n")
+
+    print(f"{'path':<44} {'model calls':>11} {'locations':>9} {'median ms':>10}")
+
+    async def llm_pipeline():
+        return await routes.run_llm_route_pipeline(USER_INPUT, USER_ID, session_service, APP_NAME)
+
+    async def direct_agent_geocoded():
+        return await routes.run_route_pipeline(USER_INPUT, USER_ID, session_service, APP_NAME)
+
+    async def direct_gazetteer():
+        return await routes.run_route_pipeline(USER_INPUT, USER_ID, session_service, APP_NAME, ENDPOINTS)
+
+    async def route_cache_hit():
+        return await routes.resolve_route(USER_INPUT, USER_ID, session_service, APP_NAME)
+
+    await timed("before: LLM pipeline (3 agents)", llm_pipeline, repeats)
+    await timed("after: geocoding agent + parsed directions", direct_agent_geocoded, repeats)
+    await timed("after: gazetteer + parsed directions", direct_gazetteer, repeats)
+    await route_cache_hit()
+    await timed("after: route cache hit", route_cache_hit, repeats)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    SimulatedRunner.latencies["llm"] = float(args[0]) if len(args) > 0 else 0.8
+    SimulatedRunner.latencies["tool"] = float(args[1]) if len(args) > 1 else 0.3
+    HTTP_SECONDS = float(args[2]) if len(args) > 2 else HTTP_SECONDS
+    asyncio.run(run(int(args[3]) if len(args) > 3 else 5))
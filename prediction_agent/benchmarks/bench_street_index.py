@@ -0,0 +1,61 @@
+"""
+Recall and latency of the fuzzy place-name index on synthetic Bangalore street
+names. Every query is a rewritten variant of an indexed name (abbreviated,
+re-romanised, with a typo or a trailing qualifier); a query counts as recalled
+when the original name's key is among the returned hits. The exact-match column
+is the previous strip/lower-case equality lookup, for comparison.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.bench_street_index [vocabulary sizes]
+e.g. python -m benchmarks.bench_street_index 1000,10000,50000
+"""
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_street_names, spelling_variant
+from tools.street_index import PlaceNameIndex, normalize_place_name
+
+QUERIES = 2000
+BATCH = 12  # locations per route, as produced by the formatter agent
+
+
+def run(sizes):
+    print(f"{'names':>7} {'build ms':>9} {'exact recall':>12} {'fuzzy recall':>12} {'top-1':>6} "
+          f"{'batch p50 ms':>12} {'batch p99 ms':>12}")
+    for n in sizes:
+        names = make_street_names(n)
+        started = time.perf_counter()
+        index = PlaceNameIndex()
+        for name in names:
+            index.add(normalize_place_name(name))
+        build_ms = (time.perf_counter() - started) * 1000
+
+        rng = np.random.default_rng(n)
+        truth = rng.integers(0, len(names), QUERIES)
+        queries = [spelling_variant(names[i], rng) for i in truth]
+        expected = [index.key_ids[normalize_place_name(names[i])] for i in truth]
+
+        exact = np.mean([q.strip().lower() == names[i].strip().lower() for q, i in zip(queries, truth)])
+        hits = index.lookup_many(queries)
+        recalled = np.mean([any(k == e for k, _ in h) for h, e in zip(hits, expected)])
+        top1 = np.mean([bool(h) and h[0][0] == e for h, e in zip(hits, expected)])
+
+        # Time cold normalisation; token matches stay cached as they would in the service.
+        normalize_place_name.cache_clear()
+        samples = []
+        for start in range(0, QUERIES, BATCH):
+            batch = queries[start:start + BATCH]
+            started = time.perf_counter()
+            index.lookup_many(batch)
+            samples.append(time.perf_counter() - started)
+        samples = np.array(samples) * 1000
+
+        print(f"{n:>7} {build_ms:>9.1f} {exact:>12.3f} {recalled:>12.3f} {top1:>6.3f} "
+              f"{np.percentile(samples, 50):>12.3f} {np.percentile(samples, 99):>12.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1_000, 10_000, 50_000]
+    run(sizes)
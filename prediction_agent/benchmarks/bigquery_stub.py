@@ -0,0 +1,38 @@
+"""
+A stand-in for `google.cloud.bigquery.Client`, so the BigQuery incident store runs
+offline (tests and benchmarks).
+"""
+import sqlite3
+from types import SimpleNamespace
+
+import pandas as pd
+
+from tools.incident_store import STORE_COLUMNS
+
+
+class StubBigQueryClient:
+    """
+    Runs queries on an in-memory SQLite table after mapping `@name` parameters and the
+    table name, and records them.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.execute(f"CREATE TABLE incidents ({', '.join(STORE_COLUMNS)})")
+        self.queries = []
+
+    def query(self, sql, job_config=None):
+        params = {p.name: p.value for p in job_config.query_parameters}
+        self.queries.append((sql, params))
+        sql = sql.replace(f"`{self.table}`", "incidents").replace("@", ":")
+        df = pd.read_sql_query(sql, self.conn, params=params)
+        return SimpleNamespace(to_dataframe=lambda: df)
+
+    def insert_rows_json(self, table, rows, row_ids=None):
+        assert table == self.table
+        self.conn.executemany(
+            f"INSERT INTO incidents ({', '.join(STORE_COLUMNS)}) VALUES ({', '.join('?' for _ in STORE_COLUMNS)})",
+            [tuple(row[column] for column in STORE_COLUMNS) for row in rows],
+        )
+        return []
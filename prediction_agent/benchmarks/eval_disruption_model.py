@@ -0,0 +1,110 @@
+"""
+Offline evaluation of the statistical disruption predictor on a temporal split:
+fitted on the reports before the split time, scored on the reports after it
+against what actually happened (outcomes labelled from the full history, so
+episodes spanning the split are judged on their real course; censored reports
+are left out).
+
+Persistence over the horizon and escalation are scored with the Brier score, log
+loss and expected calibration error (10 bins), next to a base-rate baseline that
+predicts the training frequency for every report. "Fast path" is the share of
+reports the predictor is confident enough to answer without the LLM, and its
+accuracy on them.
+
+Run from the prediction_agent directory:
+    python -m benchmarks.eval_disruption_model [n_episodes | path/to/history.csv] [train share]
+e.g. python -m benchmarks.eval_disruption_model 20000 0.8
+     python -m benchmarks.eval_disruption_model ../streamlit_ui/submission_history.csv
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_incident_episodes
+from tools.disruption_model import DisruptionPredictor
+from tools.incident_index import IncidentIndex
+
+BINS = 10
+
+
+def scores(p: np.ndarray, y: np.ndarray) -> dict:
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    bins = np.minimum((p * BINS).astype(int), BINS - 1)
+    counts = np.bincount(bins, minlength=BINS)
+    gap = np.abs(np.bincount(bins, weights=p - y, minlength=BINS))
+    return {
+        "brier": float(np.mean((p - y) ** 2)),
+        "log_loss": float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p))),
+        "ece": float(gap.sum() / max(counts.sum(), 1)),
+    }
+
+
+def reliability(p: np.ndarray, y: np.ndarray) -> list:
+    bins = np.minimum((p * BINS).astype(int), BINS - 1)
+    rows = []
+    for b in range(BINS):
+        mask = bins == b
+        if mask.any():
+            rows.append((f"{b / BINS:.1f}-{(b + 1) / BINS:.1f}", int(mask.sum()), float(p[mask].mean()), float(y[mask].mean())))
+    return rows
+
+
+def run(source: str, train_share: float):
+    if os.path.exists(source):
+        df = pd.read_csv(source)
+        print(f"History: {source}")
+    else:
+        df = make_incident_episodes(int(source))
+        print(f"History: {source} synthetic episodes")
+    index = IncidentIndex.from_frame(df)
+    split = float(np.quantile(index.unix_timestamp.view[np.isfinite(index.unix_timestamp.view)], train_share))
+    train_rows = np.flatnonzero(index.unix_timestamp.view < split)
+
+    model = DisruptionPredictor().fit(index, train_rows)
+    outcomes = model.outcomes(index)
+    test = np.isin(outcomes.row_ids, np.flatnonzero(index.unix_timestamp.view >= split))
+    h = model.curve_hours.index(model.horizon_hours)
+    print(f"{len(index)} reports, {len(train_rows)} before the split, {int(test.sum())} after; "
+          f"horizon {model.horizon_hours:g} h\n")
+
+    if not outcomes.observed[test, h].any() or not len(train_rows):
+        print("Too few reports with a known outcome on both sides of the split to evaluate.")
+        return
+
+    predictions = [model.predict(e, s, w) for e, s, w in zip(
+        outcomes.event_type[test], outcomes.sub_event_type[test], outcomes.weather[test])]
+    persist_p = np.array([p.persist_probability for p in predictions])
+    escalate_p = np.array([p.escalate_probability for p in predictions])
+    confident = np.array([p.confident for p in predictions])
+    base = model.counts[()]
+
+    print(f"{'target':<12} {'model':<9} {'reports':>8} {'brier':>7} {'log loss':>9} {'ece':>7}")
+    for name, p, labels, known, base_rate in (
+        ("persistence", persist_p, outcomes.persisted[test, h], outcomes.observed[test, h],
+         base.persisted[h] / base.observed[h]),
+        ("escalation", escalate_p, outcomes.escalated[test], outcomes.escalation_known[test],
+         base.escalated / base.escalation_observed),
+    ):
+        y = labels[known].astype(np.float64)
+        for model_name, q in (("predictor", p[known]), ("base rate", np.full(known.sum(), base_rate))):
+            m = scores(q, y)
+            print(f"{name:<12} {model_name:<9} {len(y):>8} {m['brier']:>7.4f} {m['log_loss']:>9.4f} {m['ece']:>7.4f}")
+
+    known = outcomes.observed[test, h]
+    y = outcomes.persisted[test, h][known]
+    fast = confident[known]
+    accuracy = float(((persist_p[known][fast] >= 0.5) == y[fast]).mean()) if fast.any() else float("nan")
+    print(f"\nFast path: {fast.mean():.1%} of reports answered without the LLM, "
+          f"{accuracy:.1%} of them right about persistence.")
+
+    print("\nPersistence reliability (predicted vs observed):")
+    print(f"{'bin':<9} {'reports':>8} {'predicted':>9} {'observed':>9}")
+    for label, n, predicted, observed in reliability(persist_p[known], y.astype(np.float64)):
+        print(f"{label:<9} {n:>8} {predicted:>9.3f} {observed:>9.3f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(args[0] if args else "20000", float(args[1]) if len(args) > 1 else 0.8)
@@ -0,0 +1,312 @@
+"""
+Synthetic Bangalore incident history for the benchmarks in this directory.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+# (street_name, area_name, latitude, longitude) of well-known Bangalore roads.
+BANGALORE_STREETS = [
+    ("Hoodi Main Road", "Hoodi", 12.9916, 77.7161),
+    ("Whitefield Main Road", "Whitefield", 12.9698, 77.7500),
+    ("ITPL Main Road", "Whitefield", 12.9860, 77.7370),
+    ("Outer Ring Road", "Marathahalli", 12.9569, 77.7011),
+    ("Marathahalli Bridge", "Marathahalli", 12.9558, 77.7019),
+    ("Varthur Road", "Marathahalli", 12.9490, 77.7150),
+    ("Sarjapur Road", "Bellandur", 12.9226, 77.6720),
+    ("Hosur Road", "Silk Board", 12.9177, 77.6233),
+    ("Silk Board Junction", "Silk Board", 12.9172, 77.6228),
+    ("Bannerghatta Road", "BTM Layout", 12.9100, 77.6010),
+    ("100 Feet Road", "Indiranagar", 12.9719, 77.6412),
+    ("Old Airport Road", "HAL", 12.9590, 77.6560),
+    ("Old Madras Road", "KR Puram", 13.0000, 77.6770),
+    ("KR Puram Bridge", "KR Puram", 13.0040, 77.6960),
+    ("Tin Factory Junction", "KR Puram", 12.9970, 77.6690),
+    ("Mysore Road", "Kengeri", 12.9420, 77.5200),
+    ("Tumkur Road", "Yeshwanthpur", 13.0280, 77.5400),
+    ("Bellary Road", "Hebbal", 13.0350, 77.5970),
+    ("Hebbal Flyover", "Hebbal", 13.0358, 77.5970),
+    ("MG Road", "Ashok Nagar", 12.9756, 77.6050),
+    ("Brigade Road", "Ashok Nagar", 12.9730, 77.6070),
+    ("Residency Road", "Shanthala Nagar", 12.9680, 77.6020),
+    ("Richmond Road", "Richmond Town", 12.9650, 77.6000),
+    ("Lalbagh Road", "Sudhama Nagar", 12.9560, 77.5840),
+    ("Kanakapura Road", "Jayanagar", 12.9010, 77.5710),
+    ("Sony World Signal", "Koramangala", 12.9370, 77.6270),
+    ("80 Feet Road", "Koramangala", 12.9350, 77.6240),
+    ("Intermediate Ring Road", "Ejipura", 12.9400, 77.6300),
+    ("Inner Ring Road", "Domlur", 12.9610, 77.6390),
+    ("Dr Rajkumar Road", "Rajajinagar", 12.9950, 77.5540),
+    ("West of Chord Road", "Basaveshwaranagar", 12.9930, 77.5400),
+    ("Sampige Road", "Malleshwaram", 13.0030, 77.5700),
+    ("Sankey Road", "Sadashivanagar", 13.0060, 77.5800),
+    ("Cunningham Road", "Vasanth Nagar", 12.9870, 77.5950),
+    ("Infantry Road", "Shivaji Nagar", 12.9830, 77.6010),
+    ("Thanisandra Main Road", "Thanisandra", 13.0560, 77.6330),
+    ("Hennur Road", "Hennur", 13.0350, 77.6400),
+    ("Banaswadi Main Road", "Banaswadi", 13.0140, 77.6510),
+    ("CV Raman Road", "Sadashivanagar", 13.0130, 77.5790),
+    ("Electronic City Flyover", "Electronic City", 12.8450, 77.6600),
+    ("Hosa Road", "Kudlu", 12.8900, 77.6550),
+    ("Haralur Road", "HSR Layout", 12.9080, 77.6500),
+    ("27th Main Road", "HSR Layout", 12.9110, 77.6450),
+    ("Kadubeesanahalli Road", "Kadubeesanahalli", 12.9380, 77.6980),
+    ("Doddanekundi Main Road", "Doddanekundi", 12.9700, 77.6950),
+    ("Elxsi Walk Path", "Thigalarapalya", 12.9908, 77.7252),
+    ("Kundalahalli Road", "Brookefield", 12.9650, 77.7160),
+    ("Seegehalli Road", "Kadugodi", 13.0010, 77.7620),
+    ("Yelahanka Main Road", "Yelahanka", 13.1000, 77.5960),
+    ("Jalahalli Cross Road", "Jalahalli", 13.0400, 77.5300),
+]
+
+EVENTS = [
+    ("Weather-Related Damage", "waterlogging"),
+    ("Weather-Related Damage", "flooding"),
+    ("Weather-Related Damage", "fallen trees"),
+    ("Infrastructure Issue", "pothole"),
+    ("Infrastructure Issue", "streetlight outage"),
+    ("Traffic Anomaly", "accident"),
+    ("Traffic Anomaly", "signal failure"),
+    ("Traffic Anomaly", "road block"),
+    ("Utility Disruption", "power outage"),
+    ("Public Safety Concern", "open manhole"),
+]
+
+
+def make_incidents(n: int, seed: int = 0, days: float = 180.0, now: float = None) -> pd.DataFrame:
+    """
+    Generates `n` incident rows spread over the last `days` days, in timestamp order,
+    with the same columns as submission_history.csv.
+    """
+    rng = np.random.default_rng(seed)
+    now = time.time() if now is None else now
+
+    street_ids = rng.integers(0, len(BANGALORE_STREETS), n)
+    event_ids = rng.integers(0, len(EVENTS), n)
+    streets = np.array([s[0] for s in BANGALORE_STREETS], dtype=object)
+    areas = np.array([s[1] for s in BANGALORE_STREETS], dtype=object)
+    base_lat = np.array([s[2] for s in BANGALORE_STREETS])
+    base_lon = np.array([s[3] for s in BANGALORE_STREETS])
+    event_types = np.array([e[0] for e in EVENTS], dtype=object)
+    sub_event_types = np.array([e[1] for e in EVENTS], dtype=object)
+
+    timestamps = np.sort(now - rng.uniform(0, days * 86400, n))
+    return pd.DataFrame({
+        'unix_timestamp': timestamps,
+        'event_type': event_types[event_ids],
+        'sub_event_type': sub_event_types[event_ids],
+        'description': [f"Synthetic incident {i}" for i in range(n)],
+        'severity_score': rng.integers(1, 11, n),
+        'latitude': base_lat[street_ids] + rng.normal(0, 0.002, n),
+        'longitude': base_lon[street_ids] + rng.normal(0, 0.002, n),
+        'formatted_address': streets[street_ids],
+        'street_name': streets[street_ids],
+        'area_name': areas[street_ids],
+        'city': 'Bengaluru',
+    })
+
+
+def route_locations(k: int = 12, seed: int = 1) -> list:
+    """
+    A formatter-style list of `k` street names along a route.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(BANGALORE_STREETS), size=k, replace=False)
+    return [BANGALORE_STREETS[i][0] for i in picks]
+
+
+def make_route(n_vertices: int = 1000, start=(12.9916, 77.7161), end=(12.9172, 77.6228), seed: int = 2,
+               bow: float = 0.0) -> np.ndarray:
+    """
+    A wiggly (latitude, longitude) polyline of `n_vertices` between two points,
+    standing in for a decoded directions polyline (default: Hoodi to Silk Board).
+    `bow` bends the middle half of the route sideways by up to that many degrees, for
+    alternatives that share their first and last quarters.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, n_vertices)
+    lat = start[0] + (end[0] - start[0]) * t
+    lon = start[1] + (end[1] - start[1]) * t
+    # Smooth lateral wander of a few hundred metres, pinned at both ends.
+    wander = np.cumsum(rng.normal(0, 0.0004, n_vertices)) * np.sin(np.pi * t)
+    direction = np.array([end[0] - start[0], end[1] - start[1]])
+    detour = np.sin(np.pi * np.clip((t - 0.25) / 0.5, 0.0, 1.0))
+    side = np.array([-direction[1], direction[0]]) / np.hypot(*direction) * bow * detour[:, None]
+    return np.column_stack([lat + wander * 0.6, lon - wander * 0.8]) + side
+
+
+ROAD_SUFFIXES = ["Main Road", "Road", "Cross Road", "Street", "Layout", "Junction", "Circle", "Extension"]
+ORDINALS = ["1st", "2nd", "3rd"] + [f"{i}th" for i in range(4, 40)]
+
+# Ways the same name gets written by the formatter agent or a reverse geocoder.
+ABBREVIATED = {"Road": "Rd", "Main": "Mn", "Street": "St", "Cross": "Crs", "Junction": "Jn",
+               "Circle": "Cir", "Layout": "Lyt", "Extension": "Extn", "Bangalore": "Blr"}
+ROMANISATIONS = [("halli", "hally"), ("halli", "hali"), ("th", "t"), ("ee", "i"), ("oo", "u"),
+                 ("u", "oo"), ("a", "aa"), ("ll", "l"), ("v", "w"), ("sh", "s")]
+
+
+def make_street_names(n: int, seed: int = 3) -> list:
+    """
+    `n` distinct Bangalore-style street names (up to ~130k): the well-known roads
+    above plus numbered mains and crosses and suffixed names in each area.
+    """
+    rng = np.random.default_rng(seed)
+    areas = sorted({s[1] for s in BANGALORE_STREETS} | {s[0].rsplit(" ", 1)[0] for s in BANGALORE_STREETS})
+    names = dict.fromkeys(s[0] for s in BANGALORE_STREETS)
+    while len(names) < n:
+        area = areas[rng.integers(len(areas))]
+        style = rng.integers(4)
+        if style == 0:
+            name = f"{ORDINALS[rng.integers(len(ORDINALS))]} Main Road {area}"
+        elif style == 1:
+            name = f"{ORDINALS[rng.integers(len(ORDINALS))]} Main {ORDINALS[rng.integers(len(ORDINALS))]} Cross {area}"
+        elif style == 2:
+            name = f"{ORDINALS[rng.integers(len(ORDINALS))]} Cross {area} {ROAD_SUFFIXES[rng.integers(2, 4)]}"
+        else:
+            name = f"{area} {ROAD_SUFFIXES[rng.integers(len(ROAD_SUFFIXES))]}"
+        names[name] = None
+    return list(names)[:n]
+
+
+def spelling_variant(name: str, rng: np.random.Generator) -> str:
+    """
+    Rewrites a street name the way a different source might: abbreviated, re-romanised,
+    with a one-character typo, a trailing qualifier, or different casing and punctuation.
+    """
+    kind = rng.integers(5)
+    if kind == 0:
+        words = [ABBREVIATED.get(w, w) if rng.random() < 0.7 else w for w in name.split()]
+        return " ".join(words)
+    if kind == 1:
+        candidates = [(a, b) for a, b in ROMANISATIONS if a in name.lower()]
+        if candidates:
+            a, b = candidates[rng.integers(len(candidates))]
+            return name.lower().replace(a, b, 1).title()
+    if kind == 2 and len(name) > 8:
+        i = int(rng.integers(1, len(name) - 1))
+        return name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+    if kind == 3:
+        return f"{name} {['Service Road', 'Near Signal', 'Bengaluru', 'Karnataka'][rng.integers(4)]}"
+    return name.upper().replace(" ", ", ", 1)
+
+
+def encode_polyline(points: np.ndarray) -> str:
+    """
+    Google encoded-polyline string of (latitude, longitude) points (inverse of `decode_polyline`).
+    """
+    chars = []
+    previous = np.zeros(2, dtype=np.int64)
+    for point in np.round(np.asarray(points) * 1e5).astype(np.int64):
+        for delta in (point - previous).tolist():
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        previous = point
+    return "".join(chars)
+
+
+def make_directions_route(n_steps: int = 25, n_vertices: int = 1000, seed: int = 4, bow: float = 0.0,
+                          summary: str = "Outer Ring Rd") -> dict:
+    """
+    A Directions API route (summary, one leg of `n_steps` steps with HTML instructions
+    and step polylines, distance and duration) along `make_route`, as `fetch_directions`
+    returns it.
+    """
+    rng = np.random.default_rng(seed)
+    geometry = make_route(n_vertices, seed=seed, bow=bow)
+    bounds = np.linspace(0, n_vertices - 1, n_steps + 1).round().astype(int)
+    streets = [BANGALORE_STREETS[i] for i in rng.choice(len(BANGALORE_STREETS), size=n_steps)]
+    steps = []
+    for i, (street, area, _, _) in enumerate(streets):
+        verb, turn = [("Turn", "left"), ("Turn", "right"), ("Slight", "left"), ("Keep", "right")][rng.integers(4)]
+        if i == 0:
+            instructions = f"Head <b>south</b> on <b>{street}</b> toward <b>{streets[1][0]}</b>"
+        elif rng.random() < 0.3:
+            instructions = (f"{verb} <b>{turn}</b> onto <b>{street}</b>"
+                            f"<div style=\"font-size:0.9em\">Pass by {area} Bus Stop (on the {turn})</div>")
+        else:
+            instructions = f"{verb} <b>{turn}</b> onto <b>{street}</b>"
+        piece = geometry[bounds[i]:bounds[i + 1] + 1]
+        steps.append({"html_instructions": instructions, "polyline": {"points": encode_polyline(piece)}})
+    # Metres per degree near Bangalore; 20 km/h in traffic.
+    distance = float(np.hypot(np.diff(geometry[:, 0]) * 111_000, np.diff(geometry[:, 1]) * 108_000).sum())
+    return {
+        "summary": summary,
+        "legs": [{
+            "start_address": "Hoodi Main Rd, Hoodi, Mahadevapura, Bengaluru, Karnataka 560048, India",
+            "end_address": "Silk Board Junction, Bengaluru, Karnataka 560068, India",
+            "distance": {"value": round(distance)},
+            "duration": {"value": round(distance / 20_000 * 3600)},
+            "steps": steps,
+        }],
+        "overview_polyline": {"points": encode_polyline(geometry[::10])},
+    }
+
+
+def make_route_alternatives(n_routes: int = 3, n_vertices: int = 1000, seed: int = 4) -> list:
+    """
+    `n_routes` Directions API routes between the same endpoints, sharing their first and
+    last quarters and bowed to alternate sides by growing amounts in between (the first
+    is the straightest), as `fetch_route_alternatives` returns them.
+    """
+    return [
+        make_directions_route(n_vertices=n_vertices, seed=seed, bow=0.01 * ((i + 1) // 2) * (-1) ** i,
+                              summary="Outer Ring Rd" if i == 0 else BANGALORE_STREETS[i % len(BANGALORE_STREETS)][0])
+        for i in range(n_routes)
+    ]
+
+
+# Mean episode duration in hours (clear weather, rain) and chance each follow-up report is more severe.
+EPISODE_DYNAMICS = {
+    "waterlogging": (1.0, 4.0, 0.15),
+    "flooding": (2.0, 6.0, 0.25),
+    "fallen trees": (3.0, 5.0, 0.05),
+    "pothole": (72.0, 96.0, 0.05),
+    "streetlight outage": (12.0, 12.0, 0.02),
+    "accident": (0.7, 1.2, 0.1),
+    "signal failure": (1.5, 2.5, 0.05),
+    "road block": (4.0, 4.0, 0.05),
+    "power outage": (2.0, 5.0, 0.1),
+    "open manhole": (24.0, 36.0, 0.02),
+}
+
+
+def make_incident_episodes(n_episodes: int, seed: int = 5, days: float = 90.0, now: float = None,
+                           rain_share: float = 0.3) -> pd.DataFrame:
+    """
+    Incident reports generated from episodes with known dynamics: each episode lasts
+    an exponentially distributed time whose mean depends on its sub-event type and on
+    whether it is raining (stated in the description), and is reported every 15-45
+    minutes while it lasts (less often, up to every 2.5 hours, for long episodes),
+    each follow-up possibly more severe. Rows are in
+    timestamp order with the same columns as `make_incidents`.
+    """
+    rng = np.random.default_rng(seed)
+    now = time.time() if now is None else now
+    records = []
+    for _ in range(n_episodes):
+        street, area, lat, lon = BANGALORE_STREETS[rng.integers(len(BANGALORE_STREETS))]
+        event_type, sub_event_type = EVENTS[rng.integers(len(EVENTS))]
+        clear_hours, rain_hours, escalation = EPISODE_DYNAMICS[sub_event_type]
+        raining = rng.random() < rain_share
+        duration = rng.exponential((rain_hours if raining else clear_hours) * 3600.0)
+        start = now - rng.uniform(0, days * 86400)
+        offsets = [0.0]
+        stretch = max(1.0, duration / (6 * 3600.0))
+        while offsets[-1] + 1800.0 < duration:
+            offsets.append(offsets[-1] + min(rng.uniform(900.0, 2700.0) * stretch, 9000.0))
+        severity = int(rng.integers(2, 8))
+        weather = "Heavy rain in the area." if raining else "Clear skies."
+        for offset in offsets:
+            records.append((start + min(offset, duration), event_type, sub_event_type, severity, street, area, lat, lon,
+                            f"{sub_event_type.capitalize()} reported on {street}. {weather}"))
+            if rng.random() < escalation:
+                severity = min(severity + 1, 10)
+    df = pd.DataFrame(records, columns=['unix_timestamp', 'event_type', 'sub_event_type', 'severity_score',
+                                        'street_name', 'area_name', 'latitude', 'longitude', 'description'])
+    df['formatted_address'] = df['street_name']
+    df['city'] = 'Bengaluru'
+    return df.sort_values('unix_timestamp', kind='stable').reset_index(drop=True)
@@ -0,0 +1,65 @@
+import importlib.util
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The services are deployed separately and both have a top-level `tools` package.
+REPORT_STORE_MODULE = os.path.join(os.path.dirname(__file__), "..", "..", "Data_ingestion_agents", "Data_ingest_1",
+                                   "tools", "report_store.py")
+# (street, area, latitude, longitude)
+STREETS = [
+    ("Hosur Road", "Koramangala", 12.9352, 77.6245),
+    ("Outer Ring Road", "Silk Board", 12.9172, 77.6228),
+    ("Bellary Road", "Hebbal", 13.0358, 77.5970),
+    ("Old Airport Road", "Marathahalli", 12.9591, 77.6974),
+]
+EVENTS = [("Traffic Anomaly", "accident"), ("Civic Issue", "pothole"), ("Traffic Anomaly", "congestion")]
+
+
+def incident_frame(n: int, seed: int, prefix: str, days: float) -> pd.DataFrame:
+    """
+    `n` incidents over the last `days` days, in timestamp order, with the columns of
+    submission_history.csv plus the ingestion service's incident_id and pending_address.
+    """
+    rng = np.random.default_rng(seed)
+    streets = [STREETS[i] for i in rng.integers(0, len(STREETS), n)]
+    events = [EVENTS[i] for i in rng.integers(0, len(EVENTS), n)]
+    return pd.DataFrame({
+        'unix_timestamp': np.sort(time.time() - rng.uniform(0, days * 86400, n)),
+        'event_type': [e[0] for e in events],
+        'sub_event_type': [e[1] for e in events],
+        'description': [f"Test incident {i}" for i in range(n)],
+        'severity_score': rng.integers(1, 11, n),
+        'latitude': [s[2] for s in streets] + rng.normal(0, 0.002, n),
+        'longitude': [s[3] for s in streets] + rng.normal(0, 0.002, n),
+        'formatted_address': [s[0] for s in streets],
+        'street_name': [s[0] for s in streets],
+        'area_name': [s[1] for s in streets],
+        'city': 'Bengaluru',
+        'incident_id': [f"{prefix}-{i}" for i in range(n)],
+        'pending_address': False,
+    })
+
+
+@pytest.fixture
+def history_frame():
+    """Builds an incident history of `n` rows, the same rows for the same `n`."""
+    return lambda n: incident_frame(n, seed=7, prefix="history", days=180)
+
+
+@pytest.fixture
+def make_reports():
+    """Builds `n` reports of the last day as the ingestion service stores them."""
+    return lambda n, seed: incident_frame(n, seed=seed, prefix=f"incident-{seed}", days=1).to_dict(orient="records")
+
+
+@pytest.fixture
+def report_store_class():
+    """The ingestion service's ReportStore, loaded from its file."""
+    spec = importlib.util.spec_from_file_location("ingestion_report_store", REPORT_STORE_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ReportStore
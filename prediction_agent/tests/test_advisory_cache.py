@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools import advisory_cache
+from tools.advisory_cache import AdvisoryCache, advisory_cache_key
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+from tools.risk_view import RiskView
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def cache(request):
+    return AdvisoryCache(f"test-advisories-{request.node.name}", ttl_seconds=60, max_entries=8)
+
+
+def put(cache: AdvisoryCache, key: str, cells, value=None) -> bool:
+    return cache.put(key, value or f"advisory for {key}", cells, cache.reserve())
+
+
+def test_keys_are_per_time_bucket_and_answer_style(monkeypatch):
+    monkeypatch.setattr(advisory_cache, "ADVISORY_CACHE_TIME_BUCKET_MINUTES", 60)
+    key = advisory_cache_key("hoodi|silk board", now=T0)
+    assert key == advisory_cache_key("hoodi|silk board", now=T0 + 60)
+    assert key != advisory_cache_key("hoodi|silk board", now=T0 + 3600)
+    assert advisory_cache_key("hoodi|silk board", narrative=True, now=T0) == key + "#narrative"
+
+
+def test_invalidation_drops_only_routes_crossing_the_cells(cache):
+    assert put(cache, "a", ["c1", "c2"])
+    assert put(cache, "b", ["c2", "c3"])
+    assert put(cache, "c", ["c4"])
+    assert cache.invalidate_cells(["c2"]) == 2
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (None, None, "advisory for c")
+    # Their other cells are unindexed with them.
+    assert cache.snapshot()["indexed_cells"] == 1
+    assert cache.invalidate_cells(["c1", "c3", "c9"]) == 0
+
+
+def test_a_put_racing_an_invalidation_is_rejected(cache):
+    # The advisory is computed from incidents read before a cell on its route changed.
+    reserved = cache.reserve()
+    cache.invalidate_cells(["c2"])
+    assert not cache.put("a", "stale", ["c1", "c2"], reserved)
+    assert cache.get("a") is None
+    # Changes elsewhere do not matter, and a computation started after the change is kept.
+    assert cache.put("b", "fresh", ["c1", "c3"], reserved)
+    assert cache.put("a", "recomputed", ["c1", "c2"], cache.reserve())
+    assert (cache.get("a"), cache.get("b")) == ("recomputed", "fresh")
+    assert cache.snapshot()["rejected_puts"] == 1
+
+
+def test_puts_from_before_a_tracking_reset_are_rejected(cache, monkeypatch):
+    monkeypatch.setattr(advisory_cache, "_MAX_TRACKED_CELLS", 2)
+    reserved = cache.reserve()
+    cache.invalidate_cells(["c1", "c2", "c3"])
+    # Past the limit, the next invalidation forgets which cells changed and rejects every older put.
+    cache.invalidate_cells(["c4"])
+    assert not cache.put("a", "stale", ["c9"], reserved)
+    assert cache.put("a", "fresh", ["c9"], cache.reserve())
+
+
+def test_replacing_and_evicting_entries_unindexes_their_cells(request):
+    cache = AdvisoryCache(f"test-advisories-{request.node.name}", ttl_seconds=60, max_entries=2)
+    put(cache, "a", ["c1"])
+    put(cache, "a", ["c2"])
+    assert cache.invalidate_cells(["c1"]) == 0
+    put(cache, "b", ["c3"])
+    put(cache, "c", ["c4"])
+    # "a" was the least recently used.
+    assert cache.get("a") is None
+    assert cache.snapshot()["indexed_cells"] == 2
+
+
+def test_entries_expire(cache):
+    cache.ttl_seconds = -1
+    put(cache, "a", ["c1"])
+    assert cache.get("a") is None
+    assert cache.snapshot()["indexed_cells"] == 0
+
+
+def test_risk_view_changes_invalidate_advisories(cache):
+    index = IncidentIndex()
+    view = RiskView(index, RecencyPolicy(windows_hours={'accident': 6}))
+    view.add_cell_listener(cache.invalidate_cells)
+
+    def report_incident(at: float):
+        incident = {'unix_timestamp': at, 'event_type': 'Traffic Anomaly', 'sub_event_type': 'accident',
+                    'description': f'collision at {at}', 'severity_score': 5, 'latitude': 12.9352,
+                    'longitude': 77.6245, 'street_name': '80 Feet Road', 'area_name': 'Koramangala',
+                    'city': 'Bengaluru'}
+        with index._lock:
+            index.append_frame(pd.DataFrame([incident]))
+        view.sync(at)
+
+    route_cells = view.route_risk(np.array([[12.9352, 77.6245]]), corridor_m=10, now=T0).cell_ids
+    assert put(cache, "koramangala", route_cells)
+    assert put(cache, "elsewhere", ["tdr1y00"])
+    # A new incident on the route drops its advisory and no other.
+    report_incident(T0 + 60)
+    assert (cache.get("koramangala"), cache.get("elsewhere")) == (None, "advisory for elsewhere")
+
+    # One reported while the advisory is being computed keeps it out of the cache.
+    reserved = cache.reserve()
+    report_incident(T0 + 120)
+    assert not cache.put("koramangala", "stale", route_cells, reserved)
+    assert cache.get("koramangala") is None
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from tools.cache import DiskCacheTier, TTLCache
+
+
+@pytest.fixture
+def disk(tmp_path):
+    return DiskCacheTier(str(tmp_path / "cache.db"))
+
+
+def counting_loader(values, delay: float = 0.0):
+    calls = []
+
+    async def load():
+        calls.append(len(calls))
+        await asyncio.sleep(delay)
+        return values[min(len(calls), len(values)) - 1]
+
+    return load, calls
+
+
+@pytest.mark.parametrize("empty", ["", None, []])
+def test_empty_results_are_not_cached(disk, empty):
+    cache = TTLCache(f"test-empty-{empty!r}", ttl_seconds=60, disk=disk)
+    load, calls = counting_loader([empty, "sunny"])
+
+    async def run():
+        assert await cache.get_or_load("cell", load) == empty
+        assert await cache.get_or_load("cell", load) == "sunny"
+        assert await cache.get_or_load("cell", load) == "sunny"
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert disk.get(cache.name, "cell").value == "sunny"
+
+
+def test_empty_values_on_disk_are_ignored(disk):
+    cache = TTLCache("test-empty-disk", ttl_seconds=60, disk=disk)
+    asyncio.run(cache.put("cell", ""))
+    fresh = TTLCache("test-empty-disk", ttl_seconds=60, disk=disk)
+    load, calls = counting_loader(["rain"])
+    assert asyncio.run(fresh.get_or_load("cell", load)) == "rain"
+    assert len(calls) == 1
+
+
+def test_concurrent_misses_share_one_load(disk):
+    cache = TTLCache("test-coalesce", ttl_seconds=60, disk=disk)
+    load, calls = counting_loader(["news"], delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("group", load) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["news"] * 10
+    assert len(calls) == 1
+    snapshot = cache.snapshot()
+    assert snapshot["misses"] == 10 and snapshot["coalesced"] == 9 and snapshot["loading"] == 0
+
+
+def test_a_failed_shared_load_reaches_every_caller_and_is_retried(disk):
+    cache = TTLCache("test-coalesce-failure", ttl_seconds=60, disk=disk)
+    attempts = []
+
+    async def load():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("agent failed")
+        return "news"
+
+    async def run():
+        results = await asyncio.gather(*(cache.get_or_load("group", load) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await cache.get_or_load("group", load) == "news"
+
+    asyncio.run(run())
+    assert len(attempts) == 2
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_load(disk):
+    cache = TTLCache("test-coalesce-cancel", ttl_seconds=60, disk=disk)
+    load, calls = counting_loader(["news"], delay=0.05)
+
+    async def run():
+        first = asyncio.create_task(cache.get_or_load("group", load))
+        second = asyncio.create_task(cache.get_or_load("group", load))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "news"
+
+    asyncio.run(run())
+    assert len(calls) == 1
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+from google.adk.sessions import InMemorySessionService
+from google.adk.utils.instructions_utils import inject_session_state
+
+from Agents import agent, agent_runner
+from Agents.agent_runner import get_conversation_summary, record_conversation_turn
+
+APP_NAME = "test_app"
+
+
+def test_the_summary_keeps_the_last_clipped_turns(monkeypatch):
+    monkeypatch.setattr(agent_runner, "CONVERSATION_SUMMARY_TURNS", 2)
+    monkeypatch.setattr(agent_runner, "CONVERSATION_SUMMARY_CHARS", 20)
+    session_service = InMemorySessionService()
+
+    async def run():
+        before = await get_conversation_summary(session_service, APP_NAME, "user", "session")
+        for i in range(3):
+            await record_conversation_turn(session_service, APP_NAME, "user", "session", f"question {i}",
+                                           f"a rather long   answer number {i}")
+        return before, await get_conversation_summary(session_service, APP_NAME, "user", "session")
+
+    before, summary = asyncio.run(run())
+    assert before == ""
+    assert summary.splitlines() == [
+        "User: question 1", "Assistant: a rather long ans...",
+        "User: question 2", "Assistant: a rather long ans...",
+    ]
+
+
+def test_the_prediction_agent_reads_the_summary_from_its_scratch_session(monkeypatch):
+    session_service = InMemorySessionService()
+    prompts = []
+
+    async def stream_agent_text(llm_agent, message, app_name, user_id, session_id, session_service):
+        # Renders the agent's instruction from the scratch session, as the ADK would.
+        session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        context = SimpleNamespace(_invocation_context=SimpleNamespace(session=session, artifact_service=None))
+        prompts.append(await inject_session_state(llm_agent.instruction, context))
+        yield "It will clear soon."
+
+    monkeypatch.setattr(agent, "stream_agent_text", stream_agent_text)
+    enrichment = {"news": "no news", "feature_weather": "sunny"}
+
+    async def run(summary):
+        return await agent.feature_event_prediction_agent([], enrichment, "user", session_service, APP_NAME, summary)
+
+    assert asyncio.run(run("User: from Hoodi to Silk Board\nAssistant: Heavy traffic.")) == "It will clear soon."
+    assert "User: from Hoodi to Silk Board\nAssistant: Heavy traffic." in prompts[0]
+    assert "no news" in prompts[0] and "sunny" in prompts[0]
+    # Without earlier turns the placeholder renders empty.
+    asyncio.run(run(""))
+    assert "{conversation_summary" not in prompts[1]
@@ -0,0 +1,155 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+import pytest
+
+from tools.directions import (
+    address_places, decode_polyline, fetch_route_alternatives, geocode_results_from_events, geocodes_from_events,
+    instruction_names, route_length, route_locations, route_polyline,
+)
+
+
+def encode_polyline(points) -> str:
+    """Google's polyline encoding, the inverse of decode_polyline."""
+    encoded, previous = [], (0, 0)
+    for lat, lng in points:
+        current = (int(round(lat * 1e5)), int(round(lng * 1e5)))
+        for delta in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous = current
+    return "".join(encoded)
+
+
+def test_decode_polyline_matches_the_reference_example():
+    # The worked example of Google's encoded polyline format documentation.
+    np.testing.assert_allclose(decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@"),
+                               [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]])
+    assert decode_polyline("").shape == (0, 2)
+
+
+@pytest.mark.parametrize("html_instructions, names", [
+    ("Turn <b>left</b> onto <b>Outer Ring Rd</b><div style=\"font-size:0.9em\">Pass by Tata Motors (on the left)</div>",
+     ["Outer Ring Rd", "Tata Motors"]),
+    ("Head <b>northeast</b> on <b>Hoodi Main Rd</b> toward <b>5th Cross Rd</b>", ["Hoodi Main Rd", "5th Cross Rd"]),
+    ("At the roundabout, take the <b>2nd</b> exit onto <b>Sarjapur &amp; Varthur Rd</b>", ["Sarjapur & Varthur Rd"]),
+    ("Keep <b>slight right</b>", []),
+    ("", []),
+    (None, []),
+])
+def test_instruction_names(html_instructions, names):
+    assert instruction_names(html_instructions) == names
+
+
+@pytest.mark.parametrize("address, places", [
+    ("2nd Cross Rd, Hoodi, Bengaluru, Karnataka 560048, India", ["2nd Cross Rd", "Hoodi"]),
+    ("7JVW+QR Marathahalli, Bengaluru, Karnataka, India", ["Marathahalli"]),
+    ("", []),
+    (None, []),
+])
+def test_address_places(address, places):
+    assert address_places(address) == places
+
+
+def step(points, html_instructions=""):
+    return {"polyline": {"points": encode_polyline(points)}, "html_instructions": html_instructions}
+
+
+ROUTE = {
+    "summary": "Outer Ring Rd and Hosur Rd",
+    "legs": [{
+        "start_address": "Hoodi, Bengaluru, Karnataka 560048, India",
+        "end_address": "Silk Board Junction, Bengaluru, Karnataka 560068, India",
+        "distance": {"value": 14200}, "duration": {"value": 2400},
+        "steps": [
+            step([(12.99, 77.71), (12.98, 77.70)], "Head <b>south</b> on <b>Hoodi Main Rd</b>"),
+            step([(12.98, 77.70), (12.95, 77.70)], "Turn <b>right</b> onto <b>Outer Ring Road</b>"),
+            step([(12.95, 77.70), (12.92, 77.62)], "Continue onto <b>Hosur Road</b>"),
+        ],
+    }],
+    "overview_polyline": {"points": encode_polyline([(12.99, 77.71), (12.92, 77.62)])},
+}
+
+
+def test_route_polyline_joins_steps_without_repeating_vertices():
+    np.testing.assert_allclose(route_polyline(ROUTE),
+                               [[12.99, 77.71], [12.98, 77.70], [12.95, 77.70], [12.92, 77.62]])
+
+
+def test_route_polyline_falls_back_to_the_overview():
+    route = dict(ROUTE, legs=[{"steps": [{"html_instructions": "no geometry"}]}])
+    np.testing.assert_allclose(route_polyline(route), [[12.99, 77.71], [12.92, 77.62]])
+    assert route_polyline({}).shape == (0, 2)
+
+
+def test_route_length_sums_the_legs():
+    second_leg = {"distance": {"value": 800}, "duration": {"value": 120}}
+    assert route_length(dict(ROUTE, legs=ROUTE["legs"] + [second_leg, {}])) == (15000.0, 2520.0)
+    assert route_length({}) == (0.0, 0.0)
+
+
+def test_route_locations_are_in_route_order_and_deduplicated():
+    # "Outer Ring Rd" and "Hosur Rd" in the summary repeat the steps' names.
+    assert route_locations(ROUTE) == ["Hoodi", "Hoodi Main Rd", "Outer Ring Road", "Hosur Road", "Silk Board Junction"]
+    assert route_locations({}) == []
+
+
+def tool_event(calls=(), responses=()):
+    return SimpleNamespace(get_function_calls=lambda: list(calls), get_function_responses=lambda: list(responses))
+
+
+def geocode_call(call_id, address):
+    return SimpleNamespace(id=call_id, name="maps_geocode", args={"address": address})
+
+
+def geocode_response(call_id, *texts, name="maps_geocode"):
+    content = [{"type": "text", "text": text} for text in texts]
+    return SimpleNamespace(id=call_id, name=name, response={"result": {"content": content}})
+
+
+def test_geocodes_are_read_from_tool_responses_in_call_order():
+    hoodi = json.dumps({"location": {"lat": 12.99, "lng": 77.71}, "formatted_address": "Hoodi, Bengaluru"})
+    silk_board = json.dumps({"location": {"lat": 12.92, "lng": 77.62}, "formatted_address": "Silk Board"})
+    events = [
+        tool_event(calls=[geocode_call("a", "Hoodi"), geocode_call("b", "Silk Board")]),
+        tool_event(responses=[geocode_response("a", hoodi), geocode_response("x", "not json")]),
+        tool_event(responses=[geocode_response("b", silk_board),
+                              geocode_response("c", json.dumps({"error": "ZERO_RESULTS"})),
+                              geocode_response("d", hoodi, name="maps_directions")]),
+    ]
+    assert geocodes_from_events(events) == [(12.99, 77.71), (12.92, 77.62)]
+    assert geocode_results_from_events(events) == [
+        {"query": "Hoodi", "latitude": 12.99, "longitude": 77.71, "formatted_address": "Hoodi, Bengaluru"},
+        {"query": "Silk Board", "latitude": 12.92, "longitude": 77.62, "formatted_address": "Silk Board"},
+    ]
+
+
+def test_no_api_key_means_no_routes(monkeypatch):
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+    assert asyncio.run(fetch_route_alternatives((12.99, 77.71), (12.92, 77.62))) == []
+
+
+@pytest.mark.parametrize("body, expected", [
+    ({"status": "OK", "routes": [ROUTE, dict(ROUTE, summary="Old Airport Rd")]}, 2),
+    ({"status": "ZERO_RESULTS", "routes": []}, 0),
+    ({"status": "OK"}, 0),
+])
+def test_route_alternatives_follow_the_response_status(monkeypatch, body, expected):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=body)
+
+    client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs))
+    routes = asyncio.run(fetch_route_alternatives((12.99, 77.71), (12.92, 77.62), api_key="key"))
+    assert len(routes) == expected
+    assert requests[0].url.params["alternatives"] == "true"
+    assert requests[0].url.params["origin"] == "12.99,77.71"
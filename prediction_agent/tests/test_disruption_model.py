@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.disruption_model import CLEAR, RAIN, UNKNOWN, DisruptionPredictor, describe_predictions, weather_category
+from tools.incident_index import IncidentIndex
+
+T0 = 1_700_000_000.0
+HOUR = 3600.0
+# Curve hours are 0.5, 1, 2, 3, 6 and 12; the horizon is 2 hours and episodes break after 3 quiet hours.
+TWO_HOURS = DisruptionPredictor().curve_hours.index(2.0)
+
+
+def report(hours: float, street: str, sub_event_type: str = "accident", severity: int = 5,
+           description: str = "reported by a commuter", event_type: str = "Traffic Anomaly") -> dict:
+    return {'unix_timestamp': T0 + hours * HOUR, 'event_type': event_type, 'sub_event_type': sub_event_type,
+            'description': description, 'severity_score': severity, 'latitude': 12.93, 'longitude': 77.62,
+            'street_name': street, 'area_name': 'Koramangala', 'city': 'Bengaluru'}
+
+
+def predictor(**kwargs) -> DisruptionPredictor:
+    kwargs = {'horizon_hours': 2.0, 'episode_gap_hours': 3.0, **kwargs}
+    return DisruptionPredictor(**kwargs)
+
+
+def outcomes_by_row(index: IncidentIndex, model: DisruptionPredictor) -> dict:
+    outcomes = model.outcomes(index)
+    return {int(row): (outcomes.persisted[i].tolist(), outcomes.observed[i].tolist(),
+                       bool(outcomes.escalated[i]), bool(outcomes.escalation_known[i]))
+            for i, row in enumerate(outcomes.row_ids)}
+
+
+def test_reports_of_one_kind_and_place_form_episodes():
+    index = IncidentIndex.from_frame(pd.DataFrame([
+        report(0, "80 Feet Road", severity=3),
+        report(1, "80 Feet Road", severity=3),
+        report(2.5, "80 Feet Road", severity=6),
+        # Over the gap after the last report: a new episode.
+        report(10, "80 Feet Road", severity=3),
+        # Same time and place, another kind: its own episode.
+        report(0.5, "80 Feet Road", sub_event_type="pothole"),
+        # Closes the history long after everything above.
+        report(100, "Hosur Road"),
+    ]))
+    outcomes = outcomes_by_row(index, predictor())
+    # Curve hours 0.5, 1, 2, 3, 6, 12: the first report's episode went on for 2.5 more hours.
+    assert outcomes[0][0] == [True, True, True, False, False, False]
+    assert outcomes[1][0] == [True, True, False, False, False, False]
+    assert outcomes[2][0] == outcomes[3][0] == outcomes[4][0] == [False] * 6
+    # Closed episodes are observed at every horizon.
+    assert all(all(outcomes[row][1]) for row in range(5))
+    # Only the second report has a more severe one within the next two hours.
+    assert [outcomes[row][2] for row in range(5)] == [False, True, False, False, False]
+    assert all(outcomes[row][3] for row in range(5))
+
+
+def test_open_episodes_are_censored():
+    index = IncidentIndex.from_frame(pd.DataFrame([
+        report(0, "80 Feet Road"),
+        # Still going on at the end of the history: 1.5 hours outlived so far.
+        report(48, "Outer Ring Road"),
+        report(49.5, "Outer Ring Road"),
+        report(50, "Hosur Road", sub_event_type="pothole"),
+    ]))
+    outcomes = outcomes_by_row(index, predictor())
+    assert outcomes[0][1] == [True] * 6
+    persisted, observed, escalated, escalation_known = outcomes[1]
+    assert persisted == [True, True, False, False, False, False]
+    assert observed == [True, True, False, False, False, False]
+    # Its two-hour horizon ends with the history; the next report's may yet see a more severe one.
+    assert (escalated, escalation_known) == (False, True)
+    assert outcomes[2][2:] == (False, False)
+    assert outcomes[3][1] == [False] * 6
+
+    # Censored horizons count in no stratum.
+    model = predictor().fit(index)
+    assert model.counts[()].observed[TWO_HOURS] == 1
+    assert model.counts[()].escalation_observed == 2
+
+
+def history() -> IncidentIndex:
+    """
+    Four accident episodes of two reports 2.5 hours apart (half of the reports persist
+    two hours) and six single-report pothole episodes (none persist), all closed.
+    """
+    rows = []
+    for i in range(4):
+        street = f"Accident Street {i}"
+        rows += [report(10 * i, street, description="heavy rain"), report(10 * i + 2.5, street)]
+    rows += [report(10 * i, f"Pothole Street {i}", sub_event_type="pothole") for i in range(6)]
+    rows.append(report(1000, "Hosur Road", event_type="Civic Issue", sub_event_type="waterlogging"))
+    return IncidentIndex.from_frame(pd.DataFrame(rows))
+
+
+def test_raw_rates_without_a_prior():
+    model = predictor(prior_strength=0).fit(history())
+    accident = model.predict("Traffic Anomaly", "accident")
+    assert accident.persist_probability == pytest.approx(0.5)
+    assert accident.support == 8
+    assert model.predict("Traffic Anomaly", "pothole").persist_probability == pytest.approx(0.0)
+    # Stratum keys are normalised.
+    assert model.predict("traffic  anomaly", "Accident ").support == 8
+
+
+def test_sparse_strata_shrink_towards_their_parents():
+    k = 10
+    model = predictor(prior_strength=k).fit(history())
+    # All incidents: 4 of 14 observed reports persisted; the last report is censored.
+    everything = (4 + k * 0.5) / (14 + k)
+    event = (4 + k * everything) / (14 + k)
+    accident = (4 + k * event) / (8 + k)
+    pothole = (0 + k * event) / (6 + k)
+    assert model.predict("Traffic Anomaly", "accident").persist_probability == pytest.approx(accident)
+    assert model.predict("Traffic Anomaly", "pothole").persist_probability == pytest.approx(pothole)
+
+    # The first report of each accident episode mentions rain: 4 of 4 persisted.
+    rain = model.predict("Traffic Anomaly", "accident", RAIN)
+    assert rain.support == 4
+    assert rain.persist_probability == pytest.approx((4 + k * accident) / (4 + k))
+
+    # A stratum with no reports falls back to its parent's rate, with no support.
+    unseen = model.predict("Traffic Anomaly", "fire")
+    assert (unseen.persist_probability, unseen.support) == (pytest.approx(event), 0)
+    assert model.predict("Traffic Anomaly", "pothole", RAIN).persist_probability == pytest.approx(pothole)
+    assert predictor().predict("Traffic Anomaly", "accident").persist_probability == 0.5
+
+
+def test_confidence_needs_support_and_a_clear_margin():
+    index = history()
+    model = predictor(prior_strength=0, min_support=6, confidence_margin=0.2).fit(index)
+    # Support 6, probability 0: trusted.
+    assert model.predict("Traffic Anomaly", "pothole").confident
+    # Support 8, probability 0.5: too close to a coin flip.
+    assert not model.predict("Traffic Anomaly", "accident").confident
+    # Probability 1, support 4: too few reports.
+    assert not model.predict("Traffic Anomaly", "accident", RAIN).confident
+    assert not predictor(prior_strength=0, min_support=7).fit(index).predict("Traffic Anomaly", "pothole").confident
+
+
+def test_predict_incidents_groups_by_kind_in_first_seen_order():
+    model = predictor(prior_strength=0).fit(history())
+    incidents = [
+        {"event_type": "Traffic Anomaly", "sub_event_type": "pothole", "street_name": "Pothole Street 0"},
+        {"event_type": "Traffic Anomaly", "sub_event_type": "accident", "area_name": "Koramangala"},
+        {"event_type": "Traffic Anomaly", "sub_event_type": "pothole", "street_name": "Pothole Street 1"},
+    ]
+    predictions = model.predict_incidents(incidents, RAIN)
+    assert [p.sub_event_type for p in predictions] == ["pothole", "accident"]
+    assert describe_predictions(incidents, predictions).splitlines()[1:] == [
+        "- Pothole on Pothole Street 0, Pothole Street 1: likely to clear within 2 hours (100%);"
+        " unlikely to get worse (0%). Rain is forecast.",
+        "- Accident on Koramangala: likely to persist over the next 2 hours (100%);"
+        " unlikely to get worse (0%). Rain is forecast.",
+    ]
+
+
+@pytest.mark.parametrize("text, category", [
+    ("Heavy rain since morning", RAIN),
+    ("Thunderstorms expected, otherwise cloudy", RAIN),
+    ("Sunny, no rain expected", CLEAR),
+    ("Partly cloudy, 10% chance of rain", CLEAR),
+    ("Road dug up for pipe work", UNKNOWN),
+    (None, UNKNOWN),
+])
+def test_weather_categories(text, category):
+    assert weather_category(text) == category
+
+
+def test_an_empty_index_fits_to_the_prior():
+    model = predictor().fit(IncidentIndex())
+    assert model.counts == {}
+    prediction = model.predict("Traffic Anomaly", "accident")
+    assert (prediction.persist_probability, prediction.support, prediction.confident) == (0.5, 0, False)
+    assert np.allclose(list(prediction.curve.values()), 0.5)
@@ -0,0 +1,112 @@
+import pytest
+
+from Agents import routes
+from tools.gazetteer import Gazetteer
+
+SEED = """name,latitude,longitude,aliases
+Marathahalli,12.9569,77.7011,Marathahalli Bridge
+Silk Board Junction,12.9172,77.6228,Silk Board|Central Silk Board
+Hoodi,12.9916,77.7161,
+Broken,not-a-number,77.1,
+Hebbal Flyover,13.0360,77.5960,
+Hebbal Lake,13.0450,77.5900,
+"""
+
+
+@pytest.fixture
+def seed_path(tmp_path):
+    path = tmp_path / "gazetteer_seed.csv"
+    path.write_text(SEED)
+    return str(path)
+
+
+@pytest.fixture
+def gazetteer(tmp_path, seed_path):
+    return Gazetteer(str(tmp_path / "cache.db"), seed_path)
+
+
+def name_of(gazetteer: Gazetteer, query: str):
+    place = gazetteer.lookup(query)
+    return place.name if place else None
+
+
+def test_invalid_seed_rows_are_skipped(gazetteer):
+    # Five valid seeds and three aliases.
+    assert len(gazetteer) == 8
+    assert name_of(gazetteer, "Broken") is None
+
+
+@pytest.mark.parametrize("query, name", [
+    ("Marathahalli", "Marathahalli"),
+    ("marathahalli bridge", "Marathahalli"),
+    ("Central Silk Board", "Silk Board Junction"),
+    ("Silk Board Jn.", "Silk Board Junction"),
+    ("Hudi", "Hoodi"),
+])
+def test_names_and_aliases_resolve_exactly(gazetteer, query, name):
+    place = gazetteer.lookup(query)
+    assert (place.name, place.source) == (name, "seed")
+
+
+def test_unique_prefix_resolves(gazetteer):
+    assert name_of(gazetteer, "Maratha") == "Marathahalli"
+    assert name_of(gazetteer, "Hebbal Fly") == "Hebbal Flyover"
+
+
+@pytest.mark.parametrize("query, name", [("Marthahalli", "Marathahalli"), ("Hoody", "Hoodi")])
+def test_typos_resolve_fuzzily(gazetteer, query, name):
+    assert name_of(gazetteer, query) == name
+
+
+@pytest.mark.parametrize("query", [
+    "Hebbal",           # a prefix of two places, neither a better match
+    "Mara",             # too short a prefix
+    "Nowhere Place",
+    "Bengaluru",        # normalises to nothing
+    "",
+])
+def test_ambiguous_or_unknown_names_miss(gazetteer, query):
+    assert gazetteer.lookup(query) is None
+
+
+def test_completions(gazetteer):
+    assert sorted(place.name for place in gazetteer.complete("Hebb")) == ["Hebbal Flyover", "Hebbal Lake"]
+    assert gazetteer.complete("Bengaluru") == []
+
+
+def test_learned_places_persist_and_override_seeds(tmp_path, seed_path, gazetteer):
+    assert gazetteer.learn("Hoodi", 12.99, 77.72, "Hoodi, Bengaluru")
+    assert gazetteer.learn("Kadugodi", 12.99, 77.76)
+    assert not gazetteer.learn("Bengaluru", 12.97, 77.59)
+
+    reopened = Gazetteer(str(tmp_path / "cache.db"), seed_path)
+    hoodi = reopened.lookup("hoodi")
+    assert (hoodi.latitude, hoodi.longitude, hoodi.source) == (12.99, 77.72, "learned")
+    assert name_of(reopened, "Kadugodi") == "Kadugodi"
+    assert name_of(reopened, "Bengaluru") is None
+
+
+def test_missing_seed_starts_empty(tmp_path):
+    gazetteer = Gazetteer(str(tmp_path / "cache.db"), str(tmp_path / "missing.csv"))
+    assert len(gazetteer) == 0
+    assert gazetteer.lookup("Hoodi") is None
+
+
+def test_known_geocodes_need_both_endpoints(monkeypatch, gazetteer):
+    monkeypatch.setattr(routes, "get_gazetteer", lambda: gazetteer)
+    assert routes.known_geocodes(("Hoodi", "Silk Board")) == [(12.9916, 77.7161), (12.9172, 77.6228)]
+    assert routes.known_geocodes(("Hoodi", "Nowhere Place")) is None
+    assert routes.known_geocodes(None) is None
+
+
+def test_learn_geocodes_records_queries_and_endpoints(monkeypatch, gazetteer):
+    monkeypatch.setattr(routes, "get_gazetteer", lambda: gazetteer)
+    results = [
+        {"query": "Kadugodi, Bengaluru", "latitude": 12.99, "longitude": 77.76, "formatted_address": "Kadugodi"},
+        {"query": "Hope Farm Junction, Bengaluru", "latitude": 12.98, "longitude": 77.75, "formatted_address": "Hope Farm"},
+    ]
+    monkeypatch.setattr(routes, "geocode_results_from_events", lambda events: results)
+    routes.learn_geocodes(("Kadugodi", "Hope Farm"), [])
+    # Learned under the agent's query, then again under the endpoint name (the same key).
+    assert name_of(gazetteer, "Kadugodi") == "Kadugodi"
+    assert (gazetteer.lookup("Hope Farm").latitude, gazetteer.lookup("Hope Farm").longitude) == (12.98, 77.75)
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from tools.geo import (
+    haversine_m, nearest_segments, nearest_segments_reference, pair_distances, segment_candidates, segments_within,
+    segments_within_reference, wrap_longitude,
+)
+
+# About 111 m per 0.001 degrees of latitude.
+METERS_PER_MILLIDEGREE = haversine_m(0.0, 0.0, 0.001, 0.0)
+
+
+def random_route(rng, n_segments: int, start=(12.90, 77.55)) -> np.ndarray:
+    vertices = np.cumsum(np.vstack([start, rng.normal(0.0, 0.002, size=(n_segments, 2))]), axis=0)
+    return np.hstack([vertices[:-1], vertices[1:]])
+
+
+def random_points(rng, segments: np.ndarray, n: int) -> np.ndarray:
+    # Around the route, some close to it and some far.
+    lat_min, lon_min = segments[:, [0, 2]].min() - 0.02, segments[:, [1, 3]].min() - 0.02
+    lat_max, lon_max = segments[:, [0, 2]].max() + 0.02, segments[:, [1, 3]].max() + 0.02
+    return np.column_stack([rng.uniform(lat_min, lat_max, n), rng.uniform(lon_min, lon_max, n)])
+
+
+def assert_matches_reference(points, segments, max_distance_m, chunk_pairs=500):
+    lat, lon = points[:, 0], points[:, 1]
+    expected = segments_within_reference(points.tolist(), segments.tolist(), max_distance_m)
+    got = segments_within(lat, lon, segments, max_distance_m, chunk_pairs=chunk_pairs)
+    assert [(p, s) for p, s, _, _ in expected] == list(zip(got.point.tolist(), got.segment.tolist()))
+    np.testing.assert_allclose(got.distance_m, [d for _, _, d, _ in expected], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(got.t, [t for _, _, _, t in expected], rtol=0, atol=1e-9)
+
+    for bound in (max_distance_m, None):
+        expected = nearest_segments_reference(points.tolist(), segments.tolist(), bound)
+        got = nearest_segments(lat, lon, segments, bound, chunk_pairs=chunk_pairs)
+        assert [(p, s) for p, s, _, _ in expected] == list(zip(got.point.tolist(), got.segment.tolist()))
+        np.testing.assert_allclose(got.distance_m, [d for _, _, d, _ in expected], rtol=0, atol=1e-6)
+        np.testing.assert_allclose(got.t, [t for _, _, _, t in expected], rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("max_distance_m", [50.0, 400.0, 3000.0])
+def test_kernels_match_the_reference(max_distance_m):
+    rng = np.random.default_rng(11)
+    segments = random_route(rng, 120)
+    segments[7, 2:] = segments[7, :2]       # a zero-length segment
+    points = random_points(rng, segments, 600)
+    points[::97] = np.nan                   # unlocated points match nothing
+    # Small chunks, so every code path runs over several of them.
+    assert_matches_reference(points, segments, max_distance_m)
+
+
+def test_points_beyond_the_segment_ends_measure_to_the_endpoints():
+    segment = np.array([[0.0, 0.0, 0.0, 0.01]])
+    points = np.array([[0.0, -0.002], [0.001, 0.005], [0.0, 0.013]])
+    distance, t = pair_distances(points[:, 0], points[:, 1], segment, [0, 0, 0])
+    np.testing.assert_allclose(t, [0.0, 0.5, 1.0], atol=1e-12)
+    np.testing.assert_allclose(distance, [2 * METERS_PER_MILLIDEGREE, METERS_PER_MILLIDEGREE,
+                                          3 * METERS_PER_MILLIDEGREE], rtol=1e-3)
+    assert_matches_reference(points, segment, 250.0)
+
+
+def test_degenerate_segments_measure_to_their_point():
+    segments = np.array([[12.9, 77.6, 12.9, 77.6], [12.9, 77.6, 12.9, 77.6]])
+    points = np.array([[12.901, 77.6], [12.9, 77.6]])
+    distance, t = pair_distances(points[:, 0], points[:, 1], segments, [0, 1])
+    np.testing.assert_allclose(distance, [haversine_m(12.901, 77.6, 12.9, 77.6), 0.0], atol=1e-9)
+    assert t.tolist() == [0.0, 0.0]
+    # Ties go to the first segment.
+    assert nearest_segments(points[:, 0], points[:, 1], segments).segment.tolist() == [0, 0]
+    assert_matches_reference(points, segments, 200.0)
+
+
+def test_segments_across_the_antimeridian():
+    # About 2.2 km of the equator, from 179.99 E to 179.99 W.
+    crossing = np.array([[0.0, 179.99, 0.0, -179.99]])
+    points = np.array([[0.001, 180.0], [0.001, -179.995], [0.0, 179.98], [0.0, 0.0]])
+    within = segments_within(points[:, 0], points[:, 1], crossing, 200.0)
+    assert within.point.tolist() == [0, 1]
+    np.testing.assert_allclose(within.t, [0.5, 0.75], atol=1e-9)
+    np.testing.assert_allclose(within.distance_m, METERS_PER_MILLIDEGREE, rtol=1e-3)
+    assert_matches_reference(points, crossing, 2000.0)
+
+
+def test_points_across_the_antimeridian_from_a_segment():
+    # A segment ending just short of 180 degrees and points just past it.
+    segment = np.array([[10.0, 179.98, 10.0, 179.999]])
+    points = np.array([[10.0, -179.999], [10.0, -179.9]])
+    candidates = segment_candidates(points[:, 0], points[:, 1], segment, 500.0)
+    assert candidates[0].tolist() == [0]
+    nearest = nearest_segments(points[:, 0], points[:, 1], segment, 500.0)
+    assert (nearest.point.tolist(), nearest.t.tolist()) == ([0], [1.0])
+    np.testing.assert_allclose(nearest.distance_m, haversine_m(10.0, -179.999, 10.0, 179.999), rtol=1e-9)
+    assert_matches_reference(points, segment, 500.0)
+
+
+def test_wrap_longitude():
+    np.testing.assert_allclose(wrap_longitude([0.0, 190.0, -190.0, 359.98, -0.02]), [0.0, -170.0, 170.0, -0.02, -0.02],
+                               atol=1e-9)
+
+
+def test_empty_inputs():
+    segments = np.array([[0.0, 0.0, 0.0, 0.01]])
+    assert len(segments_within([], [], segments, 100.0)) == 0
+    assert len(nearest_segments([0.0], [0.0], np.empty((0, 4)))) == 0
+    assert len(nearest_segments([np.nan], [np.nan], segments)) == 0
+    assert len(pair_distances([], [], segments, [])[0]) == 0
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.geohash import decode, encode, encode_many
+from tools.heat_grid import _TYPE_BITS, _TYPE_MASK, UNKNOWN_EVENT_TYPE, HeatGrid
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+
+T0 = 1_700_000_000.0
+HOUR = 3600.0
+KORAMANGALA = (12.9352, 77.6245)
+SILK_BOARD = (12.9172, 77.6228)
+HEBBAL = (13.0358, 77.5970)
+
+
+def incident(at: float, where=KORAMANGALA, event_type="Traffic Anomaly", severity: int = 5) -> dict:
+    return {'unix_timestamp': at, 'event_type': event_type, 'sub_event_type': 'accident',
+            'description': f"incident at {at}", 'severity_score': severity,
+            'latitude': where[0], 'longitude': where[1],
+            'street_name': 'Main Road', 'area_name': 'Somewhere', 'city': 'Bengaluru'}
+
+
+def append(index: IncidentIndex, rows) -> None:
+    with index._lock:
+        index.append_frame(pd.DataFrame(rows))
+
+
+def reference_cells(rows, precision: int, policy: RecencyPolicy, now: float, event_type=None) -> pd.DataFrame:
+    """The grid's heatmap recomputed from scratch with pandas."""
+    df = pd.DataFrame(rows)
+    df['event_type'] = df['event_type'].fillna(UNKNOWN_EVENT_TYPE)
+    if event_type is not None:
+        df = df[df['event_type'] == event_type]
+    df['geohash'] = encode_many(df['latitude'].to_numpy(), df['longitude'].to_numpy(), precision)
+    df['decayed'] = df['severity_score'] * policy.decay(now - df['unix_timestamp'].to_numpy())
+    grouped = df.groupby('geohash').agg(incident_count=('severity_score', 'size'),
+                                        max_severity=('severity_score', 'max'),
+                                        decayed_severity=('decayed', 'sum'))
+    return grouped.reset_index()
+
+
+def assert_matches_reference(grid: HeatGrid, rows, now: float, event_type=None):
+    for precision in grid.precisions:
+        actual = grid.cells(precision, event_type=event_type, now=now)
+        expected = reference_cells(rows, precision, grid.policy, now, event_type)
+        assert actual['geohash'].tolist() == expected['geohash'].tolist()
+        assert actual['incident_count'].tolist() == expected['incident_count'].tolist()
+        np.testing.assert_allclose(actual['max_severity'], expected['max_severity'])
+        np.testing.assert_allclose(actual['decayed_severity'], expected['decayed_severity'], rtol=1e-9)
+
+
+@pytest.fixture
+def policy():
+    return RecencyPolicy(half_life_hours=2)
+
+
+def test_keys_pack_the_cell_above_the_event_type(policy):
+    index = IncidentIndex()
+    append(index, [incident(T0), incident(T0, where=SILK_BOARD, event_type="Civic Issue"),
+                   incident(T0, where=SILK_BOARD, event_type=None)])
+    grid = HeatGrid(index, policy, precisions=(5, 7))
+    grid.sync(T0)
+    for precision in (5, 7):
+        layer = grid.layer(precision)
+        assert np.all(np.diff(layer.keys) > 0)
+        cells = layer.keys >> _TYPE_BITS
+        names = {grid._event_name(slot) for slot in (layer.keys & _TYPE_MASK).tolist()}
+        assert names == {"Traffic Anomaly", "Civic Issue", UNKNOWN_EVENT_TYPE}
+        # Every key of a cell sits at the cell's centre.
+        places = {encode(*KORAMANGALA, precision), encode(*SILK_BOARD, precision)}
+        assert len(np.unique(cells)) == len(places)
+        assert set(encode_many(layer.latitude, layer.longitude, precision).tolist()) == places
+    # Coarse cells are the fine codes shifted right: the same prefix.
+    fine = grid.cells(7, now=T0)['geohash'].tolist()
+    assert grid.cells(5, now=T0)['geohash'].tolist() == sorted({g[:5] for g in fine})
+    with pytest.raises(ValueError):
+        grid.layer(6)
+
+
+def test_incremental_merges_match_a_full_recount(policy):
+    index = IncidentIndex()
+    grid = HeatGrid(index, policy, precisions=(5, 6, 7))
+    rng = np.random.default_rng(7)
+    rows = []
+    for batch in range(4):
+        places = [KORAMANGALA, SILK_BOARD, HEBBAL]
+        new = [incident(T0 + batch * HOUR + i, where=places[int(rng.integers(3))],
+                        event_type=["Traffic Anomaly", "Civic Issue"][int(rng.integers(2))],
+                        severity=int(rng.integers(1, 10)))
+               for i in range(20)]
+        rows += new
+        append(index, new)
+        now = T0 + batch * HOUR + 60
+        grid.sync(now)
+        # Existing keys are updated in place, new ones inserted in order.
+        assert_matches_reference(grid, rows, now)
+    assert_matches_reference(grid, rows, T0 + 10 * HOUR, event_type="Civic Issue")
+    assert grid.cells(7, event_type="Never Seen", now=T0).empty
+
+
+def test_rows_without_place_or_time(policy):
+    index = IncidentIndex()
+    append(index, [incident(T0, severity=4), incident(T0, where=(np.nan, np.nan), severity=9),
+                   incident(np.nan, severity=8)])
+    grid = HeatGrid(index, policy, precisions=(7,))
+    (row,) = grid.cells(7, now=T0).to_dict('records')
+    # Unlocated rows are left out; undated ones counted without a decayed weight.
+    assert (row['incident_count'], row['max_severity'], row['decayed_severity']) == (2, 8.0, pytest.approx(4.0))
+
+
+def test_decayed_sums_survive_a_rebase(policy):
+    index = IncidentIndex()
+    grid = HeatGrid(index, policy, precisions=(6,))
+    rows = [incident(T0, severity=6)]
+    append(index, rows)
+    grid.sync(T0)
+    later = T0 + 2000 * HOUR
+    new = [incident(later - 2 * HOUR, severity=8), incident(later, where=SILK_BOARD, severity=2)]
+    rows += new
+    append(index, new)
+    grid.sync(later)
+    assert grid._reference == later
+    assert np.isfinite(grid.layer(6).weights).all()
+    assert_matches_reference(grid, rows, later)
+
+
+def test_an_index_rebuild_resets_the_grid(policy):
+    index = IncidentIndex()
+    append(index, [incident(T0), incident(T0, where=HEBBAL)])
+    grid = HeatGrid(index, policy, precisions=(7,))
+    grid.sync(T0)
+    with index._lock:
+        index._reset_columns()
+        index.append_frame(pd.DataFrame([incident(T0, where=SILK_BOARD)]))
+    assert grid.cells(7, now=T0)['geohash'].tolist() == [encode(*SILK_BOARD, 7)]
+
+
+def test_route_and_area_scores(policy):
+    index = IncidentIndex()
+    rows = [incident(T0, severity=4), incident(T0 - 2 * HOUR, severity=8, event_type="Civic Issue"),
+            incident(T0, where=HEBBAL, severity=9)]
+    append(index, rows)
+    grid = HeatGrid(index, policy, precisions=(5, 7))
+
+    score = grid.route_score(np.array([KORAMANGALA, SILK_BOARD]), corridor_m=50, now=T0)
+    assert (score.incident_count, score.max_severity) == (2, 8.0)
+    assert score.decayed_severity == pytest.approx(4 + 8 * 0.5)
+    assert score.by_event_type == {"Traffic Anomaly": (1, 4.0, pytest.approx(4.0)),
+                                   "Civic Issue": (1, 8.0, pytest.approx(4.0))}
+    assert grid.route_score(np.empty((0, 2)), now=T0).incident_count == 0
+
+    # Hebbal's cell centre is outside a box around Koramangala.
+    box = (12.90, 77.60, 12.96, 77.65)
+    assert grid.area_score(box, now=T0).incident_count == 2
+    lat, lon = decode(encode(*HEBBAL, 5))
+    assert grid.area_score((lat - 0.01, lon - 0.01, lat + 0.01, lon + 0.01), precision=5, now=T0).max_severity == 9.0
+    assert grid.score_cells([encode(*HEBBAL, 7), encode(*HEBBAL, 7)], now=T0).cells == 1
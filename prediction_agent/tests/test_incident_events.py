@@ -0,0 +1,99 @@
+import sqlite3
+import time
+
+import pytest
+
+from tools.incident_events import IncidentEventSubscriber
+from tools.incident_index import WatchedIncidentIndex
+
+TIMEOUT_SECONDS = 5.0
+
+
+def wait_until(condition, timeout: float = TIMEOUT_SECONDS) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def subscribed(tmp_path, report_store_class, history_frame):
+    store = report_store_class(str(tmp_path / "reports.db"))
+    csv_path = tmp_path / "submission_history.csv"
+    history_frame(100).to_csv(csv_path, index=False)
+    # Not watched, so the test decides when the index reloads.
+    index = WatchedIncidentIndex(str(csv_path))
+    index.refresh()
+    subscriber = IncidentEventSubscriber(index, store.db_path)
+    reads = []
+    read = subscriber._read
+
+    def counted_read(offset):
+        reads.append(offset)
+        return read(offset)
+
+    subscriber._read = counted_read
+    subscriber.start()
+    yield store, csv_path, index, subscriber, reads
+    subscriber.stop()
+
+
+def test_idle_subscriber_stops_reading_after_a_publish(subscribed, make_reports):
+    store, _, index, _, reads = subscribed
+    report = make_reports(1, seed=1)[0]
+    store.save(report['incident_id'], report)
+    assert wait_until(lambda: report['incident_id'] in index.incident_rows)
+
+    # Let the events of the commit itself settle, then nothing may read the log.
+    time.sleep(0.3)
+    settled = len(reads)
+    time.sleep(1.0)
+    assert len(reads) == settled
+    assert len(index) == 101
+
+
+def test_reload_replays_the_log_before_refresh_returns(subscribed, make_reports, history_frame):
+    store, csv_path, index, _, _ = subscribed
+    reports = make_reports(5, seed=2)
+    for report in reports:
+        store.save(report['incident_id'], report)
+    assert wait_until(lambda: len(index) == 105)
+
+    # A shorter history, so the rewrite is always seen as one.
+    history_frame(90).to_csv(csv_path, index=False)
+    generation = index.generation
+    index.refresh()
+    assert index.generation != generation
+    assert {report['incident_id'] for report in reports} <= set(index.incident_rows)
+    assert len(index) == 95
+
+
+def test_startup_fails_when_the_log_path_cannot_be_the_report_store(tmp_path):
+    index = WatchedIncidentIndex(str(tmp_path / "submission_history.csv"))
+    with pytest.raises(FileNotFoundError, match="REPORT_STORE_PATH"):
+        IncidentEventSubscriber(index, str(tmp_path / "missing" / "reports.db")).start()
+    with pytest.raises(IsADirectoryError):
+        IncidentEventSubscriber(index, str(tmp_path)).start()
+    not_a_database = tmp_path / "reports.db"
+    not_a_database.write_text("incident_id,report\n" * 100)
+    with pytest.raises(sqlite3.DatabaseError):
+        IncidentEventSubscriber(index, str(not_a_database)).start()
+
+
+def test_the_subscriber_waits_for_the_ingestion_service_to_create_the_log(tmp_path, report_store_class,
+                                                                          history_frame, make_reports):
+    csv_path = tmp_path / "submission_history.csv"
+    history_frame(10).to_csv(csv_path, index=False)
+    index = WatchedIncidentIndex(str(csv_path))
+    index.refresh()
+    subscriber = IncidentEventSubscriber(index, str(tmp_path / "reports.db"))
+    subscriber.start()
+    try:
+        store = report_store_class(str(tmp_path / "reports.db"))
+        report = make_reports(1, seed=3)[0]
+        store.save(report['incident_id'], report)
+        assert wait_until(lambda: report['incident_id'] in index.incident_rows)
+    finally:
+        subscriber.stop()
@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+from benchmarks.synthetic import make_incidents
+from tools.incident_index import CsvTailReader, WatchedIncidentIndex
+
+TIMEOUT_SECONDS = 5.0
+
+
+def wait_until(condition, timeout: float = TIMEOUT_SECONDS) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def watched_index(tmp_path):
+    path = tmp_path / "submission_history.csv"
+    make_incidents(100).to_csv(path, index=False)
+    index = WatchedIncidentIndex(str(path))
+    index.start()
+    reads = []
+    read_new = index._reader.read_new
+
+    def counted_read_new():
+        reads.append(time.monotonic())
+        return read_new()
+
+    index._reader.read_new = counted_read_new
+    yield index, path, reads
+    index.stop()
+
+
+def test_idle_index_stops_reading_after_an_append(watched_index):
+    index, path, reads = watched_index
+    make_incidents(5, seed=1).to_csv(path, mode='a', header=False, index=False)
+    assert wait_until(lambda: len(index) == 105)
+
+    # Let the events of the append itself settle, then nothing may read the file.
+    time.sleep(0.3)
+    settled = len(reads)
+    time.sleep(1.0)
+    assert len(reads) == settled
+    assert len(index) == 105
+
+
+def test_replacing_the_file_reloads_the_index(watched_index):
+    index, path, _ = watched_index
+    generation = index.generation
+    tmp_path = f"{path}.tmp"
+    make_incidents(40, seed=2).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    assert wait_until(lambda: index.generation != generation and len(index) == 40)
+
+
+def test_tail_reader_rereads_a_file_rewritten_in_place(tmp_path):
+    path = tmp_path / "submission_history.csv"
+    make_incidents(100).to_csv(path, index=False)
+    reader = CsvTailReader(str(path))
+    assert len(reader.read_new()[0]) == 100
+    # Same inode and at least as long, so only the bytes before the offset reveal the rewrite.
+    make_incidents(120, seed=3).to_csv(path, index=False)
+    df, reset = reader.read_new()
+    assert reset
+    assert len(df) == 120
+    assert list(df.columns) == list(make_incidents(1).columns)
@@ -0,0 +1,148 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tools.incident_store as incident_store
+from benchmarks.bigquery_stub import StubBigQueryClient
+from benchmarks.synthetic import make_incidents
+from tools.incident_store import (STORE_COLUMNS, BigQueryIncidentStore, IncidentQuery, SqliteIncidentStore,
+                                  StoreIncidentIndex)
+from tools.recency import get_recency_policy
+
+TABLE = "city-project.city.incidents"
+NOW = 1_750_000_000.0
+# Around Koramangala and Silk Board.
+BBOX = (12.90, 77.60, 12.95, 77.65)
+
+
+@pytest.fixture(params=["sqlite", "bigquery"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteIncidentStore(str(tmp_path / "incidents.db"))
+    return BigQueryIncidentStore(TABLE, client=StubBigQueryClient(TABLE))
+
+
+def incidents(n: int, seed: int = 0, now: float = NOW, days: float = 30, prefix: str = "i") -> pd.DataFrame:
+    df = make_incidents(n, seed=seed, now=now, days=days)
+    df['incident_id'] = [f"{prefix}{i}" for i in range(n)]
+    return df
+
+
+def reference(df: pd.DataFrame, query: IncidentQuery) -> pd.DataFrame:
+    keep = np.ones(len(df), dtype=bool)
+    if query.since is not None:
+        keep &= df['unix_timestamp'] >= query.since
+    if query.until is not None:
+        keep &= df['unix_timestamp'] < query.until
+    if query.inserted_since is not None:
+        keep &= df['inserted_at'] >= query.inserted_since
+    if query.bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = query.bbox
+        keep &= df['latitude'].between(min_lat, max_lat) & df['longitude'].between(min_lon, max_lon)
+    if query.min_severity is not None:
+        keep &= df['severity_score'] >= query.min_severity
+    out = df[keep].sort_values('unix_timestamp', kind='stable')
+    return out.head(query.limit) if query.limit is not None else out
+
+
+@pytest.fixture
+def loaded(store, monkeypatch):
+    # Two batches, the second inserted an hour after the first.
+    first, second = incidents(1500), incidents(500, seed=1, prefix="j")
+    append_at(monkeypatch, store, first, NOW - 3600)
+    append_at(monkeypatch, store, second, NOW)
+    return store
+
+
+def append_at(monkeypatch, store, df: pd.DataFrame, inserted_at: float) -> int:
+    store_frame = incident_store.store_frame
+    with monkeypatch.context() as m:
+        m.setattr(incident_store, "store_frame", lambda frame: store_frame(frame, inserted_at=inserted_at))
+        return store.append(df)
+
+
+QUERIES = {
+    "everything": IncidentQuery(),
+    "since": IncidentQuery(since=NOW - 86400),
+    "until": IncidentQuery(until=NOW - 20 * 86400),
+    "since and until": IncidentQuery(since=NOW - 7 * 86400, until=NOW - 86400),
+    "inserted_since": IncidentQuery(inserted_since=NOW - 60),
+    "bbox": IncidentQuery(bbox=BBOX),
+    "min_severity": IncidentQuery(min_severity=8),
+    "combined": IncidentQuery(since=NOW - 3 * 86400, bbox=BBOX, min_severity=5),
+    "limit": IncidentQuery(limit=10),
+    "limit with predicates": IncidentQuery(since=NOW - 86400, min_severity=3, limit=7),
+    "limit past the end": IncidentQuery(since=NOW - 3600, limit=100_000),
+    "nothing matches": IncidentQuery(since=NOW + 1),
+}
+
+
+@pytest.mark.parametrize("query", QUERIES.values(), ids=QUERIES.keys())
+def test_query_returns_the_matching_rows_oldest_first(loaded, query):
+    everything = loaded.query(IncidentQuery())
+    assert len(everything) == 2000
+
+    got = loaded.query(query)
+    expected = reference(everything, query)
+    assert list(got.columns) == STORE_COLUMNS
+    assert got['incident_id'].tolist() == expected['incident_id'].tolist()
+    assert np.all(np.diff(got['unix_timestamp'].to_numpy()) >= 0)
+
+
+def test_inserted_since_selects_the_later_batch(loaded):
+    got = loaded.query(IncidentQuery(inserted_since=NOW - 60))
+    assert len(got) == 500 and got['incident_id'].str.startswith("j").all()
+
+
+@pytest.mark.parametrize("query", QUERIES.values(), ids=QUERIES.keys())
+def test_predicate_values_are_parameters(store, query):
+    sql, params = store._select(query, "t", lambda name: f"@{name}")
+    for name, value in params.items():
+        assert f"@{name}" in sql
+        assert repr(value) not in sql
+
+
+def test_append_requires_the_index_columns(store):
+    with pytest.raises(ValueError):
+        store.append(incidents(3).drop(columns=['severity_score']))
+
+
+def test_append_assigns_missing_incident_ids(store):
+    df = incidents(3).drop(columns=['incident_id'])
+    assert store.append(df) == 3
+    ids = store.query(IncidentQuery())['incident_id']
+    assert ids.notna().all() and ids.nunique() == 3
+
+
+def test_index_loads_the_recency_window_then_each_insert_once(store, monkeypatch):
+    now = time.time()
+    history = incidents(2000, now=now)
+    append_at(monkeypatch, store, history, now - 3600)
+    index = StoreIncidentIndex(store, poll_seconds=3600)
+    index.refresh()
+    window = history[history['unix_timestamp'] >= now - get_recency_policy().max_window_seconds]
+    assert len(index) == len(window)
+
+    late = incidents(5, seed=9, now=now, days=0.01, prefix="late")
+    store.append(late)
+    assert index.refresh() == 5
+    # The next poll reaches back over the overlap, which still holds these rows.
+    assert index.refresh() == 0
+    assert len(index) == len(window) + 5
+
+
+def test_index_picks_up_rows_committed_late_within_the_overlap(store, monkeypatch):
+    now = time.time()
+    index = StoreIncidentIndex(store, poll_seconds=3600)
+    append_at(monkeypatch, store, incidents(20, now=now, days=1), now)
+    index.refresh()
+    assert len(index) == 20
+
+    # Stamped before the newest row already seen, but inside the sync overlap.
+    late = incidents(3, seed=4, now=now, days=0.01, prefix="late")
+    append_at(monkeypatch, store, late, now - incident_store.INCIDENT_STORE_SYNC_OVERLAP_SECONDS / 2)
+    assert index.refresh() == 3
+    assert index.refresh() == 0
+    assert len(index) == 23
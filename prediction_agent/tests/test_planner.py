@@ -0,0 +1,106 @@
+import time
+
+import pandas as pd
+import pytest
+
+from Agents import planner
+from Agents.planner import AREA_STATUS, HELP_REPLY, OTHER, ROUTE, answer_area_status, has_active_incidents, plan_query
+from tools.gazetteer import Gazetteer
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+
+NOW = time.time()
+
+
+@pytest.fixture(autouse=True)
+def gazetteer(tmp_path, monkeypatch):
+    seed = tmp_path / "gazetteer_seed.csv"
+    seed.write_text("name,latitude,longitude,aliases\n"
+                    "Hoodi,12.9916,77.7161,\nSilk Board,12.9177,77.6238,\nKoramangala,12.9352,77.6245,\n")
+    gazetteer = Gazetteer(str(tmp_path / "cache.db"), str(seed))
+    monkeypatch.setattr(planner, "get_gazetteer", lambda: gazetteer)
+    return gazetteer
+
+
+@pytest.mark.parametrize("query, endpoints, narrative", [
+    ("I have to go from Hoodi to Silk Board", ("Hoodi", "Silk Board"), False),
+    # A bare "X to Y" is a route when the gazetteer knows a place.
+    ("Hoodi to Silk Board", ("Hoodi", "Silk Board"), False),
+    ("Koramangala to Hoodi?", ("Koramangala", "Hoodi"), False),
+    ("between Hoodi and Silk Board, explain why", ("Hoodi", "Silk Board"), True),
+    ("Tell me more about the route from Hoodi to Silk Board", ("Hoodi", "Silk Board"), True),
+    # Routing words without parsable endpoints still go to the route pipeline.
+    ("How do I get to work?", None, False),
+    ("route to Hoodi please", None, False),
+])
+def test_route_queries(query, endpoints, narrative):
+    plan = plan_query(query)
+    assert (plan.intent, plan.endpoints, plan.narrative) == (ROUTE, endpoints, narrative)
+
+
+@pytest.mark.parametrize("query, area", [
+    ("What's happening in Koramangala?", "Koramangala"),
+    ("how is the traffic near Silk Board at 9am", "Silk Board"),
+    ("Any flooding in Hoodi today", "Hoodi"),
+    ("are there any potholes on Outer Ring Road", "Outer Ring Road"),
+    ("status of Outer Ring Road", "Outer Ring Road"),
+])
+def test_area_status_queries(query, area):
+    plan = plan_query(query)
+    assert (plan.intent, plan.area) == (AREA_STATUS, area)
+
+
+@pytest.mark.parametrize("query, reply", [
+    ("hi", "Hello! " + HELP_REPLY),
+    ("Good morning", "Hello! " + HELP_REPLY),
+    ("thanks!", "You're welcome! Have a safe commute."),
+    ("ok bye", "Goodbye! Have a safe commute."),
+    # Anything else falls back to the help text, including "X to Y" between unknown places.
+    ("Mars to Venus", HELP_REPLY),
+    ("what is 2+2", HELP_REPLY),
+    ("", HELP_REPLY),
+])
+def test_other_queries_get_a_canned_reply(query, reply):
+    plan = plan_query(query)
+    assert (plan.intent, plan.reply) == (OTHER, reply)
+
+
+def incident(street: str, area: str, description: str, hours_ago: float, severity: int = 5) -> dict:
+    return {'unix_timestamp': NOW - hours_ago * 3600, 'event_type': 'Traffic Anomaly', 'sub_event_type': 'accident',
+            'description': description, 'severity_score': severity, 'latitude': 12.93, 'longitude': 77.62,
+            'street_name': street, 'area_name': area, 'city': 'Bengaluru'}
+
+
+def test_active_incidents_follow_the_recency_windows():
+    policy = RecencyPolicy(windows_hours={'accident': 6})
+    assert not has_active_incidents(IncidentIndex(), policy, NOW)
+    stale = IncidentIndex.from_frame(pd.DataFrame([incident("80 Feet Road", "Koramangala", "old", hours_ago=12)]))
+    assert not has_active_incidents(stale, policy, NOW)
+    fresh = IncidentIndex.from_frame(pd.DataFrame([incident("80 Feet Road", "Koramangala", "new", hours_ago=1)]))
+    assert has_active_incidents(fresh, policy, NOW)
+
+
+def test_area_status_lists_recent_incidents_most_severe_first():
+    index = IncidentIndex.from_frame(pd.DataFrame([
+        incident("80 Feet Road", "Koramangala", "minor", hours_ago=1, severity=2),
+        incident("Sony World Signal", "Koramangala", "major", hours_ago=1, severity=9),
+        incident("80 Feet Road", "Koramangala", "expired", hours_ago=12),
+        incident("Hosur Road", "Silk Board", "elsewhere", hours_ago=1),
+    ]))
+    policy = RecencyPolicy(windows_hours={'accident': 6}, half_life_hours=None)
+    reply = answer_area_status("Koramangla", index, policy, NOW)
+    assert reply.splitlines() == [
+        "2 recent incidents reported in Koramangla:",
+        "- Traffic Anomaly (accident) on Sony World Signal, Koramangala, severity 9: major",
+        "- Traffic Anomaly (accident) on 80 Feet Road, Koramangala, severity 2: minor",
+    ]
+    assert answer_area_status("Hebbal", index, policy, NOW) == "No recent incidents reported in Hebbal."
+
+
+def test_area_status_truncates_long_lists():
+    index = IncidentIndex.from_frame(pd.DataFrame([
+        incident("80 Feet Road", "Koramangala", f"incident {i}", hours_ago=1) for i in range(8)]))
+    lines = answer_area_status("Koramangala", index, RecencyPolicy(), NOW).splitlines()
+    assert lines[0] == "8 recent incidents reported in Koramangala:"
+    assert len(lines) == 1 + planner.MAX_AREA_INCIDENTS + 1
+    assert lines[-1] == "...and 3 more."
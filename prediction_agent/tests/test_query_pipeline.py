@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import os
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+import app  # noqa: E402
+
+from Agents.agent_runner import record_conversation_turn  # noqa: E402
+from Agents.planner import OTHER, ROUTE, QueryPlan  # noqa: E402
+from Agents.routes import ResolvedRoute, RouteResolutionError  # noqa: E402
+from tools.advisory_cache import AdvisoryCache  # noqa: E402
+from tools.incident_index import IncidentIndex  # noqa: E402
+from tools.recency import RecencyPolicy  # noqa: E402
+from tools.risk_view import RiskView  # noqa: E402
+
+ROUTE_QUERY = "from Hoodi to Silk Board"
+
+
+@pytest.fixture
+def route_plan(monkeypatch):
+    """A route query with an incident somewhere in the city and a resolved route."""
+    monkeypatch.setattr(app, "plan_query", lambda user_input: QueryPlan(ROUTE, endpoints=("Hoodi", "Silk Board")))
+    monkeypatch.setattr(app, "has_active_incidents", lambda: True)
+
+    async def resolve_route(user_input, user_id, session_service, app_name):
+        return ResolvedRoute(locations=["Hoodi Main Road"], geocodes=[(12.99, 77.71), (12.92, 77.62)],
+                             polyline=np.array([[12.99, 77.71], [12.92, 77.62]]))
+
+    monkeypatch.setattr(app, "resolve_route", resolve_route)
+
+
+def run(user_input: str):
+    events = []
+
+    async def collect():
+        async for event in app.run_pipeline(user_input, "user", "session"):
+            events.append(event)
+
+    try:
+        asyncio.run(collect())
+    except HTTPException as e:
+        return events, e
+    return events, None
+
+
+def test_local_replies_stream_a_stage_a_token_and_the_final_response(monkeypatch):
+    monkeypatch.setattr(app, "plan_query", lambda user_input: QueryPlan(OTHER, reply="Hello!"))
+    events, error = run("hi")
+    assert error is None
+    assert events == [("stage", {"stage": "planned", "intent": OTHER}), ("token", {"text": "Hello!"}),
+                      ("final", {"final_output": "Hello!"})]
+
+
+def test_failing_steps_report_their_own_error(monkeypatch, caplog, route_plan):
+    def get_risk_view():
+        raise RuntimeError("risk view unavailable")
+
+    monkeypatch.setattr(app, "get_risk_view", get_risk_view)
+    with caplog.at_level(logging.ERROR, logger="app"):
+        events, error = run(ROUTE_QUERY)
+    assert [payload["stage"] for _, payload in events] == ["planned", "route_resolved"]
+    assert (error.status_code, error.detail) == (500, "Internal server error: risk view unavailable")
+    assert "Unexpected error processing query for session 'session'" in caplog.text
+    assert "CityAnomalyReport" not in caplog.text
+
+
+def test_route_resolution_errors_keep_their_message(monkeypatch, route_plan):
+    async def resolve_route(user_input, user_id, session_service, app_name):
+        raise RouteResolutionError("Could not find both places.")
+
+    monkeypatch.setattr(app, "resolve_route", resolve_route)
+    _, error = run(ROUTE_QUERY)
+    assert (error.status_code, error.detail) == (500, "Could not find both places.")
+
+
+def test_stream_reports_errors_as_an_event(monkeypatch, route_plan):
+    def get_risk_view():
+        raise RuntimeError("risk view unavailable")
+
+    monkeypatch.setattr(app, "get_risk_view", get_risk_view)
+    response = TestClient(app.app).post("/query/stream", json={"user_input": ROUTE_QUERY})
+    blocks = [block for block in response.text.replace("\r\n", "\n").split("\n\n") if block.strip()]
+    events = [dict(line.split(": ", 1) for line in block.splitlines() if ": " in line) for block in blocks]
+    assert [event["event"] for event in events] == ["stage", "stage", "error"]
+    assert json.loads(events[-1]["data"]) == {"status_code": 500, "detail": "Internal server error: risk view unavailable"}
+
+
+@pytest.mark.parametrize("narrative, earlier_turn, cached", [
+    (False, True, True),
+    (True, False, True),
+    # A narrative answer drawing on the conversation is this user's own.
+    (True, True, False),
+])
+def test_only_advisories_without_conversation_context_are_cached(monkeypatch, route_plan, narrative, earlier_turn,
+                                                                 cached):
+    plan = QueryPlan(ROUTE, endpoints=("Hoodi", "Silk Board"), narrative=narrative)
+    monkeypatch.setattr(app, "plan_query", lambda user_input: plan)
+    monkeypatch.setattr(app, "get_risk_view", lambda: RiskView(IncidentIndex(), RecencyPolicy()))
+    advisory_cache = AdvisoryCache(f"test-pipeline-{narrative}-{earlier_turn}")
+    monkeypatch.setattr(app, "get_advisory_cache", lambda: advisory_cache)
+    monkeypatch.setattr(app, "find_location_anomaly_match", lambda locations: [])
+    monkeypatch.setattr(app, "find_route_corridor_matches", lambda polyline: [])
+    monkeypatch.setattr(app, "session_service", app.get_session_service())
+    if earlier_turn:
+        asyncio.run(record_conversation_turn(app.session_service, app.APP_NAME, "user", "session",
+                                             "hi", "Hello!"))
+
+    events, error = run(ROUTE_QUERY)
+    assert error is None
+    assert events[-1][1]["final_output"] == app.NO_ANOMALY
+    assert (advisory_cache.snapshot()["entries"] == 1) == cached
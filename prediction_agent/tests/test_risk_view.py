@@ -0,0 +1,146 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.geohash import encode_many
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+from tools.risk_view import RiskView, compute_cell_risk, corridor_cells
+
+T0 = 1_700_000_000.0
+HOUR = 3600.0
+# Two spots about 1 km apart, in different precision-7 cells.
+KORAMANGALA = (12.9352, 77.6245)
+SILK_BOARD = (12.9172, 77.6228)
+
+
+def incident(at: float, where=KORAMANGALA, severity: int = 5, sub_event_type: str = "accident") -> dict:
+    return {'unix_timestamp': at, 'event_type': 'Traffic Anomaly', 'sub_event_type': sub_event_type,
+            'description': f"{sub_event_type} at {at}", 'severity_score': severity,
+            'latitude': where[0], 'longitude': where[1],
+            'street_name': '80 Feet Road', 'area_name': 'Koramangala', 'city': 'Bengaluru'}
+
+
+def append(index: IncidentIndex, *rows: dict) -> None:
+    with index._lock:
+        index.append_frame(pd.DataFrame(list(rows)))
+
+
+def cell(where) -> str:
+    return encode_many(np.array([where[0]]), np.array([where[1]]), 7).tolist()[0]
+
+
+def assert_matches_reference(view: RiskView, now: float):
+    expected = compute_cell_risk(view.index, view.policy, now, view.precision)
+    actual = view.snapshot(now)
+    assert actual.keys() == expected.keys()
+    for key, (count, maximum, decayed) in expected.items():
+        assert actual[key][:2] == (count, maximum)
+        assert actual[key][2] == pytest.approx(decayed, rel=1e-9)
+
+
+@pytest.fixture
+def policy():
+    # Accidents stay relevant for 6 hours and potholes for 10 days; severity halves every 2 hours.
+    return RecencyPolicy(windows_hours={'accident': 6, 'pothole': 240}, default_window_hours=24, half_life_hours=2)
+
+
+@pytest.fixture
+def view(policy):
+    index = IncidentIndex()
+    append(index, incident(T0 - 5 * HOUR), incident(T0 - HOUR, severity=9), incident(T0 - 100 * HOUR),
+           incident(T0 - 2 * HOUR, where=SILK_BOARD, sub_event_type="pothole", severity=3))
+    view = RiskView(index, policy)
+    view.sync(T0)
+    return view
+
+
+def test_initial_sync_matches_the_reference(view):
+    assert len(view) == 3
+    assert_matches_reference(view, T0)
+    assert view.cell_risk(cell(KORAMANGALA), T0)[:2] == (2, 9.0)
+
+
+def test_appended_rows_are_added_incrementally(view):
+    changed = []
+    view.add_cell_listener(changed.append)
+    append(view.index, incident(T0 + HOUR, where=SILK_BOARD, severity=7))
+    view.sync(T0 + HOUR)
+    assert changed == [{cell(SILK_BOARD)}]
+    assert view.cell_risk(cell(SILK_BOARD), T0 + HOUR)[:2] == (2, 7.0)
+    assert_matches_reference(view, T0 + HOUR)
+
+
+def test_rows_expire_when_their_window_closes(view):
+    changed = []
+    view.add_cell_listener(changed.append)
+    # The accident from five hours before T0 leaves after one more hour; the severity-9 one stays.
+    view.sync(T0 + 1.5 * HOUR)
+    assert changed == [{cell(KORAMANGALA)}]
+    assert view.cell_risk(cell(KORAMANGALA), T0 + 1.5 * HOUR)[:2] == (1, 9.0)
+    assert_matches_reference(view, T0 + 1.5 * HOUR)
+
+    # When the maximum leaves, the cell's maximum is recomputed; when the last row leaves, the cell goes.
+    append(view.index, incident(T0 + 2 * HOUR, severity=4))
+    view.sync(T0 + 5.5 * HOUR)
+    assert view.cell_risk(cell(KORAMANGALA), T0 + 5.5 * HOUR)[:2] == (1, 4.0)
+    view.sync(T0 + 9 * HOUR)
+    assert cell(KORAMANGALA) not in view.snapshot(T0 + 9 * HOUR)
+    assert_matches_reference(view, T0 + 9 * HOUR)
+    # The pothole is still inside its ten-day window.
+    assert view.cell_risk(cell(SILK_BOARD), T0 + 9 * HOUR)[:2] == (1, 3.0)
+
+
+def test_syncing_without_changes_notifies_nobody(view):
+    changed = []
+    view.add_cell_listener(changed.append)
+    view.sync(T0 + 60)
+    assert changed == []
+
+
+def test_decayed_sums_survive_a_rebase(policy):
+    # Over 512 half-lives after the view's reference time, weights are rebased rather than overflowing.
+    index = IncidentIndex()
+    view = RiskView(index, policy)
+    view.sync(T0)
+    later = T0 + 2000 * HOUR
+    append(index, incident(later - HOUR, severity=8), incident(later, severity=2))
+    view.sync(later)
+    assert view._reference == later
+    count, maximum, decayed = view.cell_risk(cell(KORAMANGALA), later)
+    assert (count, maximum) == (2, 8.0)
+    assert math.isfinite(decayed)
+    assert decayed == pytest.approx(8 * 2 ** -0.5 + 2)
+    assert_matches_reference(view, later)
+
+
+def test_an_index_rebuild_resets_the_view(view):
+    changed = []
+    view.add_cell_listener(changed.append)
+    with view.index._lock:
+        view.index._reset_columns()
+        view.index.append_frame(pd.DataFrame([incident(T0, where=SILK_BOARD)]))
+    view.sync(T0)
+    assert changed == [{cell(KORAMANGALA), cell(SILK_BOARD)}]
+    assert len(view) == 1
+    assert_matches_reference(view, T0)
+
+
+def test_corridor_cells_cover_the_route_and_not_beyond():
+    route = np.array([KORAMANGALA, (12.9300, 77.6240)])
+    cells = corridor_cells(route, corridor_m=50, precision=7)
+    assert cell(KORAMANGALA) in cells
+    assert cell((12.9326, 77.6242)) in cells      # between the vertices
+    assert cell(SILK_BOARD) not in cells
+    assert corridor_cells(np.empty((0, 2))) == []
+    assert corridor_cells(np.array([[np.nan, np.nan]])) == []
+
+
+def test_route_risk_aggregates_the_corridor_cells(view):
+    risk = view.route_risk(np.array([KORAMANGALA]), corridor_m=10, now=T0)
+    assert (risk.incident_count, risk.max_severity) == (2, 9.0)
+    assert risk.decayed_severity == pytest.approx(view.cell_risk(cell(KORAMANGALA), T0)[2])
+    assert sorted(risk.row_ids.tolist()) == sorted(view._cell_rows[cell(KORAMANGALA)])
+    assert view.route_risk(np.array([(13.1, 77.5)]), corridor_m=10, now=T0).incident_count == 0
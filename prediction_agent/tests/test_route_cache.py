@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from Agents import routes
+from Agents.routes import ResolvedRoute, parse_route_query, route_cache_key
+from tools.cache import TTLCache
+
+
+@pytest.mark.parametrize("query, endpoints", [
+    ("How do I get from Hoodi to Silk Board Jn. at 9am tomorrow?", ("Hoodi", "Silk Board Jn")),
+    ("  from   Hoodi   to   Silk   Board  ", ("Hoodi", "Silk Board")),
+    ("Between Hoodi and Silk Board", ("Hoodi", "Silk Board")),
+    ("Hoodi to Silk Board", ("Hoodi", "Silk Board")),
+    ("between Hoodi and Silk Board, explain why", ("Hoodi", "Silk Board")),
+    ("from Hoodi to Koramangala, Bengaluru; any delays?", ("Hoodi", "Koramangala")),
+])
+def test_route_queries_yield_their_endpoints(query, endpoints):
+    assert parse_route_query(query) == endpoints
+
+
+@pytest.mark.parametrize("query", [
+    "from Hoodi to Silk Board via ORR",
+    "I want to go to Silk Board",
+    "route to Hoodi please",
+    "directions to Silk Board",
+    "what is the weather",
+])
+def test_ambiguous_queries_are_not_keyed(query):
+    assert parse_route_query(query) is None
+
+
+def test_spellings_of_the_same_route_share_a_key():
+    keys = {route_cache_key(*parse_route_query(query)) for query in [
+        "How do I get from Hoodi to Silk Board Jn. at 9am tomorrow?",
+        "from hoodi to silk board junction",
+        "From HOODI to Silk Board Junction, now",
+    ]}
+    assert len(keys) == 1
+
+
+def test_direction_matters():
+    assert route_cache_key("Hoodi", "Silk Board") != route_cache_key("Silk Board", "Hoodi")
+
+
+def test_unnormalisable_endpoints_fall_back_to_lower_case():
+    assert route_cache_key(" Bengaluru ", "Hoodi") == "bengaluru->hudi"
+
+
+def test_time_buckets_split_the_day(monkeypatch):
+    monkeypatch.setattr(routes, "ROUTE_CACHE_TIME_BUCKET_HOURS", 6)
+    at_hour = {hour: time.mktime((2024, 1, 1, hour, 30, 0, 0, 0, -1)) for hour in (1, 5, 6)}
+    assert route_cache_key("Hoodi", "Silk Board", now=at_hour[1]) == route_cache_key("Hoodi", "Silk Board", now=at_hour[5])
+    assert route_cache_key("Hoodi", "Silk Board", now=at_hour[5]) != route_cache_key("Hoodi", "Silk Board", now=at_hour[6])
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """The route pipeline replaced by a recorder returning the queued routes in turn."""
+    monkeypatch.setattr(routes, "_route_cache", TTLCache("test-routes", ttl_seconds=60))
+    calls, results = [], []
+
+    async def run_route_pipeline(user_input, user_id, session_service, app_name, endpoints=None):
+        calls.append((user_input, endpoints))
+        return results.pop(0)
+
+    monkeypatch.setattr(routes, "run_route_pipeline", run_route_pipeline)
+    return calls, results
+
+
+COMPLETE = ResolvedRoute(locations=["Hoodi Main Road", "Outer Ring Road"], geocodes=[(12.99, 77.71), (12.92, 77.62)],
+                         polyline=np.array([[12.99, 77.71], [12.95, 77.70], [12.92, 77.62]]))
+
+
+def resolve(query: str) -> ResolvedRoute:
+    return asyncio.run(routes.resolve_route(query, "user", None, "app"))
+
+
+def test_complete_routes_are_served_from_the_cache(pipeline):
+    calls, results = pipeline
+    results.append(COMPLETE)
+    assert not resolve("from Hoodi to Silk Board Jn").cached
+    route = resolve("How do I get from hoodi to silk board junction?")
+    assert route.cached
+    assert route.locations == COMPLETE.locations
+    np.testing.assert_allclose(route.polyline, COMPLETE.polyline)
+    assert calls == [("from Hoodi to Silk Board Jn", ("Hoodi", "Silk Board Jn"))]
+
+
+def test_incomplete_routes_are_resolved_again(pipeline):
+    calls, results = pipeline
+    results.extend([ResolvedRoute(locations=["Hoodi Main Road"]), COMPLETE])
+    assert resolve("from Hoodi to Silk Board").locations == ["Hoodi Main Road"]
+    assert not resolve("from Hoodi to Silk Board").cached
+    assert len(calls) == 2
+
+
+def test_unkeyed_queries_bypass_the_cache(pipeline):
+    calls, results = pipeline
+    results.extend([COMPLETE, COMPLETE])
+    resolve("from Hoodi to Silk Board via ORR")
+    assert not resolve("from Hoodi to Silk Board via ORR").cached
+    assert calls == [("from Hoodi to Silk Board via ORR", None)] * 2
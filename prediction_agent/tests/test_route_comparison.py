@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.corridor_matcher import CorridorMatcher
+from tools.disruption_model import CLEAR, RAIN, UNKNOWN, Prediction
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+from tools.route_comparison import RouteScore, describe_comparison, rank_routes, route_matches, score_routes
+
+T0 = 1_700_000_000.0
+HOUR = 3600.0
+# Two parallel routes about 11 km apart, both heading north.
+WEST = np.array([[12.90, 77.60], [12.95, 77.60]])
+EAST = np.array([[12.90, 77.70], [12.95, 77.70]])
+NOWHERE = np.array([[13.20, 77.40], [13.25, 77.40]])
+
+
+def incident(where, sub_event_type: str, severity: int, hours_ago: float = 0.0) -> dict:
+    return {'unix_timestamp': T0 - hours_ago * HOUR, 'event_type': 'Traffic Anomaly',
+            'sub_event_type': sub_event_type, 'description': f"{sub_event_type} reported",
+            'severity_score': severity, 'latitude': where[0], 'longitude': where[1],
+            'street_name': 'Main Road', 'area_name': 'Somewhere', 'city': 'Bengaluru'}
+
+
+class FixedPredictor:
+    """Persistence probabilities per (sub-event type, weather), counting the lookups."""
+
+    def __init__(self, probabilities: dict):
+        self.probabilities = probabilities
+        self.calls = []
+
+    def predict(self, event_type, sub_event_type, weather=UNKNOWN) -> Prediction:
+        self.calls.append((event_type, sub_event_type, weather))
+        p = self.probabilities[(sub_event_type, weather)]
+        return Prediction(event_type, sub_event_type, weather, 2.0, p, 0.0, 100, True)
+
+
+@pytest.fixture
+def matcher():
+    index = IncidentIndex.from_frame(pd.DataFrame([
+        incident((12.94, 77.6001), 'accident', 8),              # 0: west, near the end
+        incident((12.91, 77.5999), 'pothole', 4, hours_ago=1),  # 1: west, near the start
+        incident((12.93, 77.60), 'accident', 9, hours_ago=10),  # 2: west, past its window
+        incident((12.92, 77.70), 'pothole', 6),                 # 3: east
+        incident((12.92, 77.65), 'accident', 7),                # 4: between the routes
+    ]))
+    return CorridorMatcher(index)
+
+
+@pytest.fixture
+def policy():
+    # No decay, so decayed severities are plain sums.
+    return RecencyPolicy(windows_hours={'accident': 6, 'pothole': 240}, half_life_hours=None)
+
+
+def test_route_matches_are_active_and_in_route_order(matcher, policy):
+    west, east, nowhere = route_matches([WEST, EAST, NOWHERE], matcher, policy, corridor_m=50, now=T0)
+    assert west.tolist() == [1, 0]
+    assert east.tolist() == [3]
+    assert nowhere.tolist() == []
+    assert route_matches([], matcher, policy, now=T0) == []
+
+
+def test_scores_weigh_severity_by_persistence(matcher, policy):
+    predictor = FixedPredictor({('accident', CLEAR): 0.9, ('pothole', CLEAR): 0.25, ('pothole', RAIN): 0.5})
+    route_rows = route_matches([WEST, EAST, NOWHERE], matcher, policy, corridor_m=50, now=T0)
+    west, east, nowhere = score_routes(route_rows, [CLEAR, RAIN, CLEAR], matcher, policy, predictor, now=T0)
+
+    assert (west.incident_count, west.max_severity, west.decayed_severity) == (2, 8.0, 12.0)
+    assert west.expected_disruption == pytest.approx(4 * 0.25 + 8 * 0.9)
+    assert (east.incident_count, east.max_severity, east.expected_disruption) == (1, 6.0, pytest.approx(6 * 0.5))
+    assert (nowhere.incident_count, nowhere.max_severity, nowhere.expected_disruption) == (0, 0.0, 0.0)
+    assert [score.route for score in (west, east, nowhere)] == [0, 1, 2]
+    # One prediction per distinct (event type, sub-event type, weather), whatever the number of incidents.
+    assert sorted(predictor.calls) == [('Traffic Anomaly', 'accident', CLEAR), ('Traffic Anomaly', 'pothole', CLEAR),
+                                       ('Traffic Anomaly', 'pothole', RAIN)]
+
+
+def test_scores_decay_with_age(matcher):
+    policy = RecencyPolicy(windows_hours={'accident': 6, 'pothole': 240}, half_life_hours=1)
+    predictor = FixedPredictor({('accident', UNKNOWN): 1.0, ('pothole', UNKNOWN): 1.0})
+    # Unknown or missing weather is scored as unknown.
+    (west,) = score_routes([np.array([0, 1])], ["hail"], matcher, policy, predictor, now=T0)
+    assert west.decayed_severity == pytest.approx(8 + 4 * 0.5)
+    assert west.expected_disruption == pytest.approx(west.decayed_severity)
+    assert score_routes([], None, matcher, policy, predictor, now=T0) == []
+
+
+def score(route: int, expected: float, decayed: float) -> RouteScore:
+    return RouteScore(route, 1, 5.0, decayed, expected, np.empty(0, dtype=np.int64))
+
+
+def test_ranking_breaks_ties_by_severity_then_duration():
+    scores = [score(0, 3.0, 5.0), score(1, 1.0, 9.0), score(2, 1.0, 4.0), score(3, 0.0, 0.0), score(4, 0.0, 0.0)]
+    ranked = rank_routes(scores, durations_s=[600, 600, 600, 1500, 1200])
+    assert [s.route for s in ranked] == [4, 3, 2, 1, 0]
+    assert [s.route for s in rank_routes(scores)] == [3, 4, 2, 1, 0]
+
+
+def test_describe_comparison():
+    routes = [
+        {"route": 1, "summary": "Outer Ring Rd", "duration_min": 32.4, "incident_count": 0, "expected_disruption": 0.0},
+        {"route": 0, "summary": "", "duration_min": 28.0, "incident_count": 1, "expected_disruption": 3.3},
+        {"route": 2, "summary": "Hosur Rd", "duration_min": 41.0, "incident_count": 3, "expected_disruption": 8.2},
+    ]
+    assert describe_comparison(routes).splitlines() == [
+        "Safest: via Outer Ring Rd (32 min, 0 active incidents)",
+        "2. Route 1 (28 min, 1 active incident, expected disruption 3.3)",
+        "3. via Hosur Rd (41 min, 3 active incidents, expected disruption 8.2)",
+    ]
+    assert describe_comparison([]) == "No route found."
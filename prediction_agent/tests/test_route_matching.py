@@ -0,0 +1,60 @@
+import inspect
+import time
+
+import numpy as np
+import pandas as pd
+
+from tools.corridor_matcher import CorridorMatcher
+from tools.get_data_from_big_query import find_location_anomaly_match, find_route_corridor_matches
+from tools.incident_index import IncidentIndex
+from tools.recency import RecencyPolicy
+
+NOW = time.time()
+# A straight north-south route along longitude 77.6, about 2.2 km long.
+POLYLINE = np.array([[12.95, 77.6], [12.96, 77.6], [12.97, 77.6]])
+METRES_PER_DEGREE = 111_195.0
+
+
+def incident(street: str, latitude: float, longitude: float, description: str, hours_ago: float = 1.0) -> dict:
+    return {
+        'unix_timestamp': NOW - hours_ago * 3600, 'event_type': 'Traffic Anomaly', 'sub_event_type': 'accident',
+        'description': description, 'severity_score': 5, 'latitude': latitude, 'longitude': longitude,
+        'street_name': street, 'area_name': 'Koramangala', 'city': 'Bengaluru',
+    }
+
+
+def make_index(rows: list) -> IncidentIndex:
+    return IncidentIndex.from_frame(pd.DataFrame(rows))
+
+
+def test_matchers_are_plain_functions():
+    # They are CPU-bound and run in worker threads; a coroutine would block the event loop.
+    assert not inspect.iscoroutinefunction(find_location_anomaly_match)
+    assert not inspect.iscoroutinefunction(find_route_corridor_matches)
+
+
+def test_corridor_match_keeps_nearby_incidents_in_route_order():
+    offset = 50 / (METRES_PER_DEGREE * np.cos(np.radians(12.96)))
+    index = make_index([
+        incident("Hosur Road", 12.968, 77.6 + offset, "near the end"),
+        incident("Hosur Road", 12.952, 77.6 - offset, "near the start"),
+        incident("Hosur Road", 12.96, 77.62, "two kilometres away"),
+    ])
+    matches = find_route_corridor_matches(POLYLINE, corridor_m=100, matcher=CorridorMatcher(index),
+                                          policy=RecencyPolicy(), now=NOW)
+    assert [match[5] for match in matches] == ["near the start", "near the end"]
+
+
+def test_corridor_match_drops_incidents_outside_their_recency_window():
+    index = make_index([
+        incident("Hosur Road", 12.96, 77.6, "fresh", hours_ago=1),
+        incident("Hosur Road", 12.96, 77.6, "stale", hours_ago=24 * 400),
+    ])
+    matches = find_route_corridor_matches(POLYLINE, corridor_m=100, matcher=CorridorMatcher(index),
+                                          policy=RecencyPolicy(), now=NOW)
+    assert [match[5] for match in matches] == ["fresh"]
+
+
+def test_location_match_on_an_empty_index_or_no_locations():
+    assert find_location_anomaly_match([], make_index([incident("Hosur Road", 12.96, 77.6, "x")])) == []
+    assert find_location_anomaly_match(["Hosur Road"], IncidentIndex()) == []
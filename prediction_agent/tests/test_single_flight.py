@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from tools.single_flight import SingleFlight, get_single_flight
+
+
+def computation(events, calls: list, started: asyncio.Event = None, release: asyncio.Event = None,
+                error: Exception = None):
+    """A computation yielding `events`, pausing after the first until `release` is set."""
+
+    async def compute():
+        calls.append(len(calls))
+        for i, event in enumerate(events):
+            yield event
+            if i == 0 and release is not None:
+                started.set()
+                await release.wait()
+        if error is not None:
+            raise error
+
+    return compute
+
+
+async def collect(group: SingleFlight, key: str, compute):
+    return [event async for event in group.run(key, compute)]
+
+
+def test_concurrent_waiters_share_one_computation():
+    group = SingleFlight("test-shared")
+    events = [("stage", {"stage": "planned"}), ("token", {"text": "Clear"}), ("final", {"final_output": "Clear"})]
+    calls = []
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+        compute = computation(events, calls, started, release)
+        leader = asyncio.create_task(collect(group, "route", compute))
+        await started.wait()
+        # A follower joining mid-way first gets the events published so far.
+        followers = [asyncio.create_task(collect(group, "route", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(leader, *followers)
+
+    results = asyncio.run(run())
+    assert calls == [0]
+    assert results == [events] * 4
+    assert group.snapshot() == {"in_flight": 0, "computations": 1, "coalesced": 3, "coalescing_ratio": 0.75}
+
+
+def test_every_waiter_sees_the_leaders_error():
+    group = SingleFlight("test-error")
+    calls = []
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+        compute = computation([("stage", {"stage": "planned"})], calls, started, release,
+                              error=RuntimeError("directions unavailable"))
+
+        async def wait(key):
+            events = []
+            with pytest.raises(RuntimeError, match="directions unavailable") as raised:
+                async for event in group.run(key, compute):
+                    events.append(event)
+            return events, raised.value
+
+        leader = asyncio.create_task(wait("route"))
+        await started.wait()
+        follower = asyncio.create_task(wait("route"))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(leader, follower)
+
+    (leader_events, leader_error), (follower_events, follower_error) = asyncio.run(run())
+    assert calls == [0]
+    assert leader_events == follower_events == [("stage", {"stage": "planned"})]
+    assert follower_error is leader_error
+
+
+def test_keys_are_computed_separately_and_not_after_completion():
+    group = SingleFlight("test-keys")
+    calls = []
+    compute = computation([("final", {"final_output": "ok"})], calls)
+
+    async def run():
+        await asyncio.gather(collect(group, "a", compute), collect(group, "b", compute))
+        # The flight is gone once its computation finished; the next request starts another.
+        await collect(group, "a", compute)
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert group.snapshot()["in_flight"] == 0
+
+
+def test_the_computation_outlives_its_waiters():
+    group = SingleFlight("test-cancel")
+    calls, finished = [], []
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def compute():
+            async for event in computation([("stage", {}), ("final", {})], calls, started, release)():
+                yield event
+            finished.append(True)
+
+        waiter = asyncio.create_task(collect(group, "route", compute))
+        await started.wait()
+        waiter.cancel()
+        release.set()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert finished == [True]
+
+
+def test_groups_are_shared_by_name():
+    assert get_single_flight("test-named") is get_single_flight("test-named")
+    assert get_single_flight("test-named") is not get_single_flight("test-other")
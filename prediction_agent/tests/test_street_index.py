@@ -0,0 +1,104 @@
+import math
+import time
+
+import pandas as pd
+import pytest
+
+from tools.incident_index import IncidentIndex
+from tools.street_index import PlaceNameIndex, normalize_place_name
+
+STREETS = ["Hoodi Main Road", "Varthur Road", "Outer Ring Road", "5th Cross Road", "6th Cross Road",
+           "Sarjapur Road", "Whitefield Main Road"]
+
+
+@pytest.fixture
+def place_names():
+    index = PlaceNameIndex()
+    for street in STREETS:
+        index.add(normalize_place_name(street))
+    return index
+
+
+def best(index: PlaceNameIndex, name: str):
+    hits = index.lookup_many([name])[0]
+    return (index.keys[hits[0][0]], hits[0][1]) if hits else None
+
+
+@pytest.mark.parametrize("variants", [
+    ["Outer Ring Rd", "ORR", "outer ring road", "Outer  Ring Road."],
+    ["Hoodi Main Road", "Hudi Mn Rd"],
+    ["Bellandur", "Bellanduru"],
+    ["Marathahalli", "Marathahally"],
+    ["MG Road", "near MG Road, Bengaluru 560001"],
+    ["Cafe Road", "Café Road"],
+])
+def test_spelling_variants_share_a_key(variants):
+    assert len({normalize_place_name(name) for name in variants}) == 1
+
+
+@pytest.mark.parametrize("name", [None, math.nan, "", "  ", "Bengaluru", "560001"])
+def test_names_without_place_tokens_have_no_key(name):
+    assert normalize_place_name(name) is None
+
+
+def test_adding_a_key_twice_keeps_one_id(place_names):
+    assert place_names.add(normalize_place_name("Hoodi Main Road")) == 0
+    assert len(place_names) == len(STREETS)
+
+
+def test_exact_normalised_match_scores_one(place_names):
+    assert best(place_names, "ORR") == (normalize_place_name("Outer Ring Road"), 1.0)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Hoody Main Rd", "Hoodi Main Road"),
+    ("Sarjapura Road", "Sarjapur Road"),
+    ("Sarjpur Road", "Sarjapur Road"),
+    # The distinctive token outweighs the missing "main".
+    ("Hoodi Road", "Hoodi Main Road"),
+])
+def test_typos_and_missing_tokens_still_match(place_names, query, expected):
+    key, score = best(place_names, query)
+    assert key == normalize_place_name(expected)
+    assert place_names.min_score <= score < 1.0
+
+
+@pytest.mark.parametrize("query", ["Road", "Totally Unknown Place"])
+def test_common_or_unknown_names_do_not_match(place_names, query):
+    assert place_names.lookup_many([query]) == [[]]
+
+
+def test_numbered_tokens_only_match_exactly(place_names):
+    hits = place_names.lookup_many(["6th Cross Road"])[0]
+    assert [place_names.keys[key_id] for key_id, _ in hits][0] == normalize_place_name("6th Cross Road")
+    assert hits[0][1] == 1.0 and hits[1][1] < 1.0
+    # "7th" matches neither numbered street better than the other.
+    scores = [score for _, score in place_names.lookup_many(["7th Cross Road"])[0]]
+    assert len(scores) == 2 and scores[0] == scores[1] < 1.0
+
+
+def test_lookup_respects_the_limit_and_batch_order(place_names):
+    results = place_names.lookup_many(["Varthur Road", "Hoodi Main Road", "nowhere"], limit=1)
+    assert [[place_names.keys[key_id] for key_id, _ in hits] for hits in results] == [
+        [normalize_place_name("Varthur Road")], [normalize_place_name("Hoodi Main Road")], []]
+
+
+def test_empty_index_matches_nothing():
+    assert PlaceNameIndex().lookup_many(["Hoodi", "ORR"]) == [[], []]
+
+
+def test_incident_index_matches_street_variants():
+    now = time.time()
+    rows = [
+        {'unix_timestamp': now - 60, 'event_type': 'Traffic Anomaly', 'sub_event_type': 'accident',
+         'description': description, 'severity_score': 5, 'latitude': 12.95, 'longitude': 77.7,
+         'street_name': street, 'area_name': area, 'city': 'Bengaluru'}
+        for street, area, description in [("Outer Ring Road", "Marathahalli", "on the ORR"),
+                                           ("Varthur Road", "Marathahalli", "on Varthur Road"),
+                                           ("Hosur Road", "Silk Board", "at Silk Board")]
+    ]
+    index = IncidentIndex.from_frame(pd.DataFrame(rows))
+    assert [match[5] for match in index.match_streets(["Outer Ring Rd"])] == ["on the ORR"]
+    # Area names are indexed too.
+    assert {match[5] for match in index.match_streets(["Marathahally"])} == {"on the ORR", "on Varthur Road"}
+    assert index.match_streets(["Nowhere Lane"]) == []
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from opentelemetry import trace
+from opentelemetry.propagate import inject
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
+
+from tools import tracing
+from tools.critical_path import critical_path, load_spans
+from tools.tracing import TracingMiddleware, get_tracer, setup_tracing
+
+
+@pytest.fixture
+def exporter():
+    return InMemorySpanExporter()
+
+
+@pytest.fixture
+def client(exporter):
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    app = FastAPI()
+
+    @app.get("/work")
+    def work():
+        with get_tracer(provider).start_as_current_span("step"):
+            return {"ok": True}
+
+    @app.get("/fail")
+    def fail():
+        raise HTTPException(status_code=503, detail="unavailable")
+
+    app.add_middleware(TracingMiddleware, tracer_provider=provider)
+    return TestClient(app), provider
+
+
+def spans_by_name(exporter: InMemorySpanExporter) -> dict:
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
+def test_requests_continue_the_callers_trace(client, exporter):
+    client, provider = client
+    # The caller's span, carried in its traceparent header.
+    with get_tracer(provider).start_as_current_span("caller") as caller:
+        headers = {}
+        inject(headers)
+    assert headers["traceparent"].startswith("00-")
+    assert client.get("/work", headers=headers).status_code == 200
+
+    spans = spans_by_name(exporter)
+    server, step = spans["GET /work"], spans["step"]
+    assert server.kind == SpanKind.SERVER
+    assert server.context.trace_id == step.context.trace_id == caller.get_span_context().trace_id
+    assert server.parent.span_id == caller.get_span_context().span_id
+    assert step.parent.span_id == server.context.span_id
+    assert (server.attributes["http.method"], server.attributes["http.status_code"]) == ("GET", 200)
+
+
+def test_requests_without_a_traceparent_start_a_trace(client, exporter):
+    client, _ = client
+    client.get("/work")
+    server = spans_by_name(exporter)["GET /work"]
+    assert server.parent is None
+    assert spans_by_name(exporter)["step"].context.trace_id == server.context.trace_id
+
+
+def test_server_errors_mark_the_span(client, exporter):
+    client, _ = client
+    assert client.get("/fail").status_code == 503
+    server = spans_by_name(exporter)["GET /fail"]
+    assert (server.attributes["http.status_code"], server.status.status_code) == (503, StatusCode.ERROR)
+
+
+def test_file_exporter_writes_batched_spans_on_shutdown(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "file")
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+    installed = []
+    monkeypatch.setattr(trace, "set_tracer_provider", installed.append)
+
+    provider = setup_tracing("test_service")
+    assert installed == [provider]
+    with get_tracer(provider).start_as_current_span("outer"):
+        with get_tracer(provider).start_as_current_span("inner"):
+            pass
+    # Nothing is written until the batch is flushed.
+    assert path.read_text(encoding="utf-8") == ""
+    provider.shutdown()
+
+    spans = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [span["name"] for span in spans] == ["inner", "outer"]
+    assert spans[0]["parent_id"] == spans[1]["context"]["span_id"]
+    assert {span["resource"]["attributes"]["service.name"] for span in spans} == {"test_service"}
+
+
+@pytest.mark.parametrize("exporter_name", ["none", "unknown"])
+def test_tracing_can_be_disabled(monkeypatch, exporter_name):
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", exporter_name)
+    assert setup_tracing("test_service") is None
+
+
+def test_critical_path_follows_the_child_that_finished_last(tmp_path):
+    def span(name, span_id, parent_id, start, end):
+        return json.dumps({"name": name, "context": {"trace_id": "t1", "span_id": span_id}, "parent_id": parent_id,
+                           "start_time": f"2026-01-01T00:00:{start:02d}Z", "end_time": f"2026-01-01T00:00:{end:02d}Z",
+                           "resource": {"attributes": {"service.name": "svc"}}})
+
+    # Spans of one trace from two components' files: the request, two steps and a call in the later one.
+    first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    first.write_text("\n".join([span("POST /query", "r", None, 0, 10), span("match", "m", "r", 1, 4)]) + "\n")
+    second.write_text("\n".join([span("enrich", "e", "r", 2, 9), span("model", "c", "e", 3, 8)]) + "\n")
+    traces = load_spans([str(first), str(second)])
+    assert [s["name"] for s in critical_path(traces["t1"])] == ["POST /query", "enrich", "model"]
+    assert critical_path([]) == []
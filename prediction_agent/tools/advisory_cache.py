@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from cachetools import LRUCache
+
+from .cache import CacheMetrics, register_cache
+from .risk_view import get_risk_view
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Advisories are also dropped after this long, as their news and weather age even
+# when no incident on the route changes.
+ADVISORY_CACHE_TTL_SECONDS = float(os.getenv("ADVISORY_CACHE_TTL_SECONDS", "3600"))
+ADVISORY_CACHE_MAX_ENTRIES = int(os.getenv("ADVISORY_CACHE_MAX_ENTRIES", "2048"))
+# Advisories are cached per route and time bucket of this width (the weather they
+# quote is forecast per hour).
+ADVISORY_CACHE_TIME_BUCKET_MINUTES = int(os.getenv("ADVISORY_CACHE_TIME_BUCKET_MINUTES", "60"))
+
+# Cells whose last invalidation is remembered for rejecting advisories computed
+# before it; past this many, puts that started earlier are rejected wholesale.
+_MAX_TRACKED_CELLS = 100_000
+
+
+def advisory_cache_key(route_key: str, narrative: bool = False, now: Optional[float] = None) -> str:
+    """
+    Key of the advisory for a route (see `route_cache_key`) in the current time bucket.
+    Narrative answers are cached apart from the short ones.
+    """
+    now = time.time() if now is None else now
+    bucket = int(now // (ADVISORY_CACHE_TIME_BUCKET_MINUTES * 60)) if ADVISORY_CACHE_TIME_BUCKET_MINUTES > 0 else 0
+    return f"{route_key}@{bucket}" + ("#narrative" if narrative else "")
+
+
+@dataclass
+class _Advisory:
+    value: Any
+    stored_at: float
+    cells: List[str]
+
+
+class _Entries(LRUCache):
+    # Tells the owner about LRU evictions, so it can unindex their cells.
+    def __init__(self, maxsize: int, on_evict):
+        super().__init__(maxsize=maxsize)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, entry = super().popitem()
+        self._on_evict(key, entry)
+        return key, entry
+
+
+class AdvisoryCache:
+    """
+    In-memory cache of route advisories, indexed by the geohash cells each route crosses.
+
+    `invalidate_cells` drops only the advisories whose route crosses one of the given
+    cells; the risk view calls it with the cells that gained or lost incidents. An
+    advisory computed while one of its cells changed is not stored: callers take a
+    `reserve()` token before computing and pass it to `put`.
+    """
+
+    def __init__(self, name: str = "advisories", ttl_seconds: float = ADVISORY_CACHE_TTL_SECONDS,
+                 max_entries: int = ADVISORY_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.metrics = CacheMetrics()
+        self._lock = threading.Lock()
+        self._entries = _Entries(max_entries, self._unindex)
+        self._cell_keys: Dict[str, Set[str]] = {}
+        self._sequence = 0
+        self._changed_at: Dict[str, int] = {}
+        self._floor = 0
+        self.invalidated = 0
+        self.rejected = 0
+        register_cache(self)
+
+    def _unindex(self, key: str, entry: _Advisory) -> None:
+        for cell in entry.cells:
+            keys = self._cell_keys.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._cell_keys[cell]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._unindex(key, entry)
+                entry = None
+        self.metrics.count("hits" if entry is not None else "misses")
+        return entry.value if entry is not None else None
+
+    def reserve(self) -> int:
+        """
+        Token to pass to `put` for an advisory computed from now on.
+        """
+        with self._lock:
+            return self._sequence
+
+    def put(self, key: str, value: Any, cells: Iterable[str], reserved: int) -> bool:
+        """
+        Caches an advisory for a route crossing `cells`, unless one of them changed since
+        `reserved` was taken.
+
+        Returns:
+            True if the advisory was cached.
+        """
+        cells = list(dict.fromkeys(cells))
+        with self._lock:
+            if reserved < self._floor or any(self._changed_at.get(cell, -1) >= reserved for cell in cells):
+                self.rejected += 1
+                return False
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._unindex(key, previous)
+            self._entries[key] = _Advisory(value, time.time(), cells)
+            for cell in cells:
+                self._cell_keys.setdefault(cell, set()).add(key)
+        return True
+
+    def invalidate_cells(self, cells: Iterable[str]) -> int:
+        """
+        Drops every advisory whose route crosses one of `cells`.
+
+        Returns:
+            The number of advisories dropped.
+        """
+        dropped = 0
+        with self._lock:
+            sequence = self._sequence
+            self._sequence += 1
+            if len(self._changed_at) > _MAX_TRACKED_CELLS:
+                self._changed_at.clear()
+                self._floor = sequence
+            for cell in cells:
+                self._changed_at[cell] = sequence
+                for key in self._cell_keys.pop(cell, ()):
+                    entry = self._entries.pop(key, None)
+                    if entry is not None:
+                        self._unindex(key, entry)
+                        dropped += 1
+            self.invalidated += dropped
+        if dropped:
+            logger.info(f"Cache '{self.name}': {dropped} advisories invalidated by incident changes.")
+        return dropped
+
+    def snapshot(self) -> Dict[str, Any]:
+        metrics = self.metrics.snapshot()
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "indexed_cells": len(self._cell_keys),
+            "lookups": metrics["lookups"],
+            "hits": metrics["hits"],
+            "misses": metrics["misses"],
+            "hit_ratio": metrics["hit_ratio"],
+            "invalidated": self.invalidated,
+            "rejected_puts": self.rejected,
+        }
+
+
+_advisory_cache: Optional[AdvisoryCache] = None
+
+
+def get_advisory_cache() -> AdvisoryCache:
+    """
+    Returns the process-wide advisory cache, invalidated by the process-wide risk view.
+    """
+    global _advisory_cache
+    if _advisory_cache is None:
+        cache = AdvisoryCache()
+        get_risk_view().add_cell_listener(cache.invalidate_cells)
+        _advisory_cache = cache
+    return _advisory_cache
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(os.path.dirname(__file__), "..", "cache.db"))
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+
+
+def is_empty(value: Any) -> bool:
+    """
+    True for None and empty strings or collections: what the agents return when a
+    lookup fails, which must not be served for a whole TTL.
+    """
+    return value is None or (isinstance(value, (str, bytes, list, tuple, dict, set)) and not value)
+
+
+class DiskCacheTier:
+    """
+    SQLite-backed second tier shared by all caches of the process (one table, keyed by
+    cache name and key). Values must be JSON-serialisable. It outlives restarts, so a
+    fresh process starts warm.
+    """
+
+    def __init__(self, db_path: str = CACHE_DB_PATH):
+        self.db_path = os.path.abspath(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (cache, key)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, cache: str, key: str) -> Optional[CacheEntry]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value, stored_at FROM cache_entries WHERE cache = ? AND key = ?", (cache, key)
+            ).fetchone()
+        return CacheEntry(json.loads(row[0]), row[1]) if row else None
+
+    def put(self, cache: str, key: str, entry: CacheEntry) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (cache, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                (cache, key, json.dumps(entry.value), entry.stored_at),
+            )
+
+
+class CacheMetrics:
+    """
+    Counters for one cache. `refresh_lag` is how long past its TTL an entry was
+    being served stale before the background refresh replaced it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.prefetches = 0
+        self.refresh_lag_total = 0.0
+        self.refresh_lag_max = 0.0
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_refresh(self, lag_seconds: float) -> None:
+        with self._lock:
+            self.refreshes += 1
+            self.refresh_lag_total += lag_seconds
+            self.refresh_lag_max = max(self.refresh_lag_max, lag_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.disk_hits + self.misses
+            served = self.hits + self.stale_hits + self.disk_hits
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": served / lookups if lookups else None,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "prefetches": self.prefetches,
+                "refresh_lag_mean_seconds": self.refresh_lag_total / self.refreshes if self.refreshes else None,
+                "refresh_lag_max_seconds": self.refresh_lag_max if self.refreshes else None,
+            }
+
+
+class TTLCache:
+    """
+    Async read-through cache with a TTL, stale-while-revalidate and an optional disk tier.
+
+    An entry younger than `ttl_seconds` is served as is. Up to `stale_seconds` past
+    its TTL it is still served immediately, while a single background task reloads
+    it. Older entries, and keys seen by neither tier, are loaded inline; concurrent
+    misses on a key share one load (counted as `coalesced`). Failed loads and empty
+    results are not cached.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, stale_seconds: float = 0.0,
+                 max_entries: int = 1024, disk: Optional[DiskCacheTier] = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.disk = disk
+        self.metrics = CacheMetrics()
+        self._memory: LRUCache = LRUCache(maxsize=max_entries)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        register_cache(self)
+
+    async def _lookup(self, key: str) -> Tuple[Optional[CacheEntry], bool]:
+        # Returns the entry and whether it came from the disk tier.
+        entry = self._memory.get(key)
+        if entry is not None or self.disk is None:
+            return entry, False
+        try:
+            entry = await asyncio.to_thread(self.disk.get, self.name, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache '{self.name}': disk tier read failed: {e}")
+            return None, False
+        if entry is None or is_empty(entry.value):
+            # Empty values stored before they were refused count as missing.
+            return None, False
+        self._memory[key] = entry
+        return entry, True
+
+    @staticmethod
+    def _cacheable(value: Any, cacheable: Optional[Callable[[Any], bool]]) -> bool:
+        return not is_empty(value) and (cacheable is None or cacheable(value))
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Returns the cached value for `key`, calling `loader()` when there is none usable.
+        A loaded value is cached unless it is empty, or `cacheable` is given and rejects it.
+        """
+        entry, from_disk = await self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            if age <= self.ttl_seconds:
+                self.metrics.count("disk_hits" if from_disk else "hits")
+                return entry.value
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self.metrics.count("stale_hits")
+                self._schedule_refresh(key, loader, entry, cacheable)
+                return entry.value
+
+        self.metrics.count("misses")
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader, cacheable))
+            self._loading[key] = task
+            task.add_done_callback(lambda done: self._load_done(key, done))
+        else:
+            self.metrics.count("coalesced")
+        # Shielded so a caller that gives up does not cancel the load for the others.
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader, cacheable) -> Any:
+        value = await loader()
+        if self._cacheable(value, cacheable):
+            await self.put(key, value)
+        return value
+
+    def _load_done(self, key: str, task: asyncio.Task) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if not task.cancelled():
+            # Retrieved here so a failure nobody waited for is not reported as unhandled.
+            task.exception()
+
+    async def warm(self, key: str, loader: Callable[[], Awaitable[Any]], min_ttl_left: float = 0.0) -> bool:
+        """
+        Loads `key` ahead of demand unless it is cached with more than `min_ttl_left`
+        seconds of its TTL to go. Not counted as a lookup, so prefetching does not
+        inflate the hit ratio.
+
+        Returns:
+            True if the loader was called.
+        """
+        entry, _ = await self._lookup(key)
+        if entry is not None and time.time() - entry.stored_at < self.ttl_seconds - min_ttl_left:
+            return False
+        value = await loader()
+        if not is_empty(value):
+            await self.put(key, value)
+        self.metrics.count("prefetches")
+        return True
+
+    async def put(self, key: str, value: Any) -> None:
+        entry = CacheEntry(value, time.time())
+        self._memory[key] = entry
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, self.name, key, entry)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.warning(f"Cache '{self.name}': disk tier write failed for '{key}': {e}")
+
+    def _schedule_refresh(self, key: str, loader, stale_entry: CacheEntry, cacheable=None) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                value = await loader()
+                if not self._cacheable(value, cacheable):
+                    raise ValueError("refreshed value is empty or not cacheable")
+                await self.put(key, value)
+                self.metrics.record_refresh(time.time() - (stale_entry.stored_at + self.ttl_seconds))
+            except Exception as e:
+                self.metrics.count("refresh_failures")
+                logger.warning(f"Cache '{self.name}': background refresh of '{key}' failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._memory),
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "refreshing": len(self._refreshing),
+            "loading": len(self._loading),
+            **self.metrics.snapshot(),
+        }
+
+
+# --- Registry, for the /metrics endpoint ---
+_caches: Dict[str, TTLCache] = {}
+_disk_tier: Optional[DiskCacheTier] = None
+
+
+def register_cache(cache: TTLCache) -> None:
+    _caches[cache.name] = cache
+
+
+def cache_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.snapshot() for name, cache in _caches.items()}
+
+
+def get_disk_tier() -> DiskCacheTier:
+    """
+    Returns the process-wide disk tier at CACHE_DB_PATH.
+    """
+    global _disk_tier
+    if _disk_tier is None:
+        _disk_tier = DiskCacheTier(CACHE_DB_PATH)
+    return _disk_tier
@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+import shapely
+
+from .geo import cumulative_lengths, meters_to_degrees, pair_distances, project_equirectangular, segment_candidates
+from .incident_index import IncidentIndex, get_incident_index
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+ROUTE_CORRIDOR_METERS = float(os.getenv("ROUTE_CORRIDOR_METERS", "150"))
+
+
+@dataclass
+class CorridorMatches:
+    """
+    Incidents inside a route corridor, ordered by distance along the route.
+    """
+    row_ids: np.ndarray
+    along_route_m: np.ndarray
+    distance_m: np.ndarray
+
+    def __len__(self):
+        return len(self.row_ids)
+
+
+class CorridorMatcher:
+    """
+    Spatial matcher of incidents against a route corridor.
+
+    Incident coordinates from the IncidentIndex are kept in an STR-packed R-tree.
+    A query buffers every route segment by the corridor width, collects
+    (incident, segment) candidate pairs from the tree, and computes the exact
+    great-circle distances for those pairs with `pair_distances`. Rows appended after
+    the tree was built are paired with segments by the bounding-box prefilter of
+    `segment_candidates`; once more than `rebuild_after_rows` have accumulated the
+    tree is rebuilt, which bounds the size of that scan.
+    """
+
+    def __init__(self, index: IncidentIndex, rebuild_after_rows: int = 1024):
+        self.index = index
+        self.rebuild_after_rows = rebuild_after_rows
+        self._lock = threading.Lock()
+        self._tree = None
+        self._tree_rows = np.empty(0, dtype=np.int64)
+        self._tree_size = 0
+        self._tree_generation = -1
+
+    def _ensure_tree(self):
+        with self._lock:
+            size = len(self.index)
+            stale = self._tree_generation != self.index.generation
+            delta = size - self._tree_size
+            if not stale and delta <= self.rebuild_after_rows:
+                return
+            with self.index._lock:
+                generation = self.index.generation
+                size = len(self.index)
+                lat = self.index.latitude.view.copy()
+                lon = self.index.longitude.view.copy()
+            rows = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+            self._tree = shapely.STRtree(shapely.points(lon[rows], lat[rows])) if len(rows) else None
+            self._tree_rows = rows
+            self._tree_size = size
+            self._tree_generation = generation
+            logger.info(f"Rebuilt incident R-tree over {len(rows)} located incidents.")
+
+    def match(self, polyline: np.ndarray, corridor_m: float = ROUTE_CORRIDOR_METERS, since: Optional[float] = None) -> CorridorMatches:
+        """
+        Finds incidents within `corridor_m` metres of a route.
+
+        Args:
+            polyline: (n, 2) array of (latitude, longitude) route vertices.
+            corridor_m: Half-width of the corridor around the route, in metres.
+            since: Optional Unix timestamp; older incidents are ignored.
+
+        Returns:
+            CorridorMatches ranked by distance along the route.
+        """
+        return self.match_many([polyline], corridor_m, since)[0]
+
+    def match_many(self, polylines: Sequence[np.ndarray], corridor_m: float = ROUTE_CORRIDOR_METERS,
+                   since: Optional[float] = None) -> List[CorridorMatches]:
+        """
+        Finds the incidents within `corridor_m` metres of each of several routes (e.g.
+        the alternatives between two places) in one pass: the segments of all routes
+        go through a single R-tree query and a single vectorised distance computation.
+
+        Args:
+            polylines: (n, 2) arrays of (latitude, longitude) route vertices.
+            corridor_m: Half-width of the corridors, in metres.
+            since: Optional Unix timestamp; older incidents are ignored.
+
+        Returns:
+            One CorridorMatches per route, ranked by distance along that route.
+        """
+        polylines = [np.asarray(polyline, dtype=np.float64).reshape(-1, 2) for polyline in polylines]
+        polylines = [np.vstack([p, p]) if len(p) == 1 else p for p in polylines]
+        empty = CorridorMatches(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+        routes = [r for r, polyline in enumerate(polylines) if len(polyline)]
+        if not routes or len(self.index) == 0:
+            return [empty] * len(polylines)
+
+        self._ensure_tree()
+        with self._lock:
+            tree, tree_rows, tree_size = self._tree, self._tree_rows, self._tree_size
+
+        # The vertices of all routes end to end; segment k of a route joins its vertices
+        # k and k + 1, stored at `segment_start` and `segment_start + 1`. Alternatives
+        # share stretches of road, so candidates and distances are computed once per
+        # distinct segment and mapped back to every route that contains it.
+        vertices = np.concatenate([polylines[r] for r in routes])
+        offsets = np.cumsum([0] + [len(polylines[r]) for r in routes])
+        segment_start = np.concatenate([np.arange(offsets[i], offsets[i + 1] - 1) for i in range(len(routes))])
+        segment_route = np.repeat(np.arange(len(routes)), [len(polylines[r]) - 1 for r in routes])
+        endpoints = np.hstack([vertices[segment_start], vertices[segment_start + 1]])
+        distinct, segment_distinct = np.unique(endpoints, axis=0, return_inverse=True)
+        segment_distinct = segment_distinct.reshape(-1)
+
+        lat0, lon0 = vertices[:, 0].mean(), vertices[:, 1].mean()
+        dlat, dlon = meters_to_degrees(corridor_m, lat0)
+        seg_lat_a, seg_lon_a, seg_lat_b, seg_lon_b = distinct.T
+
+        # Candidate (incident row, distinct segment) pairs from the R-tree...
+        pair_rows, pair_segments = [], []
+        if tree is not None:
+            boxes = shapely.box(
+                np.minimum(seg_lon_a, seg_lon_b) - dlon, np.minimum(seg_lat_a, seg_lat_b) - dlat,
+                np.maximum(seg_lon_a, seg_lon_b) + dlon, np.maximum(seg_lat_a, seg_lat_b) + dlat,
+            )
+            segment_idx, tree_idx = tree.query(boxes)
+            pair_rows.append(tree_rows[tree_idx])
+            pair_segments.append(segment_idx)
+
+        # ...plus rows appended since the tree was built, paired with the segments whose
+        # boxes they fall in by the kernel's bounding-box prefilter. The margin is a hair
+        # wider than the corridor, as the kernel sizes each box at the segment's own latitude.
+        with self.index._lock:
+            delta_lat = self.index.latitude.view[tree_size:].copy()
+            delta_lon = self.index.longitude.view[tree_size:].copy()
+        if len(delta_lat):
+            delta_rows, delta_segments = segment_candidates(delta_lat, delta_lon, distinct, corridor_m * 1.01)
+            pair_rows.append(delta_rows + tree_size)
+            pair_segments.append(delta_segments)
+
+        if not pair_rows:
+            return [empty] * len(polylines)
+        pair_rows = np.concatenate(pair_rows)
+        pair_segments = np.concatenate(pair_segments)
+        if len(pair_rows) == 0:
+            return [empty] * len(polylines)
+
+        # Exact great-circle distances for the candidate pairs, each segment in its own frame.
+        with self.index._lock:
+            timestamps = self.index.unix_timestamp.view[pair_rows]
+        keep = timestamps >= since if since is not None else ~np.isnan(timestamps)
+        pair_rows, pair_segments = pair_rows[keep], pair_segments[keep]
+        with self.index._lock:
+            lat = self.index.latitude.view[pair_rows]
+            lon = self.index.longitude.view[pair_rows]
+        distance, t = pair_distances(lat, lon, distinct, pair_segments)
+        keep = distance <= corridor_m
+        if not keep.any():
+            return [empty] * len(polylines)
+        pair_rows, pair_segments, distance, t = pair_rows[keep], pair_segments[keep], distance[keep], t[keep]
+
+        route_x, route_y = project_equirectangular(vertices[:, 0], vertices[:, 1], lat0, lon0)
+        route_along = np.concatenate([cumulative_lengths(route_x[offsets[i]:offsets[i + 1]],
+                                                         route_y[offsets[i]:offsets[i + 1]])
+                                      for i in range(len(routes))])
+
+        # Per route, map each distinct segment to its first occurrence on the route, keep
+        # each incident's closest segment (a scatter-min avoids sorting all pairs), then
+        # rank by position along the route.
+        results = [empty] * len(polylines)
+        closest = np.full(int(pair_rows.max()) + 1, np.inf)
+        occurrence = np.full(len(distinct), -1, dtype=np.int64)
+        for i, r in enumerate(routes):
+            segments = np.flatnonzero(segment_route == i)
+            route_distinct, first = np.unique(segment_distinct[segments], return_index=True)
+            occurrence[:] = -1
+            occurrence[route_distinct] = segments[first]
+            segment = occurrence[pair_segments]
+            on_route = np.flatnonzero(segment >= 0)
+            if not len(on_route):
+                continue
+            rows, route_distance, segment = pair_rows[on_route], distance[on_route], segment[on_route]
+            closest[rows] = np.inf
+            np.minimum.at(closest, rows, route_distance)
+            winners = np.flatnonzero(route_distance == closest[rows])
+            _, first = np.unique(rows[winners], return_index=True)
+            best = winners[first]
+            a = segment_start[segment[best]]
+            along = route_along[a] + t[on_route][best] * (route_along[a + 1] - route_along[a])
+            ranked = np.lexsort((route_distance[best], along))
+            results[r] = CorridorMatches(rows[best][ranked], along[ranked], route_distance[best][ranked])
+        return results
+
+
+_corridor_matcher: Optional[CorridorMatcher] = None
+
+
+def get_corridor_matcher() -> CorridorMatcher:
+    """
+    Returns the process-wide CorridorMatcher over the shared incident index.
+    """
+    global _corridor_matcher
+    if _corridor_matcher is None:
+        _corridor_matcher = CorridorMatcher(get_incident_index())
+    return _corridor_matcher
@@ -0,0 +1,82 @@
+"""
+Critical path of the slowest requests in exported traces.
+
+Reads the span files of the "file" trace exporter (see tools/tracing.py); those of
+several components can be merged, as their spans share trace ids:
+    python -m tools.critical_path traces.jsonl [more files] [--top 5]
+"""
+import argparse
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def load_spans(paths: List[str]) -> Dict[str, List[dict]]:
+    """
+    Spans of the "file" exporter, grouped by trace id.
+    """
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                span = json.loads(line)
+                traces[span["context"]["trace_id"]].append({
+                    "name": span["name"],
+                    "service": span.get("resource", {}).get("attributes", {}).get("service.name", ""),
+                    "span_id": span["context"]["span_id"],
+                    "parent_id": span.get("parent_id"),
+                    "start": _timestamp(span["start_time"]),
+                    "end": _timestamp(span["end_time"]),
+                })
+    return traces
+
+
+def critical_path(spans: List[dict]) -> List[dict]:
+    """
+    The chain of spans that bounded the trace's duration: from the root, repeatedly
+    the child that finished last.
+    """
+    ids = {span["span_id"] for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        children[span["parent_id"] if span["parent_id"] in ids else None].append(span)
+    if not children[None]:
+        return []
+    path = [max(children[None], key=lambda s: s["end"] - s["start"])]
+    while children[path[-1]["span_id"]]:
+        path.append(max(children[path[-1]["span_id"]], key=lambda s: s["end"]))
+    return path
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Critical path of the slowest exported traces.")
+    parser.add_argument("files", nargs="+", help="Span files written by the 'file' exporter.")
+    parser.add_argument("--top", type=int, default=5, help="How many of the slowest traces to show.")
+    args = parser.parse_args(argv)
+
+    traces = load_spans(args.files)
+    durations = {trace_id: max(s["end"] for s in spans) - min(s["start"] for s in spans)
+                 for trace_id, spans in traces.items()}
+    for trace_id in sorted(durations, key=durations.get, reverse=True)[:args.top]:
+        path = critical_path(traces[trace_id])
+        print(f"trace {trace_id}: {durations[trace_id] * 1000:.0f} ms, {len(traces[trace_id])} spans")
+        origin = path[0]["start"] if path else 0.0
+        for depth, span in enumerate(path):
+            # Self time: the part of the span not covered by its critical child.
+            child = path[depth + 1] if depth + 1 < len(path) else None
+            own = (span["end"] - span["start"]) - ((child["end"] - child["start"]) if child else 0.0)
+            print(f"  {'  ' * depth}{span['name']} [{span['service']}] "
+                  f"+{(span['start'] - origin) * 1000:.0f} ms, {(span['end'] - span['start']) * 1000:.0f} ms "
+                  f"(self {own * 1000:.0f} ms)")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import html
+import json
+import logging
+import os
+import re
+from typing import List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from .street_index import normalize_place_name
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
+
+
+def decode_polyline(encoded: str) -> np.ndarray:
+    """
+    Decodes a Google encoded polyline string.
+
+    Returns:
+        An (n, 2) float64 array of (latitude, longitude) vertices.
+    """
+    coordinates = []
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        coordinates.append((lat / 1e5, lng / 1e5))
+    return np.array(coordinates, dtype=np.float64).reshape(-1, 2)
+
+
+def function_response_payloads(function_response) -> list:
+    """
+    The JSON payloads of one MCP tool response.
+
+    ADK wraps an MCP CallToolResult as {'result': CallToolResult}; its text
+    content holds the JSON the Google Maps MCP server produced.
+    """
+    payloads = []
+    response = function_response.response or {}
+    result = response.get('result', response) if isinstance(response, dict) else response
+    content = result.get('content') if isinstance(result, dict) else getattr(result, 'content', None)
+    for item in content or []:
+        text = item.get('text') if isinstance(item, dict) else getattr(item, 'text', None)
+        if not text:
+            continue
+        try:
+            payloads.append(json.loads(text))
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring non-JSON {function_response.name} response: {text[:200]}")
+    return payloads
+
+
+def tool_response_payloads(events, tool_name: str) -> list:
+    """
+    Extracts the JSON payloads an MCP tool returned during an agent run.
+    """
+    payloads = []
+    for event in events:
+        for function_response in event.get_function_responses() or []:
+            if function_response.name == tool_name:
+                payloads.extend(function_response_payloads(function_response))
+    return payloads
+
+
+def geocodes_from_events(events) -> list:
+    """
+    Returns the (latitude, longitude) of every successful `maps_geocode` call, in call order.
+    """
+    geocodes = []
+    for payload in tool_response_payloads(events, 'maps_geocode'):
+        location = payload.get('location') if isinstance(payload, dict) else None
+        if location and 'lat' in location and 'lng' in location:
+            geocodes.append((float(location['lat']), float(location['lng'])))
+    return geocodes
+
+
+def geocode_results_from_events(events) -> list:
+    """
+    Pairs every successful `maps_geocode` call with the address it was asked for.
+
+    Returns:
+        A list of dicts with `query`, `latitude`, `longitude` and `formatted_address`, in call order.
+    """
+    queries = {}
+    for event in events:
+        for function_call in event.get_function_calls() or []:
+            if function_call.name == 'maps_geocode':
+                queries[function_call.id] = (function_call.args or {}).get('address')
+
+    results = []
+    for event in events:
+        for function_response in event.get_function_responses() or []:
+            if function_response.name != 'maps_geocode':
+                continue
+            query = queries.get(function_response.id)
+            for payload in function_response_payloads(function_response):
+                location = payload.get('location') if isinstance(payload, dict) else None
+                if query and location and 'lat' in location and 'lng' in location:
+                    results.append({
+                        'query': query,
+                        'latitude': float(location['lat']),
+                        'longitude': float(location['lng']),
+                        'formatted_address': payload.get('formatted_address'),
+                    })
+    return results
+
+
+async def fetch_directions(origin: tuple, destination: tuple, api_key: Optional[str] = None) -> Optional[dict]:
+    """
+    Fetches the best driving route between two coordinates from the Directions API.
+
+    The Google Maps MCP server's `maps_directions` drops the route geometry, so
+    directions are requested from the API directly.
+
+    Returns:
+        The first route of the response (summary, legs with steps, overview polyline),
+        or None if no route was found.
+    """
+    routes = await fetch_route_alternatives(origin, destination, api_key, alternatives=False)
+    return routes[0] if routes else None
+
+
+async def fetch_route_alternatives(origin: tuple, destination: tuple, api_key: Optional[str] = None,
+                                   alternatives: bool = True) -> List[dict]:
+    """
+    Fetches the driving routes between two coordinates from the Directions API: the
+    best route followed by the alternatives the API suggests (usually up to three
+    routes in all).
+
+    Returns:
+        The routes of the response, best first; empty if no route was found.
+    """
+    api_key = api_key or os.getenv("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        logger.warning("GOOGLE_MAPS_API_KEY is not set; cannot fetch directions.")
+        return []
+
+    params = {
+        "origin": f"{origin[0]},{origin[1]}",
+        "destination": f"{destination[0]},{destination[1]}",
+        "key": api_key,
+    }
+    if alternatives:
+        params["alternatives"] = "true"
+    async with httpx.AsyncClient(timeout=20) as client:
+        response = await client.get(DIRECTIONS_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
+
+    routes = data.get("routes") or []
+    if data.get("status") != "OK" or not routes:
+        logger.warning(f"Directions API returned status {data.get('status')} for {origin} -> {destination}.")
+        return []
+    return routes
+
+
+def route_length(route: dict) -> Tuple[float, float]:
+    """
+    Total (distance in metres, duration in seconds) over a Directions API route's legs.
+    """
+    legs = route.get("legs") or []
+    distance = sum(((leg.get("distance") or {}).get("value") or 0) for leg in legs)
+    duration = sum(((leg.get("duration") or {}).get("value") or 0) for leg in legs)
+    return float(distance), float(duration)
+
+
+def route_polyline(route: dict) -> np.ndarray:
+    """
+    The geometry of a Directions API route, from its steps' polylines (denser than
+    the overview polyline) or, failing that, the overview polyline.
+
+    Returns:
+        An (n, 2) array of (latitude, longitude) vertices.
+    """
+    pieces = []
+    for leg in route.get("legs") or []:
+        for step in leg.get("steps") or []:
+            points = (step.get("polyline") or {}).get("points")
+            if points:
+                piece = decode_polyline(points)
+                # Consecutive steps share their joining vertex.
+                if pieces and len(piece) and len(pieces[-1]) and np.array_equal(piece[0], pieces[-1][-1]):
+                    piece = piece[1:]
+                pieces.append(piece)
+    if pieces:
+        return np.concatenate(pieces).reshape(-1, 2)
+    overview = (route.get("overview_polyline") or {}).get("points")
+    return decode_polyline(overview) if overview else np.empty((0, 2))
+
+
+_BOLD = re.compile(r"<b>(.*?)</b>", re.IGNORECASE | re.DOTALL)
+_TAGS = re.compile(r"<[^>]+>")
+_PASS_BY = re.compile(r"Pass by (.+?) \(on the (?:left|right)\)", re.IGNORECASE)
+# Bold text in instructions that is a heading, turn or exit number rather than a name.
+_MANEUVER_WORDS = re.compile(
+    r"^(?:north|south|east|west|northeast|northwest|southeast|southwest|(?:slight |sharp )?(?:left|right)"
+    r"|straight|u-turn|\d+(?:st|nd|rd|th))$",
+    re.IGNORECASE,
+)
+# Address components that name the city, state or country rather than a place on the route.
+_ADDRESS_NOISE = {"bengaluru", "bangalore", "karnataka", "india"}
+
+
+def instruction_names(html_instructions: str) -> List[str]:
+    """
+    Street names and landmarks in a step's HTML instructions, e.g.
+    "Turn <b>left</b> onto <b>Outer Ring Rd</b><div>Pass by Tata Motors (on the left)</div>"
+    gives ["Outer Ring Rd", "Tata Motors"].
+    """
+    names = []
+    for bold in _BOLD.findall(html_instructions or ""):
+        name = html.unescape(_TAGS.sub("", bold)).strip()
+        if name and not _MANEUVER_WORDS.match(name):
+            names.append(name)
+    text = html.unescape(_TAGS.sub(" ", html_instructions or ""))
+    names.extend(match.strip() for match in _PASS_BY.findall(text))
+    return names
+
+
+def address_places(address: str) -> List[str]:
+    """
+    Locality components of a formatted address, e.g. "2nd Cross Rd, Hoodi, Bengaluru,
+    Karnataka 560048, India" gives ["2nd Cross Rd", "Hoodi"].
+    """
+    places = []
+    for part in (address or "").split(","):
+        # Plus codes ("7JVW+QR") identify a spot, not a place name.
+        words = [word for word in part.split() if "+" not in word]
+        part = " ".join(words)
+        if not part or part.lower() in _ADDRESS_NOISE or any(w.isdigit() and len(w) >= 5 for w in words):
+            continue
+        places.append(part)
+    return places
+
+
+def route_locations(route: dict) -> List[str]:
+    """
+    Place, street and landmark names along a Directions API route, in route order:
+    the start address, every step's names, the route summary and the end address.
+    Names are deduplicated normalised, so "Outer Ring Rd" repeats "Outer Ring Road".
+    This is what the formatter agent used to extract into `Outputformat`.
+    """
+    names = []
+    legs = route.get("legs") or []
+    for leg in legs:
+        names.extend(address_places(leg.get("start_address")))
+        for step in leg.get("steps") or []:
+            names.extend(instruction_names(step.get("html_instructions")))
+    names.extend(part.strip() for part in (route.get("summary") or "").split(" and ") if part.strip())
+    for leg in legs:
+        names.extend(address_places(leg.get("end_address")))
+
+    seen, locations = set(), []
+    for name in names:
+        key = normalize_place_name(name) or " ".join(name.lower().split())
+        if key not in seen:
+            seen.add(key)
+            locations.append(name)
+    return locations
+
+
+async def fetch_route_polyline(origin: tuple, destination: tuple, api_key: Optional[str] = None) -> np.ndarray:
+    """
+    Fetches the polyline of the best driving route between two coordinates.
+
+    Returns:
+        An (n, 2) array of (latitude, longitude) vertices, empty if no route was found.
+    """
+    route = await fetch_directions(origin, destination, api_key)
+    return route_polyline(route) if route else np.empty((0, 2))
@@ -0,0 +1,362 @@
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .incident_index import IncidentIndex, get_incident_index
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# The advisory looks this far ahead.
+PREDICTOR_HORIZON_HOURS = float(os.getenv("PREDICTOR_HORIZON_HOURS", "2"))
+# Reports of the same kind at the same place less than this apart belong to one episode.
+PREDICTOR_EPISODE_GAP_HOURS = float(os.getenv("PREDICTOR_EPISODE_GAP_HOURS", "3"))
+# Pseudo-observations pulling a stratum's estimate towards its parent's.
+PREDICTOR_PRIOR_STRENGTH = float(os.getenv("PREDICTOR_PRIOR_STRENGTH", "10"))
+# A prediction is trusted without the LLM when its stratum has this many observations
+# and its probability is at least this far from 0.5.
+PREDICTOR_MIN_SUPPORT = int(os.getenv("PREDICTOR_MIN_SUPPORT", "30"))
+PREDICTOR_CONFIDENCE_MARGIN = float(os.getenv("PREDICTOR_CONFIDENCE_MARGIN", "0.2"))
+# The model is refitted once this many rows have been ingested since the last fit.
+PREDICTOR_REFIT_AFTER_ROWS = int(os.getenv("PREDICTOR_REFIT_AFTER_ROWS", "500"))
+
+# Hours ahead at which the persistence curve is estimated.
+CURVE_HOURS = (0.5, 1.0, 2.0, 3.0, 6.0, 12.0)
+
+# --- Weather categories ---
+RAIN = "rain"
+CLEAR = "clear"
+UNKNOWN = "unknown"
+WEATHER_CATEGORIES = [RAIN, CLEAR, UNKNOWN]
+_RAIN_WORDS = re.compile(r"\b(?:rain\w*|shower\w*|drizzl\w*|thunder\w*|storm\w*|downpour\w*|monsoon)\b", re.IGNORECASE)
+# "no rain expected", "10% chance of rain": rain words that do not mean rain.
+_NOT_RAIN = re.compile(
+    r"\b(?:no|without|little|[1-4]?\d\s*%\s*(?:chance|probability)\s+of)\s+(?:\w+\s+)?"
+    r"(?:rain\w*|shower\w*|drizzl\w*|thunder\w*|storm\w*)",
+    re.IGNORECASE,
+)
+_CLEAR_WORDS = re.compile(r"\b(?:clear|sunny|dry|cloudy|overcast|haz[ey]|fair|partly)\b", re.IGNORECASE)
+
+
+def weather_category(text: Optional[str]) -> str:
+    """
+    Buckets free-text weather (a forecast, or an incident description) into rain,
+    clear or unknown. Rain wins when both are mentioned; negated or unlikely rain
+    ("no rain expected", "10% chance of rain") does not count.
+    """
+    if not text:
+        return UNKNOWN
+    if _RAIN_WORDS.search(_NOT_RAIN.sub(" ", text)):
+        return RAIN
+    if _CLEAR_WORDS.search(text):
+        return CLEAR
+    return UNKNOWN
+
+
+@dataclass
+class Prediction:
+    """
+    Estimated course of an incident type over the next hours.
+    """
+    event_type: Optional[str]
+    sub_event_type: Optional[str]
+    weather: str
+    horizon_hours: float
+    persist_probability: float
+    escalate_probability: float
+    support: int
+    confident: bool
+    curve: Dict[float, float] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "event_type": self.event_type,
+            "sub_event_type": self.sub_event_type,
+            "weather": self.weather,
+            "horizon_hours": self.horizon_hours,
+            "persist_probability": round(self.persist_probability, 3),
+            "escalate_probability": round(self.escalate_probability, 3),
+            "support": self.support,
+            "confident": self.confident,
+        }
+
+
+@dataclass
+class ReportOutcomes:
+    """
+    What happened after each report, in (place, kind, time) order: whether it
+    persisted to each curve hour, whether it escalated within the horizon, and
+    whether each of those is known (not censored by the end of the history).
+    """
+    row_ids: np.ndarray
+    event_type: np.ndarray
+    sub_event_type: np.ndarray
+    weather: np.ndarray
+    persisted: np.ndarray
+    observed: np.ndarray
+    escalated: np.ndarray
+    escalation_known: np.ndarray
+
+
+class _StratumCounts:
+    """Observed and positive report counts of one stratum (persistence per curve hour, escalation)."""
+
+    def __init__(self, n_hours: int):
+        self.observed = np.zeros(n_hours)
+        self.persisted = np.zeros(n_hours)
+        self.escalation_observed = 0.0
+        self.escalated = 0.0
+
+
+def _normalize(value) -> str:
+    return " ".join(str(value).lower().split()) if isinstance(value, str) else ""
+
+
+class DisruptionPredictor:
+    """
+    Persistence and escalation rates of incident types, estimated from the incident
+    history, for answering "will this still be there in 2 hours?" without an LLM.
+
+    Reports of the same sub-event type on the same street (or area, when the street
+    is unknown) less than `episode_gap_hours` apart form an episode. Every report is
+    an observation: it persisted `h` hours if its episode went on for at least `h`
+    more hours, and escalated if a report of the episode within the horizon was more
+    severe.
+    Episodes still open at the end of the history are right-censored: their reports
+    only count for the horizons they have already outlived.
+
+    Rates are counted per (event type, sub-event type, weather) stratum, with the
+    weather category read from the report's description, and each stratum's rate is
+    shrunk towards its parent's (event type, then all incidents) with
+    `prior_strength` pseudo-observations, so sparse strata stay calibrated.
+    """
+
+    def __init__(self, horizon_hours: float = PREDICTOR_HORIZON_HOURS,
+                 episode_gap_hours: float = PREDICTOR_EPISODE_GAP_HOURS,
+                 prior_strength: float = PREDICTOR_PRIOR_STRENGTH,
+                 min_support: int = PREDICTOR_MIN_SUPPORT,
+                 confidence_margin: float = PREDICTOR_CONFIDENCE_MARGIN,
+                 curve_hours: Sequence[float] = CURVE_HOURS):
+        self.horizon_hours = horizon_hours
+        self.episode_gap_hours = episode_gap_hours
+        self.prior_strength = prior_strength
+        self.min_support = min_support
+        self.confidence_margin = confidence_margin
+        self.curve_hours = tuple(sorted(set(curve_hours) | {horizon_hours}))
+        # Keys are (), (event,), (event, sub) and (event, sub, weather), normalised.
+        self.counts: Dict[tuple, _StratumCounts] = {}
+        self.fitted_rows = 0
+        self.fitted_generation = None
+
+    # --- Fitting ---
+    def outcomes(self, index: IncidentIndex, rows: Optional[np.ndarray] = None) -> ReportOutcomes:
+        """
+        What happened after each report of the index (or of the given row ids of it).
+        """
+        with index._lock:
+            rows = np.arange(len(index)) if rows is None else np.asarray(rows, dtype=np.int64)
+            rows = rows[np.isfinite(index.unix_timestamp.view[rows])]
+            timestamps = index.unix_timestamp.view[rows]
+            severities = np.nan_to_num(index.severity_score.view[rows].astype(np.float64))
+            event_codes = index.codes['event_type'].view[rows]
+            sub_codes = index.codes['sub_event_type'].view[rows]
+            description_codes = index.codes['description'].view[rows]
+            street_codes = index.street_key_codes.view[rows].astype(np.int64)
+            area_codes = index.area_key_codes.view[rows].astype(np.int64)
+            # Trailing entries are what a missing (-1) code indexes.
+            event_names = np.array([_normalize(v) for v in index.vocabularies['event_type'].values] + [""], dtype=object)
+            sub_names = np.array([_normalize(v) for v in index.vocabularies['sub_event_type'].values] + [""], dtype=object)
+            description_weather = np.array(
+                [weather_category(v) for v in index.vocabularies['description'].values] + [UNKNOWN], dtype=object)
+
+        n_hours = len(self.curve_hours)
+        if not len(rows):
+            empty = np.empty(0, dtype=object)
+            return ReportOutcomes(rows, empty, empty, empty, np.zeros((0, n_hours), dtype=bool),
+                                  np.zeros((0, n_hours), dtype=bool), np.zeros(0, dtype=bool), np.zeros(0, dtype=bool))
+
+        # Place: the street, or the area (offset past the street codes) when the street is unknown.
+        place = np.where(street_codes >= 0, street_codes, np.where(area_codes >= 0, area_codes + (1 << 31), -1))
+        kind = np.where(sub_codes >= 0, sub_codes, -2 - event_codes)
+        order = np.lexsort((timestamps, kind, place))
+        t, s, place, kind = timestamps[order], severities[order], place[order], kind[order]
+
+        gap = self.episode_gap_hours * 3600.0
+        new_episode = np.ones(len(t), dtype=bool)
+        new_episode[1:] = (place[1:] != place[:-1]) | (kind[1:] != kind[:-1]) | (np.diff(t) > gap)
+        episode = np.cumsum(new_episode) - 1
+        last = np.flatnonzero(np.append(new_episode[1:], True))
+        remaining = t[last][episode] - t
+        # An episode whose last report is within a gap of the end of the history may still be going on.
+        open_episode = t[last][episode] > t.max() - gap
+
+        hours = np.array(self.curve_hours) * 3600.0
+        persisted = remaining[:, None] >= hours[None, :]
+        # Open episodes only tell us about the horizons they have already outlived.
+        observed = persisted | ~open_episode[:, None]
+
+        # Escalation: a more severe report of the same episode within the horizon. The
+        # reports of an episode within the horizon are the slice up to the first one
+        # past t + horizon; reports are ordered by (episode, time), so one binary search
+        # over episode-offset times finds every slice's end at once.
+        horizon = self.horizon_hours * 3600.0
+        episode_time = episode * (t.max() - t.min() + 2 * horizon) + (t - t.min())
+        ends = np.searchsorted(episode_time, episode_time + horizon, side='right')
+        starts = np.arange(1, len(t) + 1)
+        has_later = ends > starts
+        bounds = np.column_stack([np.minimum(starts, len(t) - 1), ends]).ravel()
+        later_max = np.full(len(t), -np.inf)
+        if has_later.any():
+            later_max[has_later] = np.maximum.reduceat(np.append(s, -np.inf), bounds)[::2][has_later]
+        escalated = later_max > s
+        # Unescalated reports whose horizon reaches past the end of the history may yet escalate.
+        escalation_known = escalated | ~open_episode | (t + horizon <= t.max())
+
+        return ReportOutcomes(
+            row_ids=rows[order],
+            event_type=event_names[event_codes[order]],
+            sub_event_type=sub_names[sub_codes[order]],
+            weather=description_weather[description_codes[order]],
+            persisted=persisted,
+            observed=observed,
+            escalated=escalated,
+            escalation_known=escalation_known,
+        )
+
+    def fit(self, index: IncidentIndex, rows: Optional[np.ndarray] = None) -> "DisruptionPredictor":
+        """
+        Counts persistence and escalation per stratum over the index (or the given row ids of it).
+        """
+        generation, size = index.generation, len(index)
+        outcomes = self.outcomes(index, rows)
+        self.counts = {}
+        self.fitted_rows, self.fitted_generation = size, generation
+        if not len(outcomes.row_ids):
+            return self
+
+        # One integer per (event type, sub-event type, weather) stratum.
+        codes, names = zip(*(pd.factorize(column) for column in
+                             (outcomes.event_type, outcomes.sub_event_type, outcomes.weather)))
+        stratum = (codes[0].astype(np.int64) * len(names[1]) + codes[1]) * len(names[2]) + codes[2]
+        keys, inverse = np.unique(stratum, return_inverse=True)
+        observed = np.column_stack([np.bincount(inverse, weights=outcomes.observed[:, h], minlength=len(keys))
+                                    for h in range(len(self.curve_hours))])
+        persisted = np.column_stack([
+            np.bincount(inverse, weights=outcomes.persisted[:, h] & outcomes.observed[:, h], minlength=len(keys))
+            for h in range(len(self.curve_hours))])
+        escalation_observed = np.bincount(inverse, weights=outcomes.escalation_known, minlength=len(keys))
+        escalated = np.bincount(inverse, weights=outcomes.escalated & outcomes.escalation_known, minlength=len(keys))
+
+        for i, key in enumerate(keys.tolist()):
+            rest, weather_code = divmod(key, len(names[2]))
+            event_code, sub_code = divmod(rest, len(names[1]))
+            event, sub, weather = names[0][event_code], names[1][sub_code], names[2][weather_code]
+            for stratum in ((), (event,), (event, sub), (event, sub, weather)):
+                counts = self.counts.setdefault(stratum, _StratumCounts(len(self.curve_hours)))
+                counts.observed += observed[i]
+                counts.persisted += persisted[i]
+                counts.escalation_observed += escalation_observed[i]
+                counts.escalated += escalated[i]
+        logger.info(f"Fitted disruption predictor on {len(outcomes.row_ids)} reports, {len(self.counts)} strata.")
+        return self
+
+    # --- Prediction ---
+    def _rates(self, key: tuple) -> Tuple[np.ndarray, float, int]:
+        # Shrink each level's rate towards its parent's, from all incidents down to the key.
+        # A stratum with no reports falls back to its parent's rate, with no support of its own.
+        persist = np.full(len(self.curve_hours), 0.5)
+        escalate, support = 0.5, 0
+        for depth in range(len(key) + 1):
+            counts = self.counts.get(key[:depth])
+            if counts is None:
+                support = 0
+                break
+            persist = (counts.persisted + self.prior_strength * persist) / (counts.observed + self.prior_strength)
+            escalate = ((counts.escalated + self.prior_strength * escalate)
+                        / (counts.escalation_observed + self.prior_strength))
+            support = int(counts.observed[self.curve_hours.index(self.horizon_hours)])
+        return persist, escalate, support
+
+    def predict(self, event_type: Optional[str], sub_event_type: Optional[str], weather: str = UNKNOWN) -> Prediction:
+        """
+        Probability that an incident of this type persists over the horizon, and that
+        it escalates, given the weather category.
+        """
+        # Unknown weather is not a stratum of its own at prediction time: it means any weather.
+        key = (_normalize(event_type), _normalize(sub_event_type))
+        if weather != UNKNOWN:
+            key += (weather,)
+        persist, escalate, support = self._rates(key)
+        p = float(persist[self.curve_hours.index(self.horizon_hours)])
+        return Prediction(
+            event_type=event_type,
+            sub_event_type=sub_event_type,
+            weather=weather,
+            horizon_hours=self.horizon_hours,
+            persist_probability=p,
+            escalate_probability=float(escalate),
+            support=support,
+            confident=support >= self.min_support and abs(p - 0.5) >= self.confidence_margin,
+            curve=dict(zip(self.curve_hours, persist.tolist())),
+        )
+
+    def predict_incidents(self, incidents: List[dict], weather: str = UNKNOWN) -> List[Prediction]:
+        """
+        One prediction per distinct (event type, sub-event type) among the incidents, in first-seen order.
+        """
+        kinds = dict.fromkeys((i.get("event_type"), i.get("sub_event_type")) for i in incidents)
+        return [self.predict(event_type, sub_event_type, weather) for event_type, sub_event_type in kinds]
+
+
+def describe_predictions(incidents: List[dict], predictions: List[Prediction]) -> str:
+    """
+    A short advisory from the statistical predictions, in the register of the prediction agent's.
+    """
+    lines = []
+    for prediction in predictions:
+        places = list(dict.fromkeys(
+            i.get("street_name") or i.get("area_name") for i in incidents
+            if (i.get("event_type"), i.get("sub_event_type")) == (prediction.event_type, prediction.sub_event_type)
+            and (i.get("street_name") or i.get("area_name"))
+        ))
+        kind = prediction.sub_event_type or prediction.event_type or "Incident"
+        where = f" on {', '.join(places[:3])}" if places else ""
+        hours = f"{prediction.horizon_hours:g} hour{'s' if prediction.horizon_hours != 1 else ''}"
+        if prediction.persist_probability >= 0.5:
+            outlook = f"likely to persist over the next {hours} ({prediction.persist_probability:.0%})"
+        else:
+            outlook = f"likely to clear within {hours} ({1 - prediction.persist_probability:.0%})"
+        escalation = "may get worse" if prediction.escalate_probability >= 0.5 else "unlikely to get worse"
+        line = f"- {kind[:1].upper() + kind[1:]}{where}: {outlook}; {escalation} ({prediction.escalate_probability:.0%})."
+        if prediction.weather == RAIN:
+            line += " Rain is forecast."
+        lines.append(line)
+    return "Expected over the next hours, based on similar past incidents:\n" + "\n".join(lines)
+
+
+_disruption_predictor: Optional[DisruptionPredictor] = None
+_disruption_predictor_lock = threading.Lock()
+
+
+def get_disruption_predictor(index: IncidentIndex = None) -> DisruptionPredictor:
+    """
+    Returns the process-wide predictor over the process-wide incident index, refitted
+    after PREDICTOR_REFIT_AFTER_ROWS new rows or when the index is reloaded.
+    """
+    global _disruption_predictor
+    index = index if index is not None else get_incident_index()
+    with _disruption_predictor_lock:
+        model = _disruption_predictor
+        if (model is None or model.fitted_generation != index.generation
+                or len(index) - model.fitted_rows >= PREDICTOR_REFIT_AFTER_ROWS):
+            started = time.perf_counter()
+            model = _disruption_predictor = DisruptionPredictor().fit(index)
+            logger.info(f"Disruption predictor fitted in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        return model
@@ -0,0 +1,203 @@
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .cache import CACHE_DB_PATH
+from .street_index import PlaceNameIndex, normalize_place_name
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+GAZETTEER_SEED_PATH = os.getenv(
+    "GAZETTEER_SEED_PATH", os.path.join(os.path.dirname(__file__), "..", "data", "gazetteer_seed.csv")
+)
+# Learned geocodes live next to the other caches.
+GAZETTEER_DB_PATH = os.getenv("GAZETTEER_DB_PATH", CACHE_DB_PATH)
+# A fuzzy match must score at least this, and beat the runner-up by the margin, to be trusted.
+GAZETTEER_MIN_SCORE = float(os.getenv("GAZETTEER_MIN_SCORE", "0.75"))
+GAZETTEER_MIN_MARGIN = float(os.getenv("GAZETTEER_MIN_MARGIN", "0.1"))
+# Shortest prefix that may resolve to the only place it completes to.
+GAZETTEER_MIN_PREFIX = int(os.getenv("GAZETTEER_MIN_PREFIX", "5"))
+
+
+@dataclass
+class Place:
+    name: str
+    latitude: float
+    longitude: float
+    source: str     # "seed" or "learned"
+
+
+class Gazetteer:
+    """
+    Local place-name -> coordinates lookup, so that common places resolve without
+    a geocoding call.
+
+    Names are normalised (see `normalize_place_name`) and looked up exactly, then as
+    the unique completion of a prefix ("Maratha" -> Marathahalli) via a character
+    trie, then fuzzily (typos, romanisation variants) via a `PlaceNameIndex`. It is
+    seeded from a CSV (name, latitude, longitude, "|"-separated aliases) and learns
+    from every successful geocode; learned places are persisted in SQLite and take
+    precedence over seeds.
+    """
+
+    def __init__(self, db_path: str = GAZETTEER_DB_PATH, seed_path: Optional[str] = GAZETTEER_SEED_PATH,
+                 min_score: float = GAZETTEER_MIN_SCORE, min_margin: float = GAZETTEER_MIN_MARGIN):
+        self.db_path = os.path.abspath(db_path)
+        self.min_margin = min_margin
+        self._lock = threading.RLock()
+        self.places: List[Place] = []
+        self._by_key: Dict[str, int] = {}
+        self._trie: dict = {}
+        self._fuzzy = PlaceNameIndex(min_score=min_score)
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL,
+                    formatted_address TEXT,
+                    learned_at REAL NOT NULL
+                )
+                """
+            )
+        if seed_path:
+            self._load_seed(seed_path)
+        self._load_learned()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def _load_seed(self, seed_path: str):
+        if not os.path.exists(seed_path):
+            logger.warning(f"Gazetteer seed file not found at {seed_path}; starting empty.")
+            return
+        with open(seed_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    latitude, longitude = float(row["latitude"]), float(row["longitude"])
+                except (KeyError, TypeError, ValueError):
+                    logger.warning(f"Skipping invalid gazetteer seed row: {row}")
+                    continue
+                aliases = [a for a in (row.get("aliases") or "").split("|") if a.strip()]
+                place = Place(row["name"], latitude, longitude, "seed")
+                for name in [row["name"], *aliases]:
+                    self._add(name, place)
+
+    def _load_learned(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT name, latitude, longitude FROM geocodes ORDER BY learned_at").fetchall()
+        for name, latitude, longitude in rows:
+            self._add(name, Place(name, latitude, longitude, "learned"))
+
+    def _add(self, name: str, place: Place) -> bool:
+        key = normalize_place_name(name)
+        if key is None:
+            return False
+        with self._lock:
+            index = self._by_key.get(key)
+            if index is not None:
+                self.places[index] = place
+                return True
+            self._by_key[key] = len(self.places)
+            self.places.append(place)
+            node = self._trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[""] = key
+            self._fuzzy.add(key)
+        return True
+
+    def learn(self, name: str, latitude: float, longitude: float, formatted_address: Optional[str] = None) -> bool:
+        """
+        Records a geocoding result so the name resolves locally from now on.
+
+        Returns:
+            False if the name normalises to nothing and was not recorded.
+        """
+        key = normalize_place_name(name)
+        if key is None or not self._add(name, Place(name, latitude, longitude, "learned")):
+            return False
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocodes (key, name, latitude, longitude, formatted_address, learned_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, name, latitude, longitude, formatted_address, time.time()),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist learned geocode for '{name}': {e}")
+        return True
+
+    def _completions(self, key: str, limit: int) -> List[str]:
+        node = self._trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return []
+        found, stack = [], [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            if "" in node:
+                found.append(node[""])
+            stack.extend(child for char, child in node.items() if char)
+        return found
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Place]:
+        """
+        Places whose normalised name starts with the normalised prefix.
+        """
+        key = normalize_place_name(prefix)
+        if key is None:
+            return []
+        with self._lock:
+            return [self.places[self._by_key[k]] for k in self._completions(key, limit)]
+
+    def lookup(self, name: str) -> Optional[Place]:
+        """
+        The place a name refers to, or None if it is unknown or ambiguous.
+        """
+        key = normalize_place_name(name)
+        if key is None:
+            return None
+        with self._lock:
+            index = self._by_key.get(key)
+            if index is not None:
+                return self.places[index]
+
+            if len(key) >= GAZETTEER_MIN_PREFIX:
+                completions = self._completions(key, 2)
+                if len(completions) == 1:
+                    return self.places[self._by_key[completions[0]]]
+
+            hits = self._fuzzy.lookup_many([name], limit=2)[0]
+            if hits and (len(hits) == 1 or hits[0][1] - hits[1][1] >= self.min_margin):
+                return self.places[self._by_key[self._fuzzy.keys[hits[0][0]]]]
+        return None
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    """
+    Returns the process-wide gazetteer, seeded from GAZETTEER_SEED_PATH.
+    """
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer()
+    return _gazetteer
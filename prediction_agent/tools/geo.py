@@ -0,0 +1,347 @@
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def project_equirectangular(lat, lon, lat0: float, lon0: float):
+    """
+    Projects lat/lon degrees to planar metres around (lat0, lon0).
+
+    Accurate to well under 1% over city-sized extents, which is all corridor
+    matching needs, and cheap enough to apply to millions of points at once.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    x = np.radians(lon - lon0) * np.cos(np.radians(lat0)) * EARTH_RADIUS_M
+    y = np.radians(lat - lat0) * EARTH_RADIUS_M
+    return x, y
+
+
+def meters_to_degrees(meters: float, lat0: float):
+    """
+    Converts a distance in metres to (dlat, dlon) degree offsets at latitude lat0.
+    """
+    dlat = np.degrees(meters / EARTH_RADIUS_M)
+    dlon = dlat / max(np.cos(np.radians(lat0)), 1e-6)
+    return dlat, dlon
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in metres; broadcasts over array inputs.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def wrap_longitude(degrees):
+    """
+    Longitude differences in [-180, 180): the short way round, across the antimeridian if need be.
+    """
+    return np.mod(np.asarray(degrees, dtype=np.float64) + 180.0, 360.0) - 180.0
+
+
+def cumulative_lengths(x, y) -> np.ndarray:
+    """
+    Distance along a planar polyline at each vertex, starting at 0.
+    """
+    return np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))])
+
+
+# --- Point-to-segment kernels ---
+# Consecutive segments of a route lie close together, so the bounding-box prefilter tests
+# blocks of this many segments before testing segments one by one.
+SEGMENT_BLOCK_SIZE = 32
+# Upper bound on the (point, segment) pairs the kernels evaluate at once. Chunks this small
+# stay in the CPU cache, which is faster than fewer, larger chunks, and bound the memory.
+KERNEL_CHUNK_PAIRS = 1 << 16
+
+
+@dataclass
+class SegmentDistances:
+    """
+    (point, segment) pairs with the distance from the point to the closest point of
+    the segment, and that closest point's position t in [0, 1] along the segment.
+    """
+    point: np.ndarray
+    segment: np.ndarray
+    distance_m: np.ndarray
+    t: np.ndarray
+
+    def __len__(self):
+        return len(self.point)
+
+
+def _empty_distances() -> SegmentDistances:
+    return SegmentDistances(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+
+class _SegmentFrames:
+    # Each segment in its own equirectangular frame (longitudes scaled by the cosine of the
+    # segment's mid latitude), so the projection error does not grow with the extent of all
+    # segments. Distances in the frames are in degrees of latitude. Longitudes are taken
+    # relative to the segment's start the short way round, so segments and points on either
+    # side of the antimeridian are as close as they are on the globe.
+    def __init__(self, segments):
+        segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+        self.lat_a, self.lon_a, self.lat_b, _ = segments.T
+        self.dlon = wrap_longitude(segments[:, 3] - self.lon_a)
+        self.scale = np.cos(np.radians((self.lat_a + self.lat_b) / 2))
+        self.sx = self.dlon * self.scale
+        self.sy = self.lat_b - self.lat_a
+        length_sq = self.sx * self.sx + self.sy * self.sy
+        # Zero for zero-length segments, whose closest point is their start (t = 0).
+        self.inverse_length_sq = np.divide(1.0, length_sq, out=np.zeros_like(length_sq), where=length_sq > 0)
+
+    def __len__(self):
+        return len(self.lat_a)
+
+    def closest(self, lat, lon, segment=slice(None)):
+        # t of the closest point on each segment, and the squared planar distance to it.
+        scale, sx, sy = self.scale[segment], self.sx[segment], self.sy[segment]
+        px = lon - self.lon_a[segment]
+        px += 180.0
+        np.mod(px, 360.0, out=px)
+        px -= 180.0
+        px *= scale
+        py = lat - self.lat_a[segment]
+        t = px * sx
+        t += py * sy
+        t *= self.inverse_length_sq[segment]
+        np.clip(t, 0.0, 1.0, out=t)
+        px -= t * sx
+        py -= t * sy
+        px *= px
+        py *= py
+        px += py
+        return t, px
+
+    def haversine(self, lat, lon, segment, t):
+        # Great-circle distance from each point to the point at t along its segment.
+        lat_a = self.lat_a[segment]
+        return haversine_m(lat, lon, lat_a + t * (self.lat_b[segment] - lat_a),
+                           self.lon_a[segment] + t * self.dlon[segment])
+
+
+def segment_candidates(lat, lon, segments, margin_m: float,
+                       chunk_pairs: int = KERNEL_CHUNK_PAIRS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (point, segment) pairs where the point lies in the segment's bounding box grown
+    by `margin_m`: a superset of the pairs within `margin_m` of each other.
+
+    Points outside the box of all segments are dropped first. The rest are tested,
+    a chunk at a time, against the boxes of blocks of SEGMENT_BLOCK_SIZE consecutive
+    segments (at most `chunk_pairs` point-block tests at once), and only against the
+    segments of the blocks they hit one by one.
+
+    Args:
+        lat, lon: Point coordinates in degrees.
+        segments: (m, 4) array of (lat_a, lon_a, lat_b, lon_b) segment endpoints.
+
+    Returns:
+        (point indices, segment indices), ordered by point and then segment.
+    """
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    empty = np.empty(0, dtype=np.int64)
+    if not len(lat) or not len(segments):
+        return empty, empty
+
+    # Segments crossing the antimeridian end past +-180 degrees, so their boxes are not the whole globe.
+    lat_a, lon_a, lat_b = segments[:, 0], segments[:, 1], segments[:, 2]
+    lon_b = lon_a + wrap_longitude(segments[:, 3] - lon_a)
+    dlat = np.degrees(margin_m / EARTH_RADIUS_M)
+    min_lat, max_lat = np.minimum(lat_a, lat_b) - dlat, np.maximum(lat_a, lat_b) + dlat
+    # The longitude margin is widest at the box's edge furthest from the equator.
+    dlon = dlat / np.maximum(np.cos(np.radians(np.minimum(np.maximum(np.abs(min_lat), np.abs(max_lat)), 90.0))), 1e-6)
+    min_lon, max_lon = np.minimum(lon_a, lon_b) - dlon, np.maximum(lon_a, lon_b) + dlon
+
+    starts = np.arange(0, len(segments), SEGMENT_BLOCK_SIZE)
+    block_lengths = np.diff(np.append(starts, len(segments)))
+    block_min_lat, block_max_lat = np.minimum.reduceat(min_lat, starts), np.maximum.reduceat(max_lat, starts)
+    block_min_lon, block_max_lon = np.minimum.reduceat(min_lon, starts), np.maximum.reduceat(max_lon, starts)
+
+    # Boxes past +-180 degrees are also tested against the points a turn further round.
+    shifts = [0.0] + [360.0] * bool(max_lon.max() > 180.0) + [-360.0] * bool(min_lon.min() < -180.0)
+    chunk = max(1, chunk_pairs // len(starts))
+    points, hits = [empty], [empty]
+    for shift in shifts:
+        shifted = lon + shift if shift else lon
+        inside = np.flatnonzero((lat >= min_lat.min()) & (lat <= max_lat.max()) &
+                                (shifted >= min_lon.min()) & (shifted <= max_lon.max()))
+        for offset in range(0, len(inside), chunk):
+            idx = inside[offset:offset + chunk]
+            plat, plon = lat[idx][:, None], shifted[idx][:, None]
+            p, b = np.nonzero((plat >= block_min_lat) & (plat <= block_max_lat) &
+                              (plon >= block_min_lon) & (plon <= block_max_lon))
+            if not len(p):
+                continue
+            # Every segment of each block a point hit.
+            lengths = block_lengths[b]
+            firsts = np.cumsum(lengths) - lengths
+            segment = np.arange(lengths.sum()) - np.repeat(firsts, lengths) + np.repeat(starts[b], lengths)
+            p = idx[np.repeat(p, lengths)]
+            plat, plon = lat[p], shifted[p]
+            keep = ((plat >= min_lat[segment]) & (plat <= max_lat[segment]) &
+                    (plon >= min_lon[segment]) & (plon <= max_lon[segment]))
+            points.append(p[keep])
+            hits.append(segment[keep])
+    points, hits = np.concatenate(points), np.concatenate(hits)
+    if len(shifts) > 1:
+        pairs = np.unique(np.column_stack([points, hits]), axis=0)
+        points, hits = pairs[:, 0], pairs[:, 1]
+    return points, hits
+
+
+def segments_within(lat, lon, segments, max_distance_m: float,
+                    chunk_pairs: int = KERNEL_CHUNK_PAIRS) -> SegmentDistances:
+    """
+    Every (point, segment) pair within `max_distance_m`, by great-circle distance from
+    the point to the closest point of the segment.
+
+    Candidates come from `segment_candidates`; exact distances are computed for them a
+    chunk of at most `chunk_pairs` at a time.
+
+    Args:
+        lat, lon: Point coordinates in degrees.
+        segments: (m, 4) array of (lat_a, lon_a, lat_b, lon_b) segment endpoints.
+    """
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+    candidate_points, candidate_segments = segment_candidates(lat, lon, segments, max_distance_m, chunk_pairs)
+    distance, t = pair_distances(lat[candidate_points], lon[candidate_points], segments, candidate_segments,
+                                 chunk_pairs)
+    keep = distance <= max_distance_m
+    return SegmentDistances(candidate_points[keep], candidate_segments[keep], distance[keep], t[keep])
+
+
+def pair_distances(lat, lon, segments, segment_ids,
+                   chunk_pairs: int = KERNEL_CHUNK_PAIRS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Great-circle distance from each point to the closest point of its paired segment,
+    computed a chunk of at most `chunk_pairs` pairs at a time.
+
+    Args:
+        lat, lon: Point coordinates in degrees, one per pair.
+        segments: (m, 4) array of (lat_a, lon_a, lat_b, lon_b) segment endpoints.
+        segment_ids: Index into `segments` of each point's segment.
+
+    Returns:
+        (distance_m, t), where t in [0, 1] is the closest point's position along the segment.
+    """
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+    segment_ids = np.asarray(segment_ids, dtype=np.int64).ravel()
+    frames = _SegmentFrames(segments)
+    distance, t = np.empty(len(lat)), np.empty(len(lat))
+    for offset in range(0, len(lat), chunk_pairs):
+        chunk = slice(offset, offset + chunk_pairs)
+        t[chunk], _ = frames.closest(lat[chunk], lon[chunk], segment_ids[chunk])
+        distance[chunk] = frames.haversine(lat[chunk], lon[chunk], segment_ids[chunk], t[chunk])
+    return distance, t
+
+
+def nearest_segments(lat, lon, segments, max_distance_m: Optional[float] = None,
+                     chunk_pairs: int = KERNEL_CHUNK_PAIRS) -> SegmentDistances:
+    """
+    The nearest segment to each point, with the great-circle distance to it.
+
+    The nearest segment is picked by planar distance in each segment's local frame,
+    which agrees with the great-circle distance to far better than 0.1% over a city.
+    Without `max_distance_m` every pair is evaluated, `chunk_pairs // m` points at a
+    time; with it, only the pairs `segments_within` finds.
+
+    Args:
+        lat, lon: Point coordinates in degrees.
+        segments: (m, 4) array of (lat_a, lon_a, lat_b, lon_b) segment endpoints.
+        max_distance_m: Leave out points with no segment this close.
+
+    Returns:
+        One entry per point that has a nearest segment, ordered by point.
+    """
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+    frames = _SegmentFrames(segments)
+    if max_distance_m is not None:
+        pairs = segments_within(lat, lon, segments, max_distance_m, chunk_pairs)
+        _, planar = frames.closest(lat[pairs.point], lon[pairs.point], pairs.segment)
+        # Closest first within each point, then the first pair of each point.
+        order = np.lexsort((pairs.segment, planar, pairs.point))
+        first = order[np.unique(pairs.point[order], return_index=True)[1]]
+        return SegmentDistances(pairs.point[first], pairs.segment[first], pairs.distance_m[first], pairs.t[first])
+
+    located = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+    if not len(frames) or not len(located):
+        return _empty_distances()
+    best = np.empty(len(located), dtype=np.int64)
+    chunk = max(1, chunk_pairs // len(frames))
+    for offset in range(0, len(located), chunk):
+        idx = located[offset:offset + chunk]
+        _, planar = frames.closest(lat[idx][:, None], lon[idx][:, None])
+        best[offset:offset + len(idx)] = planar.argmin(axis=1)
+    plat, plon = lat[located], lon[located]
+    t, _ = frames.closest(plat, plon, best)
+    return SegmentDistances(located, best, frames.haversine(plat, plon, best, t), t)
+
+
+# --- Reference implementation ---
+# Plain-Python versions of the kernels above, one pair at a time, for checking them.
+
+def _segment_distance_reference(lat: float, lon: float, lat_a: float, lon_a: float,
+                                lat_b: float, lon_b: float) -> Tuple[float, float, float]:
+    # (great-circle distance in metres, planar distance in degrees of latitude, t).
+    def wrap(degrees: float) -> float:
+        return (degrees + 180.0) % 360.0 - 180.0
+
+    scale = math.cos(math.radians((lat_a + lat_b) / 2))
+    dlon = wrap(lon_b - lon_a)
+    sx, sy = dlon * scale, lat_b - lat_a
+    px, py = wrap(lon - lon_a) * scale, lat - lat_a
+    length_sq = sx * sx + sy * sy
+    t = min(max((px * sx + py * sy) / length_sq, 0.0), 1.0) if length_sq > 0 else 0.0
+    planar = math.hypot(px - t * sx, py - t * sy)
+    clat, clon = lat_a + t * (lat_b - lat_a), lon_a + t * dlon
+    phi1, phi2 = math.radians(lat), math.radians(clat)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(clon - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(max(a, 0.0), 1.0))), planar, t
+
+
+def segments_within_reference(points, segments, max_distance_m: float) -> List[Tuple[int, int, float, float]]:
+    """
+    `segments_within` one pair at a time: (point, segment, distance_m, t) tuples.
+    """
+    pairs = []
+    for i, (lat, lon) in enumerate(points):
+        for j, segment in enumerate(segments):
+            distance, _, t = _segment_distance_reference(lat, lon, *segment)
+            if distance <= max_distance_m:
+                pairs.append((i, j, distance, t))
+    return pairs
+
+
+def nearest_segments_reference(points, segments,
+                               max_distance_m: Optional[float] = None) -> List[Tuple[int, int, float, float]]:
+    """
+    `nearest_segments` one pair at a time: (point, segment, distance_m, t) tuples.
+    """
+    nearest = []
+    for i, (lat, lon) in enumerate(points):
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            continue
+        best = None
+        for j, segment in enumerate(segments):
+            distance, planar, t = _segment_distance_reference(lat, lon, *segment)
+            if max_distance_m is not None and distance > max_distance_m:
+                continue
+            if best is None or planar < best[0]:
+                best = (planar, j, distance, t)
+        if best is not None:
+            nearest.append((i, best[1], best[2], best[3]))
+    return nearest
@@ -1,80 +1,71 @@
 import pandas as pd
-from datetime import datetime, timedelta, timezone
-import asyncio # To run the async main function
+import logging
 import time
 
-async def find_location_anomaly_match(locations: list) -> list:
+from .corridor_matcher import ROUTE_CORRIDOR_METERS, CorridorMatcher, get_corridor_matcher
+from .incident_index import IncidentIndex, get_incident_index
+from .recency import RecencyPolicy, get_recency_policy
+
+logger = logging.getLogger(__name__)
+
+def find_location_anomaly_match(locations: list, index: IncidentIndex = None,
+                                policy: RecencyPolicy = None, now: float = None) -> list:
     """
-    Finds matching anomaly records from a Pandas DataFrame based on a list of street names.
+    Finds matching anomaly records in the resident incident index based on a list of street names.
+    CPU-bound; call it from a worker thread in async code.
 
     Args:
         locations: A list of street names to search for.
+        index: The incident index to query (defaults to the process-wide index).
+        policy: Recency windows and severity decay (defaults to the process-wide policy).
+        now: Reference time for the recency windows (defaults to the current time).
 
     Returns:
-        A list of tuples, where each tuple represents a unique matching anomaly record.
+        A list of tuples, where each tuple represents a unique matching anomaly record
+        that is still recent enough to matter, most relevant first.
     """
     # Return early if there's nothing to process
-
-    df = pd.read_csv('/home/ajaynagaraj-m/travelling_in_city/streamlit_ui/submission_history.csv')
-
-    if df.empty or not locations:
+    if not locations:
         return []
 
-    # --- Data Validation ---
-    # Ensure required columns exist to avoid errors
-    required_cols = ['street_name', 'unix_timestamp', 'event_type', 'sub_event_type',
-                     'area_name', 'city', 'description', 'severity_score']
-    if not all(col in df.columns for col in required_cols):
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        raise ValueError(f"DataFrame is missing required columns: {missing_cols}")
-
-
-    # --- Filtering Logic ---
-
-    # 1. Filter by time
-    # Get the timestamp for a very old date to replicate the original query's logic
-    far_in_the_past_ts = (datetime.now(timezone.utc) - timedelta(hours=1000000)).timestamp()
-
-    # Ensure the timestamp column is a numeric type before comparison
-    df['unix_timestamp'] = pd.to_numeric(df['unix_timestamp'], errors='coerce')
-    time_filtered_df = df[df['unix_timestamp'] >= far_in_the_past_ts].copy()
-
-    if time_filtered_df.empty:
+    index = index if index is not None else get_incident_index()
+    if len(index) == 0:
         return []
 
-    # 2. Filter by location
-    # Prepare input location strings for matching (case-insensitive and whitespace-stripped)
-    clean_locations = [loc.strip().lower() for loc in locations]
-    
-    # Prepare the 'street_name' column in the DataFrame for an efficient, case-insensitive match
-    time_filtered_df['processed_street_name'] = time_filtered_df['street_name'].astype(str).str.strip().str.lower()
-
-    # Use .isin() for an efficient lookup of all locations at once
-    matched_df = time_filtered_df[time_filtered_df['processed_street_name'].isin(clean_locations)]
-
-    print("*"*100)
-    print(clean_locations)
-    print(time_filtered_df)
-    print(matched_df)
-    print("*"*100)
-    # --- Process and Return Results ---
-
-    # Define the columns for the final output, matching the original SELECT statement
-    output_columns = [
-        'event_type', 'sub_event_type', 'area_name', 'street_name',
-        'city', 'description', 'severity_score'
-    ]
+    policy = policy if policy is not None else get_recency_policy()
+    matches = index.match_streets(locations, policy=policy, now=now)
+    logger.info(f"Matched {len(matches)} incidents for locations {locations}.")
+    return matches
 
-    # Select the desired columns and remove duplicate rows to ensure unique matches
-    unique_matches_df = matched_df[output_columns].drop_duplicates()
+def find_route_corridor_matches(polyline, corridor_m: float = ROUTE_CORRIDOR_METERS, matcher: CorridorMatcher = None,
+                                policy: RecencyPolicy = None, now: float = None) -> list:
+    """
+    Finds anomaly records located within a corridor around a route.
+    CPU-bound; call it from a worker thread in async code.
 
-    # Convert the final DataFrame rows into a list of tuples for the return value
-    matches = [tuple(row) for row in unique_matches_df.itertuples(index=False, name=None)]
+    Args:
+        polyline: (n, 2) array of (latitude, longitude) route vertices.
+        corridor_m: Half-width of the corridor in metres.
+        matcher: The corridor matcher to query (defaults to the process-wide matcher).
+        policy: Recency windows (defaults to the process-wide policy).
+        now: Reference time for the recency windows (defaults to the current time).
 
+    Returns:
+        A list of unique anomaly tuples (same layout as find_location_anomaly_match),
+        ordered by distance along the route.
+    """
+    matcher = matcher if matcher is not None else get_corridor_matcher()
+    policy = policy if policy is not None else get_recency_policy()
+    now = time.time() if now is None else now
+
+    corridor = matcher.match(polyline, corridor_m, since=now - policy.max_window_seconds)
+    row_ids = corridor.row_ids[matcher.index.within_windows(corridor.row_ids, now, policy)]
+    matches = matcher.index.rows_as_tuples(row_ids)
+    logger.info(f"Matched {len(matches)} incidents within {corridor_m} m of the route.")
     return matches
 
 # --- Example Usage ---
-async def main():
+def main():
     # 1. Create a sample DataFrame that mimics your data structure
     data = {
         'event_type': ['Traffic', 'Infrastructure', 'Traffic', 'Weather'],
@@ -95,9 +86,9 @@ async def main():
     # 2. Define the locations to search for
     locations_to_find = ['main st', 'Maple Drive'] # Note the different casing and spacing
 
-    # 3. Call the function with the DataFrame
+    # 3. Call the function with an index built from the DataFrame
     print(f"Searching for anomalies at: {locations_to_find}...")
-    found_matches = await find_location_anomaly_match(locations_to_find, anomaly_df)
+    found_matches = find_location_anomaly_match(locations_to_find, IncidentIndex.from_frame(anomaly_df))
 
     # 4. Print the results
     if found_matches:
@@ -109,4 +100,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
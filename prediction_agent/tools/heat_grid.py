@@ -0,0 +1,329 @@
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .corridor_matcher import ROUTE_CORRIDOR_METERS
+from .geohash import code_centers, codes_to_strings, encode_codes, strings_to_codes
+from .incident_index import IncidentIndex, get_incident_index
+from .recency import RecencyPolicy, get_recency_policy
+from .risk_view import corridor_cells
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Precision 5 cells are about 5 km across (a city overview), 6 about 1 km, 7 about 150 m (a route corridor).
+HEAT_GRID_PRECISIONS = tuple(sorted(int(p) for p in os.getenv("HEAT_GRID_PRECISIONS", "5,6,7").split(",")))
+
+# Keys are (cell code << _TYPE_BITS) | event type slot, so a cell's event types are adjacent
+# in the sorted keys. Slot 0 is a missing event type, slot c + 1 the event type with code c.
+_TYPE_BITS = 16
+_TYPE_MASK = (1 << _TYPE_BITS) - 1
+UNKNOWN_EVENT_TYPE = "unknown"
+
+# As in the risk view, decay weights are stored relative to a reference time that is
+# moved forward past this many half-lives.
+_MAX_HALF_LIVES = 512.0
+
+
+@dataclass
+class HeatScore:
+    """
+    Incident history of a set of cells: totals and a breakdown per event type.
+    """
+    cells: int
+    incident_count: int
+    max_severity: float
+    decayed_severity: float
+    by_event_type: Dict[str, Tuple[int, float, float]] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "cells": self.cells,
+            "incident_count": self.incident_count,
+            "max_severity": self.max_severity,
+            "decayed_severity": round(self.decayed_severity, 3),
+            "by_event_type": {
+                event_type: {"incident_count": count, "max_severity": maximum, "decayed_severity": round(decayed, 3)}
+                for event_type, (count, maximum, decayed) in self.by_event_type.items()
+            },
+        }
+
+
+class _Layer:
+    # One precision of the grid: sorted (cell, event type) keys with their aggregates,
+    # and the centre of each key's cell.
+    def __init__(self, precision: int):
+        self.precision = precision
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.maxima = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.latitude = np.empty(0, dtype=np.float64)
+        self.longitude = np.empty(0, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def merge(self, keys: np.ndarray, counts: np.ndarray, maxima: np.ndarray, weights: np.ndarray) -> None:
+        # `keys` are distinct and sorted; existing keys are updated in place, new ones inserted.
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        at = positions[found]
+        self.counts[at] += counts[found]
+        np.maximum.at(self.maxima, at, maxima[found])
+        self.weights[at] += weights[found]
+
+        new = ~found
+        if not new.any():
+            return
+        at, new_keys = positions[new], keys[new]
+        latitude, longitude = code_centers(new_keys >> _TYPE_BITS, self.precision)
+        self.keys = np.insert(self.keys, at, new_keys)
+        self.counts = np.insert(self.counts, at, counts[new])
+        self.maxima = np.insert(self.maxima, at, maxima[new])
+        self.weights = np.insert(self.weights, at, weights[new])
+        self.latitude = np.insert(self.latitude, at, latitude)
+        self.longitude = np.insert(self.longitude, at, longitude)
+
+    def positions_of_cells(self, cells: np.ndarray) -> np.ndarray:
+        # Positions of every key of the given cells: one binary search per cell bound.
+        cells = np.unique(np.asarray(cells, dtype=np.int64))
+        low = np.searchsorted(self.keys, cells << _TYPE_BITS)
+        high = np.searchsorted(self.keys, (cells + 1) << _TYPE_BITS)
+        lengths = high - low
+        starts = np.cumsum(lengths) - lengths
+        return np.arange(lengths.sum()) - np.repeat(starts, lengths) + np.repeat(low, lengths)
+
+
+class HeatGrid:
+    """
+    Incident history per geohash cell and event type, at several precisions: the
+    number of incidents, their maximum severity and their decayed severity sum.
+
+    Unlike the risk view, which holds only the incidents inside their recency
+    window, the grid covers the whole history, so it shows where incidents keep
+    happening. Each precision is a sorted array of (cell, event type) keys with
+    aligned aggregate arrays. Rows are encoded once at the finest precision; the
+    coarser cells are the same integer codes shifted right. A batch of rows is
+    aggregated with `np.unique` and `np.bincount` (`np.maximum.at` for the maxima)
+    and merged into each precision, so ingestion costs in proportion to the batch
+    and the number of cells, not the history. Scoring a route or an area is a few
+    binary searches and reductions over the matching keys.
+
+    Decayed sums are kept relative to a reference time, as in `RiskView`, and
+    scaled to the query time when read.
+    """
+
+    def __init__(self, index: IncidentIndex, policy: RecencyPolicy, precisions: Sequence[int] = HEAT_GRID_PRECISIONS):
+        self.index = index
+        self.policy = policy
+        self.precisions = tuple(sorted(precisions))
+        self._lock = threading.RLock()
+        self._generation = None
+        self._reset(time.time())
+
+    def _reset(self, now: float):
+        self._layers = {precision: _Layer(precision) for precision in self.precisions}
+        self._synced_rows = 0
+        self._reference = now
+
+    @property
+    def _half_life_seconds(self) -> Optional[float]:
+        return self.policy.half_life_hours * 3600.0 if self.policy.half_life_hours else None
+
+    def _decay_factor(self, now: float) -> float:
+        half_life = self._half_life_seconds
+        return math.exp2(-(now - self._reference) / half_life) if half_life else 1.0
+
+    def layer(self, precision: int) -> _Layer:
+        if precision not in self._layers:
+            raise ValueError(f"The heat grid has precisions {list(self.precisions)}, not {precision}.")
+        return self._layers[precision]
+
+    def sync(self, now: Optional[float] = None) -> None:
+        """
+        Adds the rows ingested since the last sync (all rows after the index was rebuilt).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            with self.index._lock:
+                if self._generation != self.index.generation:
+                    self._reset(now)
+                    self._generation = self.index.generation
+                rows = np.arange(self._synced_rows, len(self.index))
+                self._synced_rows = len(self.index)
+                if not len(rows):
+                    return
+                timestamps = self.index.unix_timestamp.view[rows]
+                lat, lon = self.index.latitude.view[rows], self.index.longitude.view[rows]
+                severities = np.nan_to_num(self.index.severity_score.view[rows].astype(np.float64))
+                slots = self.index.codes['event_type'].view[rows].astype(np.int64) + 1
+            self._add(timestamps, lat, lon, severities, slots, now)
+
+    def _add(self, timestamps, lat, lon, severities, slots, now: float) -> None:
+        located = np.isfinite(lat) & np.isfinite(lon)
+        timestamps, severities, slots = timestamps[located], severities[located], slots[located]
+        if not len(slots):
+            return
+        finest = encode_codes(lat[located], lon[located], self.precisions[-1])
+
+        half_life = self._half_life_seconds
+        dated = np.isfinite(timestamps)
+        if half_life and dated.any() and (timestamps[dated].max() - self._reference) / half_life > _MAX_HALF_LIVES:
+            self._rebase(now)
+        # Rows without a timestamp are counted but add nothing to the decayed sum.
+        if half_life:
+            weights = severities * np.exp2(np.where(dated, timestamps - self._reference, -np.inf) / half_life)
+        else:
+            weights = np.where(dated, severities, 0.0)
+
+        for precision, layer in self._layers.items():
+            cells = finest >> (5 * (self.precisions[-1] - precision))
+            keys, inverse = np.unique((cells << _TYPE_BITS) | slots, return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(keys))
+            sums = np.bincount(inverse, weights=weights, minlength=len(keys))
+            maxima = np.zeros(len(keys))
+            np.maximum.at(maxima, inverse, severities)
+            layer.merge(keys, counts, maxima, sums)
+
+    def _rebase(self, now: float) -> None:
+        scale = math.exp2(-(now - self._reference) / self._half_life_seconds)
+        for layer in self._layers.values():
+            layer.weights *= scale
+        self._reference = now
+
+    def _event_slot(self, event_type: Optional[str]) -> Optional[int]:
+        if event_type is None:
+            return None
+        if event_type == UNKNOWN_EVENT_TYPE:
+            return 0
+        code = self.index.vocabularies['event_type'].lookup(event_type)
+        # An event type never seen matches no key.
+        return code + 1 if code >= 0 else -1
+
+    def _event_name(self, slot: int) -> str:
+        name = self.index.vocabularies['event_type'].decode(slot - 1)
+        return UNKNOWN_EVENT_TYPE if name is None else name
+
+    def _score(self, layer: _Layer, positions: np.ndarray, cells: int, now: float) -> HeatScore:
+        slots = layer.keys[positions] & _TYPE_MASK
+        counts, maxima = layer.counts[positions], layer.maxima[positions]
+        weights = layer.weights[positions] * self._decay_factor(now)
+        by_event_type = {}
+        for slot in np.unique(slots).tolist():
+            of_type = slots == slot
+            by_event_type[self._event_name(slot)] = (int(counts[of_type].sum()), float(maxima[of_type].max()),
+                                                     float(weights[of_type].sum()))
+        return HeatScore(
+            cells=cells,
+            incident_count=int(counts.sum()),
+            max_severity=float(maxima.max()) if len(maxima) else 0.0,
+            decayed_severity=float(weights.sum()),
+            by_event_type=by_event_type,
+        )
+
+    def score_cells(self, geohashes: Sequence[str], now: Optional[float] = None) -> HeatScore:
+        """
+        Incident history of the given cells, which must all have one of the grid's precisions.
+        """
+        now = time.time() if now is None else now
+        self.sync(now)
+        if not len(geohashes):
+            return HeatScore(cells=0, incident_count=0, max_severity=0.0, decayed_severity=0.0)
+        codes = strings_to_codes(geohashes)
+        with self._lock:
+            layer = self.layer(len(geohashes[0]))
+            return self._score(layer, layer.positions_of_cells(codes), len(np.unique(codes)), now)
+
+    def route_score(self, points, corridor_m: float = ROUTE_CORRIDOR_METERS, now: Optional[float] = None) -> HeatScore:
+        """
+        Incident history of the finest cells a route corridor touches (see `corridor_cells`).
+
+        Args:
+            points: (n, 2) array of (latitude, longitude) route vertices.
+            corridor_m: Half-width of the corridor in metres.
+            now: Reference time for the decay (defaults to the current time).
+        """
+        return self.score_cells(corridor_cells(points, corridor_m, self.precisions[-1]), now)
+
+    def area_score(self, bbox: Tuple[float, float, float, float], precision: Optional[int] = None,
+                   now: Optional[float] = None) -> HeatScore:
+        """
+        Incident history of the cells whose centre lies in `bbox` (min_lat, min_lon, max_lat, max_lon),
+        at the finest precision unless another is given.
+        """
+        now = time.time() if now is None else now
+        self.sync(now)
+        with self._lock:
+            layer = self.layer(precision if precision is not None else self.precisions[-1])
+            positions = np.flatnonzero(self._in_bbox(layer, bbox))
+            return self._score(layer, positions, len(np.unique(layer.keys[positions] >> _TYPE_BITS)), now)
+
+    @staticmethod
+    def _in_bbox(layer: _Layer, bbox) -> np.ndarray:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        return ((layer.latitude >= min_lat) & (layer.latitude <= max_lat)
+                & (layer.longitude >= min_lon) & (layer.longitude <= max_lon))
+
+    def cells(self, precision: int, event_type: Optional[str] = None, bbox=None,
+              now: Optional[float] = None) -> pd.DataFrame:
+        """
+        Every non-empty cell at a precision, for a heatmap: geohash, centre, incident
+        count, max severity and decayed severity sum, over all event types or one.
+
+        Args:
+            precision: One of the grid's precisions.
+            event_type: Only count incidents of this event type ("unknown" for those without one).
+            bbox: Only cells whose centre lies in (min_lat, min_lon, max_lat, max_lon).
+            now: Reference time for the decay (defaults to the current time).
+        """
+        now = time.time() if now is None else now
+        self.sync(now)
+        with self._lock:
+            layer = self.layer(precision)
+            keep = np.ones(len(layer), dtype=bool)
+            slot = self._event_slot(event_type)
+            if slot is not None:
+                keep &= (layer.keys & _TYPE_MASK) == slot
+            if bbox is not None:
+                keep &= self._in_bbox(layer, bbox)
+            # Keys are sorted by cell, so the cells of the kept keys come out sorted too.
+            cells, inverse = np.unique(layer.keys[keep] >> _TYPE_BITS, return_inverse=True)
+            counts = np.bincount(inverse, weights=layer.counts[keep], minlength=len(cells)).astype(np.int64)
+            sums = np.bincount(inverse, weights=layer.weights[keep], minlength=len(cells)) * self._decay_factor(now)
+            maxima = np.zeros(len(cells))
+            np.maximum.at(maxima, inverse, layer.maxima[keep])
+            first = np.searchsorted(inverse, np.arange(len(cells)))
+            latitude, longitude = layer.latitude[keep][first], layer.longitude[keep][first]
+        return pd.DataFrame({
+            "geohash": codes_to_strings(cells, precision),
+            "latitude": latitude,
+            "longitude": longitude,
+            "incident_count": counts,
+            "max_severity": maxima,
+            "decayed_severity": sums,
+        })
+
+
+_heat_grid: Optional[HeatGrid] = None
+
+
+def get_heat_grid() -> HeatGrid:
+    """
+    Returns the process-wide heat grid over the process-wide incident index, updated
+    whenever the index ingests new rows.
+    """
+    global _heat_grid
+    if _heat_grid is None:
+        grid = HeatGrid(get_incident_index(), get_recency_policy())
+        grid.index.add_listener(grid.sync)
+        _heat_grid = grid
+    return _heat_grid
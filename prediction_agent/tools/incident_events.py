@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from watchdog.observers import Observer
+
+from .incident_index import IncidentIndex, _SourceChangeHandler, get_incident_index
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# The ingestion service's report store, to whose `incident_events` table it publishes every
+# finalised report. This is a contract across the service boundary: it must name the same file
+# as the ingestion service's REPORT_STORE_PATH (Data_ingest_1/tools/report_store.py), on a local
+# filesystem both services see, because the subscriber reads the database directly and watches
+# it and its write-ahead log (`<path>-wal`) for commits. The default is that file in a checkout
+# of both services. Startup fails if the path cannot be it; set to "none" to learn of new
+# incidents from the history source alone.
+INCIDENT_EVENT_LOG = os.getenv(
+    "INCIDENT_EVENT_LOG",
+    os.path.join(os.path.dirname(__file__), "..", "..", "Data_ingestion_agents", "Data_ingest_1", "reports.db"),
+)
+# Events read from the log per query.
+INCIDENT_EVENT_BATCH = int(os.getenv("INCIDENT_EVENT_BATCH", "1000"))
+
+
+class IncidentEventSubscriber:
+    """
+    Applies the reports the ingestion service publishes to its event log to the
+    incident index as soon as they are committed.
+
+    The log is a table of the ingestion service's SQLite report store whose event ids
+    are offsets; the subscriber remembers the last one it applied and reads only what
+    follows. It is woken by file-system notifications of writes to the database and
+    its write-ahead log rather than by polling, so a new report reaches the index, and
+    through the index's listeners the risk view, heat grid and advisory cache, within
+    milliseconds. It reads over one long-lived, query-only connection: opening and
+    closing one per read would checkpoint the log and wake the subscriber again. The
+    same report arriving later through the incident history (the UI also appends it
+    to the CSV) is skipped by incident_id. The subscriber also listens to the index:
+    when the index is rebuilt from its source, the log is replayed from the start so
+    no published report is lost.
+    """
+
+    def __init__(self, index: IncidentIndex, path: str = INCIDENT_EVENT_LOG, batch_size: int = INCIDENT_EVENT_BATCH):
+        self.index = index
+        self.path = os.path.abspath(path)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._generation = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._observer = None
+
+    @property
+    def offset(self) -> int:
+        """
+        Id of the last event applied.
+        """
+        return self._offset
+
+    def _read(self, offset: int) -> List[Tuple[int, str]]:
+        # Called with self._lock held.
+        if self._conn is None:
+            if not os.path.exists(self.path):
+                return []
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA query_only = ON")
+        try:
+            return self._conn.execute(
+                "SELECT event_id, report FROM incident_events WHERE event_id > ? ORDER BY event_id LIMIT ?",
+                (offset, self.batch_size),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            # The ingestion service has not created its tables yet.
+            logger.debug(f"Incident event log '{self.path}' not readable yet: {e}")
+            return []
+
+    def apply_new(self) -> int:
+        """
+        Applies the events published since the last call.
+
+        Returns:
+            The number of incidents added to the index (reports it already held are not counted).
+        """
+        added = 0
+        with self._lock:
+            while True:
+                generation = self.index.generation
+                if generation != self._generation:
+                    self._offset, self._generation = 0, generation
+                events = self._read(self._offset)
+                if not events:
+                    break
+                reports = pd.DataFrame([json.loads(report) for _, report in events])
+                with self.index._lock:
+                    if self.index.generation != generation:
+                        # Rebuilt while the events were read: replay from the start.
+                        continue
+                    before = len(self.index)
+                    self.index.append_frame(reports)
+                    added += len(self.index) - before
+                self._offset = events[-1][0]
+                if len(events) < self.batch_size:
+                    break
+        if added:
+            logger.info(f"Applied {added} published incidents (event {self._offset}), {len(self.index)} total.")
+            self.index.notify_listeners()
+        return added
+
+    def start(self) -> None:
+        """
+        Applies the events published so far and subscribes to new ones.
+
+        Raises:
+            FileNotFoundError: The log's directory does not exist.
+            IsADirectoryError: The log's path is a directory.
+            sqlite3.DatabaseError: The log's file is not a SQLite database.
+        """
+        watch_dir = os.path.dirname(self.path)
+        if not os.path.isdir(watch_dir):
+            raise FileNotFoundError(
+                f"Incident event log directory '{watch_dir}' does not exist. INCIDENT_EVENT_LOG must name the "
+                f"ingestion service's report store (its REPORT_STORE_PATH), or be 'none'.")
+        if os.path.isdir(self.path):
+            raise IsADirectoryError(f"Incident event log '{self.path}' is a directory, not the ingestion service's "
+                                    f"report store.")
+        if not os.path.exists(self.path):
+            # The ingestion service creates it when it starts; its first commit wakes the subscriber.
+            logger.warning(f"Incident event log '{self.path}' does not exist yet; waiting for the ingestion service.")
+        self.index.add_listener(self._on_index_change)
+        self.apply_new()
+        self._observer = Observer()
+        # Commits land in the write-ahead log; checkpoints and the first commit touch the database.
+        handler = _SourceChangeHandler([self.path, f"{self.path}-wal"], self._on_change)
+        self._observer.schedule(handler, watch_dir, recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        logger.info(f"Subscribed to published incidents in '{self.path}'.")
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _on_index_change(self):
+        # The index notifies after every change, this subscriber's own included; only a
+        # rebuild (a new generation) needs the log replayed.
+        if self.index.generation != self._generation:
+            self._on_change()
+
+    def _on_change(self):
+        try:
+            self.apply_new()
+        except Exception as e:
+            logger.error(f"Failed to apply published incidents from '{self.path}': {e}", exc_info=True)
+
+
+_incident_event_subscriber: Optional[IncidentEventSubscriber] = None
+
+
+def get_incident_event_subscriber() -> Optional[IncidentEventSubscriber]:
+    """
+    Returns the process-wide subscriber feeding the process-wide incident index, or
+    None when INCIDENT_EVENT_LOG is "none".
+    """
+    global _incident_event_subscriber
+    if _incident_event_subscriber is None and INCIDENT_EVENT_LOG.lower() != "none":
+        _incident_event_subscriber = IncidentEventSubscriber(get_incident_index())
+    return _incident_event_subscriber
@@ -0,0 +1,568 @@
+import io
+import logging
+import math
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from watchdog.events import (EVENT_TYPE_CLOSED, EVENT_TYPE_CREATED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED,
+                             FileSystemEventHandler)
+from watchdog.observers import Observer
+
+from .recency import RecencyPolicy
+from .street_index import PlaceNameIndex, normalize_place_name
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+INCIDENT_HISTORY_CSV = os.getenv(
+    "INCIDENT_HISTORY_CSV",
+    os.path.join(os.path.dirname(__file__), "..", "..", "streamlit_ui", "submission_history.csv"),
+)
+
+# Street/area hits scoring within this margin of a location's best hit are matched too.
+PLACE_MATCH_MARGIN = float(os.getenv("PLACE_MATCH_MARGIN", "0.15"))
+
+REQUIRED_COLUMNS = ['street_name', 'unix_timestamp', 'event_type', 'sub_event_type',
+                    'area_name', 'city', 'description', 'severity_score']
+
+# Columns returned for every match, in the order of the original SELECT statement.
+OUTPUT_COLUMNS = ['event_type', 'sub_event_type', 'area_name', 'street_name',
+                  'city', 'description', 'severity_score']
+
+# String columns that are dictionary-encoded into int32 codes.
+CATEGORICAL_COLUMNS = ['event_type', 'sub_event_type', 'area_name', 'street_name', 'city', 'description']
+
+
+class Vocabulary:
+    """
+    Dictionary encoding of a string column: each distinct value is stored once and
+    rows hold an int32 code. Missing values are encoded as -1.
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value) -> int:
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def encode_many(self, values: Iterable) -> np.ndarray:
+        return np.fromiter((self.encode(v) for v in values), dtype=np.int32)
+
+    def lookup(self, value) -> int:
+        return self.codes.get(value, -1)
+
+    def decode(self, code: int):
+        return self.values[code] if code >= 0 else None
+
+
+class GrowableArray:
+    """
+    A typed NumPy array with amortised O(1) appends (capacity doubling).
+    """
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, values: np.ndarray):
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            capacity = max(needed, 2 * len(self._data))
+            grown = np.empty(capacity, dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._data[:self._size]
+
+
+class IncidentIndex:
+    """
+    Process-resident, column-oriented index of incident history.
+
+    The CSV is parsed once into typed arrays (float64 timestamps and
+    coordinates, float32 severities, int32 dictionary codes for the string
+    columns); afterwards only appended rows are parsed and added. Match
+    queries are answered from memory.
+
+    Row ids are stable. A separate permutation of the row ids in timestamp
+    order (`time_order`, with `sorted_timestamps`) turns a recency window into
+    a binary search and a slice.
+
+    Rows carrying an `incident_id` already in the index are skipped, so the same
+    report arriving from two sources (the CSV and the incident event log) is
+    ingested once.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._reset_columns()
+
+    def _reset_columns(self):
+        # Bumped whenever the arrays are rebuilt, so derived structures know to rebuild too.
+        self.generation = getattr(self, 'generation', -1) + 1
+        self.unix_timestamp = GrowableArray(np.float64)
+        self.latitude = GrowableArray(np.float64)
+        self.longitude = GrowableArray(np.float64)
+        self.severity_score = GrowableArray(np.float32)
+        self.codes = {column: GrowableArray(np.int32) for column in CATEGORICAL_COLUMNS}
+        self.vocabularies = {column: Vocabulary() for column in CATEGORICAL_COLUMNS}
+        # Normalised street/area name -> code, and code -> row ids (postings), used for matching.
+        self.street_keys = Vocabulary()
+        self.street_key_codes = GrowableArray(np.int32)
+        self.street_postings = {}
+        self.area_keys = Vocabulary()
+        self.area_key_codes = GrowableArray(np.int32)
+        self.area_postings = {}
+        # Row ids ordered by timestamp (rows without a timestamp are left out).
+        self.time_order = GrowableArray(np.int64)
+        self.sorted_timestamps = GrowableArray(np.float64)
+        self._window_tables = None
+        # Fuzzy lookup over every distinct street and area key.
+        self.place_names = PlaceNameIndex()
+        # incident_id -> row id, for the rows that have one.
+        self.incident_rows = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "IncidentIndex":
+        index = cls()
+        index.append_frame(df)
+        return index
+
+    def __len__(self):
+        return len(self.unix_timestamp)
+
+    def add_listener(self, callback) -> None:
+        """
+        Registers a no-argument callback run after every refresh that changed the index.
+        """
+        self._listeners.append(callback)
+
+    def notify_listeners(self) -> None:
+        """
+        Runs the registered listeners; whoever changed the index calls this once the change is complete.
+        """
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Incident index listener failed: {e}", exc_info=True)
+
+    # --- Ingestion ---
+    def append_frame(self, df: pd.DataFrame) -> None:
+        """
+        Encodes and appends a batch of incident rows.
+
+        Raises:
+            ValueError: If the batch is missing any of the required columns.
+        """
+        if df.empty:
+            return
+        missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"DataFrame is missing required columns: {missing_cols}")
+
+        def numeric(column):
+            if column not in df.columns:
+                return np.full(len(df), np.nan)
+            return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+
+        with self._lock:
+            first_row = len(self)
+            if 'incident_id' in df.columns:
+                # Reports already ingested (from another source), or repeated within the batch.
+                ids = df['incident_id']
+                has_id = ids.notna() & (ids.astype(str) != '')
+                known = has_id & (ids.map(self.incident_rows.__contains__) | ids.duplicated())
+                if known.any():
+                    df, ids, has_id = df[~known], ids[~known], has_id[~known]
+                    if df.empty:
+                        return
+                new_rows = np.flatnonzero(has_id.to_numpy()) + first_row
+                self.incident_rows.update(zip(ids[has_id].tolist(), new_rows.tolist()))
+            timestamps = numeric('unix_timestamp')
+            self.unix_timestamp.extend(timestamps)
+            self._extend_time_order(timestamps, first_row)
+            self.latitude.extend(numeric('latitude'))
+            self.longitude.extend(numeric('longitude'))
+            self.severity_score.extend(numeric('severity_score').astype(np.float32))
+            for column in CATEGORICAL_COLUMNS:
+                self.codes[column].extend(self.vocabularies[column].encode_many(df[column].tolist()))
+            known_streets, known_areas = len(self.street_keys), len(self.area_keys)
+            street_key_codes = self.street_keys.encode_many(normalize_place_name(v) for v in df['street_name'].tolist())
+            self.street_key_codes.extend(street_key_codes)
+            _extend_postings(self.street_postings, street_key_codes, first_row)
+            area_key_codes = self.area_keys.encode_many(normalize_place_name(v) for v in df['area_name'].tolist())
+            self.area_key_codes.extend(area_key_codes)
+            _extend_postings(self.area_postings, area_key_codes, first_row)
+            for key in self.street_keys.values[known_streets:] + self.area_keys.values[known_areas:]:
+                self.place_names.add(key)
+
+    def _extend_time_order(self, timestamps: np.ndarray, first_row: int) -> None:
+        valid = np.flatnonzero(np.isfinite(timestamps))
+        batch_rows = valid[np.argsort(timestamps[valid], kind='stable')]
+        batch_timestamps = timestamps[batch_rows]
+        batch_rows = batch_rows + first_row
+        if len(batch_rows) == 0:
+            return
+        if len(self.sorted_timestamps) == 0 or batch_timestamps[0] >= self.sorted_timestamps.view[-1]:
+            # The common case: the source is appended in time order.
+            self.time_order.extend(batch_rows)
+            self.sorted_timestamps.extend(batch_timestamps)
+            return
+        # Late rows are merged in; ties keep the earlier rows first.
+        positions = np.searchsorted(self.sorted_timestamps.view, batch_timestamps, side='right')
+        merged_timestamps = np.insert(self.sorted_timestamps.view, positions, batch_timestamps)
+        merged_order = np.insert(self.time_order.view, positions, batch_rows)
+        self.sorted_timestamps = GrowableArray(np.float64, capacity=2 * len(merged_timestamps))
+        self.sorted_timestamps.extend(merged_timestamps)
+        self.time_order = GrowableArray(np.int64, capacity=2 * len(merged_order))
+        self.time_order.extend(merged_order)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset_columns()
+
+    # --- Queries ---
+    def rows_since(self, since: float) -> np.ndarray:
+        """
+        Row ids of incidents with unix_timestamp >= `since`, oldest first, in O(log n + k).
+        """
+        with self._lock:
+            start = np.searchsorted(self.sorted_timestamps.view, since, side='left')
+            return self.time_order.view[start:].copy()
+
+    def window_seconds(self, row_ids: np.ndarray, policy: RecencyPolicy) -> np.ndarray:
+        """
+        Length of each row's recency window under the policy, in seconds.
+        """
+        with self._lock:
+            sub_windows, event_windows = self._window_hours(policy)
+            hours = sub_windows[self.codes['sub_event_type'].view[row_ids]]
+            hours = np.where(np.isnan(hours), event_windows[self.codes['event_type'].view[row_ids]], hours)
+            return np.where(np.isnan(hours), policy.default_window_hours, hours) * 3600.0
+
+    def within_windows(self, row_ids: np.ndarray, now: float, policy: RecencyPolicy) -> np.ndarray:
+        """
+        Boolean mask of the rows still inside the recency window for their event type at `now`.
+        """
+        with self._lock:
+            return self.unix_timestamp.view[row_ids] >= now - self.window_seconds(row_ids, policy)
+
+    def severity_weights(self, row_ids: np.ndarray, now: float, policy: RecencyPolicy) -> np.ndarray:
+        """
+        Severity of each row scaled by the policy's exponential decay of its age (0 if unknown).
+        """
+        with self._lock:
+            severities = np.nan_to_num(self.severity_score.view[row_ids].astype(np.float64))
+            return severities * policy.decay(now - self.unix_timestamp.view[row_ids])
+
+    def _window_hours(self, policy: RecencyPolicy) -> Tuple[np.ndarray, np.ndarray]:
+        # Window per sub-event and event type code, NaN where the policy has none. The
+        # trailing NaN entry is what a missing (-1) code indexes.
+        key = (id(policy), len(self.vocabularies['sub_event_type']), len(self.vocabularies['event_type']))
+        if self._window_tables is None or self._window_tables[0] != key:
+            tables = []
+            for column in ('sub_event_type', 'event_type'):
+                hours = [policy.window_hours(value) for value in self.vocabularies[column].values]
+                tables.append(np.array([np.nan if h is None else h for h in hours] + [np.nan], dtype=np.float64))
+            self._window_tables = (key, tuple(tables))
+        return self._window_tables[1]
+
+    def match_streets(self, locations: list, since: Optional[float] = None,
+                      policy: Optional[RecencyPolicy] = None, now: Optional[float] = None) -> List[Tuple]:
+        """
+        Finds incidents whose street or area name matches any of the given locations.
+
+        Args:
+            locations: Street or area names to search for. Names are normalised and
+                matched fuzzily, so "ORR" or "Outer Ring Rd" find "Outer Ring Road".
+            since: Optional Unix timestamp; older incidents are ignored.
+            policy: Optional recency policy. Incidents outside the window for their
+                event type are ignored, and matches are ordered by decayed severity.
+            now: Reference time for the policy (defaults to the current time).
+
+        Returns:
+            A list of unique (event_type, sub_event_type, area_name, street_name,
+            city, description, severity_score) tuples, in first-seen order (or by
+            decayed severity, most relevant first, when a policy is given).
+        """
+        with self._lock:
+            street_codes, area_codes = set(), set()
+            key_ids = {key_id
+                       for hits in self.place_names.lookup_many(locations)
+                       for key_id, score in hits if score >= hits[0][1] - PLACE_MATCH_MARGIN}
+            for key_id in key_ids:
+                key = self.place_names.keys[key_id]
+                for keys, codes in ((self.street_keys, street_codes), (self.area_keys, area_codes)):
+                    code = keys.lookup(key)
+                    if code >= 0:
+                        codes.add(code)
+            if not street_codes and not area_codes:
+                return []
+
+            if policy is not None:
+                now = time.time() if now is None else now
+                since = max(since if since is not None else -np.inf, now - policy.max_window_seconds)
+            row_ids = self._place_rows(street_codes, area_codes, since)
+            if policy is not None:
+                row_ids = row_ids[self.within_windows(row_ids, now, policy)]
+                row_ids = row_ids[np.argsort(-self.severity_weights(row_ids, now, policy), kind='stable')]
+            return self.rows_as_tuples(row_ids)
+
+    def _place_rows(self, street_codes: set, area_codes: set, since: Optional[float]) -> np.ndarray:
+        # Either walk the postings of the matched places or scan the rows inside the
+        # time window, whichever is shorter, so a narrow window costs little however
+        # long the history is.
+        postings = [self.street_postings[code].view for code in street_codes]
+        postings += [self.area_postings[code].view for code in area_codes]
+        if since is not None:
+            start = np.searchsorted(self.sorted_timestamps.view, since, side='left')
+            if len(self.time_order) - start < sum(len(p) for p in postings):
+                window = self.time_order.view[start:]
+                in_place = np.isin(self.street_key_codes.view[window], list(street_codes))
+                in_place |= np.isin(self.area_key_codes.view[window], list(area_codes))
+                return np.sort(window[in_place])
+        row_ids = np.unique(np.concatenate(postings))
+        timestamps = self.unix_timestamp.view[row_ids]
+        keep = timestamps >= since if since is not None else ~np.isnan(timestamps)
+        return row_ids[keep]
+
+    def rows_as_tuples(self, row_ids: np.ndarray) -> List[Tuple]:
+        """
+        Decodes rows into unique OUTPUT_COLUMNS tuples, preserving first-seen order.
+        """
+        with self._lock:
+            code_rows = [self.codes[column].view[row_ids].tolist() for column in OUTPUT_COLUMNS if column != 'severity_score']
+            severities = self.severity_score.view[row_ids]
+            severities = np.where(np.isfinite(severities), severities, -1).astype(np.int64)
+            unique_rows = dict.fromkeys(
+                zip(*code_rows, severities.tolist())
+            )
+            matches = []
+            for event_type, sub_event_type, area_name, street_name, city, description, severity in unique_rows:
+                matches.append((
+                    self.vocabularies['event_type'].decode(event_type),
+                    self.vocabularies['sub_event_type'].decode(sub_event_type),
+                    self.vocabularies['area_name'].decode(area_name),
+                    self.vocabularies['street_name'].decode(street_name),
+                    self.vocabularies['city'].decode(city),
+                    self.vocabularies['description'].decode(description),
+                    severity if severity >= 0 else None,
+                ))
+            return matches
+
+
+def _extend_postings(postings: dict, codes: np.ndarray, first_row: int) -> None:
+    """
+    Appends the row ids of a batch to per-code postings lists (missing codes are skipped).
+    """
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    unique_codes, starts = np.unique(sorted_codes, return_index=True)
+    ends = np.append(starts[1:], len(sorted_codes))
+    for code, start, end in zip(unique_codes.tolist(), starts.tolist(), ends.tolist()):
+        if code < 0:
+            continue
+        posting = postings.get(code)
+        if posting is None:
+            posting = postings[code] = GrowableArray(np.int64, capacity=16)
+        posting.extend(order[start:end] + first_row)
+
+
+class CsvTailReader:
+    """
+    Reads an append-only CSV incrementally, remembering the byte offset of the last
+    complete record. A replaced (new inode), truncated or rewritten file is detected
+    and read from scratch.
+    """
+
+    # Bytes just before the offset that are compared on every read to detect rewrites.
+    FINGERPRINT_BYTES = 64
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._header = b""
+        self._offset = 0
+        self._fingerprint = b""
+        self._inode = None
+
+    def read_new(self) -> Tuple[pd.DataFrame, bool]:
+        """
+        Returns the rows appended since the last call, and whether the file was
+        rewritten (in which case the frame holds the whole file and any
+        previously loaded rows must be discarded).
+        """
+        if not os.path.exists(self.path):
+            return pd.DataFrame(), False
+
+        with open(self.path, 'rb') as csv_file:
+            inode = os.fstat(csv_file.fileno()).st_ino
+            reset = self._offset == 0 or inode != self._inode or not self._unchanged_prefix(csv_file)
+            self._inode = inode
+            if reset:
+                self._offset = 0
+                # The prefix check may have moved the file position.
+                csv_file.seek(0)
+                self._header = csv_file.readline()
+                self._offset = csv_file.tell()
+            else:
+                csv_file.seek(self._offset)
+
+            chunk = csv_file.read()
+            complete = _complete_records_length(chunk)
+            if complete == 0:
+                self._remember_fingerprint(csv_file)
+                return pd.DataFrame(columns=_parse_header(self._header)), reset
+
+            self._offset += complete
+            self._remember_fingerprint(csv_file)
+
+        df = pd.read_csv(io.BytesIO(self._header + chunk[:complete]))
+        return df, reset
+
+    def _unchanged_prefix(self, csv_file) -> bool:
+        size = os.fstat(csv_file.fileno()).st_size
+        if size < self._offset:
+            return False
+        header = csv_file.readline()
+        if header != self._header:
+            return False
+        csv_file.seek(self._offset - len(self._fingerprint))
+        return csv_file.read(len(self._fingerprint)) == self._fingerprint
+
+    def _remember_fingerprint(self, csv_file):
+        start = max(self._offset - self.FINGERPRINT_BYTES, len(self._header))
+        csv_file.seek(start)
+        self._fingerprint = csv_file.read(self._offset - start)
+
+
+def _parse_header(header: bytes) -> List[str]:
+    return list(pd.read_csv(io.BytesIO(header)).columns) if header.strip() else []
+
+
+def _complete_records_length(chunk: bytes) -> int:
+    """
+    Length of the longest prefix of `chunk` that ends on a record boundary: a newline
+    outside of any quoted field. A record still being written is left for the next read.
+    """
+    end = chunk.rfind(b'\n')
+    while end >= 0:
+        if chunk.count(b'"', 0, end) % 2 == 0:
+            return end + 1
+        end = chunk.rfind(b'\n', 0, end)
+    return 0
+
+
+class _SourceChangeHandler(FileSystemEventHandler):
+    # Runs `callback` when one of `paths` is written, created or moved into place. Opens and
+    # read-only closes are ignored: the callback itself reads the file and must not re-trigger.
+    _WRITE_EVENTS = {EVENT_TYPE_MODIFIED, EVENT_TYPE_CREATED, EVENT_TYPE_MOVED, EVENT_TYPE_CLOSED}
+
+    def __init__(self, paths: Iterable[str], callback):
+        self._paths = {os.path.abspath(path) for path in paths}
+        self._callback = callback
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in self._WRITE_EVENTS:
+            return
+        paths = {getattr(event, 'src_path', None), getattr(event, 'dest_path', None)}
+        if self._paths & {os.path.abspath(p) for p in paths if p}:
+            self._callback()
+
+
+class WatchedIncidentIndex(IncidentIndex):
+    """
+    An IncidentIndex kept in sync with a CSV file: loaded once on `start()` and
+    refreshed with only the appended rows whenever the file changes.
+    """
+
+    def __init__(self, path: str = INCIDENT_HISTORY_CSV):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self._reader = CsvTailReader(self.path)
+        self._refresh_lock = threading.Lock()
+        self._observer = None
+
+    def refresh(self) -> int:
+        """
+        Ingests rows appended since the last refresh.
+
+        Returns:
+            The number of rows ingested.
+        """
+        with self._refresh_lock:
+            df, reset = self._reader.read_new()
+            with self._lock:
+                if reset:
+                    self._reset_columns()
+                self.append_frame(df)
+        if reset or not df.empty:
+            logger.info(f"Incident index {'reloaded' if reset else 'refreshed'}: +{len(df)} rows, {len(self)} total.")
+            self.notify_listeners()
+        return len(df)
+
+    def start(self) -> None:
+        self.refresh()
+        watch_dir = os.path.dirname(self.path)
+        if not os.path.isdir(watch_dir):
+            logger.warning(f"Incident source directory '{watch_dir}' does not exist; not watching for appends.")
+            return
+        self._observer = Observer()
+        self._observer.schedule(_SourceChangeHandler([self.path], self._on_change), watch_dir, recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        logger.info(f"Watching '{self.path}' for new incidents.")
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+    def _on_change(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Failed to refresh incident index from '{self.path}': {e}", exc_info=True)
+
+
+_incident_index: Optional[IncidentIndex] = None
+
+
+def get_incident_index() -> IncidentIndex:
+    """
+    Returns the process-wide incident index: over INCIDENT_HISTORY_CSV, or loaded from
+    the incident store when INCIDENT_STORE_BACKEND names one (see `tools/incident_store.py`).
+    """
+    global _incident_index
+    if _incident_index is None:
+        from .incident_store import INCIDENT_STORE_BACKEND, StoreIncidentIndex, get_incident_store
+
+        if INCIDENT_STORE_BACKEND == "csv":
+            _incident_index = WatchedIncidentIndex(INCIDENT_HISTORY_CSV)
+        else:
+            _incident_index = StoreIncidentIndex(get_incident_store(INCIDENT_STORE_BACKEND))
+    return _incident_index
@@ -0,0 +1,321 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .incident_index import IncidentIndex, REQUIRED_COLUMNS
+from .recency import get_recency_policy
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# "csv" keeps the resident index on INCIDENT_HISTORY_CSV; "sqlite" and "bigquery" load it
+# from an incident store instead.
+INCIDENT_STORE_BACKEND = os.getenv("INCIDENT_STORE_BACKEND", "csv").lower()
+INCIDENT_STORE_PATH = os.getenv("INCIDENT_STORE_PATH", os.path.join(os.path.dirname(__file__), "..", "incidents.db"))
+# Fully qualified table, e.g. "my-project.city.incidents".
+INCIDENT_BIGQUERY_TABLE = os.getenv("INCIDENT_BIGQUERY_TABLE", "")
+# How often the store-backed index polls for new rows, and how far back each poll
+# reaches past the last row seen, for rows committed out of order.
+INCIDENT_STORE_POLL_SECONDS = float(os.getenv("INCIDENT_STORE_POLL_SECONDS", "30"))
+INCIDENT_STORE_SYNC_OVERLAP_SECONDS = float(os.getenv("INCIDENT_STORE_SYNC_OVERLAP_SECONDS", "300"))
+# Rows outside this region or below this severity are never loaded (unset: no limit).
+INCIDENT_STORE_BBOX = os.getenv("INCIDENT_STORE_BBOX", "")  # "min_lat,min_lon,max_lat,max_lon"
+INCIDENT_STORE_MIN_SEVERITY = os.getenv("INCIDENT_STORE_MIN_SEVERITY", "")
+
+# Columns kept by every store: what the index needs, plus an id and the time the row
+# reached the store (for incremental sync).
+STORE_COLUMNS = ['incident_id', 'inserted_at'] + REQUIRED_COLUMNS + ['latitude', 'longitude']
+_NUMERIC_COLUMNS = {'inserted_at', 'unix_timestamp', 'severity_score', 'latitude', 'longitude'}
+
+
+@dataclass
+class IncidentQuery:
+    """
+    Predicates pushed down to the store; unset ones do not filter. Times are unix
+    seconds, `since` inclusive and `until` exclusive; `bbox` is (min_lat, min_lon,
+    max_lat, max_lon).
+    """
+    since: Optional[float] = None
+    until: Optional[float] = None
+    inserted_since: Optional[float] = None
+    bbox: Optional[Tuple[float, float, float, float]] = None
+    min_severity: Optional[float] = None
+    limit: Optional[int] = None
+
+    def where(self, placeholder: Callable[[str], str]) -> Tuple[str, Dict[str, float]]:
+        """
+        The WHERE clause (empty if nothing filters) and its parameters, with parameters
+        written by `placeholder(name)` in the engine's style. Values never enter the SQL.
+        """
+        clauses, params = [], {}
+
+        def compare(column: str, op: str, name: str, value) -> None:
+            clauses.append(f"{column} {op} {placeholder(name)}")
+            params[name] = float(value)
+
+        if self.since is not None:
+            compare("unix_timestamp", ">=", "since", self.since)
+        if self.until is not None:
+            compare("unix_timestamp", "<", "until", self.until)
+        if self.inserted_since is not None:
+            compare("inserted_at", ">=", "inserted_since", self.inserted_since)
+        if self.bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = self.bbox
+            compare("latitude", ">=", "min_lat", min_lat)
+            compare("latitude", "<=", "max_lat", max_lat)
+            compare("longitude", ">=", "min_lon", min_lon)
+            compare("longitude", "<=", "max_lon", max_lon)
+        if self.min_severity is not None:
+            compare("severity_score", ">=", "min_severity", self.min_severity)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def store_frame(df: pd.DataFrame, inserted_at: Optional[float] = None) -> pd.DataFrame:
+    """
+    `df` with exactly STORE_COLUMNS: missing columns are added empty, rows without an
+    incident_id get a new one and `inserted_at` is stamped.
+
+    Raises:
+        ValueError: If the batch is missing any of the columns the index requires.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"DataFrame is missing required columns: {missing}")
+    frame = df.reindex(columns=STORE_COLUMNS).copy()
+    ids = frame['incident_id']
+    frame['incident_id'] = [value if isinstance(value, str) and value else uuid.uuid4().hex for value in ids]
+    frame['inserted_at'] = time.time() if inserted_at is None else inserted_at
+    for column in _NUMERIC_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce')
+    return frame
+
+
+class IncidentStore(ABC):
+    """
+    Durable incident history that filters where the data lives: time, location and
+    severity predicates (see `IncidentQuery`) run as parameterised SQL, so only
+    matching rows leave storage.
+    """
+
+    @abstractmethod
+    def query(self, query: IncidentQuery) -> pd.DataFrame:
+        """
+        Rows matching `query`, with STORE_COLUMNS, oldest first.
+        """
+
+    @abstractmethod
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        Adds incident rows (see `store_frame`).
+
+        Returns:
+            The number of rows added.
+        """
+
+    def _select(self, query: IncidentQuery, table: str, placeholder: Callable[[str], str]) -> Tuple[str, dict]:
+        where, params = query.where(placeholder)
+        sql = f"SELECT {', '.join(STORE_COLUMNS)} FROM {table}{where} ORDER BY unix_timestamp"
+        if query.limit is not None:
+            sql += f" LIMIT {placeholder('limit')}"
+            params['limit'] = int(query.limit)
+        return sql, params
+
+
+class SqliteIncidentStore(IncidentStore):
+    """
+    Embedded store for development and single-node deployments, in one SQLite file.
+    """
+
+    def __init__(self, db_path: str = INCIDENT_STORE_PATH):
+        self.db_path = os.path.abspath(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        columns = ",\n".join(
+            f"{column} {'REAL' if column in _NUMERIC_COLUMNS else 'TEXT'}"
+            + (" PRIMARY KEY" if column == 'incident_id' else "")
+            for column in STORE_COLUMNS
+        )
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS incidents ({columns})")
+            conn.execute("CREATE INDEX IF NOT EXISTS incidents_time ON incidents (unix_timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS incidents_inserted ON incidents (inserted_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS incidents_location ON incidents (latitude, longitude)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def query(self, query: IncidentQuery) -> pd.DataFrame:
+        sql, params = self._select(query, "incidents", lambda name: f":{name}")
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def append(self, df: pd.DataFrame) -> int:
+        frame = store_frame(df)
+        rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO incidents ({', '.join(STORE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in STORE_COLUMNS)})",
+                rows,
+            )
+        return len(frame)
+
+
+class BigQueryIncidentStore(IncidentStore):
+    """
+    Incident history in a BigQuery table with (at least) STORE_COLUMNS, numeric ones as
+    FLOAT64 or INT64. Predicates are sent as query parameters, so the scan is billed
+    for the filtered columns only and just the matching rows are downloaded.
+    """
+
+    def __init__(self, table: str = INCIDENT_BIGQUERY_TABLE, client=None):
+        from google.cloud import bigquery
+
+        if not table:
+            raise ValueError("INCIDENT_BIGQUERY_TABLE is not set.")
+        self.table = table
+        self._bigquery = bigquery
+        self.client = client if client is not None else bigquery.Client()
+
+    def query(self, query: IncidentQuery) -> pd.DataFrame:
+        sql, params = self._select(query, f"`{self.table}`", lambda name: f"@{name}")
+        job_config = self._bigquery.QueryJobConfig(query_parameters=[
+            self._bigquery.ScalarQueryParameter(name, "INT64" if isinstance(value, int) else "FLOAT64", value)
+            for name, value in params.items()
+        ])
+        df = self.client.query(sql, job_config=job_config).to_dataframe()
+        return df.reindex(columns=STORE_COLUMNS)
+
+    def append(self, df: pd.DataFrame) -> int:
+        frame = store_frame(df)
+        records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+        errors = self.client.insert_rows_json(self.table, records, row_ids=frame['incident_id'].tolist())
+        if errors:
+            raise RuntimeError(f"BigQuery rejected {len(errors)} incident rows: {errors[:3]}")
+        return len(frame)
+
+
+def store_query_from_env(now: Optional[float] = None) -> IncidentQuery:
+    """
+    What the resident index loads: incidents still inside the longest recency window,
+    within INCIDENT_STORE_BBOX and at or above INCIDENT_STORE_MIN_SEVERITY if set.
+    """
+    now = time.time() if now is None else now
+    bbox = tuple(float(v) for v in INCIDENT_STORE_BBOX.split(",")) if INCIDENT_STORE_BBOX else None
+    return IncidentQuery(
+        since=now - get_recency_policy().max_window_seconds,
+        bbox=bbox,
+        min_severity=float(INCIDENT_STORE_MIN_SEVERITY) if INCIDENT_STORE_MIN_SEVERITY else None,
+    )
+
+
+class StoreIncidentIndex(IncidentIndex):
+    """
+    An IncidentIndex loaded from an IncidentStore: on `start()` with the rows of
+    `store_query_from_env`, then by polling for rows inserted since the last poll
+    (less an overlap, for rows committed late; rows already loaded are skipped).
+    Rows that age out of the recency windows stay in memory until the next restart
+    but are ignored by every match.
+    """
+
+    def __init__(self, store: IncidentStore, poll_seconds: float = INCIDENT_STORE_POLL_SECONDS):
+        super().__init__()
+        self.store = store
+        self.poll_seconds = poll_seconds
+        self._query: Optional[IncidentQuery] = None
+        self._high_water: Optional[float] = None
+        self._recent_ids: Dict[str, float] = {}
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+
+    def refresh(self) -> int:
+        """
+        Ingests rows added to the store since the last refresh.
+
+        Returns:
+            The number of rows ingested.
+        """
+        with self._refresh_lock:
+            if self._query is None:
+                self._query = store_query_from_env()
+                query = self._query
+            else:
+                query = IncidentQuery(**{**self._query.__dict__,
+                                         "inserted_since": self._high_water - INCIDENT_STORE_SYNC_OVERLAP_SECONDS})
+            df = self.store.query(query)
+            if len(df):
+                df = df[~df['incident_id'].isin(self._recent_ids)]
+            if len(df):
+                inserted = df['inserted_at'].to_numpy(dtype=np.float64)
+                self._high_water = max(self._high_water or 0.0, float(np.nanmax(inserted)))
+                self._recent_ids.update(zip(df['incident_id'], inserted))
+            elif self._high_water is None:
+                self._high_water = time.time()
+            # Only ids inside the next poll's overlap can come back.
+            horizon = self._high_water - INCIDENT_STORE_SYNC_OVERLAP_SECONDS
+            self._recent_ids = {i: t for i, t in self._recent_ids.items() if t >= horizon}
+            self.append_frame(df)
+        if len(df):
+            logger.info(f"Incident index refreshed from the store: +{len(df)} rows, {len(self)} total.")
+            self.notify_listeners()
+        return len(df)
+
+    def start(self) -> None:
+        self.refresh()
+        self._stop.clear()
+        self._poller = threading.Thread(target=self._poll, name="incident-store-poller", daemon=True)
+        self._poller.start()
+        logger.info(f"Polling the incident store every {self.poll_seconds:.0f}s for new incidents.")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout=5)
+            self._poller = None
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh incident index from the store: {e}", exc_info=True)
+
+
+def get_incident_store(backend: str = INCIDENT_STORE_BACKEND) -> IncidentStore:
+    """
+    Returns the incident store for INCIDENT_STORE_BACKEND ("sqlite" or "bigquery").
+
+    Raises:
+        ValueError: For any other backend.
+    """
+    if backend == "sqlite":
+        return SqliteIncidentStore(INCIDENT_STORE_PATH)
+    if backend == "bigquery":
+        return BigQueryIncidentStore(INCIDENT_BIGQUERY_TABLE)
+    raise ValueError(f"Unknown incident store backend '{backend}'.")
+
+
+if __name__ == "__main__":
+    # Copies an incident history CSV (default: INCIDENT_HISTORY_CSV) into the configured
+    # store, or the SQLite store while the backend is still "csv":
+    #     python -m tools.incident_store [path/to/history.csv]
+    import sys
+
+    from .incident_index import INCIDENT_HISTORY_CSV
+
+    logging.basicConfig(level=logging.INFO)
+    path = sys.argv[1] if len(sys.argv) > 1 else INCIDENT_HISTORY_CSV
+    backend = INCIDENT_STORE_BACKEND if INCIDENT_STORE_BACKEND != "csv" else "sqlite"
+    added = get_incident_store(backend).append(pd.read_csv(path))
+    print(f"Copied {added} incidents from '{path}' into the {backend} incident store.")
@@ -0,0 +1,54 @@
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Samples kept per recorder; percentiles cover the most recent ones.
+LATENCY_WINDOW = 1024
+
+
+class LatencyRecorder:
+    """
+    Recent samples of one latency (e.g. time to first token), summarised as percentiles.
+    """
+
+    def __init__(self, name: str, window: int = LATENCY_WINDOW):
+        self.name = name
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = np.array(self._samples, dtype=np.float64)
+            count = self.count
+        if not len(samples):
+            return {"count": count, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        p50, p95 = np.percentile(samples, [50, 95]) * 1000
+        return {"count": count, "p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1),
+                "max_ms": round(float(samples.max() * 1000), 1)}
+
+
+_recorders: Dict[str, LatencyRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_latency_recorder(name: str, window: Optional[int] = None) -> LatencyRecorder:
+    """
+    Returns the process-wide recorder with the given name, creating it on first use.
+    """
+    with _recorders_lock:
+        recorder = _recorders.get(name)
+        if recorder is None:
+            recorder = _recorders[name] = LatencyRecorder(name, window or LATENCY_WINDOW)
+        return recorder
+
+
+def latency_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: recorder.snapshot() for name, recorder in _recorders.items()}
@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# How long an incident stays relevant to a prediction, by sub-event type or event type
+# (lower-cased; the sub-event type wins). Override with a JSON object in RECENCY_WINDOWS_HOURS.
+DEFAULT_RECENCY_WINDOWS_HOURS = {
+    # Weather clears within hours; the damage it leaves lasts longer.
+    "heavy rain": 6, "waterlogging": 12, "flooding": 24, "sewage overflow": 48,
+    "storms": 12, "fallen trees": 72, "damaged power lines": 72, "structural impact": 24 * 14,
+    # Traffic anomalies are short-lived.
+    "accident": 3, "road block": 12, "signal failure": 12, "illegal parking": 2,
+    "traffic anomaly": 6,
+    # Infrastructure problems persist until someone fixes them.
+    "pothole": 24 * 30, "sinkhole": 24 * 30, "streetlight outage": 24 * 14, "open manhole": 24 * 14,
+    "infrastructure issue": 24 * 21, "structural damage": 24 * 30,
+    "utility disruption": 24, "power outage": 24,
+    "public safety concern": 24 * 7, "environmental hazard": 24 * 7, "unusual activity": 12,
+    "weather-related damage": 24,
+    # Reports of nothing wrong carry no signal.
+    "normal": 0,
+}
+DEFAULT_RECENCY_WINDOW_HOURS = float(os.getenv("DEFAULT_RECENCY_WINDOW_HOURS", "168"))
+# Half-life of an incident's severity weight; 0 disables decay.
+SEVERITY_HALF_LIFE_HOURS = float(os.getenv("SEVERITY_HALF_LIFE_HOURS", "48"))
+
+
+@dataclass
+class RecencyPolicy:
+    """
+    Per-event-type recency windows and exponential severity decay for incident lookups.
+    """
+    windows_hours: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_RECENCY_WINDOWS_HOURS))
+    default_window_hours: float = DEFAULT_RECENCY_WINDOW_HOURS
+    half_life_hours: Optional[float] = SEVERITY_HALF_LIFE_HOURS
+
+    def __post_init__(self):
+        self.windows_hours = {k.strip().lower(): float(v) for k, v in self.windows_hours.items()}
+
+    def window_hours(self, event_type: Optional[str], sub_event_type: Optional[str] = None) -> Optional[float]:
+        """
+        The window configured for a sub-event type or, failing that, its event type (None if neither is).
+        """
+        for name in (sub_event_type, event_type):
+            if isinstance(name, str) and name.strip().lower() in self.windows_hours:
+                return self.windows_hours[name.strip().lower()]
+        return None
+
+    @property
+    def max_window_seconds(self) -> float:
+        return max([self.default_window_hours, *self.windows_hours.values()]) * 3600.0
+
+    def decay(self, age_seconds: np.ndarray) -> np.ndarray:
+        """
+        Weight of an incident of the given age: halves every `half_life_hours` (1.0 without decay).
+        """
+        age_seconds = np.maximum(np.asarray(age_seconds, dtype=np.float64), 0.0)
+        if not self.half_life_hours:
+            return np.ones_like(age_seconds)
+        return np.exp2(-age_seconds / (self.half_life_hours * 3600.0))
+
+
+_recency_policy: Optional[RecencyPolicy] = None
+
+
+def get_recency_policy() -> RecencyPolicy:
+    """
+    Returns the process-wide recency policy, with windows overridden from RECENCY_WINDOWS_HOURS.
+    """
+    global _recency_policy
+    if _recency_policy is None:
+        windows = dict(DEFAULT_RECENCY_WINDOWS_HOURS)
+        overrides = os.getenv("RECENCY_WINDOWS_HOURS")
+        if overrides:
+            try:
+                windows.update(json.loads(overrides))
+            except (ValueError, TypeError) as e:
+                logger.error(f"Ignoring invalid RECENCY_WINDOWS_HOURS: {e}")
+        _recency_policy = RecencyPolicy(windows_hours=windows)
+    return _recency_policy
@@ -0,0 +1,321 @@
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .corridor_matcher import ROUTE_CORRIDOR_METERS
+from .geo import meters_to_degrees, project_equirectangular
+from .geohash import cell_size, encode_many
+from .incident_index import IncidentIndex, get_incident_index
+from .recency import RecencyPolicy, get_recency_policy
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Precision 7 cells are about 150 m x 150 m, the width of the default route corridor.
+RISK_VIEW_GEOHASH_PRECISION = int(os.getenv("RISK_VIEW_GEOHASH_PRECISION", "7"))
+
+# Decay weights are stored relative to a reference time; past this many half-lives
+# the reference is moved forward so the weights stay well inside float64 range.
+_MAX_HALF_LIVES = 512.0
+
+
+@dataclass
+class RouteRisk:
+    """
+    Aggregate risk of the active incidents in the cells around a route.
+    """
+    cells: int
+    incident_count: int
+    max_severity: float
+    decayed_severity: float
+    row_ids: np.ndarray
+    cell_ids: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "cells": self.cells,
+            "incident_count": self.incident_count,
+            "max_severity": self.max_severity,
+            "decayed_severity": round(self.decayed_severity, 3),
+        }
+
+
+def corridor_cells(points, corridor_m: float = ROUTE_CORRIDOR_METERS,
+                   precision: int = RISK_VIEW_GEOHASH_PRECISION) -> List[str]:
+    """
+    Geohash cells that intersect the bounding box of a corridor around a route.
+
+    The route is densified to half a cell between samples, and every cell index range
+    a sample's corridor box spans is collected in integer cell coordinates, so only
+    the distinct cells are geohash-encoded.
+
+    Args:
+        points: (n, 2) array of (latitude, longitude) route vertices.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    points = points[np.isfinite(points).all(axis=1)]
+    if not len(points):
+        return []
+    lat_size, lon_size = cell_size(precision)
+    lat0, lon0 = points[:, 0].mean(), points[:, 1].mean()
+
+    if len(points) > 1:
+        # Samples per segment, so consecutive samples are at most half a cell apart.
+        cell_m = min(lat_size, lon_size) / 2 / max(meters_to_degrees(1.0, lat0))
+        x, y = project_equirectangular(points[:, 0], points[:, 1], lat0, lon0)
+        samples = np.maximum(np.ceil(np.hypot(np.diff(x), np.diff(y)) / cell_m), 1).astype(np.int64)
+        segment = np.repeat(np.arange(len(samples)), samples)
+        t = (np.arange(len(segment)) - np.repeat(np.cumsum(samples) - samples, samples)) / samples[segment]
+        a, b = points[:-1][segment], points[1:][segment]
+        points = np.vstack([a + (b - a) * t[:, None], points[-1:]])
+
+    dlat, dlon = meters_to_degrees(corridor_m, lat0)
+    ranges = []
+    for values, delta, size, offset in ((points[:, 0], dlat, lat_size, 90.0), (points[:, 1], dlon, lon_size, 180.0)):
+        low = np.floor((values - delta + offset) / size).astype(np.int64)
+        high = np.floor((values + delta + offset) / size).astype(np.int64)
+        ranges.append((low, high))
+    (lat_low, lat_high), (lon_low, lon_high) = ranges
+    span_lat = np.arange(int((lat_high - lat_low).max()) + 1)
+    span_lon = np.arange(int((lon_high - lon_low).max()) + 1)
+    lat_idx = lat_low[:, None, None] + span_lat[None, :, None]
+    lon_idx = lon_low[:, None, None] + span_lon[None, None, :]
+    inside = (lat_idx <= lat_high[:, None, None]) & (lon_idx <= lon_high[:, None, None])
+    lat_idx, lon_idx = np.broadcast_arrays(lat_idx, lon_idx)
+    keys = np.unique((lat_idx[inside] << 32) | lon_idx[inside])
+    lat_idx, lon_idx = keys >> 32, keys & 0xFFFFFFFF
+    return encode_many((lat_idx + 0.5) * lat_size - 90.0, (lon_idx + 0.5) * lon_size - 180.0, precision).tolist()
+
+
+def compute_cell_risk(index: IncidentIndex, policy: RecencyPolicy, now: float,
+                      precision: int = RISK_VIEW_GEOHASH_PRECISION) -> Dict[str, Tuple[int, float, float]]:
+    """
+    Recomputes every cell's (incident count, max severity, decayed severity sum) from
+    the full index. This is what `RiskView` maintains incrementally; it is kept as the
+    reference implementation.
+    """
+    rows = index.rows_since(now - policy.max_window_seconds)
+    rows = rows[index.within_windows(rows, now, policy)]
+    with index._lock:
+        lat = index.latitude.view[rows]
+        lon = index.longitude.view[rows]
+    located = np.isfinite(lat) & np.isfinite(lon)
+    rows, lat, lon = rows[located], lat[located], lon[located]
+    if not len(rows):
+        return {}
+    severities = np.nan_to_num(index.severity_score.view[rows].astype(np.float64))
+    weights = index.severity_weights(rows, now, policy)
+    cells, inverse = np.unique(encode_many(lat, lon, precision), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(cells))
+    sums = np.bincount(inverse, weights=weights, minlength=len(cells))
+    maxima = np.zeros(len(cells))
+    np.maximum.at(maxima, inverse, severities)
+    return {cell: (int(c), float(m), float(s)) for cell, c, m, s in zip(cells.tolist(), counts, maxima, sums)}
+
+
+class RiskView:
+    """
+    Materialised view of the active incidents per geohash cell, with each cell's
+    maximum and decayed-sum severity.
+
+    Rows appended to the IncidentIndex are added as they are ingested, and rows
+    leave the view when their recency window closes (a heap of expiry times is
+    drained on every `sync`), so neither ingestion nor a query rescans the history.
+    Decayed sums are kept as severity * 2^((t - reference) / half-life), which does
+    not change as time passes; a query scales them by 2^(-(now - reference) / half-life).
+    The view is rebuilt from scratch only when the index itself is rebuilt.
+
+    Cell listeners are told which cells gained or lost incidents after every sync
+    that changed any.
+    """
+
+    def __init__(self, index: IncidentIndex, policy: RecencyPolicy, precision: int = RISK_VIEW_GEOHASH_PRECISION):
+        self.index = index
+        self.policy = policy
+        self.precision = precision
+        self._lock = threading.RLock()
+        self._generation = None
+        self._cell_listeners: List[Callable[[Set[str]], None]] = []
+        self._changed: Set[str] = set()
+        self._reset(time.time())
+
+    def _reset(self, now: float):
+        self._cell_rows: Dict[str, Dict[int, float]] = {}
+        self._cell_max: Dict[str, float] = {}
+        self._cell_weight: Dict[str, float] = {}
+        self._row_cell: Dict[int, str] = {}
+        self._expiry: List[Tuple[float, int]] = []
+        self._synced_rows = 0
+        self._reference = now
+
+    def add_cell_listener(self, callback: Callable[[Set[str]], None]) -> None:
+        """
+        Registers a callback run with the set of changed cells after every sync that changed any.
+        """
+        self._cell_listeners.append(callback)
+
+    def __len__(self):
+        return len(self._row_cell)
+
+    @property
+    def _half_life_seconds(self) -> Optional[float]:
+        return self.policy.half_life_hours * 3600.0 if self.policy.half_life_hours else None
+
+    def _weight(self, severity: float, timestamp: float) -> float:
+        half_life = self._half_life_seconds
+        return severity * math.exp2((timestamp - self._reference) / half_life) if half_life else severity
+
+    def sync(self, now: Optional[float] = None) -> None:
+        """
+        Adds the rows ingested since the last sync and drops the rows whose window has closed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            with self.index._lock:
+                if self._generation != self.index.generation:
+                    self._changed.update(self._cell_rows)
+                    self._reset(now)
+                    self._generation = self.index.generation
+                    rows = self.index.rows_since(now - self.policy.max_window_seconds)
+                else:
+                    rows = np.arange(self._synced_rows, len(self.index))
+                self._synced_rows = len(self.index)
+                self._add_rows(rows, now)
+            self._expire(now)
+            changed, self._changed = self._changed, set()
+        if changed:
+            for callback in self._cell_listeners:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.warning(f"Risk view cell listener failed: {e}")
+
+    def _add_rows(self, rows: np.ndarray, now: float) -> None:
+        if not len(rows):
+            return
+        index = self.index
+        timestamps = index.unix_timestamp.view[rows]
+        lat, lon = index.latitude.view[rows], index.longitude.view[rows]
+        active = np.isfinite(timestamps) & np.isfinite(lat) & np.isfinite(lon)
+        active[active] = index.within_windows(rows[active], now, self.policy)
+        rows, timestamps, lat, lon = rows[active], timestamps[active], lat[active], lon[active]
+        if not len(rows):
+            return
+        expires_at = timestamps + index.window_seconds(rows, self.policy)
+        severities = np.nan_to_num(index.severity_score.view[rows].astype(np.float64))
+        cells = encode_many(lat, lon, self.precision).tolist()
+
+        if self._half_life_seconds and (timestamps.max() - self._reference) / self._half_life_seconds > _MAX_HALF_LIVES:
+            self._rebase(now)
+        for row, cell, severity, timestamp, expiry in zip(rows.tolist(), cells, severities.tolist(),
+                                                            timestamps.tolist(), expires_at.tolist()):
+            if row in self._row_cell:
+                continue
+            self._row_cell[row] = cell
+            self._cell_rows.setdefault(cell, {})[row] = severity
+            self._cell_max[cell] = max(self._cell_max.get(cell, severity), severity)
+            self._cell_weight[cell] = self._cell_weight.get(cell, 0.0) + self._weight(severity, timestamp)
+            heapq.heappush(self._expiry, (expiry, row))
+            self._changed.add(cell)
+
+    def _expire(self, now: float) -> None:
+        # `within_windows` keeps a row while timestamp >= now - window, i.e. until now > expiry.
+        while self._expiry and self._expiry[0][0] < now:
+            _, row = heapq.heappop(self._expiry)
+            cell = self._row_cell.pop(row, None)
+            if cell is None:
+                continue
+            self._changed.add(cell)
+            rows = self._cell_rows[cell]
+            severity = rows.pop(row)
+            if not rows:
+                # Dropping emptied cells also discards any rounding left in their sums.
+                del self._cell_rows[cell], self._cell_max[cell], self._cell_weight[cell]
+                continue
+            timestamp = float(self.index.unix_timestamp.view[row])
+            self._cell_weight[cell] = max(self._cell_weight[cell] - self._weight(severity, timestamp), 0.0)
+            if severity >= self._cell_max[cell]:
+                self._cell_max[cell] = max(rows.values())
+
+    def _rebase(self, now: float) -> None:
+        scale = math.exp2(-(now - self._reference) / self._half_life_seconds)
+        self._cell_weight = {cell: weight * scale for cell, weight in self._cell_weight.items()}
+        self._reference = now
+
+    def _decay_factor(self, now: float) -> float:
+        half_life = self._half_life_seconds
+        return math.exp2(-(now - self._reference) / half_life) if half_life else 1.0
+
+    def cell_risk(self, cell: str, now: Optional[float] = None) -> Tuple[int, float, float]:
+        """
+        (incident count, max severity, decayed severity sum) of the active incidents in a cell.
+        """
+        now = time.time() if now is None else now
+        self.sync(now)
+        with self._lock:
+            rows = self._cell_rows.get(cell)
+            if not rows:
+                return 0, 0.0, 0.0
+            return len(rows), self._cell_max[cell], self._cell_weight[cell] * self._decay_factor(now)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Tuple[int, float, float]]:
+        """
+        Every non-empty cell's (incident count, max severity, decayed severity sum).
+        """
+        now = time.time() if now is None else now
+        self.sync(now)
+        with self._lock:
+            factor = self._decay_factor(now)
+            return {cell: (len(rows), self._cell_max[cell], self._cell_weight[cell] * factor)
+                    for cell, rows in self._cell_rows.items()}
+
+    def route_risk(self, points, corridor_m: float = ROUTE_CORRIDOR_METERS, now: Optional[float] = None) -> RouteRisk:
+        """
+        Aggregate risk of the active incidents in the cells a route corridor touches.
+
+        Cells are matched whole, so incidents up to a cell beyond `corridor_m` count too;
+        `CorridorMatcher` gives the exact per-incident distances.
+
+        Args:
+            points: (n, 2) array of (latitude, longitude) route vertices.
+            corridor_m: Half-width of the corridor in metres.
+            now: Reference time for the recency windows and decay (defaults to the current time).
+        """
+        now = time.time() if now is None else now
+        cells = corridor_cells(points, corridor_m, self.precision)
+        self.sync(now)
+        with self._lock:
+            factor = self._decay_factor(now)
+            hit = [cell for cell in cells if cell in self._cell_rows]
+            row_ids = np.fromiter((row for cell in hit for row in self._cell_rows[cell]), dtype=np.int64)
+            return RouteRisk(
+                cells=len(cells),
+                incident_count=len(row_ids),
+                max_severity=max((self._cell_max[cell] for cell in hit), default=0.0),
+                decayed_severity=sum(self._cell_weight[cell] for cell in hit) * factor,
+                row_ids=row_ids,
+                cell_ids=cells,
+            )
+
+
+_risk_view: Optional[RiskView] = None
+
+
+def get_risk_view() -> RiskView:
+    """
+    Returns the process-wide risk view over the process-wide incident index, updated
+    whenever the index ingests new rows.
+    """
+    global _risk_view
+    if _risk_view is None:
+        view = RiskView(get_incident_index(), get_recency_policy())
+        view.index.add_listener(view.sync)
+        _risk_view = view
+    return _risk_view
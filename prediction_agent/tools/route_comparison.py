@@ -0,0 +1,143 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .corridor_matcher import ROUTE_CORRIDOR_METERS, CorridorMatcher, get_corridor_matcher
+from .disruption_model import UNKNOWN, WEATHER_CATEGORIES, DisruptionPredictor, get_disruption_predictor
+from .recency import RecencyPolicy, get_recency_policy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteScore:
+    """
+    Incident exposure of one route. `expected_disruption` weighs each active incident's
+    decayed severity by the chance it persists over the predictor's horizon, so
+    incidents that are likely to have cleared count for less.
+    """
+    route: int
+    incident_count: int
+    max_severity: float
+    decayed_severity: float
+    expected_disruption: float
+    row_ids: np.ndarray
+
+    def to_dict(self) -> dict:
+        return {
+            "incident_count": self.incident_count,
+            "max_severity": self.max_severity,
+            "decayed_severity": round(self.decayed_severity, 3),
+            "expected_disruption": round(self.expected_disruption, 3),
+        }
+
+
+def route_matches(polylines: Sequence[np.ndarray], matcher: CorridorMatcher = None, policy: RecencyPolicy = None,
+                  corridor_m: float = ROUTE_CORRIDOR_METERS, now: Optional[float] = None) -> List[np.ndarray]:
+    """
+    Row ids of the active incidents within `corridor_m` of each route, ordered along
+    the route, from one `CorridorMatcher.match_many` pass and one recency check over
+    the matches of all routes.
+    """
+    matcher = matcher if matcher is not None else get_corridor_matcher()
+    policy = policy if policy is not None else get_recency_policy()
+    now = time.time() if now is None else now
+
+    matches = matcher.match_many(polylines, corridor_m, since=now - policy.max_window_seconds)
+    rows = np.concatenate([m.row_ids for m in matches]) if matches else np.empty(0, dtype=np.int64)
+    active = matcher.index.within_windows(rows, now, policy)
+    bounds = np.cumsum([0] + [len(m) for m in matches])
+    return [m.row_ids[active[bounds[i]:bounds[i + 1]]] for i, m in enumerate(matches)]
+
+
+def score_routes(route_rows: Sequence[np.ndarray], weather: Optional[Sequence[str]] = None,
+                 matcher: CorridorMatcher = None, policy: RecencyPolicy = None,
+                 predictor: DisruptionPredictor = None, now: Optional[float] = None) -> List[RouteScore]:
+    """
+    Scores routes by the incidents matched on them (see `route_matches`).
+
+    Severities, decay weights and persistence probabilities are computed once over the
+    incidents of all routes and summed per route with `np.bincount`; the predictor is
+    consulted once per distinct (event type, sub-event type, weather), so another
+    route adds array work, not model calls.
+
+    Args:
+        route_rows: Active incident row ids of each route.
+        weather: Weather category (see `weather_category`) of each route; unknown if omitted.
+
+    Returns:
+        One RouteScore per route, in input order.
+    """
+    matcher = matcher if matcher is not None else get_corridor_matcher()
+    policy = policy if policy is not None else get_recency_policy()
+    index = matcher.index
+    predictor = predictor if predictor is not None else get_disruption_predictor(index)
+    now = time.time() if now is None else now
+    n_routes = len(route_rows)
+    weather = list(weather) if weather is not None else [UNKNOWN] * n_routes
+    weather_codes = np.array([WEATHER_CATEGORIES.index(w if w in WEATHER_CATEGORIES else UNKNOWN) for w in weather],
+                             dtype=np.int64)
+
+    rows = np.concatenate(route_rows) if n_routes else np.empty(0, dtype=np.int64)
+    route_of = np.repeat(np.arange(n_routes), [len(r) for r in route_rows])
+    with index._lock:
+        severities = np.nan_to_num(index.severity_score.view[rows].astype(np.float64))
+        event_codes = index.codes['event_type'].view[rows]
+        sub_codes = index.codes['sub_event_type'].view[rows]
+        vocabularies = index.vocabularies['event_type'], index.vocabularies['sub_event_type']
+    weights = index.severity_weights(rows, now, policy)
+
+    # Persistence probability per distinct (event type, sub-event type, weather), packed
+    # into one integer (codes are shifted by one, as missing values are coded -1).
+    n_subs, n_weather = len(vocabularies[1]) + 1, len(WEATHER_CATEGORIES)
+    kinds = ((event_codes.astype(np.int64) + 1) * n_subs + sub_codes + 1) * n_weather + weather_codes[route_of]
+    unique_kinds, inverse = np.unique(kinds, return_inverse=True)
+    probabilities = []
+    for kind in unique_kinds.tolist():
+        rest, weather_code = divmod(kind, n_weather)
+        event, sub = divmod(rest, n_subs)
+        prediction = predictor.predict(vocabularies[0].decode(event - 1), vocabularies[1].decode(sub - 1),
+                                       WEATHER_CATEGORIES[weather_code])
+        probabilities.append(prediction.persist_probability)
+    persist = np.array(probabilities, dtype=np.float64)[inverse]
+
+    counts = np.bincount(route_of, minlength=n_routes)
+    decayed = np.bincount(route_of, weights=weights, minlength=n_routes)
+    expected = np.bincount(route_of, weights=weights * persist, minlength=n_routes)
+    maxima = np.zeros(n_routes)
+    np.maximum.at(maxima, route_of, severities)
+    return [
+        RouteScore(route=i, incident_count=int(counts[i]), max_severity=float(maxima[i]),
+                   decayed_severity=float(decayed[i]), expected_disruption=float(expected[i]), row_ids=route_rows[i])
+        for i in range(n_routes)
+    ]
+
+
+def rank_routes(scores: List[RouteScore], durations_s: Optional[Sequence[float]] = None) -> List[RouteScore]:
+    """
+    Orders routes safest first: by expected disruption, then decayed severity, then
+    travel time.
+    """
+    durations_s = durations_s if durations_s is not None else [0.0] * len(scores)
+    return sorted(scores, key=lambda s: (round(s.expected_disruption, 6), round(s.decayed_severity, 6),
+                                         durations_s[s.route]))
+
+
+def describe_comparison(routes: List[dict]) -> str:
+    """
+    A short summary of a ranked comparison (dicts with `summary`, `duration_min`,
+    `incident_count` and `expected_disruption`, safest first).
+    """
+    if not routes:
+        return "No route found."
+    lines = []
+    for i, route in enumerate(routes):
+        name = f"via {route['summary']}" if route.get("summary") else f"Route {route['route'] + 1}"
+        incidents = route["incident_count"]
+        detail = (f"{route['duration_min']:.0f} min, {incidents} active incident{'s' if incidents != 1 else ''}"
+                  + (f", expected disruption {route['expected_disruption']:.1f}" if incidents else ""))
+        lines.append(f"{'Safest:' if i == 0 else f'{i + 1}.'} {name} ({detail})")
+    return "\n".join(lines)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    # Events published so far by the one computation of a key, replayed to every waiter.
+    def __init__(self):
+        self.events: List[Tuple[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.traceback = None
+        self.changed = asyncio.Condition()
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key into one.
+
+    `run(key, compute)` starts `compute()` (an async iterator of (event, payload) pairs)
+    as a background task unless one is already running for `key`, and yields its
+    events; a request that arrives mid-way first gets the events published so far.
+    Every waiter sees the same events and the same error, if any. The computation
+    runs to completion even if all its waiters go away, so its result still reaches
+    whatever cache it fills.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: str, compute: Callable[[], AsyncIterator[Tuple[str, Any]]]) -> _Flight:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.followers += 1
+                flight.waiters += 1
+                logger.info(f"Single flight '{self.name}': joined the computation of '{key}' "
+                            f"({flight.waiters} requests).")
+                return flight
+            flight = self._flights[key] = _Flight()
+            flight.waiters = 1
+            self.leaders += 1
+        flight.task = asyncio.create_task(self._drive(key, flight, compute))
+        return flight
+
+    async def _drive(self, key: str, flight: _Flight, compute) -> None:
+        try:
+            async for event in compute():
+                async with flight.changed:
+                    flight.events.append(event)
+                    flight.changed.notify_all()
+        except Exception as e:
+            flight.error, flight.traceback = e, e.__traceback__
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    async def run(self, key: str, compute: Callable[[], AsyncIterator[Tuple[str, Any]]]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Yields the events of the computation of `key`, starting `compute()` if none is
+        running.
+
+        Raises:
+            Exception: Whatever the computation raised, in every waiter.
+        """
+        flight = self._join(key, compute)
+        seen = 0
+        while True:
+            async with flight.changed:
+                await flight.changed.wait_for(lambda: len(flight.events) > seen or flight.done)
+                events, done = flight.events[seen:], flight.done
+            seen += len(events)
+            for event in events:
+                yield event
+            if done:
+                if flight.error is not None:
+                    # Each waiter re-raises from the computation's own traceback, not the last waiter's.
+                    raise flight.error.with_traceback(flight.traceback)
+                return
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            leaders, followers, in_flight = self.leaders, self.followers, len(self._flights)
+        requests = leaders + followers
+        return {
+            "in_flight": in_flight,
+            "computations": leaders,
+            "coalesced": followers,
+            "coalescing_ratio": round(followers / requests, 4) if requests else None,
+        }
+
+
+_single_flights: Dict[str, SingleFlight] = {}
+_single_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """
+    Returns the process-wide single flight group with the given name, creating it on first use.
+    """
+    with _single_flights_lock:
+        group = _single_flights.get(name)
+        if group is None:
+            group = _single_flights[name] = SingleFlight(name)
+        return group
+
+
+def single_flight_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: group.snapshot() for name, group in _single_flights.items()}
@@ -0,0 +1,309 @@
+import math
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# --- Normalisation ---
+# Expansions are applied per token after lower-casing and punctuation stripping.
+ABBREVIATIONS = {
+    "rd": "road", "ro": "road",
+    "st": "street", "str": "street",
+    "ave": "avenue", "av": "avenue",
+    "ln": "lane",
+    "mn": "main",
+    "blvd": "boulevard",
+    "hwy": "highway", "nh": "national highway",
+    "jn": "junction", "jnc": "junction", "jct": "junction", "junc": "junction",
+    "cir": "circle", "circ": "circle",
+    "crs": "cross", "x": "cross",
+    "ext": "extension", "extn": "extension",
+    "lyt": "layout",
+    "ngr": "nagar",
+    "svc": "service", "serv": "service",
+    "flyovr": "flyover",
+    "orr": "outer ring road",
+    "irr": "inner ring road",
+    "blr": "bengaluru", "bangalore": "bengaluru", "bengalooru": "bengaluru",
+}
+
+# Spelling variants produced by romanising Kannada/Hindi place names, folded to one form.
+# Applied in order to every token of both the indexed names and the queries.
+TRANSLITERATION_FOLDS = [
+    (re.compile(r"hally$|halli$|hali$"), "hali"),
+    (re.compile(r"([kgcjtdpb])h"), r"\1"),     # aspirates: dh -> d, bh -> b, th -> t
+    (re.compile(r"sh"), "s"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"z"), "j"),
+    (re.compile(r"aa"), "a"),
+    (re.compile(r"ee"), "i"),
+    (re.compile(r"oo"), "u"),
+    (re.compile(r"([b-df-hj-np-tv-z])\1"), r"\1"),  # doubled consonants
+    (re.compile(r"(?<=[b-df-hj-np-tv-z])u$"), ""),  # Kannada terminal -u: Bellanduru -> Bellandur
+]
+
+# Tokens that qualify a place rather than name it ("near", the city, PIN codes).
+NOISE_TOKENS = {"near", "opp", "opposite", "behind", "beside", "bengaluru", "karnataka", "india"}
+_PIN_CODE = re.compile(r"^5[0-9]{5}$")
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+@lru_cache(maxsize=65536)
+def fold_token(token: str) -> str:
+    if len(token) <= 2 or token.isdigit():
+        return token
+    for pattern, replacement in TRANSLITERATION_FOLDS:
+        token = pattern.sub(replacement, token)
+    return token
+
+
+@lru_cache(maxsize=65536)
+def normalize_place_name(name) -> Optional[str]:
+    """
+    Normalises a street or area name to a canonical key: accents stripped,
+    lower-cased, punctuation and qualifiers removed, abbreviations expanded and
+    romanisation variants folded. "Outer Ring Rd", "ORR" and "outer ring road"
+    share a key.
+    """
+    if name is None or (isinstance(name, float) and math.isnan(name)):
+        return None
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    tokens = []
+    for token in _NON_ALNUM.sub(" ", text).split():
+        for expanded in ABBREVIATIONS.get(token, token).split():
+            if expanded not in NOISE_TOKENS and not _PIN_CODE.match(expanded):
+                tokens.append(fold_token(expanded))
+    return " ".join(tokens) or None
+
+
+def trigrams(token: str) -> List[str]:
+    padded = f"  {token} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def single_deletes(token: str) -> List[str]:
+    return [token[:i] + token[i + 1:] for i in range(len(token))]
+
+
+class PlaceNameIndex:
+    """
+    Inverted index over the tokens of normalised place-name keys, for fuzzy lookup.
+
+    Every distinct key is indexed once, as its set of tokens. A query token is
+    matched against the (small) token vocabulary exactly, by single-edit
+    variants (via deletion postings, as in SymSpell) and by trigram overlap;
+    these matches are cached until new tokens arrive. Keys are then scored by
+    an IDF-weighted Dice coefficient over matched tokens, so a distinctive
+    token ("hudi") counts for more than a ubiquitous one ("road").
+
+    Candidate keys come only from the postings of a query's most distinctive
+    tokens: the tokens left out carry too little weight for a key sharing
+    nothing else to reach `min_score` (a prefix filter). Candidates for a whole
+    batch of queries are then scored together in a few NumPy operations.
+    """
+
+    # Similarity credited to a token one edit away from the query token.
+    EDIT_SIMILARITY = 0.8
+
+    def __init__(self, min_score: float = 0.5, min_token_similarity: float = 0.6):
+        self.min_score = min_score
+        self.min_token_similarity = min_token_similarity
+        self._lock = threading.RLock()
+        self.keys: List[str] = []
+        self.key_ids: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        self.token_ids: Dict[str, int] = {}
+        self._token_keys: List[List[int]] = []
+        self._key_tokens: List[List[int]] = []
+        self._trigram_tokens: Dict[str, List[int]] = {}
+        self._delete_tokens: Dict[str, List[int]] = {}
+        self._token_matches: Dict[str, List[Tuple[int, float]]] = {}
+        self._posting_arrays: Dict[int, np.ndarray] = {}
+        self._dirty = True
+        self._idf = np.empty(0)
+        self._key_weights = np.empty(0)
+        self._key_offsets = np.zeros(1, dtype=np.int64)
+        self._flat_tokens = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key: str) -> int:
+        """
+        Indexes a normalised key (idempotent) and returns its id.
+        """
+        with self._lock:
+            key_id = self.key_ids.get(key)
+            if key_id is not None:
+                return key_id
+            key_id = len(self.keys)
+            self.keys.append(key)
+            self.key_ids[key] = key_id
+            token_ids = [self._add_token(token) for token in dict.fromkeys(key.split())]
+            for token_id in token_ids:
+                self._token_keys[token_id].append(key_id)
+                self._posting_arrays.pop(token_id, None)
+            self._key_tokens.append(token_ids)
+            self._dirty = True
+            return key_id
+
+    def _add_token(self, token: str) -> int:
+        token_id = self.token_ids.get(token)
+        if token_id is not None:
+            return token_id
+        token_id = self.token_ids[token] = len(self.tokens)
+        self.tokens.append(token)
+        self._token_keys.append([])
+        for gram in trigrams(token):
+            self._trigram_tokens.setdefault(gram, []).append(token_id)
+        for variant in [token] + single_deletes(token):
+            self._delete_tokens.setdefault(variant, []).append(token_id)
+        self._token_matches.clear()
+        return token_id
+
+    def _refresh(self):
+        # IDF weights depend on the whole vocabulary, so they are recomputed lazily
+        # on the first lookup after keys were added.
+        if not self._dirty:
+            return
+        document_frequency = np.array([len(k) for k in self._token_keys], dtype=np.float64)
+        self._idf = np.log1p(len(self.keys) / np.maximum(document_frequency, 1.0))
+        lengths = np.array([len(t) for t in self._key_tokens], dtype=np.int64)
+        self._key_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self._flat_tokens = np.fromiter((t for ids in self._key_tokens for t in ids), dtype=np.int64,
+                                        count=int(self._key_offsets[-1]))
+        owners = np.repeat(np.arange(len(self.keys)), lengths)
+        self._key_weights = np.bincount(owners, weights=self._idf[self._flat_tokens], minlength=len(self.keys))
+        self._dirty = False
+
+    def _postings(self, token_id: int) -> np.ndarray:
+        array = self._posting_arrays.get(token_id)
+        if array is None:
+            array = self._posting_arrays[token_id] = np.array(self._token_keys[token_id], dtype=np.int64)
+        return array
+
+    def match_token(self, token: str) -> List[Tuple[int, float]]:
+        """
+        Vocabulary tokens similar to `token`, as (token_id, similarity) pairs.
+        Numbered tokens ("5th", "100") and tokens under four characters only match exactly.
+        """
+        matches = self._token_matches.get(token)
+        if matches is not None:
+            return matches
+        exact = self.token_ids.get(token)
+        if exact is not None:
+            matches = [(exact, 1.0)]
+        elif len(token) < 4 or any(ch.isdigit() for ch in token):
+            matches = []
+        else:
+            similarity = {}
+            for variant in [token] + single_deletes(token):
+                for token_id in self._delete_tokens.get(variant, ()):
+                    similarity[token_id] = self.EDIT_SIMILARITY
+            grams = trigrams(token)
+            shared = {}
+            for gram in grams:
+                for token_id in self._trigram_tokens.get(gram, ()):
+                    shared[token_id] = shared.get(token_id, 0) + 1
+            for token_id, count in shared.items():
+                dice = 2.0 * count / (len(grams) + len(trigrams(self.tokens[token_id])))
+                if dice >= self.min_token_similarity and dice > similarity.get(token_id, 0.0):
+                    similarity[token_id] = dice
+            matches = sorted(similarity.items(), key=lambda item: -item[1])[:3]
+        if len(self._token_matches) >= 65536:
+            self._token_matches.clear()
+        self._token_matches[token] = matches
+        return matches
+
+    def lookup_many(self, names: List[str], limit: int = 5) -> List[List[Tuple[int, float]]]:
+        """
+        Fuzzy-matches a batch of raw names against the indexed keys.
+
+        Returns:
+            For each name, up to `limit` (key_id, score) pairs with score >= min_score,
+            best first. An exact normalised match scores 1.0.
+        """
+        with self._lock:
+            results = [[] for _ in names]
+            if not self.keys:
+                return results
+            self._refresh()
+            unknown_weight = math.log1p(len(self.keys))
+
+            query_weights = np.zeros(len(names))
+            credit = {}     # (query, vocabulary token) -> credited weight
+            candidate_queries, candidate_keys = [], []
+            for query, name in enumerate(names):
+                key = normalize_place_name(name)
+                if key is None:
+                    continue
+                token_weights = []
+                for token in dict.fromkeys(key.split()):
+                    credited = [(token_id, similarity * self._idf[token_id]) for token_id, similarity in self.match_token(token)]
+                    for token_id, value in credited:
+                        credit[query, token_id] = max(credit.get((query, token_id), 0.0), value)
+                    token_weights.append((max((v for _, v in credited), default=unknown_weight), credited))
+                query_weights[query] = sum(weight for weight, _ in token_weights)
+
+                # Prefix filter: most distinctive tokens first, until the weight left over
+                # could not lift a key sharing only those tokens to min_score.
+                token_weights.sort(key=lambda item: -item[0])
+                remaining = query_weights[query]
+                prefix_postings, prefix_values = [], []
+                for weight, credited in token_weights:
+                    if 2.0 * remaining / (query_weights[query] + remaining) < self.min_score:
+                        break
+                    remaining -= weight
+                    for token_id, value in credited:
+                        prefix_postings.append(self._postings(token_id))
+                        prefix_values.append(value)
+                if not prefix_postings:
+                    continue
+
+                # Drop candidates that cannot reach min_score even if they also share every
+                # remaining token: 2 * (prefix overlap + remaining) / (Q + key weight).
+                postings = np.concatenate(prefix_postings)
+                values = np.repeat(prefix_values, [len(p) for p in prefix_postings])
+                order = np.argsort(postings, kind="stable")
+                postings = postings[order]
+                starts = np.flatnonzero(np.concatenate([[True], postings[1:] != postings[:-1]]))
+                keys = postings[starts]
+                overlap_bound = np.add.reduceat(values[order], starts) + remaining
+                keys = keys[2.0 * overlap_bound / (query_weights[query] + self._key_weights[keys]) >= self.min_score]
+                candidate_keys.append(keys)
+                candidate_queries.append(np.full(len(keys), query, dtype=np.int64))
+            if not candidate_keys:
+                return results
+
+            # Exact weighted overlap of every (query, candidate key) pair with the query.
+            queries = np.concatenate(candidate_queries)
+            keys = np.concatenate(candidate_keys)
+            starts = self._key_offsets[keys]
+            lengths = self._key_offsets[keys + 1] - starts
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            key_tokens = self._flat_tokens[positions]
+
+            # Credited weights as a dense (query x matched token) table; the extra last
+            # column is zero and absorbs key tokens the query did not match.
+            matched = sorted({token_id for _, token_id in credit})
+            columns = np.full(len(self.tokens), len(matched), dtype=np.int64)
+            columns[matched] = np.arange(len(matched))
+            table = np.zeros((len(names), len(matched) + 1))
+            for (query, token_id), value in credit.items():
+                table[query, columns[token_id]] = value
+            credited = table[np.repeat(queries, lengths), columns[key_tokens]]
+            shared = np.bincount(np.repeat(np.arange(len(keys)), lengths), weights=credited, minlength=len(keys))
+            scores = np.minimum(2.0 * shared / (query_weights[queries] + self._key_weights[keys]), 1.0)
+
+            keep = np.flatnonzero(scores >= self.min_score)
+            keep = keep[np.lexsort((-scores[keep], queries[keep]))]
+            for i in keep.tolist():
+                hits = results[int(queries[i])]
+                if len(hits) < limit:
+                    hits.append((int(keys[i]), float(scores[i])))
+            return results
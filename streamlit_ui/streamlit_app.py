@@ -4,7 +4,9 @@ import time
 import base64
 import pandas as pd
 import os
+import json
 from streamlit_js_eval import streamlit_js_eval
+from tools.tracing import get_tracer, setup_tracing, traced_headers
 
 # Note: This application requires 'streamlit-js-eval' and 'pandas'.
 # Install them using: pip install streamlit-js-eval pandas
@@ -15,6 +17,56 @@ st.set_page_config(
    layout="centered"
 )
 
+# --- Backends ---
+INGESTION_URL = os.getenv("INGESTION_URL", "http://0.0.0.0:8000").rstrip("/")
+PREDICTION_URL = os.getenv("PREDICTION_URL", "http://0.0.0.0:9900").rstrip("/")
+# Pending addresses are re-checked at most once per PENDING_ADDRESS_TTL_SECONDS (the script
+# reruns on every interaction), in one batched lookup.
+PENDING_ADDRESS_TTL_SECONDS = int(os.getenv("PENDING_ADDRESS_TTL_SECONDS", "15"))
+
+# --- Tracing ---
+# Each backend call starts a trace that the services continue (W3C traceparent header),
+# configured as for the services (TRACE_EXPORTER, TRACE_FILE; see tools/tracing.py).
+@st.cache_resource
+def init_tracing():
+    """
+    Installs the tracer provider once per Streamlit process (the script reruns on every
+    interaction). It flushes its batched spans when the process exits.
+    """
+    return setup_tracing("streamlit_ui")
+
+
+init_tracing()
+tracer = get_tracer()
+
+# --- Chat streaming ---
+# Progress messages for the prediction service's stage events.
+STAGE_LABELS = {
+    "planned": "Understanding your question...",
+    "route_resolved": "Route found ({locations} places along it). Checking for incidents...",
+    "incidents_found": "{incidents} incidents found on your route. Estimating how they will develop...",
+    "predicted": "Checking news and weather...",
+    "advisory_cached": "Using the latest advisory for this route...",
+    "enriched": "Preparing your advisory...",
+}
+
+
+def read_sse(response):
+    """
+    Parses a server-sent event stream into (event, data) pairs, with data decoded from JSON.
+    """
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].lstrip())
+
+
 # --- Initialize Session State ---
 # This ensures that our variables persist across reruns.
 
@@ -37,8 +89,61 @@ if 'chat_messages' not in st.session_state:
     st.session_state.chat_messages = []
 
 
+def rewrite_history(df, file_path="submission_history.csv"):
+    """
+    Replaces the submission history in one atomic rename, so readers tailing the
+    file (the prediction service's incident index) see a new file rather than a
+    half-rewritten one.
+    """
+    tmp_path = f"{file_path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+
+
+@st.cache_data(ttl=PENDING_ADDRESS_TTL_SECONDS, show_spinner=False)
+def fetch_reports(incident_ids: tuple) -> dict:
+    """
+    Fetches the stored reports for the given ids in batched calls, keyed by incident_id.
+    """
+    reports = {}
+    # The ingestion service takes at most 500 ids per lookup.
+    for start in range(0, len(incident_ids), 500):
+        response = requests.get(f"{INGESTION_URL}/reports", params={"incident_id": list(incident_ids[start:start + 500])},
+                                headers=traced_headers(), timeout=5)
+        response.raise_for_status()
+        reports.update((report["incident_id"], report) for report in response.json())
+    return reports
+
+
+def refresh_pending_addresses(file_path="submission_history.csv"):
+    """
+    Re-fetches reports that were returned before reverse geocoding finished and
+    rewrites their rows in the submission history once the address is known.
+    """
+    df = st.session_state.responses_df
+    if df.empty or "pending_address" not in df.columns or "incident_id" not in df.columns:
+        return
+    pending = df.index[df["pending_address"].astype(str).str.lower() == "true"]
+    if pending.empty:
+        return
+    try:
+        reports = fetch_reports(tuple(df.loc[pending, "incident_id"].astype(str)))
+    except requests.exceptions.RequestException:
+        return
+    updated = False
+    for idx in pending:
+        report = reports.get(str(df.at[idx, "incident_id"]))
+        if report and not report.get("pending_address"):
+            for column, value in report.items():
+                if column in df.columns:
+                    df.at[idx, column] = value
+            updated = True
+    if updated:
+        rewrite_history(df, file_path)
+
+
 # --- Create Tabs ---
-tab1, tab2 = st.tabs(["Report", "Chat"])
+tab1, tab2, tab3 = st.tabs(["Report", "Chat", "Heatmap"])
 
 
 # ==============================================================================
@@ -111,21 +216,31 @@ with tab1:
         if image_provided:
             try:
                 st.info("Sending request to the backend...")
-                response = requests.post("http://0.0.0.0:8000/query", json=payload)
+                with tracer.start_as_current_span("submit_report"):
+                    response = requests.post(f"{INGESTION_URL}/query", json=payload, headers=traced_headers())
                 response.raise_for_status()
                 st.success("Request sent successfully!")
 
                 response_data = response.json()
                 st.json(response_data)
+                if response_data.get("pending_address"):
+                    st.info("The address is still being resolved; it will be filled into the history once the geocoder finishes.")
 
                 new_entry_df = pd.DataFrame([response_data])
                 file_path = "submission_history.csv"
-                new_entry_df.to_csv(
-                    file_path,
-                    mode='a',
-                    header=not os.path.exists(file_path),
-                    index=False
-                )
+                existing_columns = list(pd.read_csv(file_path, nrows=0).columns) if os.path.exists(file_path) else []
+                if existing_columns and set(new_entry_df.columns) - set(existing_columns):
+                    # The report schema gained columns (e.g. source_media_uri): rewrite with the union
+                    # so older rows and the new row stay aligned.
+                    rewrite_history(pd.concat([pd.read_csv(file_path), new_entry_df], ignore_index=True), file_path)
+                else:
+                    new_entry_df = new_entry_df.reindex(columns=existing_columns or new_entry_df.columns)
+                    new_entry_df.to_csv(
+                        file_path,
+                        mode='a',
+                        header=not existing_columns,
+                        index=False
+                    )
                 st.success(f"Response appended to {file_path}")
 
                 st.session_state.responses_df = pd.concat(
@@ -140,6 +255,7 @@ with tab1:
 
     # --- Display the full history ---
     st.subheader("Submission History")
+    refresh_pending_addresses()
     if not st.session_state.responses_df.empty:
         st.dataframe(st.session_state.responses_df)
     else:
@@ -180,23 +296,37 @@ with tab2:
                     "session_id": chat_session_id
                 }
                 
-                # Send request to the chat backend
-                response = requests.post("http://0.0.0.0:9900/query", json=chat_payload)
-                response.raise_for_status() # Raise an exception for bad status codes
-
-                response_data = response.json()
-                
-                # Extract the final output from the response
-                final_output = response_data.get("final_output", "Sorry, I received an unexpected response format.")
-
-                # Helper function to yield words for a streaming effect
-                def stream_data(text):
-                    for word in text.split(" "):
-                        yield word + " "
-                        time.sleep(0.02) # Adjust sleep time for desired speed
-
-                # Use st.write_stream to display the response with a typewriter effect
-                st.write_stream(stream_data(final_output))
+                # Stream the response from the chat backend: stage progress first,
+                # then the advisory as the prediction agent generates it.
+                started = time.perf_counter()
+                timings = {}
+                progress = st.empty()
+                result = {}
+
+                def stream_reply():
+                    with tracer.start_as_current_span("chat_query"), \
+                            requests.post(f"{PREDICTION_URL}/query/stream", json=chat_payload, stream=True,
+                                          headers=traced_headers()) as response:
+                        response.raise_for_status() # Raise an exception for bad status codes
+                        for event, data in read_sse(response):
+                            if event == "stage":
+                                progress.caption(STAGE_LABELS.get(data.get("stage"), "Working...").format(**data))
+                            elif event == "token":
+                                if "first_token" not in timings:
+                                    timings["first_token"] = time.perf_counter() - started
+                                    progress.empty()
+                                yield data["text"]
+                            elif event == "final":
+                                result.update(data)
+                            elif event == "error":
+                                raise requests.exceptions.RequestException(data.get("detail"))
+
+                # Use st.write_stream to display the response as it arrives
+                final_output = st.write_stream(stream_reply())
+                final_output = result.get("final_output", final_output) or "Sorry, I received an unexpected response format."
+                if "first_token" in timings:
+                    st.caption(f"First token after {timings['first_token']:.1f} s, "
+                               f"complete after {time.perf_counter() - started:.1f} s")
 
                 # Add the complete assistant response to chat history after streaming
                 st.session_state.chat_messages.append({"role": "assistant", "content": final_output})
@@ -205,4 +335,53 @@ with tab2:
                 error_message = f"Failed to get a response from the chat agent: {e}"
                 st.error(error_message)
                 # Add the error to the chat history so it's visible in the UI
-                st.session_state.chat_messages.append({"role": "assistant", "content": error_message})
\ No newline at end of file
+                st.session_state.chat_messages.append({"role": "assistant", "content": error_message})
+
+
+# ==============================================================================
+# --- TAB 3: HEATMAP ---
+# ==============================================================================
+# Streamlit reruns every tab on any interaction, so the heatmap is fetched at most once
+# per HEATMAP_TTL_SECONDS for the same parameters.
+HEATMAP_TTL_SECONDS = int(os.getenv("HEATMAP_TTL_SECONDS", "60"))
+
+
+@st.cache_data(ttl=HEATMAP_TTL_SECONDS, show_spinner=False)
+def fetch_heatmap(precision: int, event_type: str) -> dict:
+    params = {"precision": precision}
+    if event_type:
+        params["event_type"] = event_type
+    with tracer.start_as_current_span("heatmap"):
+        response = requests.get(f"{PREDICTION_URL}/heatmap", params=params, headers=traced_headers(), timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+with tab3:
+    st.header("Incident Heatmap")
+    st.write("Where incidents have been reported, per geohash cell. Recent incidents weigh more.")
+
+    heat_precision = st.radio("Cell size", options=[5, 6, 7], index=1, horizontal=True,
+                              format_func=lambda p: {5: "~5 km", 6: "~1 km", 7: "~150 m"}[p])
+    heat_event_type = st.text_input("Event type (optional)", value="", key="heat_event_type")
+
+    try:
+        heat = fetch_heatmap(heat_precision, heat_event_type.strip())
+        cells = pd.DataFrame(heat["cells"])
+        if cells.empty:
+            st.info("No incidents to show.")
+        else:
+            # Brighter and larger for a higher decayed severity; every cell stays visible.
+            intensity = (cells["decayed_severity"] / cells["decayed_severity"].max()).clip(0.05, 1.0)
+            cells["color"] = [f"#ff{int(255 * (1 - v)):02x}00{int(80 + 160 * v):02x}" for v in intensity]
+            cells["size"] = {5: 2500, 6: 500, 7: 80}[heat_precision] * intensity.pow(0.5)
+            st.map(cells, latitude="latitude", longitude="longitude", size="size", color="color")
+            area = heat["area"]
+            shown = (f"{len(cells)} cells shown" if len(cells) == heat["total_cells"]
+                     else f"{len(cells)} of {heat['total_cells']} cells shown (the most severe)")
+            st.caption(f"{shown}. All {area['incident_count']} incidents by event type:")
+            st.dataframe(pd.DataFrame.from_dict(area["by_event_type"], orient="index")
+                         .sort_values("decayed_severity", ascending=False))
+    except requests.exceptions.RequestException as e:
+        st.error(f"Failed to load the heatmap: {e}")
+
@@ -0,0 +1,71 @@
+"""
+OpenTelemetry tracing of the Streamlit UI.
+
+`setup_tracing` installs the global tracer provider; each backend call runs in a
+span whose trace `traced_headers` carries to the services (W3C `traceparent`
+header), which continue it.
+
+Spans go to TRACE_EXPORTER: "file" (one JSON span per line in TRACE_FILE, for offline
+use; see prediction_agent/tools/critical_path.py), "console", "gcp" (Cloud Trace) or
+"none".
+"""
+import logging
+import os
+from typing import Dict, Optional
+
+from opentelemetry import trace
+from opentelemetry.propagate import inject
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(__file__), "..", "traces.jsonl"))
+
+TRACER_NAME = "commuteguardian"
+
+
+def setup_tracing(service_name: str) -> Optional[TracerProvider]:
+    """
+    Installs a tracer provider exporting to TRACE_EXPORTER, unless it is "none".
+
+    Returns:
+        The provider, to shut down (flushing pending spans) when the service stops.
+    """
+    if TRACE_EXPORTER == "none":
+        return None
+    if TRACE_EXPORTER == "file":
+        path = os.path.abspath(TRACE_FILE)
+        exporter = ConsoleSpanExporter(out=open(path, "a", encoding="utf-8"),
+                                       formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif TRACE_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif TRACE_EXPORTER == "gcp":
+        from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+        exporter = CloudTraceSpanExporter()
+    else:
+        logger.warning(f"Unknown TRACE_EXPORTER '{TRACE_EXPORTER}', tracing disabled.")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing '{service_name}' to {TRACE_EXPORTER}"
+                + (f" ({os.path.abspath(TRACE_FILE)})." if TRACE_EXPORTER == "file" else "."))
+    return provider
+
+
+def get_tracer() -> trace.Tracer:
+    return trace.get_tracer(TRACER_NAME)
+
+
+def traced_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    `headers` plus the propagation headers of the current trace, for an outgoing request.
+    """
+    headers = dict(headers or {})
+    inject(headers)
+    return headers